@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""End-to-end orchestration benchmark on the fake tools.
+
+Runs the real ``run_wrap_n_shake_docking`` → ``run_shaker_cycles``
+(``washing_cycle``) flow in a temporary project with ``fake_tools``
+launchers first on ``PATH``.  With the tool latency fixed, every second
+beyond the tool time is orchestration: Python start-up of each call,
+template rendering, DLG parsing, masking, clash checks, GRO parsing,
+checkpoint and results-store writes.
+
+    python benchmarks/bench_orchestration.py --seeds 20 --latency 0.2
+    python benchmarks/bench_orchestration.py --crash-at 4      # resume after a crash
+    python benchmarks/bench_orchestration.py --baseline old.json
+
+For each phase the results report wall time, the time spent inside tool
+calls (from ``run_metrics``), the difference (``overhead_s``) and the tool
+call count.  ``--crash-at N`` makes the N-th autodock4 call fail, then
+reruns the docking and reports how long the resume took and whether every
+seed ended up completed exactly once.  Results are JSON in the same layout
+as ``run_benchmarks.py`` so ``--baseline``/``--diff`` work the same way.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools  # noqa: E402
+import synthetic  # noqa: E402
+from run_benchmarks import (DEFAULT_RESULTS_DIR, DEFAULT_THRESHOLD, RESULTS_VERSION,  # noqa: E402
+                            compare, git_commit, load_results, print_comparison)
+
+LIGAND_TYPES = "A C N NA OA HD SA"
+
+
+def make_project(root: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    """Write receptor, ligand and annealing inputs; return the pipeline config."""
+    synthetic.write_receptor_pdbqt(root / "pdbqt" / "protein.pdbqt", args.receptor_atoms)
+    low, high = synthetic.receptor_extent(args.receptor_atoms)
+    center = [round((low[k] + high[k]) / 2, 3) for k in range(3)]
+    # Blind docking box: the whole receptor plus a 10 Å margin
+    spacing = round((max(high[k] - low[k] for k in range(3)) + 20.0) / args.npts, 3)
+    ligand = synthetic.write_ligand_pdbqt(root / "wrapper" / "ligand.pdbqt", tuple(center))
+    # AutoDock runs inside the output directory; the project keeps a copy of the ligand there
+    (root / "autodock_runs").mkdir()
+    shutil.copy2(ligand, root / "autodock_runs" / ligand.name)
+    return {
+        "paths": {"working_dir": str(root), "autogrid4": "autogrid4", "autodock4": "autodock4", "gmx": "gmx"},
+        "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                   "ligand_types": LIGAND_TYPES},
+        "autogrid": {"npts": [args.npts] * 3, "center": center, "spacing": spacing},
+        "wrapper": {"seeds": [101 * (i + 1) for i in range(args.seeds)], "output_dir": "autodock_runs",
+                    "template_dir": str(PROJECT_ROOT / "scripts" / "templates"),
+                    "max_cycles": args.seeds, "min_ligand_distance": 2.0},
+        "shaker": {"n_cycles": args.cycles, "displacement_cutoff": 6.0, "cycle_time": 1.0,
+                   "ligand_resname": "LIG"},
+        "results": {"db": "results/wns_results.sqlite", "run_id": "orchestration-bench"},
+    }
+
+
+def make_gmx_dir(root: Path, n_ligands: int, receptor_atoms: int) -> Path:
+    """Equilibrated-system stand-in for the washing cycles (``gromacs_pipeline`` is not run)."""
+    gmx_dir = root / "gmx"
+    synthetic.write_gro_system(gmx_dir / "npt.gro", receptor_atoms, n_ligands=n_ligands)
+    (gmx_dir / "topol.top").write_text(
+        "[ system ]\nWnS benchmark\n\n[ molecules ]\n; Compound        #mols\n"
+        f"Protein             1\nLIG                 {n_ligands}\n", encoding="utf-8")
+    shutil.copy2(PROJECT_ROOT / "mdp" / "annealing.mdp", gmx_dir / "annealing.mdp")
+    return gmx_dir
+
+
+def phase_summary(name: str, records: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    tools = [record for record in records if record["kind"] == "tool"]
+    tool_s = sum(record["wall_s"] for record in tools)
+    return {"phase": name, "wall_s": round(wall, 4), "tool_s": round(tool_s, 4),
+            "overhead_s": round(wall - tool_s, 4), "tool_calls": len(tools)}
+
+
+def timed_phase(name: str, func, log) -> Dict[str, Any]:
+    from run_metrics import METRICS
+
+    first = len(METRICS.records)
+    start = time.perf_counter()
+    error = None
+    with contextlib.redirect_stdout(log):
+        try:
+            func()
+        except Exception as exc:  # the crash phase is expected to fail
+            error = f"{type(exc).__name__}: {exc}"
+    summary = phase_summary(name, METRICS.records[first:], time.perf_counter() - start)
+    if error:
+        summary["error"] = error
+    return summary
+
+
+def run_once(args: argparse.Namespace, workdir: Optional[Path] = None) -> Dict[str, Any]:
+    """One complete docking + washing run in a fresh project; returns the phase summaries."""
+    from run_metrics import METRICS
+    from run_full_wrap_n_shake import run_shaker_cycles
+    from wrap_n_shake_docking import CheckpointState, run_wrap_n_shake_docking
+
+    saved_env = dict(os.environ)
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        root = Path(tmp)
+        bin_dir = root / "bin"
+        fake_tools.install(bin_dir)
+        os.environ["PATH"] = str(bin_dir) + os.pathsep + os.environ.get("PATH", "")
+        os.environ["WNS_FAKE_STATE_DIR"] = str(root / ".fake_state")
+        os.environ["WNS_STRUCTURE_CACHE"] = str(root / ".cache")
+        os.environ["WNS_FAKE_LATENCY"] = str(args.latency)
+        if args.mdrun_latency is not None:
+            os.environ["WNS_FAKE_LATENCY_GMX_MDRUN"] = str(args.mdrun_latency)
+        if args.busy:
+            os.environ["WNS_FAKE_BUSY"] = "1"
+        config = make_project(root, args)
+        METRICS.clear()
+        phases = []
+        try:
+            with (root / "pipeline.log").open("w", encoding="utf-8") as log:
+                if args.crash_at:
+                    os.environ["WNS_FAKE_FAIL"] = f"autodock4:{args.crash_at}"
+                    phases.append(timed_phase("docking_crash", lambda: run_wrap_n_shake_docking(config), log))
+                    os.environ.pop("WNS_FAKE_FAIL")
+                    phases.append(timed_phase("docking_resume", lambda: run_wrap_n_shake_docking(config), log))
+                else:
+                    phases.append(timed_phase("docking", lambda: run_wrap_n_shake_docking(config), log))
+
+                checkpoint = CheckpointState(root / "autodock_runs" / "docking_checkpoint.json")
+                with contextlib.redirect_stdout(log):
+                    checkpoint.load()
+                completed = checkpoint.state["completed_seeds"]
+                docked = len(checkpoint.get_docked_ligands())
+                gmx_dir = make_gmx_dir(root, max(1, docked), args.receptor_atoms)
+                phases.append(timed_phase(
+                    "washing", lambda: run_shaker_cycles(gmx_dir, config, "gmx", "orchestration-bench"), log))
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+        return {
+            "phases": phases,
+            "seeds_completed": len(completed),
+            "seeds_unique": len(set(completed)) == len(completed),
+            "ligands_docked": docked,
+        }
+
+
+def run_orchestration(args: argparse.Namespace) -> Dict[str, Any]:
+    runs = [run_once(args) for _ in range(args.repeats)]
+    results = []
+    for index, phase in enumerate(runs[0]["phases"]):
+        walls = [run["phases"][index]["wall_s"] for run in runs]
+        overheads = [run["phases"][index]["overhead_s"] for run in runs]
+        results.append({
+            "benchmark": f"orchestration.{phase['phase']}",
+            "size": args.seeds,
+            "repeats": len(runs),
+            "min_s": min(walls),
+            "median_s": round(statistics.median(walls), 4),
+            "mean_s": round(statistics.fmean(walls), 4),
+            "overhead_median_s": round(statistics.median(overheads), 4),
+            "tool_s": phase["tool_s"],
+            "tool_calls": phase["tool_calls"],
+            **({"error": phase["error"]} if "error" in phase else {}),
+        })
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "preset": "orchestration",
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "threshold")},
+        "checks": {key: runs[-1][key] for key in ("seeds_completed", "seeds_unique", "ligands_docked")},
+        "results": results,
+    }
+
+
+def print_results(document: Dict[str, Any]) -> None:
+    header = f"{'phase':<32} {'wall s':>9} {'tools s':>9} {'overhead s':>11} {'calls':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in document["results"]:
+        print(f"{row['benchmark']:<32} {row['median_s']:>9.3f} {row['tool_s']:>9.3f} "
+              f"{row['overhead_median_s']:>11.3f} {row['tool_calls']:>6}")
+    checks = document["checks"]
+    print(f"seeds completed: {checks['seeds_completed']} (unique: {checks['seeds_unique']}), "
+          f"ligands docked: {checks['ligands_docked']}")
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, default=10, help="Docking seeds (wrapper cycles)")
+    parser.add_argument("--cycles", type=int, default=3, help="Washing cycles")
+    parser.add_argument("--receptor-atoms", type=int, default=5000)
+    parser.add_argument("--npts", type=int, default=40, help="Grid points per axis written by autogrid4")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per fake tool call")
+    parser.add_argument("--mdrun-latency", type=float, help="Seconds per gmx mdrun call")
+    parser.add_argument("--busy", action="store_true", help="Burn CPU during the latency instead of sleeping")
+    parser.add_argument("--crash-at", type=int, help="Fail the N-th autodock4 call, then resume")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Results JSON (default: benchmarks/results/...)")
+    parser.add_argument("--baseline", type=Path, help="Compare with this results JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    document = run_orchestration(args)
+    print_results(document)
+    output = args.output or DEFAULT_RESULTS_DIR / (
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{(document['commit'] or 'nogit')[:12]}-orchestration.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        rows = compare(baseline, document, args.threshold)
+        print_comparison(rows, baseline, document)
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
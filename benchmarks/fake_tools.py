@@ -0,0 +1,810 @@
+#!/usr/bin/env python3
+"""Stand-in executables for autogrid4, autodock4, vina, gmx and acpype.
+
+They read the same inputs and write the same kinds of outputs as the real
+tools, so the pipeline scripts (including their post-processing) can run end
+to end on a laptop:
+
+* ``autogrid4 -p x.gpf -l x.log``: one ASCII ``.map`` per ``map``/``elecmap``/
+  ``dsolvmap`` line with the full ``npts`` grid, plus ``.maps.fld``/``.maps.xyz``;
+* ``autodock4 -p x.dpf -l x.dlg``: a DLG with ``ga_run`` ``DOCKED:`` poses of
+  the ``move`` ligand, placed randomly (per ``seed``) inside the grid box;
+  with ``WNS_FAKE_FUNNEL`` a share of the runs finds the box's optimum pose;
+* ``vina --receptor r --ligand l --out o``: a multi-model PDBQT with
+  ``REMARK VINA RESULT`` lines;
+* ``gmx grompp | mdrun | trjconv | make_ndx | ...``: ``grompp`` packs the
+  structure and MDP settings into the ``.tpr``; ``mdrun`` writes ``.gro``,
+  ``.xtc``, ``.edr``, ``.log`` and ``.cpt``, moving every ligand residue a
+  little and a fraction of them far enough to be washed away.  The ``.xtc``
+  keeps the real frame header layout but stores coordinates uncompressed, so
+  only the fake ``trjconv`` can read it.  Other subcommands copy or convert
+  their input structure to every ``-o`` output;
+* ``acpype -i x.mol2``: ``x.acpype/`` with ``x_GMX.itp``/``.gro``/``.top``,
+  ``posre_x.itp`` and ``x_AC.frcmod`` built from the mol2 atoms and bonds.
+
+Behaviour is controlled through environment variables:
+
+``WNS_FAKE_LATENCY``                seconds each call takes (default 0; autodock4: per
+                                    10 runs of 2.5M evaluations, scaled by ``ga_run``
+                                    and ``ga_num_evals``)
+``WNS_FAKE_LATENCY_<TOOL>[_<SUB>]`` per tool / gmx subcommand, e.g. ``_GMX_MDRUN``
+``WNS_FAKE_BUSY=1``                 burn CPU during the latency instead of sleeping
+``WNS_FAKE_FAIL``                   ``tool[:n],...``: exit 1 on the n-th call (every
+                                    call without ``:n``), e.g. ``autodock4:3,gmx mdrun``
+``WNS_FAKE_WASH_FRACTION``          share of ligands mdrun moves away (default 0.3)
+``WNS_FAKE_WASH_NM``                how far they move in nm (default 1.0)
+``WNS_FAKE_MAX_FRAMES``             cap on trajectory frames (default 50)
+``WNS_FAKE_FUNNEL``                 share of autodock4 runs that land in the box's
+                                    single best pose (default 0: all random)
+``WNS_FAKE_STATE_DIR``              where call counters live (default: next to the shims)
+
+Install the shims into a directory and put it first on ``PATH``::
+
+    python benchmarks/fake_tools.py --install /tmp/fake_bin
+    export PATH=/tmp/fake_bin:$PATH
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shlex
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TOOLS = ("autogrid4", "autodock4", "vina", "gmx", "acpype")
+FAKE_VERSION = "2023.3-wns-fake"
+TPR_MAGIC = b"WNSFAKETPR\n"
+XTC_MAGIC = 1995
+# magic, natoms, step, time, box (3x3), natoms again
+XTC_HEADER = struct.Struct(">iiif9fi")
+
+ENV_PREFIX = "WNS_FAKE_"
+
+
+# ----------------------------------------------------------------------
+# Shared behaviour: latency, failure injection
+# ----------------------------------------------------------------------
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(ENV_PREFIX + name)
+    return float(value) if value not in (None, "") else default
+
+
+def latency(tool: str, subcommand: Optional[str] = None) -> float:
+    keys = [tool.upper()]
+    if subcommand:
+        keys.insert(0, f"{tool}_{subcommand}".upper().replace("-", "_"))
+    for key in keys:
+        value = os.environ.get(f"{ENV_PREFIX}LATENCY_{key}")
+        if value not in (None, ""):
+            return float(value)
+    return _env_float("LATENCY", 0.0)
+
+
+def wait(seconds: float) -> None:
+    if seconds <= 0:
+        return
+    if os.environ.get(ENV_PREFIX + "BUSY", "").lower() in ("1", "true", "yes"):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+    else:
+        time.sleep(seconds)
+
+
+def count_call(name: str, state_dir: Path) -> int:
+    """Number of this call (1-based); one byte per call, appended atomically."""
+    state_dir.mkdir(parents=True, exist_ok=True)
+    path = state_dir / (re.sub(r"\W+", "_", name) + ".calls")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, b".")
+    finally:
+        os.close(fd)
+    return path.stat().st_size
+
+
+def should_fail(name: str, state_dir: Path) -> bool:
+    number = count_call(name, state_dir)
+    for entry in filter(None, (item.strip() for item in os.environ.get(ENV_PREFIX + "FAIL", "").split(","))):
+        target, _, nth = entry.partition(":")
+        if target.strip() == name and (not nth or int(nth) == number):
+            return True
+    return False
+
+
+# ----------------------------------------------------------------------
+# Small parsers
+# ----------------------------------------------------------------------
+def read_keywords(path: Path) -> List[Tuple[str, List[str]]]:
+    """``keyword value ...`` lines of a GPF/DPF (comments after ``#`` dropped)."""
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        fields = line.split("#", 1)[0].split()
+        if fields:
+            entries.append((fields[0], fields[1:]))
+    return entries
+
+
+def first_value(entries: List[Tuple[str, List[str]]], key: str, default: Optional[List[str]] = None):
+    for name, values in entries:
+        if name == key:
+            return values
+    return default
+
+
+def atom_lines(path: Path) -> List[str]:
+    return [line.rstrip("\n") for line in path.read_text(encoding="utf-8").splitlines()
+            if line.startswith(("ATOM", "HETATM"))]
+
+
+def line_coord(line: str) -> Tuple[float, float, float]:
+    return float(line[30:38]), float(line[38:46]), float(line[46:54])
+
+
+def with_coord(line: str, coord: Sequence[float]) -> str:
+    return f"{line[:30]}{coord[0]:8.3f}{coord[1]:8.3f}{coord[2]:8.3f}{line[54:]}"
+
+
+def place_ligand(lines: List[str], center: Sequence[float], rng: random.Random) -> List[str]:
+    """Rigidly move a ligand so its centroid lands on ``center`` (random rotation about z).
+
+    Like AutoDock, docked poses are written as ``ATOM`` records even when the
+    input ligand uses ``HETATM``.
+    """
+    coords = [line_coord(line) for line in lines]
+    n = len(coords) or 1
+    cx, cy, cz = (sum(c[k] for c in coords) / n for k in range(3))
+    angle = rng.uniform(0.0, 2.0 * math.pi)
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    placed = []
+    for line, (x, y, z) in zip(lines, coords):
+        dx, dy = x - cx, y - cy
+        if line.startswith("HETATM"):
+            line = "ATOM  " + line[6:]
+        placed.append(with_coord(line, (center[0] + dx * cos_a - dy * sin_a,
+                                        center[1] + dx * sin_a + dy * cos_a,
+                                        center[2] + z - cz)))
+    return placed
+
+
+# ----------------------------------------------------------------------
+# autogrid4
+# ----------------------------------------------------------------------
+def write_map(path: Path, header: List[str], npts: Sequence[int], offset: float) -> None:
+    nx, ny, nz = (n + 1 for n in npts)
+    # One row of smoothly varying values, shifted per (y, z) line
+    row = [f"{offset + 0.5 * math.sin(i * 0.37):.3f}" for i in range(nx + ny + nz)]
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write("\n".join(header) + "\n")
+        for z in range(nz):
+            for y in range(ny):
+                start = (y + z) % (ny + nz)
+                handle.write("\n".join(row[start:start + nx]))
+                handle.write("\n")
+
+
+def autogrid4(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="autogrid4")
+    parser.add_argument("-p", dest="gpf", required=True)
+    parser.add_argument("-l", dest="log")
+    args, _ = parser.parse_known_args(argv)
+    gpf = Path(args.gpf)
+    entries = read_keywords(gpf)
+    npts = [int(v) for v in first_value(entries, "npts", ["40", "40", "40"])]
+    spacing = float(first_value(entries, "spacing", ["0.375"])[0])
+    center = [float(v) for v in first_value(entries, "gridcenter", ["0", "0", "0"])]
+    gridfld = first_value(entries, "gridfld", ["protein.maps.fld"])[0]
+    receptor = first_value(entries, "receptor", ["receptor.pdbqt"])[0]
+    if not Path(receptor).exists():
+        print(f"autogrid4: ERROR: can't find or open receptor PDBQT file \"{receptor}\".", file=sys.stderr)
+        return 1
+    n_receptor = len(atom_lines(Path(receptor)))
+
+    maps = [(values[0], f"{Path(values[0]).stem}-affinity") for name, values in entries if name == "map"]
+    for key, label in (("elecmap", "Electrostatics"), ("dsolvmap", "Desolvation")):
+        value = first_value(entries, key)
+        if value:
+            maps.append((value[0], label))
+
+    header = [
+        f"GRID_PARAMETER_FILE {gpf.name}",
+        f"GRID_DATA_FILE {gridfld}",
+        f"MACROMOLECULE {receptor}",
+        f"SPACING {spacing:.3f}",
+        f"NELEMENTS {npts[0]} {npts[1]} {npts[2]}",
+        f"CENTER {center[0]:.3f} {center[1]:.3f} {center[2]:.3f}",
+    ]
+    for index, (map_name, _) in enumerate(maps):
+        write_map(Path(map_name), header, npts, offset=-0.2 * index)
+
+    half = [n * spacing / 2 for n in npts]
+    xyz = Path(gridfld).with_suffix(".xyz")
+    xyz.write_text("".join(f"{center[k] - half[k]:.3f} {center[k] + half[k]:.3f}\n" for k in range(3)),
+                   encoding="utf-8")
+    fld = ["# AVS field file", "#", "# AutoDock Atomic Affinity and Electrostatic Grids", "#",
+           "# Created by autogrid4.", "#", f"#SPACING {spacing:.3f}",
+           f"#NELEMENTS {npts[0]} {npts[1]} {npts[2]}",
+           f"#CENTER {center[0]:.3f} {center[1]:.3f} {center[2]:.3f}",
+           f"#MACROMOLECULE {receptor}", f"#GRID_PARAMETER_FILE {gpf.name}", "#",
+           "ndim=3\t\t\t# number of dimensions in the field",
+           *(f"dim{k + 1}={npts[k] + 1}\t\t\t# number of {'xyz'[k]}-elements" for k in range(3)),
+           "nspace=3\t\t# number of physical coordinates per point",
+           f"veclen={len(maps)}\t\t# number of affinity values at each point",
+           "data=float\t\t# data type (byte, integer, float, double)",
+           "field=uniform\t\t# field type (uniform, rectilinear, irregular)",
+           *(f"coord {k + 1} file={xyz.name} filetype=ascii offset={2 * k}" for k in range(3)),
+           *(f"label={label}\t# component label for variable {i + 1}" for i, (_, label) in enumerate(maps)),
+           "#", "# location of affinity grid files and how to read them", "#",
+           *(f"variable {i + 1} file={name} filetype=ascii skip=6" for i, (name, _) in enumerate(maps))]
+    Path(gridfld).write_text("\n".join(fld) + "\n", encoding="utf-8")
+
+    wait(latency("autogrid4"))
+    if args.log:
+        Path(args.log).write_text(
+            f"autogrid4: fake AutoGrid {FAKE_VERSION}\n"
+            f"Receptor atoms: {n_receptor}\nMaps: {len(maps)} of {npts[0] + 1}x{npts[1] + 1}x{npts[2] + 1} points\n\n"
+            "autogrid4: Successful Completion.\n", encoding="utf-8")
+    return 0
+
+
+# ----------------------------------------------------------------------
+# autodock4
+# ----------------------------------------------------------------------
+def grid_box(fld_name: Optional[str], fallback_center: Sequence[float]) -> Tuple[List[float], List[float]]:
+    """Centre and half-extent of the grid box described by a ``.maps.fld``."""
+    center, half = list(fallback_center), [10.0, 10.0, 10.0]
+    if fld_name and Path(fld_name).exists():
+        text = Path(fld_name).read_text(encoding="utf-8")
+        spacing = re.search(r"#SPACING\s+([\d.]+)", text)
+        elements = re.search(r"#NELEMENTS\s+(\d+)\s+(\d+)\s+(\d+)", text)
+        grid_center = re.search(r"#CENTER\s+(\S+)\s+(\S+)\s+(\S+)", text)
+        if spacing and elements:
+            half = [int(n) * float(spacing.group(1)) / 2 for n in elements.groups()]
+        if grid_center:
+            center = [float(v) for v in grid_center.groups()]
+    return center, half
+
+
+def autodock4(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="autodock4")
+    parser.add_argument("-p", dest="dpf", required=True)
+    parser.add_argument("-l", dest="dlg")
+    args, _ = parser.parse_known_args(argv)
+    dpf = Path(args.dpf)
+    entries = read_keywords(dpf)
+    # "seed a b" like AutoDock's two-value seed
+    seed = " ".join(first_value(entries, "seed", ["0"]))
+    n_runs = int(first_value(entries, "ga_run", ["10"])[0])
+    ligand = Path(first_value(entries, "move", ["ligand.pdbqt"])[0])
+    about = [float(v) for v in first_value(entries, "about", ["0", "0", "0"])]
+    fld = first_value(entries, "fld", [None])[0]
+    for name, values in entries:
+        if name in ("map", "elecmap", "desolvmap") and not Path(values[0]).exists():
+            print(f"autodock4: ERROR: Can't find or open grid map \"{values[0]}\".", file=sys.stderr)
+            return 1
+    if not ligand.exists():
+        print(f"autodock4: ERROR: Can't find or open ligand \"{ligand}\".", file=sys.stderr)
+        return 1
+
+    ligand_text = ligand.read_text(encoding="utf-8").splitlines()
+    ligand_atoms = [line for line in ligand_text if line.startswith(("ATOM", "HETATM"))]
+    center, half = grid_box(fld, about)
+    rng = random.Random(int(seed) if seed.isdigit() else seed)
+    funnel = _env_float("FUNNEL", 0.0)
+    # The optimum depends on the box only, so every seed can find it
+    optimum_rng = random.Random(f"{center}|{half}")
+    optimum = [center[k] + optimum_rng.uniform(-0.5, 0.5) * half[k] for k in range(3)]
+    optimum_pose = place_ligand(ligand_atoms, optimum, optimum_rng)
+
+    num_evals = int(first_value(entries, "ga_num_evals", ["2500000"])[0])
+    num_generations = int(first_value(entries, "ga_num_generations", ["27000"])[0])
+
+    # Like autodock4, the DLG grows run by run while the docking proceeds
+    dlg = Path(args.dlg) if args.dlg else dpf.with_suffix(".dlg")
+    handle = dlg.open("w", encoding="utf-8")
+    out = [f"          AutoDock 4.2 Release {FAKE_VERSION}", "",
+           f"Random number generator was seeded with values {seed}, 0.",
+           f"Docking parameter file (DPF) used for this docking:\t\t{dpf.name}"]
+    out.extend(f"DPF> {' '.join([name, *values])}" for name, values in entries)
+    out.extend(f"INPUT-LIGAND-PDBQT: {line}" for line in ligand_text)
+    found = [funnel > 0 and rng.random() < funnel for _ in range(n_runs)]
+    energies = sorted(rng.uniform(-10.6, -10.4) if hit else rng.uniform(-9.0, -3.0) for hit in found)
+    found.sort(reverse=True)
+    run_latency = latency("autodock4") / 10 * num_evals / 2500000
+    for run in range(1, n_runs + 1):
+        out.append(f"\tBEGINNING GENETIC ALGORITHM DOCKING {run} of {n_runs}")
+        for step in range(1, 5):
+            handle.write("\n".join(out) + "\n")
+            handle.flush()
+            out = []
+            wait(run_latency / 4)
+            out.append(f"Generation: {num_generations * step // 4:3d}   Oldest's energy: -1.000    "
+                       f"Lowest energy: {energies[run - 1]:.3f}    Num.evals.: {num_evals * step // 4}   "
+                       f"Timing: 0.010 sec real, 0.010 sec CPU")
+        target = [center[k] + rng.uniform(-0.8, 0.8) * half[k] for k in range(3)]
+        pose = place_ligand(ligand_atoms, target, rng)
+        if found[run - 1]:
+            pose = [with_coord(line, tuple(value + rng.uniform(-0.2, 0.2) for value in line_coord(line)))
+                    for line in optimum_pose]
+        energy = energies[run - 1]
+        out.extend([
+            "DOCKED: MODEL        1",
+            f"DOCKED: USER    Run = {run}",
+            f"DOCKED: USER    DPF = {dpf.name}",
+            "DOCKED: USER  ",
+            f"DOCKED: USER    Estimated Free Energy of Binding    = {energy:7.2f} kcal/mol",
+            f"DOCKED: USER    Final Intermolecular Energy     = {energy - 0.6:7.2f} kcal/mol",
+            f"DOCKED: REMARK  Name = {ligand.name}",
+            "DOCKED: ROOT",
+            *(f"DOCKED: {line}" for line in pose),
+            "DOCKED: ENDROOT",
+            "DOCKED: TORSDOF 0",
+            "DOCKED: TER",
+            "DOCKED: ENDMDL",
+            "________________________________________________________________________________",
+        ])
+    out.extend(["", "    CLUSTERING HISTOGRAM", "    ____________________", ""])
+    out.extend(f"{rank:4d} | {energy:10.2f} |{run:5d} |" for rank, (run, energy)
+               in enumerate(zip(range(1, n_runs + 1), energies), start=1))
+    out.extend(["", f"{n_runs} docking runs completed.", "autodock4: Successful Completion."])
+    handle.write("\n".join(out) + "\n")
+    handle.close()
+    return 0
+
+
+# ----------------------------------------------------------------------
+# vina
+# ----------------------------------------------------------------------
+def vina(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="vina")
+    parser.add_argument("--config")
+    parser.add_argument("--receptor")
+    parser.add_argument("--ligand")
+    parser.add_argument("--out")
+    parser.add_argument("--log")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--num_modes", type=int, default=9)
+    parser.add_argument("--version", action="store_true")
+    for axis in "xyz":
+        parser.add_argument(f"--center_{axis}", type=float, default=0.0)
+        parser.add_argument(f"--size_{axis}", type=float, default=20.0)
+    args, _ = parser.parse_known_args(argv)
+    if args.version:
+        print(f"AutoDock Vina {FAKE_VERSION}")
+        return 0
+    if args.config:
+        config_args = []
+        for line in Path(args.config).read_text(encoding="utf-8").splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                config_args.extend([f"--{key.strip()}", value.strip()])
+        args, _ = parser.parse_known_args(config_args + argv)
+    for name in ("receptor", "ligand"):
+        path = getattr(args, name)
+        if not path or not Path(path).exists():
+            print(f"vina: ERROR: could not open {name} \"{path}\"", file=sys.stderr)
+            return 1
+
+    ligand = Path(args.ligand)
+    ligand_atoms = atom_lines(ligand)
+    rng = random.Random(args.seed)
+    center = [args.center_x, args.center_y, args.center_z]
+    half = [args.size_x / 2, args.size_y / 2, args.size_z / 2]
+    energies = sorted(rng.uniform(-9.0, -4.0) for _ in range(args.num_modes))
+    out = []
+    for mode, energy in enumerate(energies, start=1):
+        target = [center[k] + rng.uniform(-0.5, 0.5) * half[k] for k in range(3)]
+        rmsd = 0.0 if mode == 1 else rng.uniform(1.0, 8.0)
+        out.extend([f"MODEL {mode}", f"REMARK VINA RESULT: {energy:9.3f} {rmsd:10.3f} {rmsd * 1.4:10.3f}",
+                    f"REMARK  Name = {ligand.stem}", "ROOT", *place_ligand(ligand_atoms, target, rng),
+                    "ENDROOT", "TORSDOF 0", "ENDMDL"])
+
+    wait(latency("vina"))
+    out_path = Path(args.out) if args.out else ligand.with_name(ligand.stem + "_out.pdbqt")
+    out_path.write_text("\n".join(out) + "\n", encoding="utf-8")
+    table = ["mode |   affinity | dist from best mode", "     | (kcal/mol) | rmsd l.b.| rmsd u.b.",
+             "-----+------------+----------+----------"]
+    table.extend(f"{mode:4d} {energy:12.3f} {0.0:10.3f} {0.0:10.3f}" for mode, energy in enumerate(energies, 1))
+    print("\n".join(table))
+    if args.log:
+        Path(args.log).write_text(f"AutoDock Vina {FAKE_VERSION}\n" + "\n".join(table) + "\n", encoding="utf-8")
+    return 0
+
+
+# ----------------------------------------------------------------------
+# gmx
+# ----------------------------------------------------------------------
+def parse_gmx_options(argv: List[str]) -> Dict[str, Optional[str]]:
+    """``-flag value`` pairs; flags followed by another flag are booleans."""
+    options: Dict[str, Optional[str]] = {}
+    index = 0
+    while index < len(argv):
+        token = argv[index]
+        if token.startswith("-"):
+            nxt = argv[index + 1] if index + 1 < len(argv) else None
+            if nxt is not None and (not nxt.startswith("-") or re.match(r"^-\d", nxt)):
+                options[token] = nxt
+                index += 2
+                continue
+            options[token] = None
+        index += 1
+    return options
+
+
+class GroFrame:
+    def __init__(self, title: str, lines: List[str], box: str) -> None:
+        self.title = title
+        self.lines = lines  # atom lines without coordinates changed
+        self.box = box
+
+    @classmethod
+    def read(cls, path: Path) -> "GroFrame":
+        text = path.read_text(encoding="utf-8").splitlines()
+        count = int(text[1].strip())
+        return cls(text[0], text[2:2 + count], text[2 + count] if len(text) > 2 + count else "   0.0 0.0 0.0")
+
+    @classmethod
+    def from_pdb(cls, path: Path) -> "GroFrame":
+        lines = []
+        for serial, line in enumerate(atom_lines(path), start=1):
+            x, y, z = line_coord(line)
+            resid = int(line[22:26]) if line[22:26].strip() else 1
+            lines.append(f"{resid % 100000:>5}{line[17:20].strip():<5}{line[12:16].strip():>5}"
+                         f"{serial % 100000:>5}{x / 10:8.3f}{y / 10:8.3f}{z / 10:8.3f}")
+        return cls(f"Converted from {path.name}", lines, "   5.00000   5.00000   5.00000")
+
+    def coords(self) -> List[Tuple[float, float, float]]:
+        return [(float(l[20:28]), float(l[28:36]), float(l[36:44])) for l in self.lines]
+
+    def write(self, path: Path, coords: Optional[Sequence[Sequence[float]]] = None) -> None:
+        if coords is None:
+            body = self.lines
+        else:
+            body = [f"{line[:20]}{c[0]:8.3f}{c[1]:8.3f}{c[2]:8.3f}" for line, c in zip(self.lines, coords)]
+        path.write_text(f"{self.title}\n{len(body):5d}\n" + "\n".join(body) + f"\n{self.box}\n",
+                        encoding="utf-8")
+
+    def box_vector(self) -> List[float]:
+        values = [float(v) for v in self.box.split()[:3]] or [0.0, 0.0, 0.0]
+        return values + [0.0] * (3 - len(values))
+
+
+def read_structure(path: Path) -> GroFrame:
+    if path.suffix == ".tpr":
+        return read_tpr(path)[1]
+    if path.suffix in (".pdb", ".pdbqt"):
+        return GroFrame.from_pdb(path)
+    return GroFrame.read(path)
+
+
+def read_mdp(path: Path) -> Dict[str, str]:
+    settings = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        key, sep, value = line.split(";", 1)[0].partition("=")
+        if sep:
+            settings[key.strip().replace("_", "-")] = value.strip()
+    return settings
+
+
+def write_tpr(path: Path, mdp: Dict[str, str], frame: GroFrame) -> None:
+    header = json.dumps({"mdp": mdp, "title": frame.title, "box": frame.box})
+    body = "\n".join(frame.lines)
+    path.write_bytes(TPR_MAGIC + header.encode("utf-8") + b"\n" + body.encode("utf-8"))
+
+
+def read_tpr(path: Path) -> Tuple[Dict[str, str], GroFrame]:
+    raw = path.read_bytes()
+    if not raw.startswith(TPR_MAGIC):
+        raise ValueError(f"{path} is not a run input file written by the fake grompp")
+    header, _, body = raw[len(TPR_MAGIC):].partition(b"\n")
+    meta = json.loads(header)
+    return meta["mdp"], GroFrame(meta["title"], body.decode("utf-8").splitlines(), meta["box"])
+
+
+def write_xtc(path: Path, frames: List[Tuple[int, float, List[Tuple[float, float, float]]]],
+              box: Sequence[float]) -> None:
+    box9 = [box[0], 0.0, 0.0, 0.0, box[1], 0.0, 0.0, 0.0, box[2]]
+    with path.open("wb") as handle:
+        for step, t, coords in frames:
+            handle.write(XTC_HEADER.pack(XTC_MAGIC, len(coords), step, t, *box9, len(coords)))
+            flat = [value for coord in coords for value in coord]
+            handle.write(struct.pack(f">f{len(flat)}f", 1000.0, *flat))
+
+
+def read_xtc(path: Path) -> List[Tuple[int, float, List[Tuple[float, float, float]]]]:
+    frames = []
+    data = path.read_bytes()
+    offset = 0
+    while offset + XTC_HEADER.size <= len(data):
+        magic, natoms, step, t, *rest = XTC_HEADER.unpack_from(data, offset)
+        if magic != XTC_MAGIC:
+            raise ValueError(f"{path}: bad frame magic {magic}")
+        offset += XTC_HEADER.size + 4  # skip the precision
+        flat = struct.unpack_from(f">{3 * natoms}f", data, offset)
+        offset += 12 * natoms
+        frames.append((step, t, [tuple(flat[i:i + 3]) for i in range(0, len(flat), 3)]))
+    return frames
+
+
+def residue_groups(frame: GroFrame, resname: str) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = {}
+    for index, line in enumerate(frame.lines):
+        if line[5:10].strip() == resname:
+            groups.setdefault(int(line[0:5]), []).append(index)
+    return groups
+
+
+def mdrun(options: Dict[str, Optional[str]]) -> int:
+    deffnm = options.get("-deffnm")
+    tpr = Path(options.get("-s") or (f"{deffnm}.tpr" if deffnm else "topol.tpr"))
+    base = deffnm or tpr.stem
+    if not tpr.exists():
+        print(f"Fatal error: File input/output error: {tpr}", file=sys.stderr)
+        return 1
+    mdp, frame = read_tpr(tpr)
+    nsteps = int(float(mdp.get("nsteps", "0")))
+    dt = float(mdp.get("dt", "0.002"))
+    interval = int(float(mdp.get("nstxout-compressed", "0") or 0)) or max(1, nsteps)
+    n_frames = max(1, min(nsteps // interval if nsteps else 1, int(_env_float("MAX_FRAMES", 50))))
+    total_ps = nsteps * dt
+
+    start = frame.coords()
+    digest = hashlib.sha256(tpr.read_bytes()).hexdigest()
+    rng = random.Random(int(digest[:12], 16))
+    wash_fraction = _env_float("WASH_FRACTION", 0.3)
+    wash_nm = _env_float("WASH_NM", 1.0)
+    drift = [(0.0, 0.0, 0.0)] * len(start)
+    for indices in residue_groups(frame, os.environ.get(ENV_PREFIX + "LIGAND", "LIG")).values():
+        distance = wash_nm if rng.random() < wash_fraction else rng.uniform(0.01, 0.08)
+        theta, phi = rng.uniform(0.0, math.pi), rng.uniform(0.0, 2.0 * math.pi)
+        vector = (distance * math.sin(theta) * math.cos(phi), distance * math.sin(theta) * math.sin(phi),
+                  distance * math.cos(theta))
+        for index in indices:
+            drift[index] = vector
+
+    frames = []
+    coords = start
+    for number in range(n_frames + 1):
+        share = number / n_frames
+        coords = [(x + d[0] * share + rng.uniform(-0.005, 0.005),
+                   y + d[1] * share + rng.uniform(-0.005, 0.005),
+                   z + d[2] * share + rng.uniform(-0.005, 0.005))
+                  for (x, y, z), d in zip(start, drift)]
+        frames.append((int(nsteps * share), total_ps * share, coords))
+
+    # mdrun reports its progress on stderr, overwriting the step line with \r,
+    # and appends an energy block headed "Step Time" to <deffnm>.log
+    print(f"starting mdrun '{base}'\n{nsteps} steps, {total_ps:8.1f} ps.", file=sys.stderr, flush=True)
+    log = Path(f"{base}.log").open("w", encoding="utf-8")
+    log.write(f"GROMACS version:    {FAKE_VERSION}\nInput Parameters:\n   nsteps                         = {nsteps}\n"
+              f"   dt                             = {dt}\nStarted mdrun on {len(coords)} atoms, {nsteps} steps\n")
+    for update in range(1, 11):
+        step = nsteps * (update - 1) // 10
+        log.write(f"           Step           Time\n{step:>15d}{step * dt:>15.5f}\n\n")
+        log.flush()
+        wait(latency("gmx", "mdrun") / 10)
+        print(f"\rstep {nsteps * update // 10}, will finish Sun Oct 18 12:00:00 2026", end="", file=sys.stderr,
+              flush=True)
+    print("\n               (ns/day)    (hour/ns)\nPerformance:      100.000        0.240", file=sys.stderr)
+    box = frame.box_vector()
+    write_xtc(Path(f"{base}.xtc"), frames, box)
+    frame.write(Path(options.get("-c") or f"{base}.gro"), coords)
+    Path(f"{base}.edr").write_bytes(struct.pack(">ii", -55555, len(frames)) + bytes(64 * len(frames)))
+    Path(f"{base}.cpt").write_bytes(struct.pack(">ii", 171817, nsteps) + bytes(16 * len(coords)))
+    log.write(f"           Step           Time\n{nsteps:>15d}{total_ps:>15.5f}\n\nFinished mdrun\n"
+              f"               (ns/day)    (hour/ns)\nPerformance:      100.000        0.240\n")
+    log.close()
+    return 0
+
+
+def trjconv(options: Dict[str, Optional[str]]) -> int:
+    if not sys.stdin.isatty():
+        sys.stdin.read()  # group selection
+    structure = read_structure(Path(options.get("-s") or "topol.tpr"))
+    output = Path(options.get("-o") or "trajout.xtc")
+    frames = read_xtc(Path(options.get("-f") or "traj.xtc"))
+    if not frames:
+        print("Fatal error: trajectory has no frames", file=sys.stderr)
+        return 1
+    if options.get("-dump") is not None:
+        target = float(options["-dump"])
+        frames = [min(frames, key=lambda frame: abs(frame[1] - target))]
+    wait(latency("gmx", "trjconv"))
+    if output.suffix == ".gro":
+        structure.write(output, frames[-1][2])
+    else:
+        write_xtc(output, frames, structure.box_vector())
+    return 0
+
+
+def make_ndx(options: Dict[str, Optional[str]]) -> int:
+    if not sys.stdin.isatty():
+        sys.stdin.read()
+    structure = read_structure(Path(options.get("-f") or "conf.gro"))
+    groups: Dict[str, List[int]] = {"System": []}
+    for number, line in enumerate(structure.lines, start=1):
+        resname = line[5:10].strip()
+        groups["System"].append(number)
+        kind = {"SOL": "Water", "NA": "Ion", "CL": "Ion"}.get(resname, "Protein" if resname != "LIG" else "LIG")
+        groups.setdefault(kind, []).append(number)
+    lines = []
+    for name, members in groups.items():
+        lines.append(f"[ {name} ]")
+        for start in range(0, len(members), 15):
+            lines.append(" ".join(f"{member:>4}" for member in members[start:start + 15]))
+    wait(latency("gmx", "make_ndx"))
+    Path(options.get("-o") or "index.ndx").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return 0
+
+
+def grompp(options: Dict[str, Optional[str]]) -> int:
+    mdp_path = Path(options.get("-f") or "grompp.mdp")
+    structure_path = Path(options.get("-c") or "conf.gro")
+    topology = Path(options.get("-p") or "topol.top")
+    for path in (mdp_path, structure_path, topology):
+        if not path.exists():
+            print(f"Fatal error: File '{path}' does not exist or is not accessible.", file=sys.stderr)
+            return 1
+    mdp = read_mdp(mdp_path)
+    wait(latency("gmx", "grompp"))
+    write_tpr(Path(options.get("-o") or "topol.tpr"), mdp, read_structure(structure_path))
+    Path(options.get("-po") or "mdout.mdp").write_text(mdp_path.read_text(encoding="utf-8"), encoding="utf-8")
+    return 0
+
+
+def generic(subcommand: str, options: Dict[str, Optional[str]]) -> int:
+    """Copy the input structure to every structure output, placeholders otherwise."""
+    if not sys.stdin.isatty():
+        sys.stdin.read()
+    source = next((Path(options[key]) for key in ("-f", "-c", "-cp", "-s")
+                   if options.get(key) and Path(options[key]).exists()), None)
+    wait(latency("gmx", subcommand))
+    for key in ("-o", "-p", "-i", "-on"):
+        target = options.get(key)
+        if not target:
+            continue
+        path = Path(target)
+        if path.suffix == ".gro" and source is not None:
+            read_structure(source).write(path)
+        elif path.suffix == ".top" and not path.exists():
+            path.write_text("[ molecules ]\n; Compound        #mols\nProtein             1\n", encoding="utf-8")
+        elif path.suffix == ".xvg":
+            path.write_text(f'@    title "{subcommand}"\n0.000 0.000\n', encoding="utf-8")
+        elif not path.exists():
+            path.write_text(f"; written by fake gmx {subcommand}\n", encoding="utf-8")
+    return 0
+
+
+def gmx(argv: List[str]) -> int:
+    if not argv or argv[0] in ("-version", "--version", "-h", "--help"):
+        print(f"GROMACS version:    {FAKE_VERSION}")
+        return 0
+    subcommand, options = argv[0], parse_gmx_options(argv[1:])
+    handlers = {"grompp": grompp, "mdrun": mdrun, "trjconv": trjconv, "make_ndx": make_ndx}
+    handler = handlers.get(subcommand)
+    if handler is None:
+        return generic(subcommand, options)
+    return handler(options)
+
+
+# ----------------------------------------------------------------------
+# acpype
+# ----------------------------------------------------------------------
+ACPYPE_MASSES = {"h": 1.008, "c": 12.01, "n": 14.01, "o": 16.0, "f": 19.0, "p": 30.97, "s": 32.06,
+                 "cl": 35.45, "br": 79.9, "i": 126.9}
+
+
+def acpype(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="acpype", add_help=False)
+    parser.add_argument("-i", dest="input", required=True)
+    parser.add_argument("-b", dest="basename")
+    parser.add_argument("-c", dest="charge_method", default="bcc")
+    parser.add_argument("-a", dest="atom_type", default="gaff2")
+    parser.add_argument("-n", dest="net_charge", default="0")
+    parser.add_argument("-o", dest="output", default="all")
+    parser.add_argument("-f", dest="force", action="store_true")
+    args, _ = parser.parse_known_args(argv)
+    mol2 = Path(args.input)
+    if not mol2.exists():
+        print(f"ACPYPE FAILED: [Errno 2] No such file or directory: '{mol2}'", file=sys.stderr)
+        return 1
+    atoms, bonds, section = [], [], ""
+    for line in mol2.read_text(encoding="utf-8").splitlines():
+        if line.startswith("@<TRIPOS>"):
+            section = line.strip()[9:]
+            continue
+        fields = line.split()
+        if section == "ATOM" and len(fields) >= 6:
+            atoms.append((fields[1], fields[5].split(".")[0].lower(),
+                          [float(value) / 10 for value in fields[2:5]]))
+        elif section == "BOND" and len(fields) >= 3:
+            bonds.append((int(fields[1]), int(fields[2])))
+
+    base = args.basename or mol2.stem
+    out_dir = Path(f"{base}.acpype")
+    out_dir.mkdir(exist_ok=True)
+    wait(latency("acpype"))
+    header = f"; fake acpype {args.charge_method}/{args.atom_type} net charge {args.net_charge}\n"
+    itp = [header, "[ moleculetype ]\n", f" {base:<10} 3\n", "\n[ atoms ]\n"]
+    itp += [f"{index:>6} {atom_type:>4} 1 {base[:3].upper():>5} {name:>5} {index:>5}  0.000000 "
+            f"{ACPYPE_MASSES.get(atom_type, 12.01):8.5f}\n"
+            for index, (name, atom_type, _) in enumerate(atoms, start=1)]
+    itp += ["\n[ bonds ]\n"] + [f"{ai:>6} {aj:>6}   1\n" for ai, aj in bonds]
+    (out_dir / f"{base}_GMX.itp").write_text("".join(itp), encoding="utf-8")
+    (out_dir / f"posre_{base}.itp").write_text("[ position_restraints ]\n", encoding="utf-8")
+    (out_dir / f"{base}_GMX.top").write_text(f'{header}#include "{base}_GMX.itp"\n', encoding="utf-8")
+    (out_dir / f"{base}_AC.frcmod").write_text("Remark line goes here\nMASS\n\nBOND\n\n", encoding="utf-8")
+    frame = GroFrame(base, [f"{1:>5}{base[:3].upper():<5}{name:>5}{index:>5}{x:8.3f}{y:8.3f}{z:8.3f}"
+                            for index, (name, _, (x, y, z)) in enumerate(atoms, start=1)],
+                     "   3.00000   3.00000   3.00000")
+    frame.write(out_dir / f"{base}_GMX.gro")
+    return 0
+
+
+# ----------------------------------------------------------------------
+# Entry points
+# ----------------------------------------------------------------------
+HANDLERS = {"autogrid4": autogrid4, "autodock4": autodock4, "vina": vina, "gmx": gmx, "acpype": acpype}
+
+
+def run_tool(tool: str, argv: List[str], state_dir: Optional[Path] = None) -> int:
+    state_dir = Path(os.environ.get(ENV_PREFIX + "STATE_DIR") or state_dir or Path.cwd() / ".fake_tools")
+    name = f"gmx {argv[0]}" if tool == "gmx" and argv else tool
+    if should_fail(name, state_dir) or (name != tool and should_fail(tool, state_dir)):
+        print(f"{name}: injected failure (WNS_FAKE_FAIL)", file=sys.stderr)
+        return 1
+    return HANDLERS[tool](list(argv))
+
+
+def install(bin_dir: Path, python: str = sys.executable) -> List[Path]:
+    """Write one launcher per tool into ``bin_dir`` (``.cmd`` files on Windows)."""
+    bin_dir = Path(bin_dir).resolve()
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    module_dir = Path(__file__).resolve().parent
+    written = []
+    for tool in TOOLS:
+        launcher = bin_dir / f"{tool}.py"
+        launcher.write_text(
+            f"#!{python}\n"
+            "import sys\n"
+            f"sys.path.insert(0, {str(module_dir)!r})\n"
+            "from fake_tools import run_tool\n"
+            f"sys.exit(run_tool({tool!r}, sys.argv[1:], state_dir={str(bin_dir / '.state')!r}))\n",
+            encoding="utf-8")
+        if os.name == "nt":
+            shim = bin_dir / f"{tool}.cmd"
+            shim.write_text(f'@"{python}" "{launcher}" %*\n', encoding="utf-8")
+        else:
+            shim = bin_dir / tool
+            shim.write_text(f"#!/bin/sh\nexec {shlex.quote(python)} {shlex.quote(str(launcher))} \"$@\"\n",
+                            encoding="utf-8")
+            shim.chmod(0o755)
+        written.append(shim)
+    return written
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] in HANDLERS:
+        return run_tool(argv[0], argv[1:])
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--install", type=Path, required=True, metavar="BIN_DIR",
+                        help="Write autogrid4/autodock4/vina/gmx/acpype launchers into BIN_DIR")
+    args = parser.parse_args(argv)
+    for shim in install(args.install):
+        print(f"Installed {shim}")
+    print(f"Prepend {args.install.resolve()} to PATH to use the fake tools.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the pipeline's pure-Python kernels.
+
+Each benchmark generates synthetic inputs (``synthetic.py``) of a given size,
+runs one warm-up call and then times the kernel ``--repeats`` times.  The
+results (min / median / mean seconds per call plus commit, Python version and
+whether NumPy was available) are written as JSON so two commits can be
+compared:
+
+    python benchmarks/run_benchmarks.py                       # default preset
+    python benchmarks/run_benchmarks.py --preset full --baseline old.json
+    python benchmarks/run_benchmarks.py --diff old.json new.json
+
+Benchmarks and their size parameter:
+
+* ``find_atoms_to_mask``   receptor atoms, masked around 50 ligands;
+* ``check_ligand_clash``   existing ligands; the new pose clashes with none of
+                           them, so every file is checked (the common case);
+* ``count_hydrogen_bonds`` receptor atoms against one ligand;
+* ``read_gro_file``        atoms in the GRO system;
+* ``extract_best_pose``    GA runs in the DLG (DLG parsing);
+* ``analyze_structure``    receptor atoms of the scored complex;
+* ``build_ligand_topology`` ligand copies in the GRO system (bond perception,
+                           graph walks and geometry for all of them);
+* ``cluster_poses``        docked poses, 20 per surface site, clustered by
+                           heavy-atom RMSD;
+* ``rescore_poses``        ligand poses scored with the AutoDock4 function
+                           against a 61-point map per ligand type.
+* ``archive_maps``         grid points per axis of a 4-map cycle packed as a
+                           sparse delta from the base set (1 % of the points
+                           changed by masking).
+
+The structure cache's disk layer is switched off and its memory layer is
+cleared before every call of the parsing benchmarks, so they measure parsing
+rather than cache hits.  Only ``check_ligand_clash`` keeps the memory cache,
+as the wrapper cycles do.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import synthetic  # noqa: E402
+import structure_cache  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_THRESHOLD = 1.25
+
+
+class Benchmark:
+    def __init__(self, name: str, setup: Callable[[Path, int], Callable[[], Any]],
+                 sizes: Dict[str, List[int]]) -> None:
+        """
+        Args:
+            name: Benchmark name (usually the kernel's function name).
+            setup: ``setup(workdir, size)`` writes the inputs and returns the
+                zero-argument callable to time.
+            sizes: Sizes to run for each preset.
+        """
+        self.name = name
+        self.setup = setup
+        self.sizes = sizes
+
+
+def _setup_find_atoms_to_mask(workdir: Path, size: int) -> Callable[[], Any]:
+    from mask_pdbqt import AtomRecord, find_atoms_to_mask
+
+    receptor = synthetic.write_receptor_pdbqt(workdir / "receptor.pdbqt", size)
+    receptor_atoms = [AtomRecord(line) for line in receptor.read_text(encoding="utf-8").splitlines()]
+    ligand_atoms = []
+    for path in synthetic.write_ligand_swarm(workdir / "swarm", 50, receptor_size=size):
+        ligand_atoms.extend(AtomRecord(line) for line in path.read_text(encoding="utf-8").splitlines())
+    return lambda: find_atoms_to_mask(receptor_atoms, ligand_atoms, 3.5)
+
+
+def _setup_check_ligand_clash(workdir: Path, size: int) -> Callable[[], Any]:
+    from wrap_n_shake_docking import check_ligand_clash
+
+    existing = synthetic.write_ligand_swarm(workdir / "swarm", size, receptor_size=50000)
+    new_ligand = synthetic.write_ligand_pdbqt(workdir / "new_ligand.pdbqt", (-500.0, -500.0, -500.0))
+    return lambda: check_ligand_clash(new_ligand, existing, 2.0)
+
+
+def _setup_count_hydrogen_bonds(workdir: Path, size: int) -> Callable[[], Any]:
+    from analyze_hbonds import count_hydrogen_bonds, read_pdb_file
+
+    receptor = synthetic.write_receptor_pdbqt(workdir / "receptor.pdbqt", size)
+    center = synthetic.surface_centers(1, size, shell=2.5)[0]
+    ligand = synthetic.write_ligand_pdbqt(workdir / "ligand.pdbqt", center)
+    protein_atoms = read_pdb_file(receptor)
+    ligand_atoms = read_pdb_file(ligand)
+    return lambda: count_hydrogen_bonds(protein_atoms, ligand_atoms)
+
+
+def _setup_read_gro_file(workdir: Path, size: int) -> Callable[[], Any]:
+    from washing_cycle import read_gro_file
+
+    gro = synthetic.write_gro_system(workdir / "system.gro", size, n_ligands=max(1, size // 1000))
+    return lambda: read_gro_file(gro)
+
+
+def _setup_extract_best_pose(workdir: Path, size: int) -> Callable[[], Any]:
+    from wrap_n_shake_docking import extract_best_pose
+
+    dlg = synthetic.write_dlg(workdir / "docking.dlg", size)
+    output = workdir / "best_pose.pdbqt"
+    return lambda: extract_best_pose(dlg, output)
+
+
+def _setup_analyze_structure(workdir: Path, size: int) -> Callable[[], Any]:
+    from generate_score_report import analyze_structure
+
+    complex_file = synthetic.write_complex_pdbqt(workdir / "complex.pdbqt", size)
+    hbond_file = workdir / "hbonds.csv"
+    hbond_file.write_text("ligand_id,cycle,stable,residue,count\n1,0,1,A:1,3\n", encoding="utf-8")
+    vina_file = workdir / "missing_vina.pdbqt"
+    return lambda: analyze_structure(complex_file, hbond_file, vina_file)
+
+
+def _setup_build_ligand_topology(workdir: Path, size: int) -> Callable[[], Any]:
+    from ligand_topology import topology_from_file
+
+    gro = synthetic.write_gro_system(workdir / "system.gro", 1000, n_ligands=size)
+    return lambda: topology_from_file(gro, "LIG")
+
+
+def _setup_cluster_poses(workdir: Path, size: int) -> Callable[[], Any]:
+    import random
+
+    from pose_dedup import cluster_poses
+
+    rng = random.Random(1)
+    sites = synthetic.surface_centers(max(1, size // 20), 10000)
+    shape = synthetic.ligand_coords((0.0, 0.0, 0.0), rng)
+    coords = []
+    for index in range(size):
+        site = sites[index % len(sites)]
+        coords.append([(x + site[0] + rng.gauss(0.0, 0.3), y + site[1] + rng.gauss(0.0, 0.3),
+                        z + site[2] + rng.gauss(0.0, 0.3)) for x, y, z in shape])
+    energies = [rng.uniform(-9.0, -3.0) for _ in coords]
+    return lambda: cluster_poses(coords, energies, 2.0)
+
+
+def _setup_rescore_poses(workdir: Path, size: int) -> Callable[[], Any]:
+    import math
+    import random
+
+    from ad4_score import AD4Scorer, intramolecular_pairs
+    from grid_maps import GridMap
+
+    npts = (60, 60, 60)
+    values = [0.5 * math.sin(0.3 * index) for index in range(61 ** 3)]
+    types = [atom_type for _, atom_type, _ in synthetic.LIGAND_TEMPLATE]
+    maps = {key: GridMap(values, npts, 0.375, (0.0, 0.0, 0.0)) for key in set(types) | {"e", "d"}}
+    rng = random.Random(1)
+    shape = synthetic.ligand_coords((0.0, 0.0, 0.0), rng)
+    pairs = intramolecular_pairs(shape, [name for name, _, _ in synthetic.LIGAND_TEMPLATE], types,
+                                 list(range(len(types))))
+    scorer = AD4Scorer(maps, types, [charge for _, _, charge in synthetic.LIGAND_TEMPLATE], pairs, 5)
+    poses = []
+    for _ in range(size):
+        shift = (rng.uniform(-6, 6), rng.uniform(-6, 6), rng.uniform(-6, 6))
+        poses.append([(x + shift[0], y + shift[1], z + shift[2]) for x, y, z in shape])
+    return lambda: scorer.score(poses)
+
+
+def _setup_archive_maps(workdir: Path, size: int) -> Callable[[], Any]:
+    import itertools
+    import math
+
+    from grid_maps import GridMap
+    from map_archive import MapArchive
+
+    npts = (size, size, size)
+    points = (size + 1) ** 3
+    for name, changed in (("base", 0), ("cycle", points // 100)):
+        directory = workdir / name
+        directory.mkdir()
+        variables = []
+        for index, map_type in enumerate(("C", "OA", "e", "d"), start=1):
+            values = [round(0.8 * math.sin(0.05 * point + index), 3) for point in range(points)]
+            for point in range(points // 2, points // 2 + changed):
+                values[point] += 1.5
+            GridMap(values, npts, 0.375, (0.0, 0.0, 0.0)).write(directory / f"protein.{map_type}.map")
+            variables.append(f"variable {index} file=protein.{map_type}.map filetype=ascii skip=6")
+        (directory / "protein.maps.fld").write_text("\n".join(variables) + "\n", encoding="utf-8")
+    archive = MapArchive(workdir / "archive")
+    archive.add("base", workdir / "base" / "protein.maps.fld")
+    counter = itertools.count()
+    return lambda: archive.add(f"cycle_{next(counter)}", workdir / "cycle" / "protein.maps.fld", base="base")
+
+
+BENCHMARKS = [
+    Benchmark("find_atoms_to_mask", _setup_find_atoms_to_mask,
+              {"quick": [1000], "default": [1000, 10000, 50000], "full": [1000, 10000, 50000, 200000]}),
+    Benchmark("check_ligand_clash", _setup_check_ligand_clash,
+              {"quick": [10], "default": [10, 100, 500], "full": [10, 100, 500, 2000]}),
+    # Quadratic in the receptor size (hydrogens are searched per donor)
+    Benchmark("count_hydrogen_bonds", _setup_count_hydrogen_bonds,
+              {"quick": [500], "default": [1000, 2000], "full": [1000, 2000, 5000]}),
+    Benchmark("read_gro_file", _setup_read_gro_file,
+              {"quick": [1000], "default": [10000, 50000], "full": [10000, 50000, 200000]}),
+    Benchmark("extract_best_pose", _setup_extract_best_pose,
+              {"quick": [5], "default": [10, 100], "full": [10, 100, 500]}),
+    Benchmark("analyze_structure", _setup_analyze_structure,
+              {"quick": [1000], "default": [1000, 10000, 50000], "full": [1000, 10000, 50000, 200000]}),
+    Benchmark("build_ligand_topology", _setup_build_ligand_topology,
+              {"quick": [10], "default": [100, 1000], "full": [100, 1000, 5000]}),
+    Benchmark("cluster_poses", _setup_cluster_poses,
+              {"quick": [100], "default": [1000, 5000], "full": [1000, 5000, 20000]}),
+    Benchmark("rescore_poses", _setup_rescore_poses,
+              {"quick": [100], "default": [1000, 10000], "full": [1000, 10000, 50000]}),
+    Benchmark("archive_maps", _setup_archive_maps,
+              {"quick": [20], "default": [40, 80], "full": [40, 80, 126]}),
+]
+# Benchmarks that keep the in-memory structure cache between calls
+WARM_CACHE = {"check_ligand_clash"}
+
+
+def time_call(func: Callable[[], Any], repeats: int, warm_cache: bool = False,
+              max_seconds: float = 30.0) -> List[float]:
+    """Time ``func`` after one warm-up call; stop early once ``max_seconds`` are spent."""
+    timings: List[float] = []
+    # Kernels print progress lines; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+        spent = 0.0
+        for _ in range(repeats):
+            if not warm_cache:
+                structure_cache.clear_memory_cache()
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            spent += elapsed
+            if spent > max_seconds:
+                break
+    return timings
+
+
+def git_commit(root: Path = PROJECT_ROOT) -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def _run_cases(tmp: Path, preset: str, only: Sequence[str], repeats: int,
+               max_seconds: float) -> List[Dict[str, Any]]:
+    results = []
+    for bench in BENCHMARKS:
+        if only and bench.name not in only:
+            continue
+        for size in bench.sizes[preset]:
+            case_dir = tmp / f"{bench.name}-{size}"
+            case_dir.mkdir()
+            func = bench.setup(case_dir, size)
+            timings = time_call(func, repeats, bench.name in WARM_CACHE, max_seconds)
+            structure_cache.clear_memory_cache()
+            result = {
+                "benchmark": bench.name,
+                "size": size,
+                "repeats": len(timings),
+                "min_s": round(min(timings), 6),
+                "median_s": round(statistics.median(timings), 6),
+                "mean_s": round(statistics.fmean(timings), 6),
+            }
+            results.append(result)
+            print(f"{bench.name:<22} {size:>8}  median {result['median_s'] * 1000:10.2f} ms  "
+                  f"min {result['min_s'] * 1000:10.2f} ms  ({result['repeats']} runs)")
+    return results
+
+
+def run_benchmarks(preset: str = "default", only: Sequence[str] = (), repeats: int = 5,
+                   max_seconds: float = 30.0, workdir: Optional[Path] = None) -> Dict[str, Any]:
+    """Run the selected benchmarks and return the results document."""
+    try:
+        import numpy  # noqa: F401
+        has_numpy = True
+    except ImportError:
+        has_numpy = False
+
+    # Measure parsing, not the on-disk structure cache
+    previous_cache = os.environ.get("WNS_STRUCTURE_CACHE")
+    os.environ["WNS_STRUCTURE_CACHE"] = "off"
+    try:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            results = _run_cases(Path(tmp), preset, only, repeats, max_seconds)
+    finally:
+        if previous_cache is None:
+            os.environ.pop("WNS_STRUCTURE_CACHE", None)
+        else:
+            os.environ["WNS_STRUCTURE_CACHE"] = previous_cache
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "preset": preset,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": has_numpy,
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Median ratios ``current / baseline`` for the cases present in both documents."""
+    base = {(row["benchmark"], row["size"]): row for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        old = base.get((row["benchmark"], row["size"]))
+        if old is None or old["median_s"] <= 0:
+            continue
+        ratio = row["median_s"] / old["median_s"]
+        rows.append({
+            "benchmark": row["benchmark"],
+            "size": row["size"],
+            "baseline_s": old["median_s"],
+            "current_s": row["median_s"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\nbaseline {baseline.get('commit') or '?'}  ->  current {current.get('commit') or '?'}")
+    header = f"{'benchmark':<22} {'size':>8} {'base ms':>10} {'now ms':>10} {'ratio':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<22} {row['size']:>8} {row['baseline_s'] * 1000:>10.2f} "
+              f"{row['current_s'] * 1000:>10.2f} {row['ratio']:>7.2f}{flag}")
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def default_output(document: Dict[str, Any]) -> Path:
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    commit = (document.get("commit") or "nogit")[:12]
+    return DEFAULT_RESULTS_DIR / f"{stamp}-{commit}-{document['preset']}.json"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=["quick", "default", "full"], default="default",
+                        help="Input sizes to run (full includes 200k-atom receptors)")
+    parser.add_argument("--only", nargs="+", choices=[b.name for b in BENCHMARKS], default=[],
+                        help="Run only these benchmarks")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls per case")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="Stop repeating a case once this much time was spent on it")
+    parser.add_argument("--output", type=Path, help="Results JSON (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, help="Compare the new results with this results JSON")
+    parser.add_argument("--diff", nargs=2, type=Path, metavar=("BASELINE", "CURRENT"),
+                        help="Only compare two existing results files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Median ratio above which a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.diff:
+        baseline, current = load_results(args.diff[0]), load_results(args.diff[1])
+    else:
+        current = run_benchmarks(args.preset, args.only, args.repeats, args.max_seconds)
+        output = args.output or default_output(current)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2), encoding="utf-8")
+        print(f"Results written to {output}")
+        if not args.baseline:
+            return 0
+        baseline = load_results(args.baseline)
+
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows, baseline, current)
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
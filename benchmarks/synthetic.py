@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic inputs for the benchmarks.
+
+The generators write files in the formats the pipeline reads:
+
+* receptor PDBQT: residues of N/H/CA/C/O (AD4 types N, HD, C, C, OA) on a
+  jittered lattice at protein-like density, 1k–200k atoms;
+* ligand PDBQT (``LIG``) and swarms of ligand copies around the receptor, as
+  produced by the wrapper cycles;
+* complex PDBQT (receptor plus one ligand) for scoring;
+* GRO systems (protein plus ``LIG`` residues, coordinates in nm);
+* AutoDock DLG files with ``DOCKED:`` blocks and GA progress lines.
+
+Every generator takes a ``seed`` so the same size always yields the same file.
+
+Usage:
+    python benchmarks/synthetic.py --out bench_data --receptor-atoms 10000 --ligands 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+Coord = Tuple[float, float, float]
+
+# name, AD4 type, offset from the residue anchor (Å), partial charge
+RESIDUE_TEMPLATE = [
+    ("N", "N", (0.00, 0.00, 0.00), -0.350),
+    ("H", "HD", (0.00, 1.01, 0.00), 0.250),
+    ("CA", "C", (1.45, -0.20, 0.00), 0.180),
+    ("C", "C", (2.10, 1.10, 0.40), 0.240),
+    ("O", "OA", (1.60, 2.20, 0.60), -0.270),
+]
+RESIDUE_NAMES = ["ALA", "GLY", "SER", "LEU", "VAL", "THR", "ASP", "LYS", "PHE", "GLU"]
+# Protein interior holds roughly one heavy atom per 12 Å^3; one residue per 3.8 Å cell
+RESIDUE_SPACING = 3.8
+
+# name, AD4 type, charge; ligand atoms are placed on a compact random walk
+LIGAND_TEMPLATE = [
+    ("C1", "C", 0.020), ("C2", "C", 0.010), ("C3", "A", 0.000), ("C4", "A", 0.000),
+    ("C5", "A", 0.000), ("C6", "A", 0.000), ("N1", "NA", -0.310), ("H1", "HD", 0.160),
+    ("O1", "OA", -0.390), ("O2", "OA", -0.280), ("C7", "C", 0.210), ("N2", "N", -0.250),
+    ("H2", "HD", 0.170), ("C8", "C", 0.030), ("S1", "SA", -0.100), ("C9", "C", 0.050),
+    ("O3", "OA", -0.350), ("H3", "HD", 0.210), ("C10", "A", 0.010), ("C11", "A", 0.010),
+]
+
+
+def pdbqt_line(record: str, serial: int, name: str, resname: str, chain: str, resid: int,
+               coord: Coord, charge: float, atom_type: str) -> str:
+    """One PDBQT ATOM/HETATM record (80 columns, type in 78-79)."""
+    # Four-character names start in column 13, shorter ones in column 14
+    name_field = name if len(name) == 4 else f" {name:<3}"
+    return (f"{record:<6}{serial % 100000:>5} {name_field} {resname:>3} {chain}"
+            f"{resid % 10000:>4}    {coord[0]:8.3f}{coord[1]:8.3f}{coord[2]:8.3f}"
+            f"{1.0:6.2f}{0.0:6.2f}    {charge:+6.3f} {atom_type:<2}")
+
+
+def receptor_atoms(n_atoms: int, seed: int = 1) -> List[Tuple[str, str, int, Coord, float, str]]:
+    """Return ``(name, resname, resid, coord, charge, type)`` for a synthetic receptor."""
+    rng = random.Random(seed)
+    n_residues = max(1, math.ceil(n_atoms / len(RESIDUE_TEMPLATE)))
+    side = max(1, math.ceil(n_residues ** (1.0 / 3.0)))
+    atoms = []
+    for index in range(n_residues):
+        i, j, k = index % side, (index // side) % side, index // (side * side)
+        anchor = (
+            i * RESIDUE_SPACING + rng.uniform(-0.3, 0.3),
+            j * RESIDUE_SPACING + rng.uniform(-0.3, 0.3),
+            k * RESIDUE_SPACING + rng.uniform(-0.3, 0.3),
+        )
+        resname = RESIDUE_NAMES[index % len(RESIDUE_NAMES)]
+        for name, atom_type, offset, charge in RESIDUE_TEMPLATE:
+            if len(atoms) == n_atoms:
+                break
+            coord = (anchor[0] + offset[0], anchor[1] + offset[1], anchor[2] + offset[2])
+            atoms.append((name, resname, index + 1, coord, charge, atom_type))
+    return atoms
+
+
+def receptor_extent(n_atoms: int) -> Tuple[Coord, Coord]:
+    """Bounding box (min, max) of ``receptor_atoms(n_atoms)`` without generating it."""
+    n_residues = max(1, math.ceil(n_atoms / len(RESIDUE_TEMPLATE)))
+    side = max(1, math.ceil(n_residues ** (1.0 / 3.0)))
+    layers = math.ceil(n_residues / (side * side))
+    upper = ((side - 1) * RESIDUE_SPACING + 2.5, (side - 1) * RESIDUE_SPACING + 2.5,
+             (layers - 1) * RESIDUE_SPACING + 1.0)
+    return (-0.3, -0.5, -0.3), upper
+
+
+def write_receptor_pdbqt(path: Path, n_atoms: int, seed: int = 1) -> Path:
+    lines = [
+        pdbqt_line("ATOM", serial, name, resname, "A", resid, coord, charge, atom_type)
+        for serial, (name, resname, resid, coord, charge, atom_type)
+        in enumerate(receptor_atoms(n_atoms, seed), start=1)
+    ]
+    lines.append("TER")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def ligand_coords(center: Coord, rng: random.Random) -> List[Coord]:
+    """Compact random walk with ~1.5 Å steps (one coordinate per template atom)."""
+    coords = [center]
+    for _ in LIGAND_TEMPLATE[1:]:
+        theta = rng.uniform(0.0, math.pi)
+        phi = rng.uniform(0.0, 2.0 * math.pi)
+        prev = coords[-1]
+        step = (1.5 * math.sin(theta) * math.cos(phi), 1.5 * math.sin(theta) * math.sin(phi),
+                1.5 * math.cos(theta))
+        # Pull back towards the centre so the ligand stays ~6 Å across
+        coords.append((0.8 * prev[0] + 0.2 * center[0] + step[0],
+                       0.8 * prev[1] + 0.2 * center[1] + step[1],
+                       0.8 * prev[2] + 0.2 * center[2] + step[2]))
+    return coords
+
+
+def ligand_lines(center: Coord, rng: random.Random, resid: int = 1, first_serial: int = 1) -> List[str]:
+    return [
+        pdbqt_line("HETATM", first_serial + idx, name, "LIG", "B", resid, coord, charge, atom_type)
+        for idx, ((name, atom_type, charge), coord) in enumerate(zip(LIGAND_TEMPLATE, ligand_coords(center, rng)))
+    ]
+
+
+def write_ligand_pdbqt(path: Path, center: Coord, seed: int = 1) -> Path:
+    lines = ["ROOT", *ligand_lines(center, random.Random(seed)), "ENDROOT", "TORSDOF 0"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def surface_centers(n_ligands: int, receptor_size: int, seed: int = 1, shell: float = 4.0) -> List[Coord]:
+    """Ligand centres scattered over a shell just outside the receptor box."""
+    rng = random.Random(seed)
+    low, high = receptor_extent(receptor_size)
+    centers = []
+    for _ in range(n_ligands):
+        axis = rng.randrange(3)
+        point = [rng.uniform(low[d], high[d]) for d in range(3)]
+        point[axis] = (low[axis] - shell) if rng.random() < 0.5 else (high[axis] + shell)
+        centers.append((point[0], point[1], point[2]))
+    return centers
+
+
+def write_ligand_swarm(directory: Path, n_ligands: int, receptor_size: int = 10000, seed: int = 1) -> List[Path]:
+    """One PDBQT per ligand copy, like the accepted poses of the wrapper cycles."""
+    return [
+        write_ligand_pdbqt(directory / f"ligand_{idx:05d}.pdbqt", center, seed=seed + idx)
+        for idx, center in enumerate(surface_centers(n_ligands, receptor_size, seed))
+    ]
+
+
+def write_complex_pdbqt(path: Path, n_atoms: int, seed: int = 1) -> Path:
+    """Receptor plus one ligand docked against one face of it."""
+    lines = [
+        pdbqt_line("ATOM", serial, name, resname, "A", resid, coord, charge, atom_type)
+        for serial, (name, resname, resid, coord, charge, atom_type)
+        in enumerate(receptor_atoms(n_atoms, seed), start=1)
+    ]
+    center = surface_centers(1, n_atoms, seed, shell=2.5)[0]
+    lines.extend(ligand_lines(center, random.Random(seed), resid=1, first_serial=len(lines) + 1))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def gro_line(resid: int, resname: str, name: str, serial: int, coord_nm: Coord) -> str:
+    return (f"{resid % 100000:>5}{resname:<5}{name:>5}{serial % 100000:>5}"
+            f"{coord_nm[0]:8.3f}{coord_nm[1]:8.3f}{coord_nm[2]:8.3f}")
+
+
+def write_gro_system(path: Path, n_atoms: int, n_ligands: int = 10, seed: int = 1) -> Path:
+    """Protein of ``n_atoms`` atoms plus ``n_ligands`` ``LIG`` residues (nm units)."""
+    rng = random.Random(seed)
+    lines = []
+    protein = receptor_atoms(n_atoms, seed)
+    for serial, (name, resname, resid, coord, _, _) in enumerate(protein, start=1):
+        lines.append(gro_line(resid, resname, name, serial, (coord[0] / 10, coord[1] / 10, coord[2] / 10)))
+    resid = protein[-1][2] if protein else 0
+    for center in surface_centers(n_ligands, n_atoms, seed):
+        resid += 1
+        for (name, _, _), coord in zip(LIGAND_TEMPLATE, ligand_coords(center, rng)):
+            lines.append(gro_line(resid, "LIG", name, len(lines) + 1,
+                                  (coord[0] / 10, coord[1] / 10, coord[2] / 10)))
+    low, high = receptor_extent(n_atoms)
+    box = [(high[d] - low[d] + 20.0) / 10 for d in range(3)]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "Synthetic WnS benchmark system\n"
+        f"{len(lines)}\n" + "\n".join(lines) + "\n"
+        f"{box[0]:10.5f}{box[1]:10.5f}{box[2]:10.5f}\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+def write_dlg(path: Path, n_runs: int, generations: int = 50, seed: int = 1) -> Path:
+    """AutoDock 4 log with ``n_runs`` GA runs of ``generations`` progress lines each."""
+    rng = random.Random(seed)
+    out: List[str] = [
+        "          AutoDock 4.2 Release 4.2.6",
+        "DPF> outlev 1",
+        f"DPF> seed {seed}",
+        "DPF> ligand_types A C HD N NA OA SA",
+        "DPF> fld protein.maps.fld",
+        f"DPF> ga_run {n_runs}",
+        "",
+    ]
+    for run in range(1, n_runs + 1):
+        out.append(f"\tBEGINNING GENETIC ALGORITHM DOCKING {run} of {n_runs}")
+        for generation in range(1, generations + 1):
+            out.append(f"Generation: {generation * 10:>4}   Oldest's energy: {rng.uniform(-8, 2):8.3f}    "
+                       f"Lowest energy: {rng.uniform(-9, -3):8.3f}    Num.evals.: {generation * 2500:>8}")
+        energy = rng.uniform(-9.0, -3.0)
+        out.extend([
+            "DOCKED: MODEL        1",
+            f"DOCKED: USER    Run = {run}",
+            "DOCKED: USER    DPF = wrapper.dpf",
+            "DOCKED: USER  ",
+            f"DOCKED: USER    Estimated Free Energy of Binding    = {energy:7.2f} kcal/mol",
+            "DOCKED: REMARK  Name = ligand",
+            "DOCKED: ROOT",
+        ])
+        center = (rng.uniform(0, 20), rng.uniform(0, 20), rng.uniform(0, 20))
+        out.extend("DOCKED: " + line for line in ligand_lines(center, rng))
+        out.extend(["DOCKED: ENDROOT", "DOCKED: TORSDOF 0", "DOCKED: TER", "DOCKED: ENDMDL", ""])
+    out.append(f"{n_runs} docking runs completed.")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(out) + "\n", encoding="utf-8")
+    return path
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, default=Path("bench_data"), help="Output directory")
+    parser.add_argument("--receptor-atoms", type=int, default=10000, help="Receptor size in atoms")
+    parser.add_argument("--ligands", type=int, default=100, help="Ligand copies in the swarm / GRO system")
+    parser.add_argument("--dlg-runs", type=int, default=10, help="GA runs in the synthetic DLG")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    out = args.out
+    write_receptor_pdbqt(out / "receptor.pdbqt", args.receptor_atoms, args.seed)
+    write_complex_pdbqt(out / "complex.pdbqt", args.receptor_atoms, args.seed)
+    swarm = write_ligand_swarm(out / "swarm", args.ligands, args.receptor_atoms, args.seed)
+    write_gro_system(out / "system.gro", args.receptor_atoms, args.ligands, args.seed)
+    write_dlg(out / "docking.dlg", args.dlg_runs, seed=args.seed)
+    print(f"Wrote receptor ({args.receptor_atoms} atoms), complex, {len(swarm)} ligands, "
+          f"GRO system and DLG ({args.dlg_runs} runs) to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,11 @@ try:
 except ImportError as exc:  # pragma: no cover
     raise SystemExit("PyYAML is required. Install it via 'pip install pyyaml'.") from exc
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from results_store import ResultsStore
+from profiling import add_profile_argument, enable as enable_profiling, profiled
+
 
 class Atom:
     """Represents an atom in a PDB file."""
@@ -46,6 +51,25 @@ class Atom:
             self.pdbqt_type = None
             self.element = line[76:78].strip() if len(line) > 76 else self.atom_name[0]
 
+    @classmethod
+    def from_structure(cls, structure, index: int) -> "Atom":
+        """Build an atom from a cached ``Structure`` row without re-parsing floats."""
+        atom = cls.__new__(cls)
+        atom.line = str(structure.lines[index])
+        atom.atom_id = int(structure.serial[index])
+        atom.atom_name = str(structure.name[index])
+        atom.residue_name = str(structure.resname[index])
+        atom.residue_id = int(structure.resid[index])
+        atom.coord = structure.coord(index)
+        # Same column rules as __init__, which sees the line with its newline
+        if len(atom.line) + 1 > 77:
+            atom.pdbqt_type = str(structure.atom_type[index])
+            atom.element = atom.pdbqt_type[0] if atom.pdbqt_type else atom.atom_name[0]
+        else:
+            atom.pdbqt_type = None
+            atom.element = str(structure.element[index]) if len(atom.line) + 1 > 76 else atom.atom_name[0]
+        return atom
+
 
 class HydrogenBond:
     """Represents a hydrogen bond between donor and acceptor."""
@@ -104,14 +128,11 @@ def calculate_angle(donor_h: Tuple[float, float, float],
         return math.degrees(math.acos(cos_angle))
 
 
+@profiled
 def read_pdb_file(pdb_file: Path) -> List[Atom]:
     """Read PDB file and return list of atoms."""
-    atoms = []
-    with pdb_file.open('r', encoding='utf-8') as f:
-        for line in f:
-            if line.startswith(('ATOM', 'HETATM')):
-                atoms.append(Atom(line))
-    return atoms
+    structure = load_structure(pdb_file)
+    return [Atom.from_structure(structure, idx) for idx in range(len(structure)) if structure.valid[idx]]
 
 
 def is_donor(atom: Atom) -> bool:
@@ -155,6 +176,7 @@ def find_hydrogen_atoms(atoms: List[Atom], donor: Atom) -> List[Atom]:
     return hydrogens
 
 
+@profiled
 def count_hydrogen_bonds(protein_atoms: List[Atom], ligand_atoms: List[Atom],
                         distance_cutoff: float = 3.5, angle_cutoff: float = 120.0) -> List[HydrogenBond]:
     """Count hydrogen bonds between protein and ligand."""
@@ -205,6 +227,7 @@ def count_hydrogen_bonds(protein_atoms: List[Atom], ligand_atoms: List[Atom],
     return hbonds
 
 
+@profiled
 def cluster_ligands(atoms: List[Atom], ligand_resname: str = "LIG", 
                     distance_cutoff: float = 2.0) -> Dict[int, List[Atom]]:
     """Cluster ligands based on spatial proximity."""
@@ -257,6 +280,7 @@ def cluster_ligands(atoms: List[Atom], ligand_resname: str = "LIG",
     return clusters
 
 
+@profiled
 def calculate_interaction_energy(ligand_atoms: List[Atom], protein_atoms: List[Atom]) -> float:
     """Calculate simplified interaction energy between ligand and protein."""
     # This is a simplified calculation - in practice you'd use more sophisticated methods
@@ -430,7 +454,7 @@ def save_results_to_csv(scores: List[Dict], output_csv: str = "hbond_analysis.cs
     print(f"Results saved to {output_csv}")
 
 
-def main() -> None:
+def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("pdb_file", type=Path, help="PDB file with protein-ligand complex")
     parser.add_argument("-t", "--trajectory", type=Path, help="Optional trajectory file for analysis")
@@ -441,8 +465,15 @@ def main() -> None:
     parser.add_argument("-a", "--angle", type=float, default=120.0,
                        help="Hydrogen bond angle cutoff (degrees)")
     parser.add_argument("--csv", action="store_true", help="Save results to CSV file")
+    parser.add_argument("--results-db", type=Path, help="Append H-bond rows to this results store")
+    parser.add_argument("--run-id", default="default", help="Run key for the results store")
+    parser.add_argument("--cycle", type=int, help="Cycle number for the results store")
+    parser.add_argument("--seed", type=int, help="Docking seed for the results store")
+    add_profile_argument(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.profile:
+        enable_profiling(args.profile)
     
     if not args.pdb_file.exists():
         raise FileNotFoundError(f"PDB file not found: {args.pdb_file}")
@@ -459,6 +490,11 @@ def main() -> None:
         csv_file = f"{args.output}.csv"
         save_results_to_csv(scores, csv_file)
     
+    if args.results_db:
+        with ResultsStore(args.results_db) as store:
+            n_rows = store.add_hbond_scores(args.run_id, scores, cycle=args.cycle, seed=args.seed)
+        print(f"Appended {n_rows} H-bond rows to {args.results_db}")
+    
     # Print summary
     print("\n=== Hydrogen Bond Analysis Summary ===")
     print(f"Total ligands with hydrogen bonds: {len(scores)}")
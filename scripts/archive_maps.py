@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Pack AutoGrid map sets into a compressed map archive, list it, or restore a set as ASCII maps.
+
+    wns maps pack autodock_runs/map_archive cycle_00 autodock_runs/protein.maps.fld
+    wns maps pack autodock_runs/map_archive cycle_01 cycle_01/protein.maps.fld --base cycle_00 --remove
+    wns maps list autodock_runs/map_archive
+    wns maps unpack autodock_runs/map_archive cycle_01 restored/
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from grid_maps import read_fld
+from map_archive import DEFAULT_MAX_ERROR, DEFAULT_REL_ERROR, MapArchive
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    pack = subparsers.add_parser("pack", help="Add the maps of a .maps.fld as a new set")
+    pack.add_argument("archive", type=Path)
+    pack.add_argument("name", help="Set name (letters, digits, '_', '.', '-')")
+    pack.add_argument("fld", type=Path, help="AutoGrid field file (protein.maps.fld)")
+    pack.add_argument("--base", help="Store the maps as sparse deltas from this set")
+    pack.add_argument("--max-error", type=float, default=DEFAULT_MAX_ERROR,
+                      help=f"Absolute error bound in kcal/mol (default: {DEFAULT_MAX_ERROR})")
+    pack.add_argument("--rel-error", type=float, default=DEFAULT_REL_ERROR,
+                      help=f"Relative error bound (default: {DEFAULT_REL_ERROR})")
+    pack.add_argument("--remove", action="store_true", help="Delete the ASCII maps once they are archived")
+
+    listing = subparsers.add_parser("list", help="Sets in the archive with their sizes")
+    listing.add_argument("archive", type=Path)
+
+    unpack = subparsers.add_parser("unpack", help="Write a set as AutoDock-readable ASCII maps")
+    unpack.add_argument("archive", type=Path)
+    unpack.add_argument("name")
+    unpack.add_argument("out_dir", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.action == "pack":
+        if not args.fld.exists():
+            raise FileNotFoundError(f"Grid field file not found: {args.fld}")
+        entry = MapArchive(args.archive, args.max_error, args.rel_error).add(args.name, args.fld, args.base)
+        changed = sum(record["changed"] for record in entry["maps"])
+        points = sum(record["points"] for record in entry["maps"])
+        error = max(record["error"] for record in entry["maps"])
+        print(f"Packed {len(entry['maps'])} maps as {args.name}: {entry['ascii_bytes'] / 1e6:.1f} MB -> "
+              f"{entry['stored_bytes'] / 1e6:.2f} MB, {changed}/{points} points stored, max error {error:.4f}")
+        if args.remove:
+            for path in read_fld(args.fld):
+                path.unlink()
+    elif args.action == "list":
+        archive = MapArchive(args.archive)
+        print(f"{'set':<24}  {'base':<24}  {'maps':>4}  {'ASCII MB':>9}  {'stored MB':>9}  {'ratio':>6}")
+        for name in archive.names:
+            entry = archive.info(name)
+            ratio = entry["ascii_bytes"] / max(entry["stored_bytes"], 1)
+            print(f"{name:<24}  {entry['base'] or '-':<24}  {len(entry['maps']):>4}  "
+                  f"{entry['ascii_bytes'] / 1e6:9.2f}  {entry['stored_bytes'] / 1e6:9.3f}  {ratio:6.0f}")
+    else:
+        fld = MapArchive(args.archive).materialize(args.name, args.out_dir)
+        print(f"Restored {args.name} into {fld}")
+
+
+if __name__ == "__main__":
+    main()
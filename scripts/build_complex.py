@@ -5,8 +5,13 @@ from __future__ import annotations
 
 import argparse
 import math
+import sys
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Iterable, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from pose_dedup import DEFAULT_RMSD_CUTOFF, deduplicate_pose_files
 
 
 Coordinate = Tuple[float, float, float]
@@ -15,9 +20,9 @@ Coordinate = Tuple[float, float, float]
 class AtomRecord:
     __slots__ = ("line", "coord", "serial")
 
-    def __init__(self, line: str) -> None:
+    def __init__(self, line: str, coord: Optional[Coordinate] = None) -> None:
         self.line = line
-        self.coord = (
+        self.coord = coord if coord is not None else (
             float(line[30:38]),
             float(line[38:46]),
             float(line[46:54]),
@@ -26,10 +31,11 @@ class AtomRecord:
 
 
 def load_atoms(path: Path) -> List[AtomRecord]:
+    structure = load_structure(path)
     atoms: List[AtomRecord] = []
-    for line in path.read_text(encoding="utf-8").splitlines():
-        if line.startswith(("ATOM", "HETATM")):
-            atoms.append(AtomRecord(line.ljust(80)))
+    for idx in range(len(structure)):
+        if structure.valid[idx]:
+            atoms.append(AtomRecord(str(structure.lines[idx]).ljust(80), structure.coord(idx)))
     return atoms
 
 
@@ -95,10 +101,22 @@ def main() -> None:
         default=2.0,
         help="Distance cutoff in Å for removing clashing ligand poses",
     )
+    parser.add_argument(
+        "--dedup-rmsd",
+        type=float,
+        default=DEFAULT_RMSD_CUTOFF,
+        help="Keep only the lowest-energy pose among poses within this heavy-atom RMSD in Å (0 disables)",
+    )
     args = parser.parse_args()
 
+    ligand_paths = args.ligands
+    if args.dedup_rmsd > 0:
+        ligand_paths, clusters = deduplicate_pose_files(args.ligands, args.dedup_rmsd)
+        print(f"{len(args.ligands)} poses -> {len(ligand_paths)} after RMSD deduplication "
+              f"({args.dedup_rmsd} Å, {sum(len(cluster) > 1 for cluster in clusters)} clusters merged)")
+
     protein_atoms = load_atoms(args.protein)
-    ligand_atoms = [load_atoms(path) for path in args.ligands]
+    ligand_atoms = [load_atoms(path) for path in ligand_paths]
     ligand_groups = filter_ligands(ligand_atoms, args.cutoff)
 
     write_complex(protein_atoms, ligand_groups, args.output)
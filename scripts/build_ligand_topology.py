@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Write a GROMACS ``.itp`` for the ligand from its coordinates.
+
+    python scripts/build_ligand_topology.py ../gmx/npt.gro ligand.itp --resname UNL
+    python scripts/build_ligand_topology.py ligand.pdbqt ligand.itp --resname ""
+
+Bonds are perceived from covalent radii with a cell-list neighbour search;
+angles, dihedrals and 1-4 pairs come from the bond graph, and the reference
+bond lengths and angles are measured from the input (averaged over all
+copies of the ligand residue).  Atom names, elements and connectivity are
+taken from the input; charges are zero and force constants generic, so the
+result keeps the ligand in shape during the Shaker washes but is not a
+force field parameterization.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from ligand_topology import BOND_TOLERANCE, topology_from_file
+
+
+def build_ligand_topology(input_file: Path, output_itp: Path, resname: str = "UNL",
+                          tolerance: float = BOND_TOLERANCE, dihedrals: bool = True):
+    """Build and write the topology; returns the ``LigandTopology``."""
+    start = time.perf_counter()
+    topology = topology_from_file(input_file, resname or None, tolerance, dihedrals)
+    topology.write_itp(output_itp)
+    print(f"{input_file}: {topology.summary()} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if topology.mismatched:
+        print(f"WARNING: {len(topology.mismatched)} copies disagree with the majority bond graph "
+              f"(residue indices {topology.mismatched[:10]}) and were left out of the averages")
+    fragments = topology.fragments()
+    if fragments > 1:
+        print(f"WARNING: the bond graph has {fragments} disconnected fragments; check --tolerance")
+    print(f"Topology written to {output_itp}")
+    return topology
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="GRO, PDB, PDBQT or mol2 file containing the ligand")
+    parser.add_argument("output", type=Path, help="Output .itp file")
+    parser.add_argument("--resname", default="UNL",
+                        help="Ligand residue name (\"\" for every atom of a PDB/PDBQT/mol2 file)")
+    parser.add_argument("--tolerance", type=float, default=BOND_TOLERANCE,
+                        help="Slack on the covalent radius sum, in nm")
+    parser.add_argument("--no-dihedrals", action="store_true", help="Only write bonds and angles")
+    args = parser.parse_args(argv)
+    build_ligand_topology(args.input, args.output, args.resname, args.tolerance, not args.no_dihedrals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Report how much of the receptor's solvent-accessible surface docked ligands cover, and the largest gaps."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from surface_coverage import CONTACT, PROBE_RADIUS, SURFACE_POINTS, SurfaceCoverage
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("receptor", type=Path, help="Unmasked receptor PDBQT")
+    parser.add_argument("ligands", nargs="*", type=Path, help="Docked ligand PDBQT files")
+    parser.add_argument("--masked", type=Path, help="Masked receptor PDBQT (atoms typed X count as covered)")
+    parser.add_argument("--probe", type=float, default=PROBE_RADIUS,
+                        help=f"Probe radius in Angstroms (default: {PROBE_RADIUS})")
+    parser.add_argument("--contact", type=float, default=CONTACT,
+                        help=f"Ligand atom to surface point distance in Angstroms (default: {CONTACT})")
+    parser.add_argument("--points", type=int, default=SURFACE_POINTS,
+                        help=f"Surface test points per atom (default: {SURFACE_POINTS})")
+    parser.add_argument("-n", "--top", type=int, default=5, help="Number of uncovered patches to report (default: 5)")
+    parser.add_argument("--json", type=Path, help="Also write the coverage and per-residue fractions to this JSON file")
+    args = parser.parse_args(argv)
+
+    for path in [args.receptor, args.masked, *args.ligands]:
+        if path is not None and not path.exists():
+            raise FileNotFoundError(f"File not found: {path}")
+
+    coverage = SurfaceCoverage(args.receptor.read_text(encoding="utf-8").splitlines(), probe=args.probe,
+                               points=args.points, contact=args.contact)
+    coverage.update([coord for path in args.ligands for coord in load_structure(path).valid_coords()],
+                    args.masked.read_text(encoding="utf-8").splitlines() if args.masked else None)
+    residues = coverage.residue_coverage()
+    print(f"Surface coverage: {coverage.fraction:.1%} ({coverage.covered_area:.0f} of {coverage.total_area:.0f} A^2), "
+          f"{sum(1 for value in residues.values() if value >= 0.5)}/{len(residues)} residues covered")
+    patches = coverage.uncovered_patches()
+    if patches:
+        print(f"{'patch':>5}  {'center (A)':>26}  {'area':>8}")
+    for number, patch in enumerate(patches[:args.top], start=1):
+        print(f"{number:>5}  {patch.center[0]:8.3f} {patch.center[1]:8.3f} {patch.center[2]:8.3f}  {patch.area:8.1f}")
+    if args.json:
+        record = coverage.to_dict()
+        record["patches"] = [{"center": [round(value, 3) for value in patch.center], "area": round(patch.area, 1)}
+                             for patch in patches]
+        args.json.write_text(json.dumps(record, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Rank low-energy surface hotspots in AutoGrid maps and print focused docking boxes."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from grid_maps import load_maps
+from hotspots import (DEFAULT_CONTACT, DEFAULT_ENERGY_CUTOFF, DEFAULT_MIN_VOLUME, DEFAULT_PADDING,
+                      find_hotspots, focus_box)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fld", type=Path, help="AutoGrid field file (protein.maps.fld)")
+    parser.add_argument("receptor", type=Path, help="Receptor PDBQT (masked atoms typed X)")
+    parser.add_argument("-t", "--types", required=True, help='Ligand atom types, e.g. "A C OA HD"')
+    parser.add_argument("-n", "--top", type=int, default=5, help="Number of hotspots to report (default: 5)")
+    parser.add_argument("--cutoff", type=float, default=DEFAULT_ENERGY_CUTOFF,
+                        help=f"Affinity cutoff in kcal/mol (default: {DEFAULT_ENERGY_CUTOFF})")
+    parser.add_argument("--contact", type=float, default=DEFAULT_CONTACT,
+                        help=f"Distance to the nearest receptor atom in Angstroms (default: {DEFAULT_CONTACT})")
+    parser.add_argument("--min-volume", type=float, default=DEFAULT_MIN_VOLUME,
+                        help=f"Smallest hotspot volume in A^3 (default: {DEFAULT_MIN_VOLUME})")
+    parser.add_argument("--padding", type=float, default=DEFAULT_PADDING,
+                        help=f"Space around each hotspot in the docking box (default: {DEFAULT_PADDING})")
+    parser.add_argument("--json", type=Path, help="Also write the hotspots and boxes to this JSON file")
+    args = parser.parse_args(argv)
+
+    if not args.fld.exists():
+        raise FileNotFoundError(f"Grid field file not found: {args.fld}")
+    if not args.receptor.exists():
+        raise FileNotFoundError(f"Receptor file not found: {args.receptor}")
+
+    types = args.types.split()
+    maps = load_maps(args.fld)
+    grid = maps[types[0]] if types[0] in maps else None
+    found = find_hotspots(maps, types, args.receptor.read_text(encoding="utf-8").splitlines(),
+                          energy_cutoff=args.cutoff, contact=args.contact, min_volume=args.min_volume,
+                          top=args.top)
+    records = []
+    print(f"{'rank':>4}  {'center (A)':>26}  {'npts':>12}  {'volume':>8}  {'energy':>9}  {'best':>6}")
+    for hotspot in found:
+        lower, upper = focus_box(hotspot, grid, args.padding)
+        npts = [high - low for low, high in zip(lower, upper)]
+        center = grid.point([(low + high) // 2 for low, high in zip(lower, upper)])
+        print(f"{hotspot.rank:>4}  {center[0]:8.3f} {center[1]:8.3f} {center[2]:8.3f}  "
+              f"{npts[0]:>4}{npts[1]:>4}{npts[2]:>4}  {hotspot.volume:8.1f}  {hotspot.energy:9.2f}  "
+              f"{hotspot.best:6.2f}")
+        records.append({**hotspot.to_dict(), "box_center": [round(value, 3) for value in center],
+                        "npts": npts, "spacing": grid.spacing})
+    if not found:
+        print("No hotspots found")
+    if args.json:
+        args.json.write_text(json.dumps(records, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
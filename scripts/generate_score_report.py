@@ -1,10 +1,31 @@
 #!/usr/bin/env python3
-"""Generate scoring report in JSON format (Standard Python Implementation)."""
+"""Generate scoring report in JSON format (Standard Python Implementation).
 
+Default mode scores one complex.  Batch mode (``--poses``) scores every pose file
+matching the given globs against one receptor in parallel and writes a ranked
+table plus one JSON report per pose.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
 import json
 import math
 import datetime
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from pose_dedup import FREE_ENERGY
+from results_store import ResultsStore
+from profiling import add_profile_argument, enable as enable_profiling, profiled
 
 # Atomic weights (Average)
 ATOMIC_WEIGHTS = {
@@ -18,7 +39,7 @@ HYDROPHOBIC_RES = {'ALA', 'VAL', 'LEU', 'ILE', 'MET', 'PHE', 'TRP', 'PRO'}
 AROMATIC_RES = {'PHE', 'TYR', 'TRP', 'HIS'}
 
 class Atom:
-    def __init__(self, line):
+    def __init__(self, line, coord=None):
         self.line = line
         try:
             # PDB/PDBQT fixed widths
@@ -26,9 +47,9 @@ class Atom:
             self.res_name = line[17:20].strip()
             self.chain = line[21:22].strip()
             self.res_id = line[22:26].strip()
-            self.x = float(line[30:38])
-            self.y = float(line[38:46])
-            self.z = float(line[46:54])
+            if coord is None:
+                coord = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+            self.x, self.y, self.z = coord
             
             # Element guessing
             # PDBQT puts element at the end (77-78), PDB at 76-77 usually
@@ -64,6 +85,7 @@ class Atom:
 def dist_sq(a1, a2):
     return (a1.x - a2.x)**2 + (a1.y - a2.y)**2 + (a1.z - a2.z)**2
 
+@profiled
 def analyze_structure(complex_file: Path, hbond_file: Path, vina_file: Path) -> dict:
     # 1. Parse Structure
     prot_atoms = []
@@ -76,24 +98,51 @@ def analyze_structure(complex_file: Path, hbond_file: Path, vina_file: Path) ->
     if not complex_file.exists():
         return {}
 
-    with open(complex_file, 'r') as f:
-        for line in f:
-            if line.startswith(('ATOM', 'HETATM')):
-                atom = Atom(line)
-                if not atom.valid: continue
-                
-                # Identify ligand by residue name or LIG string
-                if 'LIG' in line or 'UNL' in line or 'MOL' in line:
-                    lig_atoms.append(atom)
-                else:
-                    prot_atoms.append(atom)
+    # Parsed records (and coordinates) come from the content-hash cache
+    structure = load_structure(complex_file)
+    for idx in range(len(structure)):
+        if not structure.valid[idx]: continue
+        line = str(structure.lines[idx]) + '\n'
+        atom = Atom(line, structure.coord(idx))
+        if not atom.valid: continue
+        
+        # Identify ligand by residue name or LIG string
+        if 'LIG' in line or 'UNL' in line or 'MOL' in line:
+            lig_atoms.append(atom)
+        else:
+            prot_atoms.append(atom)
 
-    # 2. Ligand Metrics
-    mol_weight = 0.0
-    for a in lig_atoms:
-        mol_weight += ATOMIC_WEIGHTS.get(a.element, 12.0)
-    
-    # 3. Protein Metrics
+    # 5. H-bonds
+    hbond_count = 0
+    if hbond_file.exists():
+        try:
+            with open(hbond_file, 'r') as f:
+                for line in f:
+                    if "1,0," in line:
+                         parts = line.split(',')
+                         hbond_count = int(parts[4])
+        except: pass
+
+    # 6. Vina Affinity
+    vina_score = 0.0
+    if vina_file.exists():
+        try:
+            with open(vina_file, 'r') as f:
+                for line in f:
+                    if "REMARK VINA RESULT:" in line:
+                        # Format: REMARK VINA RESULT:    -6.8      0.000      0.000
+                        parts = line.split()
+                        try:
+                            vina_score = float(parts[3])
+                        except: pass
+                        break # Only 1st model
+        except: pass
+
+    return score_atoms(prot_atoms, lig_atoms, hbond_count, vina_score)
+
+
+def protein_metrics(prot_atoms) -> tuple:
+    """Residue count and hydrophobic/aromatic residue counts of the receptor."""
     unique_residues = set()
     hydrophobic_count = 0
     aromatic_count = 0
@@ -109,6 +158,26 @@ def analyze_structure(complex_file: Path, hbond_file: Path, vina_file: Path) ->
                 
     total_res = float(len(unique_residues))
     if total_res == 0: total_res = 1.0
+    return total_res, hydrophobic_count, aromatic_count
+
+
+@profiled
+def score_atoms(prot_atoms, lig_atoms, hbond_count: int, vina_score: float,
+                prot_stats: tuple | None = None) -> dict:
+    """Score one ligand pose against receptor atoms.
+
+    ``prot_stats`` is the ``protein_metrics`` result; batch scoring computes it
+    once per receptor instead of once per pose.
+    """
+    # 2. Ligand Metrics
+    mol_weight = 0.0
+    for a in lig_atoms:
+        mol_weight += ATOMIC_WEIGHTS.get(a.element, 12.0)
+    
+    # 3. Protein Metrics
+    if prot_stats is None:
+        prot_stats = protein_metrics(prot_atoms)
+    total_res, hydrophobic_count, aromatic_count = prot_stats
     
     # 4. Binding Metrics
     min_dist_sq = float('inf')
@@ -154,33 +223,6 @@ def analyze_structure(complex_file: Path, hbond_file: Path, vina_file: Path) ->
                     if pa.res_name in AROMATIC_RES and d2 <= 4.0**2:
                          aromatic_contacts += 1
 
-    # 5. H-bonds
-    hbond_count = 0
-    if hbond_file.exists():
-        try:
-            with open(hbond_file, 'r') as f:
-                for line in f:
-                    if "1,0," in line:
-                         parts = line.split(',')
-                         hbond_count = int(parts[4])
-        except: pass
-
-    # 6. Vina Affinity
-    vina_score = 0.0
-    if vina_file.exists():
-        try:
-            with open(vina_file, 'r') as f:
-                for line in f:
-                    if "REMARK VINA RESULT:" in line:
-                        # Format: REMARK VINA RESULT:    -6.8      0.000      0.000
-                        parts = line.split()
-                        try:
-                            vina_score = float(parts[3])
-                        except: pass
-                        break # Only 1st model
-        except: pass
-
-
     # 6. Normalization and Weights (Deduced from User Example)
     # Ligand
     # Raw MW 454 -> Norm 0.113 => Norm = x / 4000
@@ -288,17 +330,245 @@ def analyze_structure(complex_file: Path, hbond_file: Path, vina_file: Path) ->
         "note": "Calculated using deduced formulas from user example. Vina Energy included."
     }
 
-def main():
-    complex_file = Path("complex/complex.pdbqt")
-    hbond_file = Path("view_hbonds.csv")
-    vina_file = Path("autodock_runs/vina_docked_101.pdbqt")
+# Receptor shared by batch workers: (path, atoms, protein_metrics, H-bond atoms).
+# Filled once per process by _init_receptor; forked workers inherit the parent's copy.
+_RECEPTOR = None
+
+
+def _init_receptor(receptor_file: str, with_hbonds: bool) -> None:
+    """Parse the receptor once per process (via the structure cache)."""
+    global _RECEPTOR
+    if _RECEPTOR is not None and _RECEPTOR[0] == receptor_file:
+        return
+    structure = load_structure(Path(receptor_file))
+    indices = [idx for idx in range(len(structure)) if structure.valid[idx]]
+    prot_atoms = [Atom(str(structure.lines[idx]) + '\n', structure.coord(idx)) for idx in indices]
+    hbond_atoms = None
+    if with_hbonds:
+        from analyze_hbonds import Atom as HBondAtom
+        hbond_atoms = [HBondAtom.from_structure(structure, idx) for idx in indices]
+    _RECEPTOR = (receptor_file, prot_atoms, protein_metrics(prot_atoms), hbond_atoms)
+
+
+def read_first_model(pose_file: Path) -> Tuple[List[str], float]:
+    """Return the atom lines and docking score of the first model in a pose file.
+
+    The score is the Vina affinity (``REMARK VINA RESULT``) or the AutoDock
+    estimated free energy of binding, whichever is present; 0.0 otherwise.
+    """
+    atom_lines = []
+    score = None
+    for line in pose_file.read_text(encoding='utf-8', errors='replace').splitlines():
+        if line.startswith('ENDMDL'):
+            break
+        if line.startswith(('ATOM', 'HETATM')):
+            atom_lines.append(line + '\n')
+        elif score is None and "VINA RESULT:" in line:
+            try:
+                score = float(line.split()[3])
+            except (IndexError, ValueError):
+                pass
+        elif score is None and "Estimated Free Energy of Binding" in line:
+            match = FREE_ENERGY.search(line)
+            if match:
+                score = float(match.group(1))
+    return atom_lines, score if score is not None else 0.0
+
+
+@profiled
+def count_pose_hbonds(hbond_atoms, ligand_lines: List[str]) -> int:
+    """Count receptor-ligand H-bonds, searching only receptor atoms near the pose."""
+    from analyze_hbonds import Atom as HBondAtom, count_hydrogen_bonds
+
+    ligand = []
+    for line in ligand_lines:
+        try:
+            ligand.append(HBondAtom(line))
+        except ValueError:
+            continue
+    if not ligand:
+        return 0
+    # 3.5 A H...acceptor cutoff plus 1.5 A donor-H bond length
+    margin = 5.0
+    lo = [min(a.coord[k] for a in ligand) - margin for k in range(3)]
+    hi = [max(a.coord[k] for a in ligand) + margin for k in range(3)]
+    pocket = [a for a in hbond_atoms
+              if all(lo[k] <= a.coord[k] <= hi[k] for k in range(3))]
+    return len(count_hydrogen_bonds(pocket, ligand))
+
+
+def score_pose(pose_file: str) -> dict:
+    """Batch worker: score one pose file against the shared receptor."""
+    _, prot_atoms, prot_stats, hbond_atoms = _RECEPTOR
+    ligand_lines, docking_score = read_first_model(Path(pose_file))
+    lig_atoms = [a for a in (Atom(line) for line in ligand_lines) if a.valid]
+    hbond_count = count_pose_hbonds(hbond_atoms, ligand_lines) if hbond_atoms is not None else 0
+    return {
+        "pose": pose_file,
+        "report": score_atoms(prot_atoms, lig_atoms, hbond_count, docking_score, prot_stats),
+    }
+
+
+def seed_from_name(path: Path) -> Optional[int]:
+    """Seed encoded in pose file names such as vina_docked_101 / docked_ligand_202."""
+    match = re.search(r'(\d+)(?!.*\d)', path.stem)
+    return int(match.group(1)) if match else None
+
+
+def report_names(pose_files: Sequence[str]) -> dict:
+    """Unique report name per pose: its path below the poses' common directory, ``/`` as ``__``.
+
+    ``seed_101/best_pose.pdbqt`` and ``seed_202/best_pose.pdbqt`` become
+    ``seed_101__best_pose`` and ``seed_202__best_pose``; poses in one
+    directory keep their stem.
+    """
+    paths = [Path(pose).resolve() for pose in pose_files]
+    root = Path(os.path.commonpath([str(path.parent) for path in paths])) if paths else Path()
+    return {pose: "__".join(path.relative_to(root).with_suffix("").parts)
+            for pose, path in zip(pose_files, paths)}
+
+
+def expand_pose_globs(patterns: Sequence[str]) -> List[str]:
+    pose_files = []
+    for pattern in patterns:
+        for match in sorted(glob.glob(pattern, recursive=True)):
+            if match not in pose_files and os.path.isfile(match):
+                pose_files.append(match)
+    return pose_files
+
+
+def score_batch(patterns: Sequence[str], receptor_file: Path, out_dir: Path,
+                workers: Optional[int] = None, with_hbonds: bool = True) -> List[dict]:
+    """Score all poses matching ``patterns`` and write the ranked outputs.
+
+    Args:
+        patterns: Glob patterns of pose files (PDBQT, first model is scored)
+        receptor_file: Receptor PDB/PDBQT, parsed once and shared with workers
+        out_dir: Directory for ``ranking.csv`` and the per-pose JSON reports
+        workers: Process count (default: CPU count); 1 scores in-process
+        with_hbonds: Count receptor-ligand H-bonds for each pose
+
+    Returns:
+        Result rows sorted best first.
+    """
+    pose_files = expand_pose_globs(patterns)
+    if not pose_files:
+        raise FileNotFoundError(f"No pose files match {list(patterns)}")
+
+    # Parse in the parent first: forked workers inherit it, spawned workers
+    # hit the warm structure cache instead of re-parsing the text.
+    _init_receptor(str(receptor_file), with_hbonds)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pose_files) == 1:
+        results = [score_pose(pose) for pose in pose_files]
+    else:
+        chunksize = max(1, len(pose_files) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_receptor,
+                                 initargs=(str(receptor_file), with_hbonds)) as pool:
+            results = list(pool.map(score_pose, pose_files, chunksize=chunksize))
+
+    results.sort(key=lambda r: (-r["report"]["final_score"],
+                                r["report"]["binding"]["raw"]["binding_energy"]))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = report_names([result["pose"] for result in results])
+    timestamp = datetime.datetime.now().isoformat()
+    rows = []
+    for rank, result in enumerate(results, start=1):
+        pose = Path(result["pose"])
+        seed = seed_from_name(pose)
+        report = result["report"]
+        report["rank"] = rank
+        report["reproducibility"] = {
+            "timestamp": timestamp,
+            "seeds": {"autodock_seed": seed},
+            "files_used": {"pose": str(pose), "receptor": str(receptor_file)},
+        }
+        report["input_files"] = {"pose": str(pose), "receptor": str(receptor_file)}
+        report_path = out_dir / f"{names[result['pose']]}.json"
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        binding = report["binding"]["raw"]
+        rows.append({
+            "rank": rank,
+            "pose": str(pose),
+            "seed": seed if seed is not None else "",
+            "final_score": round(report["final_score"], 6),
+            "binding_energy": binding["binding_energy"],
+            "hbond_count": int(binding["hbond_count"]),
+            "contact_residues": int(binding["contact_residues"]),
+            "min_distance": round(binding["min_distance"], 3),
+            "report": str(report_path),
+        })
+
+    with open(out_dir / "ranking.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def print_ranking(rows: List[dict]) -> None:
+    print(f"{'Rank':>4}  {'Score':>7}  {'Energy':>8}  {'HB':>3}  {'Contacts':>8}  Pose")
+    for row in rows:
+        print(f"{row['rank']:>4}  {row['final_score']:>7.4f}  {row['binding_energy']:>8.2f}  "
+              f"{row['hbond_count']:>3}  {row['contact_residues']:>8}  {row['pose']}")
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--complex", type=Path, default=Path("complex/complex.pdbqt"),
+                        help="Protein-ligand complex to score (single mode)")
+    parser.add_argument("--hbond-file", type=Path, default=Path("view_hbonds.csv"),
+                        help="H-bond CSV from analyze_hbonds.py (single mode)")
+    parser.add_argument("--vina", type=Path, default=Path("autodock_runs/vina_docked_101.pdbqt"),
+                        help="Vina output providing the affinity (single mode)")
+    parser.add_argument("--seed", type=int, default=101, help="AutoDock seed recorded in the report")
+    parser.add_argument("--output", type=Path, default=Path("score_report.json"),
+                        help="Report path (single mode)")
+    parser.add_argument("--poses", nargs="+", metavar="GLOB",
+                        help="Batch mode: pose file globs to score against --receptor")
+    parser.add_argument("--receptor", type=Path, default=Path("pdbqt/protein.pdbqt"),
+                        help="Receptor for batch mode")
+    parser.add_argument("--out-dir", type=Path, default=Path("score_reports"),
+                        help="Batch mode output directory")
+    parser.add_argument("--workers", type=int, help="Batch worker processes (default: CPU count)")
+    parser.add_argument("--no-hbonds", action="store_true",
+                        help="Batch mode: skip per-pose H-bond counting")
+    parser.add_argument("--results-db", type=Path, help="Append scores to this results store")
+    parser.add_argument("--run-id", default="default", help="Run key for the results store")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if args.profile:
+        enable_profiling(args.profile)
+
+    if args.poses:
+        rows = score_batch(args.poses, args.receptor, args.out_dir,
+                           args.workers, not args.no_hbonds)
+        print_ranking(rows)
+        print(f"Wrote {args.out_dir / 'ranking.csv'} and {len(rows)} pose reports")
+        if args.results_db:
+            with ResultsStore(args.results_db) as store:
+                for row in rows:
+                    with open(row["report"]) as f:
+                        report = json.load(f)
+                    store.add_score_report(args.run_id, report, seed=None if row["seed"] == "" else row["seed"],
+                                           ligand=Path(row["pose"]).stem, pose_file=row["pose"])
+            print(f"Appended {len(rows)} scores to {args.results_db}")
+        return
+
+    complex_file = args.complex
+    hbond_file = args.hbond_file
+    vina_file = args.vina
     
     data = analyze_structure(complex_file, hbond_file, vina_file)
     
     output = data
     output["reproducibility"] = {
         "timestamp": datetime.datetime.now().isoformat(),
-        "seeds": { "autodock_seed": 101 },
+        "seeds": { "autodock_seed": args.seed },
         "files_used": { "complex": str(complex_file) }
     }
     output["input_files"] = {
@@ -308,10 +578,15 @@ def main():
         "config": "config.yml"
     }
     
-    with open("score_report.json", "w") as f:
+    with open(args.output, "w") as f:
         json.dump(output, f, indent=2)
+    
+    if args.results_db:
+        with ResultsStore(args.results_db) as store:
+            store.add_score_report(args.run_id, output, seed=args.seed,
+                                   ligand=complex_file.stem, pose_file=str(complex_file))
         
-    print("Generated score_report.json")
+    print(f"Generated {args.output}")
     print(json.dumps(output, indent=2))
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import argparse
 import os
 import shutil
 import subprocess
@@ -13,12 +14,17 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
 from state_manager import StateManager
 from gmx_runner import run_gmx_mdrun_safe
+from run_metrics import METRICS, measured_run, metrics_record_name
+from param_cache import ParameterCache
+from complex_assembly import assemble_complex
+from manifest_writer import ManifestWriter
+from update_manifest import DEFAULT_MANIFEST_PATH
 
 
 def run_command(cmd, cwd=None):
     """Run a command and handle errors."""
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=cwd, check=True)
+    result = measured_run(cmd, cwd=cwd, check=True)
     return result
 
 
@@ -41,12 +47,78 @@ def run_genion(gmx_cmd, tpr_file, output_gro, neutral=True, conc=0.15, cwd=None)
     
     # Use subprocess with input
     print(f"Running: {' '.join(cmd)} (input: SOL)")
-    result = subprocess.run(cmd, input="SOL\n", text=True, cwd=cwd, check=True)
+    result = measured_run(cmd, input="SOL\n", text=True, cwd=cwd, check=True)
     return result
 
 
-def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
-    """Run GROMACS pipeline with checkpoint support."""
+def find_acpype_command():
+    """ACPYPE command prefix (binary or ``python3 -m acpype``), or None if it is not installed."""
+    acpype_exe = shutil.which("acpype")
+    if not acpype_exe and Path("/usr/local/bin/acpype").exists():
+        acpype_exe = "/usr/local/bin/acpype"
+    
+    # Check miniconda path (user specific)
+    if not acpype_exe:
+        home_acpype = Path.home() / "miniconda3/bin/acpype"
+        if home_acpype.exists():
+            acpype_exe = str(home_acpype)
+    
+    if acpype_exe:
+        return [acpype_exe]
+    # Fallback: try python -m acpype
+    try:
+        # Verify module exists first
+        subprocess.run(["python3", "-m", "acpype", "--help"], 
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        print("ACPYPE found as python module")
+        return ["python3", "-m", "acpype"]
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def parameterize_ligand(ligand_mol2, work_dir, charge_method="bcc", atom_type="gaff2", net_charge=0,
+                        cache=None):
+    """Put ``<ligand>.acpype`` into ``work_dir``, from the parameter cache or by running ACPYPE.
+
+    Returns True when ligand parameters are available.
+    """
+    ligand_mol2 = Path(ligand_mol2).resolve()
+    work_dir = Path(work_dir)
+    cache = cache or ParameterCache()
+
+    def build():
+        acpype = find_acpype_command()
+        if acpype is None:
+            raise FileNotFoundError("ACPYPE not found in PATH or as python module")
+        print(f"Parameterizing ligand with ACPYPE ({charge_method}/{atom_type}, net charge {net_charge})...")
+        run_command(acpype + ["-i", str(ligand_mol2), "-c", charge_method, "-n", str(net_charge),
+                              "-a", atom_type, "-o", "gmx", "-f"], cwd=work_dir)
+        return work_dir / f"{ligand_mol2.stem}.acpype"
+
+    try:
+        output_dir, hit = cache.get_or_create(ligand_mol2, work_dir, build, charge_method, atom_type, net_charge)
+    except FileNotFoundError as exc:
+        print(f"{exc}. Proceeding with protein only.")
+        return False
+    except subprocess.CalledProcessError:
+        print("ACPYPE failed, proceeding with protein only")
+        return False
+    if hit:
+        print(f"Ligand parameters restored from cache into {output_dir}")
+    return True
+
+
+def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None,
+                         manifest_path=DEFAULT_MANIFEST_PATH, ntomp=None,
+                         charge_method="bcc", atom_type="gaff2", net_charge=0):
+    """Run GROMACS pipeline with checkpoint support.
+
+    Per-stage wall/CPU/memory metrics are stored in the manifest at
+    ``manifest_path`` (None skips that) and printed at the end.  ``ntomp``
+    is passed to every mdrun as ``-ntomp``.  Ligand parameters
+    (``charge_method``, ``atom_type``, ``net_charge``) are cached by the
+    mol2 hash, see ``utils/param_cache.py``.
+    """
     work_dir = Path(work_dir)
     work_dir.mkdir(parents=True, exist_ok=True)
     
@@ -83,6 +155,7 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
     for i, stage in enumerate(stages[start_idx:], start=start_idx):
         print(f"\n=== Running stage: {stage} ===")
         
+        stage_metrics = METRICS.begin_stage(stage, outputs=[work_dir])
         try:
             if stage == "extract_protein":
                 # Extract protein from complex
@@ -99,48 +172,10 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 # Check if ligand exists and parameterize
                 has_ligand = False
                 if ligand_mol2 and Path(ligand_mol2).exists():
-                    # Check for ACPYPE
-                    # Check for ACPYPE
-                    acpype_exe = shutil.which("acpype")
-                    if not acpype_exe and Path("/usr/local/bin/acpype").exists():
-                        acpype_exe = "/usr/local/bin/acpype"
-                    
-                    # Check miniconda path (user specific)
-                    if not acpype_exe:
-                         home_acpype = Path.home() / "miniconda3/bin/acpype"
-                         if home_acpype.exists():
-                             acpype_exe = str(home_acpype)
-                        
-                    use_python_module = False
-                    
-                    if acpype_exe:
-                        acpype_cmd = [acpype_exe, "-i", str(ligand_mol2), "-n", "0", "-a", "gaff2", "-o", "gmx", "-f"]
-                    else:
-                        # Fallback: try python -m acpype
-                        try:
-                            # Verify module exists first
-                            subprocess.run(["python3", "-m", "acpype", "--help"], 
-                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-                            print("ACPYPE found as python module")
-                            acpype_cmd = ["python3", "-m", "acpype", "-i", str(ligand_mol2), "-n", "0", "-a", "gaff2", "-o", "gmx", "-f"]
-                            use_python_module = True
-                        except (subprocess.CalledProcessError, FileNotFoundError):
-                            acpype_cmd = None
-                    
-                    if acpype_cmd:
-                        print(f"Parameterizing ligand with ACPYPE (via {'module' if use_python_module else 'binary'})...")
-                        try:
-                            run_command(acpype_cmd, cwd=work_dir)
-                            has_ligand = True
-                        except subprocess.CalledProcessError:
-                            print("ACPYPE failed, proceeding with protein only")
-                            has_ligand = False
-                    else:    
-                        print("ACPYPE not found in PATH or as python module. Proceeding with protein only.")
-                        has_ligand = False
+                    has_ligand = parameterize_ligand(Path(ligand_mol2), work_dir, charge_method,
+                                                     atom_type, net_charge)
                 else:
                     print("No ligand file provided, proceeding with protein only")
-                    has_ligand = False
                 
                 state.update("has_ligand", has_ligand)
                 state.update("current_stage", "generate_topology")
@@ -160,18 +195,12 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 has_ligand = state.get("has_ligand", False)
                 if has_ligand:
                     # Find ACPYPE output
-                    acpype_dirs = list(work_dir.glob("*.acpype"))
+                    acpype_dirs = sorted(work_dir.glob("*.acpype"))
                     if acpype_dirs:
-                        acpype_dir = acpype_dirs[0]
-                        # Copy ligand files
-                        for itp_file in acpype_dir.glob("*.itp"):
-                            itp_file.rename(work_dir / "ligand.itp")
-                        for gro_file in acpype_dir.glob("*.gro"):
-                            gro_file.rename(work_dir / "ligand.gro")
-                        
-                        # Combine protein and ligand
-                        # (Implementation would go here)
-                        print("Combined protein and ligand")
+                        # Every docked pose in input_pdb becomes one ligand residue,
+                        # mapped onto the ACPYPE atom order (see utils/complex_assembly.py)
+                        copies = assemble_complex(Path(input_pdb).resolve(), acpype_dirs[0], work_dir)
+                        print(f"Combined protein and {copies} ligand copies")
                     else:
                         print("ACPYPE output not found, using protein only")
                 
@@ -209,7 +238,7 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 mdp_dir = Path(__file__).parent.parent / "mdp"
                 run_grompp(gmx_cmd, str(mdp_dir / "em.mdp"), 
                           "ionized.gro", "topol.top", "em.tpr", cwd=work_dir)
-                run_gmx_mdrun_safe("em", gmx_cmd)
+                run_gmx_mdrun_safe("em", gmx_cmd, cwd=work_dir, ntomp=ntomp)
                 state.update("current_stage", "nvt_eq")
                 
             elif stage == "nvt_eq":
@@ -217,7 +246,7 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 mdp_dir = Path(__file__).parent.parent / "mdp"
                 run_grompp(gmx_cmd, str(mdp_dir / "nvt.mdp"), 
                           "em.gro", "topol.top", "nvt.tpr", cwd=work_dir)
-                run_gmx_mdrun_safe("nvt", gmx_cmd)
+                run_gmx_mdrun_safe("nvt", gmx_cmd, cwd=work_dir, ntomp=ntomp)
                 state.update("current_stage", "npt_eq")
                 
             elif stage == "npt_eq":
@@ -225,7 +254,7 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 mdp_dir = Path(__file__).parent.parent / "mdp"
                 run_grompp(gmx_cmd, str(mdp_dir / "npt.mdp"), 
                           "nvt.gro", "topol.top", "npt.tpr", cwd=work_dir)
-                run_gmx_mdrun_safe("npt", gmx_cmd)
+                run_gmx_mdrun_safe("npt", gmx_cmd, cwd=work_dir, ntomp=ntomp)
                 state.update("current_stage", "production_md")
                 
             elif stage == "production_md":
@@ -233,25 +262,41 @@ def run_gromacs_pipeline(input_pdb, work_dir, gmx_cmd="gmx", ligand_mol2=None):
                 mdp_dir = Path(__file__).parent.parent / "mdp"
                 run_grompp(gmx_cmd, str(mdp_dir / "md.mdp"), 
                           "npt.gro", "topol.top", "md.tpr", cwd=work_dir)
-                run_gmx_mdrun_safe("md", gmx_cmd)
+                run_gmx_mdrun_safe("md", gmx_cmd, cwd=work_dir, ntomp=ntomp)
                 state.update("current_stage", "completed")
                 
         except subprocess.CalledProcessError as e:
             print(f"Error in stage {stage}: {e}")
             state.update("current_stage", stage)  # Save current stage for retry
+            METRICS.end_stage(stage_metrics, failed=True)
+            report_metrics(manifest_path)
             raise
+        METRICS.end_stage(stage_metrics)
     
+    report_metrics(manifest_path)
     print("\n=== GROMACS pipeline completed successfully! ===")
     return work_dir
 
 
+def report_metrics(manifest_path):
+    """Store the collected stage metrics in the manifest and print the summary table."""
+    if manifest_path and METRICS.records:
+        manifest = ManifestWriter(Path(manifest_path))
+        manifest.add_record(metrics_record_name("gromacs_pipeline"), METRICS.records)
+        manifest.flush()
+    METRICS.print_summary()
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python gromacs_pipeline.py <input_pdb> <work_dir> [ligand_mol2]")
-        sys.exit(1)
-    
-    input_pdb = sys.argv[1]
-    work_dir = sys.argv[2]
-    ligand_mol2 = sys.argv[3] if len(sys.argv) > 3 else None
+    parser = argparse.ArgumentParser(description="GROMACS pipeline with checkpoint support")
+    parser.add_argument("input_pdb")
+    parser.add_argument("work_dir")
+    parser.add_argument("ligand_mol2", nargs="?")
+    parser.add_argument("--charge-method", default="bcc", help="ACPYPE charge method (bcc, gas, user)")
+    parser.add_argument("--atom-type", default="gaff2", choices=["gaff", "gaff2", "amber", "amber2"])
+    parser.add_argument("--net-charge", type=int, default=0)
+    args = parser.parse_args()
     
-    run_gromacs_pipeline(input_pdb, work_dir, ligand_mol2=ligand_mol2)
\ No newline at end of file
+    run_gromacs_pipeline(args.input_pdb, args.work_dir, ligand_mol2=args.ligand_mol2,
+                         charge_method=args.charge_method, atom_type=args.atom_type,
+                         net_charge=args.net_charge)
\ No newline at end of file
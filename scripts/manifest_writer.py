@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""In-process writer for ``manifest/run-manifest.yml``.
+
+The pipeline drivers used to launch ``update_manifest.py`` once per stage,
+which re-imported PyYAML and re-read and re-dumped the whole manifest every
+time.  ``ManifestWriter`` keeps the manifest in memory, queues updates and
+writes them in one atomic replace at stage boundaries::
+
+    manifest = ManifestWriter(manifest_path)
+    with manifest.stage():
+        manifest.record(commands=[cmd], seeds=["20231129"])
+
+Commands, seeds and note lines that are already present are not appended
+again, so reruns no longer grow the manifest.  Large structured records can
+be stored in a zlib-compressed binary sidecar (``<manifest>.records.bin``);
+the manifest then only holds a reference to them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import update_manifest as manifest_io
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from file_lock import FileLock
+
+SIDECAR_MAGIC = b"WNSR"
+# magic, name length, payload length, crc32 of the compressed payload
+SIDECAR_HEADER = struct.Struct("<4sIII")
+DEFAULT_SIDECAR_THRESHOLD = 16 * 1024
+
+
+def dedupe_manifest(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop repeated commands, seeds and note lines, keeping the first occurrence."""
+    for section in ("commands", "random_seeds"):
+        values = manifest.get(section)
+        if values:
+            manifest[section] = []
+            manifest_io.append_list(manifest, section, values)
+    if isinstance(manifest.get("notes"), str):
+        manifest["notes"] = "\n".join(dict.fromkeys(manifest["notes"].splitlines()))
+    return manifest
+
+
+class ManifestWriter:
+    def __init__(self, path: Path, sidecar_threshold: int = DEFAULT_SIDECAR_THRESHOLD) -> None:
+        """
+        Args:
+            path: Manifest YAML file.
+            sidecar_threshold: JSON size in bytes above which ``add_record``
+                stores the record in the binary sidecar instead of the YAML.
+        """
+        self.path = Path(path)
+        self.sidecar_path = self.path.with_name(self.path.name + ".records.bin")
+        self.sidecar_threshold = sidecar_threshold
+        self._lock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._pending: List[Callable[[Dict[str, Any]], None]] = []
+        self._loaded_stat = None
+        self.manifest = self._load()
+
+    # ------------------------------------------------------------------
+    # Loading / flushing
+    # ------------------------------------------------------------------
+    def _stat(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> Dict[str, Any]:
+        self._loaded_stat = self._stat()
+        return dedupe_manifest(manifest_io.load_manifest(str(self.path)) or {})
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def _queue(self, operation: Callable[[Dict[str, Any]], None]) -> None:
+        operation(self.manifest)
+        self._pending.append(operation)
+
+    def flush(self) -> bool:
+        """Write queued updates atomically. Returns True if the file was written."""
+        if not self._pending:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._stat() != self._loaded_stat:
+                # Someone else wrote the manifest since we loaded it; re-apply on top.
+                self.manifest = self._load()
+                for operation in self._pending:
+                    operation(self.manifest)
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp-{os.getpid()}")
+            with tmp_path.open("w", encoding="utf-8") as handle:
+                manifest_io.yaml.safe_dump(self.manifest, handle, sort_keys=False, allow_unicode=False)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.path)
+            self._loaded_stat = self._stat()
+        self._pending.clear()
+        return True
+
+    @contextmanager
+    def stage(self) -> Iterator["ManifestWriter"]:
+        """Batch the updates of one pipeline stage and flush them when it ends."""
+        try:
+            yield self
+        finally:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def add_commands(self, commands: Iterable[str]) -> None:
+        commands = [str(command) for command in commands]
+        self._queue(lambda manifest: manifest_io.append_list(manifest, "commands", commands))
+
+    def add_seeds(self, seeds: Iterable[Any]) -> None:
+        seeds = [str(seed) for seed in seeds]
+        self._queue(lambda manifest: manifest_io.append_list(manifest, "random_seeds", seeds))
+
+    def set_entries(self, section: str, entries: Dict[str, Any]) -> None:
+        """Set key/value pairs of a flat section such as ``inputs`` or ``outputs``."""
+        entries = {key: str(value) for key, value in entries.items()}
+
+        def apply(manifest: Dict[str, Any]) -> None:
+            if manifest.get(section) is None:
+                manifest[section] = {}
+            manifest[section].update(entries)
+
+        self._queue(apply)
+
+    def set_software(self, versions: Dict[str, str]) -> None:
+        self._queue(lambda manifest: manifest_io.update_software(
+            manifest, [f"{name}={version}" for name, version in versions.items()]))
+
+    def set_parameters(self, parameters: Dict[str, Any]) -> None:
+        """``parameters`` maps ``section.key`` to a value."""
+        self._queue(lambda manifest: manifest_io.update_nested_parameter(
+            manifest, [f"{key}={value}" for key, value in parameters.items()]))
+
+    def append_note(self, note: str) -> None:
+        def apply(manifest: Dict[str, Any]) -> None:
+            lines = (manifest.get("notes") or "").splitlines()
+            if note not in lines:
+                lines.append(note)
+            manifest["notes"] = "\n".join(lines)
+
+        self._queue(apply)
+
+    def record(
+        self,
+        commands: Iterable[str] | None = None,
+        seeds: Iterable[Any] | None = None,
+        inputs: Dict[str, str] | None = None,
+        outputs: Dict[str, str] | None = None,
+        notes: str | None = None,
+    ) -> None:
+        """Queue the usual per-stage metadata in one call."""
+        if commands:
+            self.add_commands(commands)
+        if seeds:
+            self.add_seeds(seeds)
+        if inputs:
+            self.set_entries("inputs", inputs)
+        if outputs:
+            self.set_entries("outputs", outputs)
+        if notes is not None:
+            self.append_note(notes)
+
+    # ------------------------------------------------------------------
+    # Large records
+    # ------------------------------------------------------------------
+    def add_record(self, name: str, payload: Any) -> None:
+        """Store a JSON-serialisable record under ``records.<name>``.
+
+        Records larger than ``sidecar_threshold`` are appended to the binary
+        sidecar and only referenced (offset, length, SHA-256) from the YAML.
+        """
+        encoded = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        if len(encoded) <= self.sidecar_threshold:
+            entry: Any = payload
+        else:
+            blob = zlib.compress(encoded, 6)
+            name_bytes = name.encode("utf-8")
+            header = SIDECAR_HEADER.pack(SIDECAR_MAGIC, len(name_bytes), len(blob), zlib.crc32(blob))
+            with self._lock:
+                with self.sidecar_path.open("ab") as handle:
+                    offset = handle.tell()
+                    handle.write(header + name_bytes + blob)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            entry = {
+                "sidecar": self.sidecar_path.name,
+                "offset": offset,
+                "length": SIDECAR_HEADER.size + len(name_bytes) + len(blob),
+                "raw_bytes": len(encoded),
+                "sha256": hashlib.sha256(encoded).hexdigest(),
+            }
+
+        def apply(manifest: Dict[str, Any]) -> None:
+            if manifest.get("records") is None:
+                manifest["records"] = {}
+            manifest["records"][name] = entry
+
+        self._queue(apply)
+
+    def read_record(self, name: str) -> Optional[Any]:
+        """Return a record stored by ``add_record`` (inline or from the sidecar)."""
+        entry = (self.manifest.get("records") or {}).get(name)
+        if not (isinstance(entry, dict) and "sidecar" in entry and "offset" in entry):
+            return entry
+        with (self.path.parent / entry["sidecar"]).open("rb") as handle:
+            handle.seek(entry["offset"])
+            magic, name_len, blob_len, crc = SIDECAR_HEADER.unpack(handle.read(SIDECAR_HEADER.size))
+            stored_name = handle.read(name_len).decode("utf-8")
+            blob = handle.read(blob_len)
+        if magic != SIDECAR_MAGIC or stored_name != name or zlib.crc32(blob) != crc:
+            raise ValueError(f"Sidecar record '{name}' in {entry['sidecar']} is corrupted")
+        encoded = zlib.decompress(blob)
+        if hashlib.sha256(encoded).hexdigest() != entry["sha256"]:
+            raise ValueError(f"Sidecar record '{name}' does not match its manifest checksum")
+        return json.loads(encoded)
@@ -5,8 +5,13 @@ from __future__ import annotations
 
 import argparse
 import math
+import sys
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from profiling import profiled
 
 
 class AtomRecord:
@@ -64,8 +69,8 @@ class AtomRecord:
             self.line = self.line.ljust(80)
         
         # Columns 71-76 are Python indices 70-75
-        # Format: +0.0000 or -0.0000 (6 characters with sign)
-        charge_str = f"{charge:+6.4f}"
+        # Format: +0.000 or -0.000 (6 characters with sign)
+        charge_str = f"{charge:+6.3f}"
         self.line = self.line[:70] + charge_str + self.line[76:]
 
 
@@ -79,28 +84,63 @@ def calculate_distance(coord1: Tuple[float, float, float],
     )
 
 
+@profiled
+def find_coords_to_mask(receptor_coords: Sequence[Sequence[float]],
+                        ligand_coords: Iterable[Sequence[float]],
+                        cutoff: float = 3.5,
+                        receptor_valid: Sequence[bool] | None = None) -> List[int]:
+    """Return indices of receptor coordinates within cutoff of any ligand coordinate.
+
+    Ligand atoms are hashed into cubic cells of edge ``cutoff`` so each receptor
+    atom is only compared against the ligand atoms of its 27 neighbouring cells.
+    A non-positive cutoff masks nothing.
+    """
+    if cutoff <= 0:
+        return []
+    cells: Dict[Tuple[int, int, int], List[Tuple[float, float, float]]] = {}
+    for x, y, z in ligand_coords:
+        key = (math.floor(x / cutoff), math.floor(y / cutoff), math.floor(z / cutoff))
+        cells.setdefault(key, []).append((float(x), float(y), float(z)))
+    if not cells:
+        return []
+
+    cutoff_sq = cutoff * cutoff
+    hits = []
+    for rec_idx, (x, y, z) in enumerate(receptor_coords):
+        if receptor_valid is not None and not receptor_valid[rec_idx]:
+            continue
+        cx, cy, cz = math.floor(x / cutoff), math.floor(y / cutoff), math.floor(z / cutoff)
+        found = False
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for lx, ly, lz in cells.get((cx + dx, cy + dy, cz + dz), ()):
+                        if (x - lx)**2 + (y - ly)**2 + (z - lz)**2 < cutoff_sq:
+                            found = True
+                            break
+                    if found:
+                        break
+                if found:
+                    break
+        if found:
+            hits.append(rec_idx)
+    return hits
+
+
 def find_atoms_to_mask(receptor_atoms: List[AtomRecord], 
                       ligand_atoms: List[AtomRecord], 
                       cutoff: float = 3.5) -> List[int]:
     """Find receptor atoms within cutoff distance of any ligand atom."""
-    atoms_to_mask = []
-    
-    for rec_idx, rec_atom in enumerate(receptor_atoms):
-        if not rec_atom.is_atom:
-            continue
-            
-        for lig_atom in ligand_atoms:
-            if not lig_atom.is_atom:
-                continue
-                
-            distance = calculate_distance(rec_atom.coord, lig_atom.coord)
-            if distance < cutoff:
-                atoms_to_mask.append(rec_idx)
-                break  # No need to check other ligand atoms for this receptor atom
-    
-    return atoms_to_mask
+    atom_indices = [idx for idx, atom in enumerate(receptor_atoms) if atom.is_atom]
+    hits = find_coords_to_mask(
+        [receptor_atoms[idx].coord for idx in atom_indices],
+        [atom.coord for atom in ligand_atoms if atom.is_atom],
+        cutoff,
+    )
+    return [atom_indices[hit] for hit in hits]
 
 
+@profiled
 def mask_receptor(receptor_file: Path, 
                   ligand_files: List[Path], 
                   output_file: Path, 
@@ -113,33 +153,33 @@ def mask_receptor(receptor_file: Path,
         output_file: Path for output masked receptor PDBQT file
         cutoff: Distance cutoff in Angstroms for masking
     """
-    # Load receptor atoms
-    receptor_atoms = []
-    for line in receptor_file.read_text(encoding="utf-8").splitlines():
-        receptor_atoms.append(AtomRecord(line))
-    
-    # Load all ligand atoms
-    all_ligand_atoms = []
+    # Parsed receptor/ligand records come from the content-hash cache
+    receptor = load_structure(receptor_file)
+    ligand_coords = []
     for ligand_file in ligand_files:
-        for line in ligand_file.read_text(encoding="utf-8").splitlines():
-            all_ligand_atoms.append(AtomRecord(line))
+        ligand_coords.extend(load_structure(ligand_file).valid_coords())
     
     # Find atoms to mask
-    atoms_to_mask = find_atoms_to_mask(receptor_atoms, all_ligand_atoms, cutoff)
+    atoms_to_mask = find_coords_to_mask(receptor.coords, ligand_coords, cutoff, receptor.valid)
+    
+    # Patch masked records in place; all other lines are written unchanged
+    lines = receptor_file.read_text(encoding="utf-8").splitlines()
+    for atom_idx in atoms_to_mask:
+        line_idx = int(receptor.line_index[atom_idx])
+        # Mask this atom: set atom type to 'X' and charge to 0.000
+        atom = AtomRecord(lines[line_idx])
+        atom.set_atom_type('X')
+        atom.set_charge(0.000)
+        lines[line_idx] = atom.line
     
-    # Write masked receptor
     with output_file.open('w', encoding="utf-8") as f:
-        for idx, atom in enumerate(receptor_atoms):
-            if idx in atoms_to_mask and atom.is_atom:
-                # Mask this atom: set atom type to 'X' and charge to 0.000
-                atom.set_atom_type('X')
-                atom.set_charge(0.000)
-            f.write(atom.line + '\n')
+        for line in lines:
+            f.write(line + '\n')
     
     print(f"Masked {len(atoms_to_mask)} receptor atoms in {output_file}")
 
 
-def main() -> None:
+def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("receptor", type=Path, help="Receptor PDBQT file")
     parser.add_argument("ligands", nargs="+", type=Path, help="Ligand PDBQT files")
@@ -148,7 +188,7 @@ def main() -> None:
     parser.add_argument("-c", "--cutoff", type=float, default=3.5,
                        help="Distance cutoff in Angstroms (default: 3.5)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate input files
     if not args.receptor.exists():
@@ -1,12 +1,39 @@
 #!/usr/bin/env python3
-"""Create a reproducibility archive with manifests, scripts, and outputs."""
+"""Create a reproducibility archive with manifests, scripts, and outputs.
+
+Files are streamed straight into a content-addressed zip instead of being
+copied into a staging directory first:
+
+* every file is hashed (SHA-256) and each distinct content is stored once
+  as ``objects/<sha[:2]>/<sha>.gz``, so receptors and maps repeated across
+  cycles cost nothing extra;
+* objects are gzip-compressed in parallel worker threads and then written
+  to the zip uncompressed;
+* ``index.json`` maps every archived path to its object;
+* ``--base previous.zip`` makes an incremental archive.  Files whose size and
+  mtime match the previous index are not re-read.  Objects already stored in
+  the base archive are referenced, not stored again.  ``--restore`` follows
+  the chain of base archives.  When the new archive replaces its own base
+  (the default ``--output`` used as ``--base``), the objects it still needs
+  from the old file are copied across instead of referenced.
+"""
 
 from __future__ import annotations
 
 import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
 import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Iterable
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 DEFAULT_INCLUDE = [
@@ -18,34 +45,219 @@ DEFAULT_INCLUDE = [
     "md",
 ]
 
+EXCLUDE_NAMES = {"__pycache__", "_repro_pack", ".cache"}
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+CHUNK_SIZE = 1 << 20
+# Compressed objects up to this size stay in memory before the zip write
+SPOOL_LIMIT = 16 << 20
+# Zip entries whose size may exceed 4 GiB need ZIP64 headers up front
+ZIP64_LIMIT = (1 << 31)
 
-def collect_files(root: Path, include: Iterable[str], output: Path) -> None:
-    if output.exists():
-        output.unlink()
-    temp_dir = root / "_repro_pack"
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-    temp_dir.mkdir()
+
+def object_name(digest: str) -> str:
+    return f"objects/{digest[:2]}/{digest}.gz"
+
+
+def iter_files(root: Path, include: Iterable[str]) -> Iterator[Tuple[str, Path]]:
+    """Yield ``(archive_path, file)`` for every file under the included entries."""
+    for item in include:
+        source = root / item
+        if source.is_file():
+            yield source.relative_to(root).as_posix(), source
+        elif source.is_dir():
+            for dirpath, dirnames, filenames in os.walk(source):
+                dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDE_NAMES)
+                for filename in sorted(filenames):
+                    path = Path(dirpath) / filename
+                    yield path.relative_to(root).as_posix(), path
+
+
+def hash_file(path: Path) -> str:
+    sha = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def compress_file(path: Path, level: int) -> tempfile.SpooledTemporaryFile:
+    """Gzip one file into a spooled temporary file (zlib releases the GIL)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_LIMIT)
+    with path.open("rb") as source, gzip.GzipFile(fileobj=spool, mode="wb",
+                                                  compresslevel=level, mtime=0) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    spool.seek(0)
+    return spool
+
+
+def read_index(archive: Path) -> Dict:
+    with zipfile.ZipFile(archive) as zf:
+        return json.loads(zf.read(INDEX_NAME))
+
+
+def build_archive(
+    root: Path,
+    include: Iterable[str],
+    output: Path,
+    base: Optional[Path] = None,
+    workers: Optional[int] = None,
+    level: int = 6,
+) -> Dict:
+    """Write the archive and return its index.
+
+    Args:
+        root: Project root; archived paths are relative to it.
+        include: Files or directories (relative to ``root``) to archive.
+        output: Archive path (``.zip`` is appended if missing).
+        base: Previous archive for an incremental pack.
+        workers: Compression threads (defaults to the CPU count).
+        level: gzip compression level.
+    """
+    output = output if output.suffix == ".zip" else output.with_name(output.name + ".zip")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    base_files: Dict[str, Dict] = {}
+    known_objects: Dict[str, str] = {}
+    base_name = None
+    # Set when ``output`` replaces an archive the base chain still references
+    replaces_holder = False
+    if base is not None:
+        base_index = read_index(base)
+        base_files = base_index["files"]
+        base_name = base.name
+        # Objects reachable through the base chain, mapped to the archive holding them
+        for digest, location in base_index["objects"].items():
+            known_objects[digest] = location if location != "." else base.name
+        replaces_holder = output.exists() and (base.parent / output.name).resolve() == output.resolve()
+        if base.resolve() == output.resolve():
+            base_name = base_index["base"]
+
+    files: Dict[str, Dict] = {}
+    objects: Dict[str, str] = {}
+    claimed = set(known_objects)
+    claim_lock = threading.Lock()
+    stats = {"files": 0, "bytes": 0, "stored_objects": 0, "stored_bytes": 0, "reused": 0}
+
+    def process(rel_path: str, path: Path):
+        stat = path.stat()
+        previous = base_files.get(rel_path)
+        if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            digest = previous["sha256"]
+        else:
+            digest = hash_file(path)
+        entry = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        with claim_lock:
+            is_new = digest not in claimed
+            claimed.add(digest)
+        return rel_path, entry, compress_file(path, level) if is_new else None
+
+    tmp_output = output.with_name(f".{output.name}.tmp-{os.getpid()}")
+    with zipfile.ZipFile(tmp_output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf, \
+            (zipfile.ZipFile(output) if replaces_holder else nullcontext()) as overwritten, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: List = []
+
+        def drain(limit: int) -> None:
+            # Write finished objects in submission order, keeping at most
+            # ``limit`` compressed objects waiting in spool files.
+            while len(pending) > limit:
+                rel_path, entry, spool = pending.pop(0).result()
+                files[rel_path] = entry
+                stats["files"] += 1
+                stats["bytes"] += entry["size"]
+                digest = entry["sha256"]
+                if spool is None:
+                    stats["reused"] += 1
+                    if digest in known_objects and digest not in objects:
+                        objects[digest] = known_objects[digest]
+                    if overwritten is not None and objects.get(digest) == output.name:
+                        # The holder is about to be replaced: copy the stored object over
+                        size = overwritten.getinfo(object_name(digest)).file_size
+                        with overwritten.open(object_name(digest)) as source, \
+                                zf.open(object_name(digest), "w", force_zip64=size >= ZIP64_LIMIT) as target:
+                            shutil.copyfileobj(source, target, CHUNK_SIZE)
+                        objects[digest] = "."
+                    continue
+                with spool:
+                    size = spool.seek(0, os.SEEK_END)
+                    spool.seek(0)
+                    with zf.open(object_name(digest), "w", force_zip64=size >= ZIP64_LIMIT) as target:
+                        shutil.copyfileobj(spool, target, CHUNK_SIZE)
+                objects[digest] = "."
+                stats["stored_objects"] += 1
+                stats["stored_bytes"] += size
+
+        for rel_path, path in iter_files(root, include):
+            pending.append(pool.submit(process, rel_path, path))
+            drain(workers * 2)
+        drain(0)
+
+        index = {
+            "version": INDEX_VERSION,
+            "created": datetime.datetime.now().isoformat(),
+            "base": base_name,
+            "files": files,
+            # "." = stored in this archive, otherwise the archive file name holding it
+            "objects": objects,
+            "stats": stats,
+        }
+        zf.writestr(INDEX_NAME, json.dumps(index, indent=2))
+    os.replace(tmp_output, output)
+    return index
+
+
+def restore_archive(archive: Path, destination: Path) -> int:
+    """Extract every file of an archive (and its base chain) into ``destination``."""
+    index = read_index(archive)
+    handles: Dict[str, zipfile.ZipFile] = {}
     try:
-        for item in include:
-            source = root / item
-            if source.exists():
-                if source.is_dir():
-                    shutil.copytree(source, temp_dir / source.name)
-                else:
-                    shutil.copy2(source, temp_dir / source.name)
-        shutil.make_archive(str(output), "zip", root_dir=str(temp_dir))
+        for rel_path, entry in index["files"].items():
+            location = index["objects"][entry["sha256"]]
+            holder = archive.name if location == "." else location
+            if holder not in handles:
+                handles[holder] = zipfile.ZipFile(archive.parent / holder)
+            target = destination / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with handles[holder].open(object_name(entry["sha256"])) as raw, \
+                    gzip.GzipFile(fileobj=raw) as source, target.open("wb") as sink:
+                shutil.copyfileobj(source, sink, CHUNK_SIZE)
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
     finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        for handle in handles.values():
+            handle.close()
+    return len(index["files"])
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description=__doc__)
+def collect_files(root: Path, include: Iterable[str], output: Path) -> None:
+    """Backwards-compatible entry point: full (non-incremental) archive."""
+    build_archive(root, include, output)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--root", type=Path, default=Path(".."), help="Project root directory")
     parser.add_argument("--output", type=Path, default=Path("../manifest/repro_pack"), help="Archive output base path")
-    args = parser.parse_args()
+    parser.add_argument("--base", type=Path, help="Previous archive; only add files changed since it")
+    parser.add_argument("--workers", type=int, help="Compression threads (default: CPU count)")
+    parser.add_argument("--level", type=int, default=6, help="gzip compression level (1-9)")
+    parser.add_argument("--restore", type=Path, help="Restore this archive instead of packing")
+    parser.add_argument("--dest", type=Path, default=Path("restored"), help="Destination for --restore")
+    args = parser.parse_args(argv)
+
+    if args.restore:
+        count = restore_archive(args.restore.resolve(), args.dest.resolve())
+        print(f"Restored {count} files into {args.dest}")
+        return
 
-    collect_files(args.root.resolve(), DEFAULT_INCLUDE, args.output.resolve())
+    base = args.base.resolve() if args.base else None
+    index = build_archive(args.root.resolve(), DEFAULT_INCLUDE, args.output.resolve(),
+                          base=base, workers=args.workers, level=args.level)
+    stats = index["stats"]
+    print(f"Archived {stats['files']} files ({stats['bytes'] / 1e6:.1f} MB): "
+          f"{stats['stored_objects']} objects stored ({stats['stored_bytes'] / 1e6:.1f} MB), "
+          f"{stats['reused']} deduplicated or unchanged")
 
 
 if __name__ == "__main__":
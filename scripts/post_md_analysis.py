@@ -6,12 +6,14 @@ from __future__ import annotations
 import argparse
 import json
 from pathlib import Path
+from typing import List
 
 try:
     import MDAnalysis as mda  # type: ignore
     from MDAnalysis.analysis import contacts, density, rms
-except ImportError as exc:  # pragma: no cover
-    raise SystemExit("Install MDAnalysis to run post_md_analysis.py") from exc
+except ImportError:  # pragma: no cover
+    # Checked in main(), so --help and argument errors work without it
+    mda = None
 
 
 def occupancy(universe: mda.Universe, selection: str, output: Path) -> None:
@@ -38,7 +40,7 @@ def compute_rmsd(universe: mda.Universe, selection: str, reference: str, output:
     output.write_text(json.dumps(analysis.rmsd.tolist(), indent=2), encoding="utf-8")
 
 
-def main() -> None:
+def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("topology", type=Path)
     parser.add_argument("trajectory", type=Path)
@@ -46,7 +48,9 @@ def main() -> None:
     parser.add_argument("--contacts", nargs=3, metavar=("SEL1", "SEL2", "RADIUS"))
     parser.add_argument("--rmsd", nargs=2, metavar=("SELECTION", "REFERENCE"))
     parser.add_argument("--outdir", type=Path, default=Path("../analysis"))
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if mda is None:
+        raise SystemExit("Install MDAnalysis to run post_md_analysis.py")
 
     universe = mda.Universe(str(args.topology), str(args.trajectory))
     args.outdir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Rescore ligand poses with the AutoDock4 function against existing AutoGrid maps.
+
+Every MODEL of every PDBQT is scored; poses of the same ligand (same atoms,
+charges and torsion tree) are evaluated together in one batch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from ad4_score import AD4Scorer, intramolecular_pairs, read_ligand_poses
+from grid_maps import load_maps
+
+DEFAULT_PARAMETERS = Path(__file__).resolve().parent / "AD4_parameters.dat"
+
+
+def rescore_files(fld: Path, paths: List[Path], parameter_file: Path | None = None) -> List[Dict]:
+    """One record per pose with its file, model number and energies, best binding energy first."""
+    maps = load_maps(fld)
+    groups: Dict[Tuple, Tuple[AD4Scorer, List[Tuple[Path, int]], List]] = {}
+    for path in paths:
+        ligand = read_ligand_poses(path)
+        if not ligand.poses:
+            print(f"WARNING: no atoms in {path}, skipped")
+            continue
+        key = (tuple(ligand.names), tuple(ligand.types), tuple(ligand.charges), tuple(ligand.segments),
+               ligand.torsdof)
+        if key not in groups:
+            pairs = intramolecular_pairs(ligand.poses[0], ligand.names, ligand.types, ligand.segments)
+            scorer = AD4Scorer(maps, ligand.types, ligand.charges, pairs, ligand.torsdof, parameter_file)
+            groups[key] = (scorer, [], [])
+        _, labels, poses = groups[key]
+        labels.extend((path, model) for model in range(1, len(ligand.poses) + 1))
+        poses.extend(ligand.poses)
+
+    records = []
+    for scorer, labels, poses in groups.values():
+        energies = scorer.score(poses)
+        for index, (path, model) in enumerate(labels):
+            records.append({"file": str(path), "model": model,
+                            **{name: round(values[index], 4) for name, values in energies.items()}})
+    records.sort(key=lambda record: record["binding"])
+    return records
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fld", type=Path, help="AutoGrid field file (protein.maps.fld)")
+    parser.add_argument("poses", nargs="+", type=Path, help="Ligand PDBQT files (all MODELs are scored)")
+    parser.add_argument("-p", "--parameters", type=Path, default=DEFAULT_PARAMETERS,
+                        help="AutoDock parameter file with extra or changed atom types "
+                             "(default: scripts/AD4_parameters.dat)")
+    parser.add_argument("-n", "--top", type=int, default=20, help="Rows to print (default: 20)")
+    parser.add_argument("--json", type=Path, help="Write every pose's energies to this JSON file")
+    args = parser.parse_args(argv)
+
+    for path in [args.fld, *args.poses]:
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {path}")
+    parameters = args.parameters if args.parameters and args.parameters.exists() else None
+
+    start = time.perf_counter()
+    records = rescore_files(args.fld, args.poses, parameters)
+    elapsed = time.perf_counter() - start
+    print(f"{'binding':>9}  {'inter':>9}  {'intra':>9}  model  file")
+    for record in records[:args.top]:
+        print(f"{record['binding']:9.2f}  {record['inter']:9.2f}  {record['intra']:9.2f}  "
+              f"{record['model']:>5}  {record['file']}")
+    print(f"Scored {len(records)} poses in {elapsed:.2f} s")
+    if args.json:
+        args.json.write_text(json.dumps(records, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Ingest existing result files into the results store and query it."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from results_store import ResultsStore, parse_hbond_csv
+
+SUMMARY_SQL = """
+SELECT s.run_id,
+       COUNT(*) AS n_scores,
+       MAX(s.final_score) AS best_score,
+       MIN(s.binding_energy) AS best_energy,
+       (SELECT COUNT(*) FROM hbonds h WHERE h.run_id = s.run_id) AS n_hbonds,
+       (SELECT SUM(washed) FROM displacements d WHERE d.run_id = s.run_id) AS n_washed
+FROM scores s
+GROUP BY s.run_id
+ORDER BY best_score DESC
+"""
+
+
+def print_rows(rows) -> None:
+    if not rows:
+        print("(no rows)")
+        return
+    columns = rows[0].keys()
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if row[col] is None else str(row[col]) for col in columns))
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", type=Path, default=Path("results/wns_results.sqlite"),
+                        help="Results store (SQLite file)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    score = sub.add_parser("ingest-score", help="Append score_report.json style files")
+    score.add_argument("reports", nargs="+", type=Path)
+    score.add_argument("--run-id", required=True)
+    score.add_argument("--cycle", type=int)
+
+    hbonds = sub.add_parser("ingest-hbonds", help="Append analyze_hbonds CSV files")
+    hbonds.add_argument("csv_files", nargs="+", type=Path)
+    hbonds.add_argument("--run-id", required=True)
+    hbonds.add_argument("--cycle", type=int)
+    hbonds.add_argument("--seed", type=int)
+
+    query = sub.add_parser("query", help="Run an SQL query and print the rows")
+    query.add_argument("sql")
+
+    sub.add_parser("summary", help="Best score, H-bond and washing counts per run")
+    args = parser.parse_args(argv)
+
+    with ResultsStore(args.db) as store:
+        if args.command == "ingest-score":
+            store.add_run(args.run_id)
+            for report_path in args.reports:
+                report = json.loads(report_path.read_text(encoding="utf-8"))
+                seed = report.get("reproducibility", {}).get("seeds", {}).get("autodock_seed")
+                store.add_score_report(args.run_id, report, cycle=args.cycle, seed=seed,
+                                       ligand=report_path.stem, pose_file=str(report_path))
+            print(f"Appended {len(args.reports)} score reports to {args.db}")
+        elif args.command == "ingest-hbonds":
+            store.add_run(args.run_id)
+            total = 0
+            for csv_path in args.csv_files:
+                total += store.add_hbond_scores(args.run_id, parse_hbond_csv(csv_path),
+                                                cycle=args.cycle, seed=args.seed)
+            print(f"Appended {total} H-bond rows to {args.db}")
+        elif args.command == "query":
+            print_rows(store.query(args.sql))
+        elif args.command == "summary":
+            print_rows(store.query(SUMMARY_SQL))
+
+
+if __name__ == "__main__":
+    main()
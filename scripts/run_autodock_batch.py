@@ -4,6 +4,8 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
 import os
 import shutil
 import subprocess
@@ -17,8 +19,22 @@ try:
 except ImportError as exc:  # pragma: no cover
     raise SystemExit("PyYAML is required. Install it via 'pip install pyyaml'.") from exc
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from scheduler import scheduler_from_config
+from work_queue import WorkQueue
+from pose_dedup import DEFAULT_RMSD_CUTOFF, deduplicate_pose_files
+from grid_tiles import (DEFAULT_MARGIN, DEFAULT_OVERLAP, DEFAULT_PADDING, DEFAULT_SPACING, MAX_NPTS,
+                        atom_coords, crop_receptor, mark_tile_current, plan_tiles, tile_is_current, tile_key)
+from grid_maps import read_fld
+from map_archive import DEFAULT_MAX_ERROR, MapArchive
+from process_runner import run_process
+from structure_cache import file_digest
+from ga_budget import adaptive_from_config, best_docked_run, ga_mapping
+
 REPO_ROOT = Path(__file__).resolve().parents[1]
 CONFIG_PATH = REPO_ROOT / "scripts" / "config.yml"
+# Per-tile archive of every map set computed for the tile (autogrid.tiling.archive_maps)
+TILE_ARCHIVE = "map_archive"
 
 
 def to_wsl_path(path: Path) -> str:
@@ -79,13 +95,236 @@ def build_command(executable: str, args: List[str], use_wsl: bool = False) -> Li
     return [executable, *args]
 
 
-def run_command(cmd: List[str], dry_run: bool, cwd: Path | None = None) -> None:
+def run_command(cmd: List[str], dry_run: bool, cwd: Path | None = None, name: str | None = None,
+                log_dir: Path | None = None, tail: List[Path] = (), outputs: List[Path] | None = None) -> None:
+    """Run ``cmd`` on the process runner; its output goes to ``<log_dir or cwd>/logs/<name>.log``.
+
+    ``tail`` lists files the tool reports its progress in (the DLG for autodock4);
+    ``outputs`` the files it writes, for the run metrics (default: ``tail``).
+    """
     print(" ".join(cmd))
     if dry_run:
         return
-    result = subprocess.run(cmd, check=False, cwd=cwd)
-    if result.returncode != 0:
-        raise RuntimeError(f"Command '{cmd}' failed with exit code {result.returncode}")
+    log_path = Path(log_dir or cwd or ".") / "logs" / f"{name}.log" if name else None
+    job = run_process(cmd, cwd=cwd, name=name, log_path=log_path, tail=tail, outputs=outputs)
+    if job.returncode != 0:
+        raise RuntimeError(f"Command '{cmd}' failed with exit code {job.returncode} (log: {job.log_path})")
+
+
+def queued_task_id(name: str, directory: Path, dpf_content: str, inputs: List[Path]) -> str:
+    """Queue id of one docking seed: ``name`` plus a hash of its run directory, DPF and input files.
+
+    Finished ids are never re-run, so a later batch on the same queue (another
+    ligand, output directory or masked receptor) needs ids of its own.
+    """
+    sha = hashlib.sha256(f"{Path(directory).resolve()}\n{dpf_content}".encode("utf-8"))
+    for path in inputs:
+        if path.exists():
+            sha.update(file_digest(path).encode("ascii"))
+    return f"{name}_{sha.hexdigest()[:12]}"
+
+
+def run_queued_commands(queue: WorkQueue, commands: Dict[str, tuple]) -> None:
+    """Queue ``{task_id: (cmd, cwd)}`` for the workers and wait for all of them."""
+    for task_id, (cmd, cwd) in commands.items():
+        queue.submit("command", {"cmd": cmd, "cwd": str(cwd) if cwd else None}, task_id=task_id)
+    print(f"Queued {len(commands)} docking seeds in {queue.root}; waiting for workers...")
+    records = queue.wait(commands)
+    failed = [f"{task_id} ({record.get('error')})" for task_id, record in records.items()
+              if record["state"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Queued docking failed: {', '.join(failed)}")
+
+
+def command_in_dir(executable: str, args: List[str], directory: Path) -> tuple:
+    """``(cmd, cwd)`` running ``executable`` inside ``directory``, through WSL when it only exists there."""
+    if not windows_command_exists(executable) and wsl_command_exists(executable):
+        return ["wsl", "bash", "-c", f"cd {to_wsl_path(directory)} && {executable} {' '.join(args)}"], None
+    return build_command(executable, args, use_wsl=False), directory
+
+
+def autodock_command(autodock_exe: str, dpf_name: str, dlg_name: str, directory: Path) -> tuple:
+    """``(cmd, cwd)`` running autodock4 on ``dpf_name`` inside ``directory``."""
+    return command_in_dir(autodock_exe, ["-p", dpf_name, "-l", dlg_name], directory)
+
+
+def run_grid_tile(cmd: List[str], dry_run: bool, cwd: Path | None, tile_dir: Path, key: str, tile) -> None:
+    run_command(cmd, dry_run, cwd=cwd, name=f"autogrid_{tile.name}", log_dir=tile_dir, outputs=[tile_dir])
+    if not dry_run:
+        mark_tile_current(tile_dir, key, tile)
+
+
+def restore_grid_tile(archive: MapArchive, dry_run: bool, tile_dir: Path, key: str, tile) -> None:
+    """Write the archived maps of ``key`` back into ``tile_dir`` instead of rerunning AutoGrid."""
+    print(f"Restoring {tile_dir.name} maps from {archive.path}")
+    if not dry_run:
+        archive.materialize(key[:16], tile_dir)
+        mark_tile_current(tile_dir, key, tile)
+
+
+def archive_tile_maps(archive: MapArchive, tile_dir: Path, key: str) -> None:
+    """Add the tile's maps to its archive (as a delta from the tile's first set) and delete the ASCII maps."""
+    fld = tile_dir / "receptor.maps.fld"
+    if key[:16] not in archive:
+        names = archive.names
+        entry = archive.add(key[:16], fld, base=names[0] if names else None)
+        changed = sum(record["changed"] for record in entry["maps"])
+        points = sum(record["points"] for record in entry["maps"])
+        print(f"Archived {tile_dir.name} maps: {entry['ascii_bytes'] / 1e6:.1f} MB -> "
+              f"{entry['stored_bytes'] / 1e6:.2f} MB ({changed}/{points} points stored)")
+    for path in read_fld(fld):
+        path.unlink(missing_ok=True)
+
+
+def run_tiled_docking(config: Dict, output_dir: Path, template_dir: Path, receptor_pdbqt: Path,
+                      ligand_pdbqt: Path, dry_run: bool = False, queue: WorkQueue | None = None) -> List[Path]:
+    """Dock every seed in every surface tile of the receptor; returns the DLG paths.
+
+    Each tile gets its own directory under ``<output_dir>/tiles`` with a
+    receptor cropped to the tile (see ``utils/grid_tiles.py``).  AutoGrid only
+    runs for tiles whose inputs changed since the last run; the grids and
+    then the docking runs are spread over the local scheduler.
+
+    With ``autogrid.tiling.archive_maps`` every map set of a tile is kept in
+    ``<tile>/map_archive`` (see ``utils/map_archive.py``) and the ASCII maps
+    are deleted once the tile's docking runs finished; a later run whose
+    inputs hash to an archived set restores it instead of running AutoGrid.
+    """
+    tiling = config["autogrid"]["tiling"]
+    receptor_lines = receptor_pdbqt.read_text(encoding="utf-8").splitlines()
+    tiles = plan_tiles(atom_coords(receptor_lines),
+                       spacing=float(tiling.get("spacing", DEFAULT_SPACING)),
+                       max_npts=int(tiling.get("max_npts", MAX_NPTS)),
+                       overlap=float(tiling.get("overlap", DEFAULT_OVERLAP)),
+                       padding=float(tiling.get("padding", DEFAULT_PADDING)))
+    cropped = crop_receptor(receptor_lines, tiles, float(tiling.get("margin", DEFAULT_MARGIN)))
+
+    ligand_types = config["inputs"]["ligand_types"]
+    map_definitions = [f"map {ligand_type}.map" for ligand_type in ligand_types.split()]
+    parameter_file = template_dir.parent / "AD4_parameters.dat"
+    parameters = parameter_file.read_bytes() if parameter_file.exists() else None
+    seeds = config["wrapper"]["seeds"]
+    adaptive = adaptive_from_config(config)
+    archive_maps = bool(tiling.get("archive_maps", False))
+    max_error = float(tiling.get("archive_max_error", DEFAULT_MAX_ERROR))
+
+    scheduler = scheduler_from_config(config)
+    grid_jobs = []
+    restore_jobs = []
+    queued_commands: Dict[str, tuple] = {}
+    tile_docks = []
+    dlg_files = []
+    for tile, receptor_part in zip(tiles, cropped):
+        tile_dir = output_dir / "tiles" / tile.name
+        tile_dir.mkdir(parents=True, exist_ok=True)
+        center = {f"center_{axis}": f"{value:.3f}" for axis, value in zip("xyz", tile.center)}
+        gpf_text = render_template(template_dir / "gpf_template.txt", dict(
+            center,
+            npts_x=str(tile.npts[0]), npts_y=str(tile.npts[1]), npts_z=str(tile.npts[2]),
+            gridfld="receptor.maps.fld", receptor="receptor.pdbqt", spacing=str(tile.spacing),
+            ligand_types=ligand_types, map_definitions="\n".join(map_definitions)))
+        key = tile_key(receptor_part, gpf_text, parameters)
+        if ligand_pdbqt.exists():
+            shutil.copy2(ligand_pdbqt, tile_dir / ligand_pdbqt.name)
+
+        after = []
+        archive = MapArchive(tile_dir / TILE_ARCHIVE, max_error) if archive_maps else None
+        if not tile_is_current(tile_dir, key):
+            write_file(tile_dir / "receptor.pdbqt", "\n".join(receptor_part) + "\n")
+            write_file(tile_dir / "autogrid.gpf", gpf_text)
+            if parameter_file.exists():
+                shutil.copy2(parameter_file, tile_dir / parameter_file.name)
+            if archive is not None and key[:16] in archive:
+                after = [scheduler.submit(f"restore_{tile.name}",
+                                          functools.partial(restore_grid_tile, archive, dry_run, tile_dir, key, tile))]
+                restore_jobs.extend(after)
+            else:
+                cmd, cwd = command_in_dir(config["paths"]["autogrid4"],
+                                          ["-p", "autogrid.gpf", "-l", "autogrid.log"], tile_dir)
+                after = [scheduler.submit(f"autogrid_{tile.name}",
+                                          functools.partial(run_grid_tile, cmd, dry_run, cwd, tile_dir, key, tile))]
+                grid_jobs.extend(after)
+
+        docks = []
+        for seed in seeds:
+            mapping = dict(center, **ga_mapping(config, ligand_pdbqt, tile.npts, tile.spacing),
+                           seed=str(seed), ligand_types=ligand_types, gridfld="receptor.maps.fld",
+                           maps="\n".join(map_definitions), ligand_pdbqt=ligand_pdbqt.name, receptor="receptor")
+            dpf_content = render_template(template_dir / "dpf_template.txt", mapping)
+            write_file(tile_dir / f"wrapper_{seed}.dpf", dpf_content)
+            dlg_files.append(tile_dir / f"wrapper_{seed}.dlg")
+            cmd, cwd = command_in_dir(config["paths"]["autodock4"],
+                                      ["-p", f"wrapper_{seed}.dpf", "-l", f"wrapper_{seed}.dlg"], tile_dir)
+            if queue is not None:
+                task_id = queued_task_id(f"autodock_{tile.name}_{seed}", tile_dir, dpf_content,
+                                         [tile_dir / "receptor.pdbqt", tile_dir / ligand_pdbqt.name])
+                queued_commands[task_id] = (cmd, cwd)
+                continue
+            if adaptive is not None:
+                docks.append(scheduler.submit(f"autodock_{tile.name}_{seed}",
+                                              functools.partial(adaptive.dock, template_dir / "dpf_template.txt",
+                                                                mapping, tile_dir, seed,
+                                                                functools.partial(autodock_command,
+                                                                                  config["paths"]["autodock4"]),
+                                                                run_command, dry_run, f"autodock_{tile.name}_{seed}"),
+                                              after=after))
+                continue
+            docks.append(scheduler.submit(f"autodock_{tile.name}_{seed}",
+                                          functools.partial(run_command, cmd, dry_run, cwd=cwd,
+                                                            name=f"autodock_{tile.name}_{seed}", log_dir=tile_dir,
+                                                            tail=[tile_dir / f"wrapper_{seed}.dlg"]),
+                                          after=after))
+        if archive is not None and not dry_run:
+            tile_docks.append((archive, tile_dir, key, docks or after))
+
+    queued = []
+    if queued_commands:
+        queued = [scheduler.submit("queued_autodock", functools.partial(run_queued_commands, queue, queued_commands),
+                                   after=grid_jobs + restore_jobs)]
+    for archive, tile_dir, key, docks in tile_docks:
+        scheduler.submit(f"archive_{tile_dir.name}", functools.partial(archive_tile_maps, archive, tile_dir, key),
+                         after=queued or docks)
+    print(f"Tiling: {len(tiles)} surface tiles at {tiles[0].spacing if tiles else 0} Å "
+          f"({len(tiles) - len(grid_jobs) - len(restore_jobs)} grids reused, "
+          f"{len(restore_jobs)} restored from the map archive), "
+          f"{len(seeds)} seeds each, on {scheduler.cores} cores")
+    scheduler.run()
+    return dlg_files
+
+
+def merge_docking_results(config: Dict, output_dir: Path, receptor_pdbqt: Path, dlg_files: List[Path]) -> None:
+    """Extract the best pose of every DLG, drop RMSD duplicates and write ``wrapped_complex.pdb``."""
+    print("\n=== Merging docking results ===")
+    ligand_pdbqt_files = []
+    for dlg_file in dlg_files:
+        # Extract ligand ID from filename (tiled runs are prefixed with their tile)
+        ligand_id = dlg_file.stem.replace("wrapper_", "")
+        if dlg_file.parent != output_dir:
+            ligand_id = f"{dlg_file.parent.name}_{ligand_id}"
+        output_ligand = output_dir / f"best_pose_{ligand_id}.pdbqt"
+
+        # Extract best pose from DLG file
+        try:
+            extract_best_pose(dlg_file, output_ligand)
+            ligand_pdbqt_files.append(output_ligand)
+        except Exception as e:
+            print(f"Warning: Could not extract pose from {dlg_file}: {e}")
+
+    # Seeds (and overlapping tiles) often converge on the same site: keep the
+    # lowest-energy pose of each RMSD cluster
+    dedup_rmsd = float(config["wrapper"].get("dedup_rmsd", DEFAULT_RMSD_CUTOFF))
+    if ligand_pdbqt_files and dedup_rmsd > 0:
+        kept, clusters = deduplicate_pose_files(sorted(ligand_pdbqt_files), dedup_rmsd)
+        print(f"RMSD deduplication ({dedup_rmsd} Å): {len(ligand_pdbqt_files)} poses -> {len(kept)}")
+        ligand_pdbqt_files = kept
+
+    # Create merged complex file
+    if ligand_pdbqt_files:
+        wrapped_complex_pdb = output_dir / "wrapped_complex.pdb"
+        merge_complex_files(receptor_pdbqt, ligand_pdbqt_files, wrapped_complex_pdb)
+        print(f"Successfully created {wrapped_complex_pdb} with {len(ligand_pdbqt_files)} ligands")
+    else:
+        print("Warning: No ligand poses were extracted, skipping complex merge")
 
 
 def merge_complex_files(receptor_pdbqt: Path, ligand_pdbqt_files: List[Path], output_pdb: Path) -> None:
@@ -108,7 +347,7 @@ def merge_complex_files(receptor_pdbqt: Path, ligand_pdbqt_files: List[Path], ou
                 for line in lig_file:
                     if line.startswith(('ATOM', 'HETATM')):
                         # Update residue ID to ensure uniqueness
-                        modified_line = line[:17] + f"{res_id:4d}" + line[22:66] + '\n'
+                        modified_line = line[:22] + f"{res_id:4d}" + line[26:66] + '\n'
                         out_file.write(modified_line)
                 res_id += 1
     
@@ -119,6 +358,8 @@ def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--config", default=str(CONFIG_PATH), help="Path to YAML config file")
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing")
+    parser.add_argument("--queue", type=Path,
+                        help="Shared queue directory: docking seeds are run by `wns worker` processes")
     args = parser.parse_args(argv)
 
     config = load_config(Path(args.config))
@@ -140,6 +381,21 @@ def main(argv: List[str] | None = None) -> None:
     if ligand_pdbqt.exists():
         shutil.copy2(ligand_pdbqt, ligand_in_output)
 
+    queue = WorkQueue(args.queue) if args.queue and not args.dry_run else None
+    if queue is not None and adaptive_from_config(config) is not None:
+        # A queued seed is one autodock4 command; workers cannot stop it between chunks
+        print("[WARN] wrapper.ga_budget.adaptive does not apply to --queue: "
+              "queued seeds run all max_runs GA runs without early stopping")
+    if (config["autogrid"].get("tiling") or {}).get("enabled"):
+        # Receptor larger than one 126-point grid: overlapping tiles at full resolution
+        if not receptor_in_output.exists():
+            raise FileNotFoundError(f"Tiled docking needs the receptor to plan tiles: {receptor_pdbqt}")
+        dlg_files = run_tiled_docking(config, output_dir, template_dir, receptor_in_output, ligand_in_output,
+                                      args.dry_run, queue)
+        if not args.dry_run:
+            merge_docking_results(config, output_dir, receptor_in_output, dlg_files)
+        return
+
     gpf_path = output_dir / "autogrid.gpf"
     gridfld = output_dir / "protein.maps.fld"
 
@@ -194,13 +450,22 @@ def main(argv: List[str] | None = None) -> None:
     if use_wsl_autogrid:
         wsl_output_dir = to_wsl_path(output_dir)
         autogrid_cmd = ["wsl", "bash", "-c", f"cd {wsl_output_dir} && {autogrid_exe} -p {gpf_path.name} -l autogrid.log"]
-    run_command(autogrid_cmd, args.dry_run, cwd=output_dir if not use_wsl_autogrid else None)
+    # Seeds are independent: each one is a single-core job after the grid maps
+    scheduler = scheduler_from_config(config)
+    grid_job = scheduler.submit(
+        "autogrid",
+        functools.partial(run_command, autogrid_cmd, args.dry_run,
+                          cwd=output_dir if not use_wsl_autogrid else None, name="autogrid", log_dir=output_dir),
+    )
 
     dpf_template = template_dir / "dpf_template.txt"
     autodock_exe = config["paths"]["autodock4"]
     # Determine if we need WSL for autodock
     use_wsl_autodock = not windows_command_exists(autodock_exe) and wsl_command_exists(autodock_exe)
 
+    # With --queue the seeds run on `wns worker` processes (any node sharing output_dir)
+    queued_commands: Dict[str, tuple] = {}
+    adaptive = adaptive_from_config(config)
     for seed in config["wrapper"]["seeds"]:
         map_definitions = "\n".join([
             f"map {ligand_type}.map" for ligand_type in config["inputs"]["ligand_types"].split()
@@ -216,6 +481,8 @@ def main(argv: List[str] | None = None) -> None:
             "center_y": str(config["autogrid"]["center"][1]),
             "center_z": str(config["autogrid"]["center"][2]),
         }
+        mapping.update(ga_mapping(config, ligand_pdbqt, config["autogrid"]["npts"],
+                                  float(config["autogrid"]["spacing"])))
         dpf_content = render_template(dpf_template, mapping)
         dpf_path = output_dir / f"wrapper_{seed}.dpf"
         write_file(dpf_path, dpf_content)
@@ -231,58 +498,42 @@ def main(argv: List[str] | None = None) -> None:
                 ["-p", dpf_path.name, "-l", dlg_path.name],
                 use_wsl=False,
             )
-        run_command(cmd, args.dry_run, cwd=output_dir if not use_wsl_autodock else None)
+        cwd = output_dir if not use_wsl_autodock else None
+        if queue is not None:
+            task_id = queued_task_id(f"autodock_{seed}", output_dir, dpf_content, [receptor_in_output, ligand_in_output])
+            queued_commands[task_id] = (cmd, cwd)
+            continue
+        if adaptive is not None:
+            scheduler.submit(f"autodock_{seed}", functools.partial(adaptive.dock, dpf_template, mapping, output_dir, seed,
+                                                                   functools.partial(autodock_command, autodock_exe),
+                                                                   run_command, args.dry_run),
+                             after=[grid_job])
+            continue
+        scheduler.submit(f"autodock_{seed}", functools.partial(run_command, cmd, args.dry_run, cwd=cwd,
+                                                               name=f"autodock_{seed}", log_dir=output_dir,
+                                                               tail=[dlg_path]),
+                         after=[grid_job])
+
+    if queued_commands:
+        scheduler.submit("queued_autodock", functools.partial(run_queued_commands, queue, queued_commands),
+                         after=[grid_job])
+
+    print(f"Running autogrid and {len(config['wrapper']['seeds'])} docking seeds on {scheduler.cores} cores")
+    scheduler.run()
 
     # After all docking runs, merge the results into a single complex file
-    print("\n=== Merging docking results ===")
-    
-    # Find all generated DLG files and extract best poses
-    dlg_files = list(output_dir.glob("wrapper_*.dlg"))
-    ligand_pdbqt_files = []
-    
-    for dlg_file in dlg_files:
-        # Extract ligand ID from filename
-        ligand_id = dlg_file.stem.replace("wrapper_", "")
-        output_ligand = output_dir / f"best_pose_{ligand_id}.pdbqt"
-        
-        # Extract best pose from DLG file
-        try:
-            extract_best_pose(dlg_file, output_ligand)
-            ligand_pdbqt_files.append(output_ligand)
-        except Exception as e:
-            print(f"Warning: Could not extract pose from {dlg_file}: {e}")
-    
-    # Create merged complex file
-    if ligand_pdbqt_files:
-        wrapped_complex_pdb = output_dir / "wrapped_complex.pdb"
-        merge_complex_files(receptor_in_output, ligand_pdbqt_files, wrapped_complex_pdb)
-        print(f"Successfully created {wrapped_complex_pdb} with {len(ligand_pdbqt_files)} ligands")
-    else:
-        print("Warning: No ligand poses were extracted, skipping complex merge")
+    merge_docking_results(config, output_dir, receptor_in_output, sorted(output_dir.glob("wrapper_*.dlg")))
 
 
 def extract_best_pose(dlg_file: Path, output_pdbqt: Path) -> None:
     """Extract the best (lowest energy) pose from AutoDock DLG file."""
-    best_pose_lines = []
-    found_best = False
-    
-    with dlg_file.open('r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Find the best pose section
-    for i, line in enumerate(lines):
-        if "DOCKED: USER    Run = 0" in line:
-            # Found the best pose, extract coordinates
-            j = i
-            while j < len(lines) and not lines[j].startswith("DOCKED: USER    Run = 1"):
-                if lines[j].startswith("DOCKED: ATOM"):
-                    best_pose_lines.append(lines[j][8:])  # Remove "DOCKED: " prefix
-                j += 1
-            found_best = True
-            break
-    
-    if not found_best:
+    # Run = 1 is only the best model in merged DLGs; pick the lowest energy
+    best = best_docked_run(dlg_file)
+    if best is None:
         raise RuntimeError(f"Could not find best pose in {dlg_file}")
+    # Keep the energy so pose deduplication can rank the poses
+    best_pose_lines = [line[8:] + "\n" for line in best.lines  # Remove "DOCKED: " prefix
+                       if line.startswith(("DOCKED: ATOM", "DOCKED: USER    Estimated Free Energy"))]
     
     # Write the best pose to PDBQT file
     with output_pdbqt.open('w', encoding='utf-8') as f:
@@ -18,7 +18,6 @@ except ImportError as exc:  # pragma: no cover
 SCRIPTS_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPTS_DIR.parent
 DEFAULT_CONFIG = SCRIPTS_DIR / "config.yml"
-UPDATE_MANIFEST = SCRIPTS_DIR / "update_manifest.py"
 
 # Import state management
 sys.path.append(str(SCRIPTS_DIR.parent / 'utils'))
@@ -31,6 +30,9 @@ except ImportError:
         def get(self, k, d=None): return self.data.get(k, d)
         def update(self, k, v): self.data[k] = v
 
+from manifest_writer import ManifestWriter
+
+
 class PipelineError(RuntimeError):
     """Domain-specific error for pipeline failures."""
 
@@ -95,26 +97,15 @@ def rel_to_workdir(path: Path, workdir: Path) -> str:
 
 
 def update_manifest(
-    python_exe: str,
-    manifest_path: Path,
+    manifest: ManifestWriter,
     commands: Iterable[str] | None = None,
     seeds: Iterable[str] | None = None,
     inputs: Dict[str, str] | None = None,
     outputs: Dict[str, str] | None = None,
     notes: str | None = None,
 ) -> None:
-    args: List[str] = [python_exe, str(UPDATE_MANIFEST), "--manifest", str(manifest_path)]
-    for command in commands or []:
-        args.extend(["--command", command])
-    for seed in seeds or []:
-        args.extend(["--seed", seed])
-    for key, value in (inputs or {}).items():
-        args.extend(["--input", f"{key}={value}"])
-    for key, value in (outputs or {}).items():
-        args.extend(["--output", f"{key}={value}"])
-    if notes is not None:
-        args.extend(["--append-note", notes])
-    subprocess.run(args, check=True)
+    """Queue stage metadata; it is written when the stage's ``manifest.stage()`` block ends."""
+    manifest.record(commands=commands, seeds=seeds, inputs=inputs, outputs=outputs, notes=notes)
 
 
 def build_mgl_paths(mgl_root: Path) -> Dict[str, Path]:
@@ -188,6 +179,7 @@ def main(argv: List[str] | None = None) -> None:
     working_dir = (SCRIPTS_DIR / config["paths"]["working_dir"]).resolve()
     python_exe = config["paths"].get("python", "python")
     manifest_path = (working_dir / config.get("manifest", {}).get("path", "manifest/run-manifest.yml")).resolve()
+    manifest = ManifestWriter(manifest_path)
     
     # Initialize state manager
     state_file = working_dir / "pipeline_state.json"
@@ -269,8 +261,7 @@ def main(argv: List[str] | None = None) -> None:
                 executed = run_command("Clean protein PDB", preprocess_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(map(str, preprocess_cmd))],
                         inputs={"raw_protein": str(raw_protein)},
                         outputs={"cleaned_protein": str(cleaned_protein)},
@@ -298,8 +289,7 @@ def main(argv: List[str] | None = None) -> None:
                 )
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(map(str, receptor_cmd))],
                         seeds=[receptor_seed],
                         outputs={"receptor_pdbqt": str(receptor_pdbqt)},
@@ -325,8 +315,7 @@ def main(argv: List[str] | None = None) -> None:
                 )
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(map(str, ligand_cmd))],
                         outputs={"ligand_pdbqt": str(ligand_pdbqt)},
                     )
@@ -365,8 +354,7 @@ def main(argv: List[str] | None = None) -> None:
                         executed = run_wsl("Ligand parameterization", ligand_param_cmd, args.dry_run)
                         if executed:
                             update_manifest(
-                                python_exe,
-                                manifest_path,
+                                manifest,
                                 commands=[ligand_param_cmd],
                                 outputs={"ligand_param_basename": str(ligand_basename)},
                             )
@@ -386,8 +374,7 @@ def main(argv: List[str] | None = None) -> None:
                 executed = run_command("AutoDock batch", autodock_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(map(str, autodock_cmd))],
                         seeds=wrapper_seeds,
                     )
@@ -413,8 +400,7 @@ def main(argv: List[str] | None = None) -> None:
                     executed = run_command("Build complex", complex_cmd, args.dry_run)
                     if executed:
                         update_manifest(
-                            python_exe,
-                            manifest_path,
+                            manifest,
                             commands=[" ".join(map(str, complex_cmd))],
                             outputs={"complex_pdb": str(complex_output)},
                         )
@@ -448,8 +434,7 @@ def main(argv: List[str] | None = None) -> None:
                 
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[gmx_cmd],
                         outputs={"gromacs_workdir": str(gmx_workdir)},
                     )
@@ -482,6 +467,9 @@ def main(argv: List[str] | None = None) -> None:
         except Exception as e:
             print(f"❌ Error in stage '{stage}': {e}")
             raise PipelineError(f"Pipeline failed at stage {stage}") from e
+        finally:
+            # Stage boundary: write this stage's manifest updates in one go
+            manifest.flush()
 
     print("\n✅ Pipeline completed successfully.")
 
@@ -18,11 +18,13 @@ except ImportError as exc:  # pragma: no cover
 SCRIPTS_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPTS_DIR.parent
 DEFAULT_CONFIG = SCRIPTS_DIR / "config.yml"
-UPDATE_MANIFEST = SCRIPTS_DIR / "update_manifest.py"
 
 # Import state management
 sys.path.append(str(SCRIPTS_DIR.parent / 'utils'))
 from state_manager import StateManager
+from manifest_writer import ManifestWriter
+from run_metrics import METRICS, measured_run, metrics_record_name
+from profiling import add_profile_argument, enable as enable_profiling
 
 
 class PipelineError(RuntimeError):
@@ -52,7 +54,7 @@ def run_command(label: str, cmd: List[str], dry_run: bool, cwd: Path | None = No
     print(prefix, " ".join(shlex.quote(part) for part in cmd))
     if dry_run:
         return False
-    result = subprocess.run(cmd, cwd=cwd, check=False)
+    result = measured_run(cmd, label=label, cwd=cwd)
     if result.returncode != 0:
         raise PipelineError(f"Command for '{label}' failed with exit code {result.returncode}.")
     return True
@@ -89,26 +91,22 @@ def rel_to_workdir(path: Path, workdir: Path) -> str:
 
 
 def update_manifest(
-    python_exe: str,
-    manifest_path: Path,
+    manifest: ManifestWriter,
     commands: Iterable[str] | None = None,
     seeds: Iterable[str] | None = None,
     inputs: Dict[str, str] | None = None,
     outputs: Dict[str, str] | None = None,
     notes: str | None = None,
 ) -> None:
-    args: List[str] = [python_exe, str(UPDATE_MANIFEST), "--manifest", str(manifest_path)]
-    for command in commands or []:
-        args.extend(["--command", command])
-    for seed in seeds or []:
-        args.extend(["--seed", seed])
-    for key, value in (inputs or {}).items():
-        args.extend(["--input", f"{key}={value}"])
-    for key, value in (outputs or {}).items():
-        args.extend(["--output", f"{key}={value}"])
-    if notes is not None:
-        args.extend(["--append-note", notes])
-    subprocess.run(args, check=True)
+    """Queue stage metadata; it is written when the stage's ``manifest.stage()`` block ends."""
+    manifest.record(commands=commands, seeds=seeds, inputs=inputs, outputs=outputs, notes=notes)
+
+
+def record_run_metrics(manifest: ManifestWriter) -> None:
+    """Queue this run's stage and tool metrics in the manifest and print the summary."""
+    if METRICS.records:
+        manifest.add_record(metrics_record_name("run_full_pipeline_checkpoint"), METRICS.records)
+    METRICS.print_summary()
 
 
 def build_mgl_paths(mgl_root: Path) -> Dict[str, Path]:
@@ -173,12 +171,17 @@ def main(argv: List[str] | None = None) -> None:
     parser.add_argument("--config", default=str(DEFAULT_CONFIG), help="Path to config.yml")
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing")
     parser.add_argument("--reset", action="store_true", help="Reset all progress and start from scratch")
+    add_profile_argument(parser)
     args = parser.parse_args(argv)
 
     config = load_config(Path(args.config))
     working_dir = (SCRIPTS_DIR / config["paths"]["working_dir"]).resolve()
+    if args.profile:
+        # Inherited by the stage subprocesses through WNS_PROFILE / WNS_PROFILE_DIR
+        enable_profiling(args.profile, output_dir=working_dir / "profile")
     python_exe = config["paths"].get("python", "python")
     manifest_path = (working_dir / config.get("manifest", {}).get("path", "manifest/run-manifest.yml")).resolve()
+    manifest = ManifestWriter(manifest_path)
     
     # Initialize state manager
     state_file = working_dir / "pipeline_state.json"
@@ -224,6 +227,18 @@ def main(argv: List[str] | None = None) -> None:
         "build_complex",
         "run_gromacs"
     ]
+    # What each stage writes; only these are scanned for the stage's output bytes
+    wrapper_output_dir = (working_dir / config["wrapper"]["output_dir"]).resolve()
+    gmx_workdir = (working_dir / config["gromacs"]["workdir"]).resolve()
+    stage_outputs = {
+        "clean_protein": [cleaned_protein],
+        "prepare_receptor": [receptor_pdbqt],
+        "prepare_ligand": [ligand_pdbqt],
+        "parameterize_ligand": [ligand_basename.parent],
+        "run_wrapper": [wrapper_output_dir],
+        "build_complex": [complex_output],
+        "run_gromacs": [gmx_workdir],
+    }
     
     # Get current stage
     current_stage = state.get("current_stage", None)
@@ -246,6 +261,8 @@ def main(argv: List[str] | None = None) -> None:
             
         print(f"\n=== Running stage: {stage} ===")
         
+        stage_metrics = METRICS.begin_stage(stage, outputs=stage_outputs[stage])
+        stage_failed = False
         try:
             if stage == "clean_protein":
                 # Step 1: clean protein PDB
@@ -260,8 +277,7 @@ def main(argv: List[str] | None = None) -> None:
                 executed = run_command("Clean protein PDB", preprocess_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(preprocess_cmd)],
                         inputs={"raw_protein": str(raw_protein)},
                         outputs={"cleaned_protein": str(cleaned_protein)},
@@ -293,8 +309,7 @@ def main(argv: List[str] | None = None) -> None:
                 )
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(receptor_cmd)],
                         seeds=[receptor_seed],
                         outputs={"receptor_pdbqt": str(receptor_pdbqt)},
@@ -322,8 +337,7 @@ def main(argv: List[str] | None = None) -> None:
                 )
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(ligand_cmd)],
                         outputs={"ligand_pdbqt": str(ligand_pdbqt)},
                     )
@@ -350,16 +364,14 @@ def main(argv: List[str] | None = None) -> None:
                 if skip_amber:
                     print("[INFO] Skipping AmberTools ligand parameterization (config: ambertools.skip = true)")
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         notes="Skipped AmberTools ligand parameterization (config: ambertools.skip = true)",
                     )
                 else:
                     executed = run_wsl("AmberTools ligand parameterization", ligand_param_cmd, args.dry_run)
                     if executed:
                         update_manifest(
-                            python_exe,
-                            manifest_path,
+                            manifest,
                             commands=[ligand_param_cmd],
                             inputs={"raw_ligand": str(raw_ligand)},
                             outputs={"ligand_basename": str(ligand_basename)},
@@ -371,7 +383,6 @@ def main(argv: List[str] | None = None) -> None:
                 wrapper_cfg = config.get("wrapper", {})
                 wrapper_script = (working_dir / wrapper_cfg["script"]).resolve()
                 ensure_exists(wrapper_script, "wrapper script")
-                wrapper_output_dir = (working_dir / wrapper_cfg["output_dir"]).resolve()
                 make_parent(wrapper_output_dir / "placeholder")
 
                 wrapper_cmd = [
@@ -396,8 +407,7 @@ def main(argv: List[str] | None = None) -> None:
                 executed = run_command("Wrapper docking", wrapper_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(wrapper_cmd)],
                         inputs={"receptor_pdbqt": str(receptor_pdbqt), "ligand_pdbqt": str(ligand_pdbqt)},
                         outputs={"wrapper_output_dir": str(wrapper_output_dir)},
@@ -408,7 +418,6 @@ def main(argv: List[str] | None = None) -> None:
             elif stage == "build_complex":
                 # Step 6: Build complex
                 wrapper_cfg = config.get("wrapper", {})
-                wrapper_output_dir = (working_dir / wrapper_cfg["output_dir"]).resolve()
                 pose_entries = wrapper_cfg.get("poses", ["docked_ligand_*.pdbqt"])
                 pose_paths = resolve_pose_files(wrapper_output_dir, pose_entries)
 
@@ -433,12 +442,13 @@ def main(argv: List[str] | None = None) -> None:
                     *[str(path) for path in pose_paths],
                     "-o",
                     str(complex_output),
+                    "--dedup-rmsd",
+                    str(wrapper_cfg.get("dedup_rmsd", 2.0)),
                 ]
                 executed = run_command("Build complex", complex_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(complex_cmd)],
                         outputs={"complex_pdb": str(complex_output)},
                     )
@@ -449,7 +459,6 @@ def main(argv: List[str] | None = None) -> None:
                 gromacs_script = (SCRIPTS_DIR / "gromacs_pipeline.py").resolve()
                 ensure_exists(gromacs_script, "gromacs pipeline script")
                 
-                gmx_workdir = (working_dir / config["gromacs"]["workdir"]).resolve()
                 make_parent(gmx_workdir / "placeholder")
                 
                 # 使用 Python 脚本而不是 bash 脚本
@@ -460,12 +469,18 @@ def main(argv: List[str] | None = None) -> None:
                     str(gmx_workdir),
                     str(raw_ligand)
                 ]
+                # Ligand parameters are cached by mol2 hash + these options (utils/param_cache.py)
+                amber_cfg = config.get("ambertools", {})
+                gromacs_cmd += [
+                    "--charge-method", str(amber_cfg.get("charge_method", "bcc")),
+                    "--atom-type", str(amber_cfg.get("atom_type", "gaff2")),
+                    "--net-charge", str(amber_cfg.get("net_charge", 0)),
+                ]
                 
                 executed = run_command("GROMACS pipeline", gromacs_cmd, args.dry_run)
                 if executed:
                     update_manifest(
-                        python_exe,
-                        manifest_path,
+                        manifest,
                         commands=[" ".join(gromacs_cmd)],
                         outputs={"gromacs_workdir": str(gmx_workdir)},
                     )
@@ -477,10 +492,19 @@ def main(argv: List[str] | None = None) -> None:
                 state.update("completed_stages", completed_stages)
                 
         except Exception as e:
+            stage_failed = True
             print(f"Error in stage {stage}: {e}")
             state.update("current_stage", stage)  # Save current stage for retry
             raise
-
+        finally:
+            METRICS.end_stage(stage_metrics, failed=stage_failed)
+            if stage_failed:
+                record_run_metrics(manifest)
+            # Stage boundary: write this stage's manifest updates in one go
+            manifest.flush()
+
+    record_run_metrics(manifest)
+    manifest.flush()
     print("\n=== Pipeline completed successfully! ===")
 
 
@@ -4,9 +4,9 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import os
 import shutil
-import subprocess
 import sys
 from pathlib import Path
 from typing import Dict, List
@@ -19,14 +19,15 @@ except ImportError as exc:  # pragma: no cover
 # Import our modules
 from wrap_n_shake_docking import run_wrap_n_shake_docking, to_wsl_path
 from washing_cycle import washing_cycle
+from manifest_writer import ManifestWriter
 
 # Import state management
 sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
 from state_manager import StateManager
-
-# Import state management
-sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
-from state_manager import StateManager
+from results_store import default_run_id, open_from_config
+from run_metrics import METRICS, measured_run, metrics_record_name
+from profiling import add_profile_argument, enable as enable_profiling
+from scheduler import JobError, scheduler_from_config
 
 
 def load_config(config_path: Path) -> Dict:
@@ -110,15 +111,20 @@ def run_gromacs_pipeline(complex_pdb: Path, work_dir: Path,
     ]
     
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=work_dir)
+    result = measured_run(cmd, cwd=work_dir, outputs=[gmx_dir])
     if result.returncode != 0:
         raise RuntimeError(f"GROMACS pipeline failed with exit code {result.returncode}")
     
     return gmx_dir
 
 
-def run_shaker_cycles(gmx_dir: Path, config: Dict, gmx_exe: str = "gmx") -> None:
-    """Run Shaker washing cycles."""
+def run_shaker_cycles(gmx_dir: Path, config: Dict, gmx_exe: str = "gmx",
+                      run_id: str | None = None, reraise: bool = False) -> None:
+    """Run Shaker washing cycles.
+
+    A failed cycle is reported and ends the run; with ``reraise`` its
+    ``JobError`` is raised to the caller (queue workers use this to fail the task).
+    """
     print("Starting Shaker washing cycles...")
     
     # Number of washing cycles
@@ -126,21 +132,32 @@ def run_shaker_cycles(gmx_dir: Path, config: Dict, gmx_exe: str = "gmx") -> None
     displacement_cutoff = config.get("shaker", {}).get("displacement_cutoff", 6.0)
     cycle_time = config.get("shaker", {}).get("cycle_time", 1.0)
     ligand_resname = config.get("shaker", {}).get("ligand_resname", "LIG")
+    results_store = open_from_config(config, gmx_dir.parent)
     
-    for cycle in range(n_cycles):
+    # Every cycle rewrites npt.gro/topol.top, so the cycles form a dependency
+    # chain; the scheduler reserves mdrun's OpenMP threads on this machine
+    scheduler = scheduler_from_config(config)
+    requested_threads = config.get("gromacs", {}).get("ntomp")
+    cores = scheduler.fit_cores(requested_threads)
+    ntomp = cores if requested_threads else None
+    progress = {"all_washed": False}
+    
+    def run_cycle(cycle: int) -> None:
+        if progress["all_washed"]:
+            return
         print(f"\n=== Shaker cycle {cycle + 1}/{n_cycles} ===")
-        
-        try:
+        with METRICS.stage(f"washing_cycle_{cycle + 1}", outputs=[gmx_dir]):
             washing_cycle(
                 gmx_dir,
                 gmx_exe,
                 ligand_resname,
                 displacement_cutoff,
-                cycle_time
+                cycle_time,
+                results_store=results_store,
+                run_id=run_id,
+                cycle=cycle + 1,
+                ntomp=ntomp,
             )
-        except Exception as e:
-            print(f"Error in washing cycle {cycle + 1}: {e}")
-            break
         
         # Check if any ligands remain
         topol_file = gmx_dir / "topol.top"
@@ -148,8 +165,23 @@ def run_shaker_cycles(gmx_dir: Path, config: Dict, gmx_exe: str = "gmx") -> None
             content = topol_file.read_text()
             if f"{ligand_resname}    0" in content:
                 print(f"All ligands have been washed away after {cycle + 1} cycles")
-                break
+                progress["all_washed"] = True
     
+    previous = None
+    for cycle in range(n_cycles):
+        previous = scheduler.submit(f"washing_cycle_{cycle + 1}", functools.partial(run_cycle, cycle),
+                                    cores=cores, after=[previous] if previous else [])
+    try:
+        scheduler.run()
+    except JobError as exc:
+        # Later cycles depend on the failed one and were skipped
+        for job in exc.failed:
+            print(f"Error in {job.name.replace('_', ' ')}: {job.error}")
+        if reraise:
+            raise
+    finally:
+        if results_store is not None:
+            results_store.close()
     print("Shaker cycles completed")
 
 
@@ -163,7 +195,7 @@ def run_analysis(gmx_dir: Path, work_dir: Path) -> None:
     if analysis_script.exists():
         cmd = ["python", str(analysis_script), str(gmx_dir)]
         print(f"Running: {' '.join(cmd)}")
-        result = subprocess.run(cmd, cwd=work_dir)
+        result = measured_run(cmd, cwd=work_dir, outputs=[work_dir / "analysis"])
         if result.returncode != 0:
             print(f"Analysis script failed with exit code {result.returncode}")
     else:
@@ -178,6 +210,7 @@ def main(argv: List[str] | None = None) -> None:
     parser.add_argument("--skip-wrapper", action="store_true", help="Skip wrapper stage")
     parser.add_argument("--skip-shaker", action="store_true", help="Skip shaker stage")
     parser.add_argument("--reset", action="store_true", help="Reset all progress and start from scratch")
+    add_profile_argument(parser)
     
     args = parser.parse_args(argv)
     
@@ -185,6 +218,8 @@ def main(argv: List[str] | None = None) -> None:
     config = load_config(Path(args.config))
     scripts_dir = Path(__file__).resolve().parent
     work_dir = (scripts_dir / config["paths"]["working_dir"]).resolve()
+    if args.profile:
+        enable_profiling(args.profile, output_dir=work_dir / "profile")
     
     # Initialize state manager
     state_file = work_dir / "workflow_state.json"
@@ -200,6 +235,11 @@ def main(argv: List[str] | None = None) -> None:
         }
         state.update("reset", True)
     
+    # One run id per campaign, kept across resumes so results stay grouped
+    run_id = state.get("run_id") or default_run_id(config)
+    if state.get("run_id") != run_id:
+        state.update("run_id", run_id)
+    
     print("=== Wrap 'n' Shake Pipeline ===")
     print(f"Working directory: {work_dir}")
     print(f"State file: {state_file}")
@@ -213,7 +253,9 @@ def main(argv: List[str] | None = None) -> None:
         if wrapper_completed:
             print("Wrapper stage already completed. Skipping...")
         else:
-            run_wrap_n_shake_docking(config, args.dry_run)
+            wrapper_dir = work_dir / config["wrapper"]["output_dir"]
+            with METRICS.stage("wrapper", outputs=[wrapper_dir]):
+                run_wrap_n_shake_docking(config, args.dry_run, run_id=run_id)
             state.update("wrapper_completed", True)
         
         # Collect docked ligands
@@ -229,7 +271,8 @@ def main(argv: List[str] | None = None) -> None:
         complex_pdb = prepare_gromacs_system(work_dir, docked_ligands, config)
         
         # Run GROMACS pipeline
-        gmx_dir = run_gromacs_pipeline(complex_pdb, work_dir, config, args.gmx)
+        with METRICS.stage("gromacs_pipeline"):
+            gmx_dir = run_gromacs_pipeline(complex_pdb, work_dir, config, args.gmx)
     else:
         print("\n=== Skipping Wrapper stage ===")
         gmx_dir = work_dir / "gmx"
@@ -270,11 +313,18 @@ def main(argv: List[str] | None = None) -> None:
     # Check if analysis is already completed
     analysis_completed = state.get("analysis_completed", False)
     if not analysis_completed:
-        run_analysis(gmx_dir, work_dir)
+        with METRICS.stage("analysis"):
+            run_analysis(gmx_dir, work_dir)
         state.update("analysis_completed", True)
     else:
         print("Analysis already completed. Skipping...")
     
+    if METRICS.records:
+        manifest_path = work_dir / config.get("manifest", {}).get("path", "manifest/run-manifest.yml")
+        manifest = ManifestWriter(manifest_path)
+        manifest.add_record(metrics_record_name("run_full_wrap_n_shake"), METRICS.records)
+        manifest.flush()
+    METRICS.print_summary()
     print("\n=== Wrap 'n' Shake pipeline completed successfully! ===")
 
 
@@ -49,13 +49,14 @@ def run_wrapper_stage(config: Dict, dry_run: bool = False) -> Path:
     scripts_dir = Path(__file__).resolve().parent
     working_dir = (scripts_dir / config["paths"]["working_dir"]).resolve()
     
-    # Run AutoDock batch
-    wrapper_script = scripts_dir / "run_autodock_batch.py"
-    cmd = ["python", str(wrapper_script), "--config", str(scripts_dir / "config.yml")]
+    # Run AutoDock batch in this process (no second interpreter start-up)
+    from run_autodock_batch import main as run_autodock_batch
+
+    argv = ["--config", str(scripts_dir / "config.yml")]
     if dry_run:
-        cmd.append("--dry-run")
-    
-    run_command(cmd, cwd=scripts_dir, dry_run=dry_run)
+        argv.append("--dry-run")
+    print(f"Running: run_autodock_batch {' '.join(argv)}")
+    run_autodock_batch(argv)
     
     # Check for output
     output_dir = working_dir / config["wrapper"]["output_dir"]
@@ -82,15 +83,13 @@ def run_shaker_stage(config: Dict, wrapped_complex: Path, dry_run: bool = False)
         gmx_dir.mkdir(parents=True, exist_ok=True)
         shutil.copy2(wrapped_complex, gmx_complex)
     
-    # Run GROMACS pipeline (simplified version)
-    gmx_script = scripts_dir / "gromacs_pipeline.py"
-    if gmx_script.exists():
-        cmd = ["python", str(gmx_script), "--input", str(gmx_complex), "--config", str(scripts_dir / "config.yml")]
-        if dry_run:
-            cmd.append("--dry-run")
-        run_command(cmd, cwd=scripts_dir, dry_run=dry_run)
-    else:
-        print("Warning: gromacs_pipeline.py not found, skipping GROMACS setup")
+    # Run GROMACS pipeline (checkpointed, resumes at the last finished stage)
+    print(f"Running: run_gromacs_pipeline {gmx_complex} {gmx_dir}")
+    if not dry_run:
+        from gromacs_pipeline import run_gromacs_pipeline
+
+        run_gromacs_pipeline(gmx_complex, gmx_dir, gmx_cmd=config["paths"]["gmx"],
+                             ntomp=config.get("gromacs", {}).get("ntomp"))
     
     # Run washing cycle
     if not dry_run:
@@ -126,19 +125,12 @@ def run_analysis_stage(config: Dict, final_complex: Path, dry_run: bool = False)
     working_dir = (scripts_dir / config["paths"]["working_dir"]).resolve()
     
     # Run hydrogen bond analysis
-    analysis_script = scripts_dir / "analyze_hbonds.py"
     output_prefix = working_dir / "hbond_results"
-    
-    cmd = [
-        "python", str(analysis_script), str(final_complex),
-        "-o", str(output_prefix),
-        "--csv"
-    ]
-    
-    if dry_run:
-        cmd.append("--dry-run")
-    
-    run_command(cmd, cwd=working_dir, dry_run=dry_run)
+    print(f"Running: calculate_wns_score {final_complex}")
+    if not dry_run:
+        scores = calculate_wns_score(final_complex, None, "LIG")
+        if scores:
+            save_results_to_csv(scores, f"{output_prefix}.csv")
     
     # Check for outputs
     csv_file = working_dir / "hbond_results.csv"
@@ -151,7 +143,7 @@ def run_analysis_stage(config: Dict, final_complex: Path, dry_run: bool = False)
     print("Analysis stage completed")
 
 
-def main() -> None:
+def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--config", default="config.yml", help="Path to YAML config file")
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing")
@@ -159,7 +151,7 @@ def main() -> None:
                        default="all", help="Which stage to run")
     parser.add_argument("--input", type=Path, help="Input PDB file (skip wrapper stage)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Load configuration
     scripts_dir = Path(__file__).resolve().parent
@@ -29,8 +29,12 @@ def load_manifest(path: str) -> Dict[str, Any]:
 
 
 def save_manifest(path: str, manifest: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as handle:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
         yaml.safe_dump(manifest, handle, sort_keys=False, allow_unicode=False)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
 
 
 def update_software(manifest: Dict[str, Any], items: List[str]) -> None:
@@ -57,8 +61,15 @@ def update_kv_section(manifest: Dict[str, Any], section: str, items: List[str])
 
 
 def append_list(manifest: Dict[str, Any], section: str, values: List[Any]) -> None:
-    manifest.setdefault(section, [])
-    manifest[section].extend(values)
+    """Append values that are not already listed (reruns repeat the same commands)."""
+    if manifest.get(section) is None:
+        manifest[section] = []
+    seen = {" ".join(str(value).split()) for value in manifest[section]}
+    for value in values:
+        marker = " ".join(str(value).split())
+        if marker not in seen:
+            seen.add(marker)
+            manifest[section].append(value)
 
 
 def update_nested_parameter(manifest: Dict[str, Any], entries: List[str]) -> None:
@@ -7,10 +7,16 @@ import argparse
 import math
 import os
 import re
-import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from results_store import ResultsStore
+from run_metrics import measured_run
+from process_runner import run_process
+from gmx_runner import MDRUN_OUTPUTS
+from profiling import add_profile_argument, enable as enable_profiling, profiled
 
 
 class AtomRecord:
@@ -18,15 +24,17 @@ class AtomRecord:
     
     def __init__(self, line: str) -> None:
         self.line = line.rstrip('\n')
-        if len(line.split()) >= 6:
-            self.atom_id = int(line.split()[0])
-            self.atom_name = line.split()[1]
-            self.residue_name = line.split()[2]
-            self.residue_id = int(line.split()[3])
+        # Fixed GRO columns: resid(5) resname(5) atomname(5) atomnr(5) x y z(8 each).
+        # Residue number and name are not separated by whitespace ("1MET").
+        if len(self.line) >= 44:
+            self.residue_id = int(line[0:5])
+            self.residue_name = line[5:10].strip()
+            self.atom_name = line[10:15].strip()
+            self.atom_id = int(line[15:20])
             self.coord = (
-                float(line.split()[4]),
-                float(line.split()[5]),
-                float(line.split()[6]),
+                float(line[20:28]),
+                float(line[28:36]),
+                float(line[36:44]),
             )
         else:
             self.atom_id = 0
@@ -59,6 +67,7 @@ def calculate_rmsd(coords1: List[Tuple[float, float, float]],
     return math.sqrt(sum_sq_diff / len(coords1))
 
 
+@profiled
 def read_gro_file(gro_file: Path) -> Tuple[List[AtomRecord], List[str]]:
     """Read GRO file and return atom records and header/footer."""
     lines = gro_file.read_text(encoding='utf-8').splitlines()
@@ -99,10 +108,15 @@ def get_ligand_residues(atoms: List[AtomRecord], ligand_resname: str) -> Dict[in
     return ligand_residues
 
 
+@profiled
 def calculate_ligand_displacements(initial_atoms: List[AtomRecord], 
                                  final_atoms: List[AtomRecord],
                                  ligand_resname: str) -> Dict[int, float]:
-    """Calculate displacement for each ligand residue."""
+    """Calculate the centre-of-mass displacement (Å) of each ligand residue.
+
+    GRO coordinates are in nm; the result is converted to Å so it can be
+    compared with ``displacement_cutoff``.
+    """
     initial_ligands = get_ligand_residues(initial_atoms, ligand_resname)
     final_ligands = get_ligand_residues(final_atoms, ligand_resname)
     
@@ -133,7 +147,7 @@ def calculate_ligand_displacements(initial_atoms: List[AtomRecord],
         final_com = [c/n_atoms for c in final_com]
         
         displacement = calculate_distance(tuple(initial_com), tuple(final_com))
-        displacements[res_id] = displacement
+        displacements[res_id] = displacement * 10.0  # nm -> Å
     
     return displacements
 
@@ -184,7 +198,7 @@ def run_gromacs_command(gmx_exe: str, args: List[str], cwd: Path,
     cmd = [gmx_exe] + args
     print(f"Running: {' '.join(cmd)}")
     
-    result = subprocess.run(
+    result = measured_run(
         cmd, 
         cwd=cwd, 
         input=input_text, 
@@ -259,7 +273,11 @@ def validate_annealing_mdp(mdp_file: Path, cycle_time: float) -> None:
 def washing_cycle(work_dir: Path, gmx_exe: str = "gmx", 
                 ligand_resname: str = "LIG", 
                 displacement_cutoff: float = 6.0,
-                cycle_time: float = 1.0) -> None:
+                cycle_time: float = 1.0,
+                results_store: Optional[ResultsStore] = None,
+                run_id: Optional[str] = None,
+                cycle: Optional[int] = None,
+                ntomp: Optional[int] = None) -> None:
     """Run washing cycle with MD and ligand displacement analysis.
     
     Args:
@@ -268,6 +286,10 @@ def washing_cycle(work_dir: Path, gmx_exe: str = "gmx",
         ligand_resname: Residue name for ligands
         displacement_cutoff: Displacement threshold in Angstroms
         cycle_time: MD simulation time per cycle in nanoseconds
+        results_store: Optional results store that receives the displacements
+        run_id: Run key for the results store
+        cycle: Shaker cycle number for the results store
+        ntomp: OpenMP threads for mdrun (None: let GROMACS decide)
     """
     print(f"Starting washing cycle in {work_dir}")
     
@@ -301,11 +323,15 @@ def washing_cycle(work_dir: Path, gmx_exe: str = "gmx",
         work_dir
     )
     
-    run_gromacs_command(
-        gmx_exe, 
-        ["mdrun", "-deffnm", "anneal"],
-        work_dir
-    )
+    mdrun_args = ["mdrun", "-deffnm", "anneal"]
+    if ntomp:
+        mdrun_args += ["-ntomp", str(ntomp)]
+    # mdrun streams its progress into logs/mdrun_anneal.log and the status line
+    print(f"Running: {' '.join([gmx_exe] + mdrun_args)}")
+    job = run_process([gmx_exe] + mdrun_args, cwd=work_dir, name="mdrun_anneal", tail=[work_dir / "anneal.log"],
+                      outputs=[work_dir / f"anneal.{ext}" for ext in MDRUN_OUTPUTS])
+    if job.returncode != 0:
+        raise RuntimeError(f"GROMACS command failed, see {job.log_path}")
     
     # Extract final frame - calculate correct time point
     final_time_ps = int(cycle_time * 1000)  # Convert ns to ps
@@ -326,6 +352,10 @@ def washing_cycle(work_dir: Path, gmx_exe: str = "gmx",
     # Identify washed-away ligands
     washed_residues = {res_id for res_id, disp in displacements.items() if disp > displacement_cutoff}
     
+    if results_store is not None:
+        results_store.add_displacements(run_id or "default", displacements,
+                                        displacement_cutoff, cycle=cycle)
+    
     print(f"Ligand displacements:")
     for res_id, disp in displacements.items():
         status = "WASHED AWAY" if disp > displacement_cutoff else "OK"
@@ -352,10 +382,8 @@ def washing_cycle(work_dir: Path, gmx_exe: str = "gmx",
     # Update atom numbers in filtered structure
     for i, atom in enumerate(filtered_atoms):
         atom.atom_id = i + 1
-        # Update the line with new atom ID
-        parts = atom.line.split()
-        parts[0] = str(i + 1)
-        atom.line = ' '.join(parts)
+        # Update the atom number column (16-20) of the fixed-width line
+        atom.line = f"{atom.line[:15]}{(i + 1) % 100000:>5}{atom.line[20:]}"
     
     # Update header with new atom count
     header_footer[1] = str(len(filtered_atoms))
@@ -368,7 +396,7 @@ def washing_cycle(work_dir: Path, gmx_exe: str = "gmx",
     print(f"Washing cycle completed. {len(washed_residues)} ligands removed.")
 
 
-def main() -> None:
+def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("work_dir", type=Path, help="Working directory with GROMACS files")
     parser.add_argument("-g", "--gmx", default="gmx", help="GROMACS executable")
@@ -377,19 +405,35 @@ def main() -> None:
                        help="Displacement cutoff in Angstroms")
     parser.add_argument("-t", "--time", type=float, default=1.0,
                        help="MD simulation time per cycle in nanoseconds")
+    parser.add_argument("--results-db", type=Path, help="Append displacements to this results store")
+    parser.add_argument("--run-id", default="default", help="Run key for the results store")
+    parser.add_argument("--cycle", type=int, help="Shaker cycle number for the results store")
+    parser.add_argument("--ntomp", type=int, help="OpenMP threads for mdrun")
+    add_profile_argument(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.profile:
+        enable_profiling(args.profile, output_dir=args.work_dir / "profile")
     
     if not args.work_dir.exists():
         raise FileNotFoundError(f"Working directory not found: {args.work_dir}")
     
-    washing_cycle(
-        args.work_dir, 
-        args.gmx, 
-        args.ligand, 
-        args.cutoff,
-        args.time
-    )
+    store = ResultsStore(args.results_db) if args.results_db else None
+    try:
+        washing_cycle(
+            args.work_dir, 
+            args.gmx, 
+            args.ligand, 
+            args.cutoff,
+            args.time,
+            results_store=store,
+            run_id=args.run_id,
+            cycle=args.cycle,
+            ntomp=args.ntomp,
+        )
+    finally:
+        if store is not None:
+            store.close()
 
 
 if __name__ == "__main__":
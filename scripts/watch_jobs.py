@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Follow the DLGs and mdrun logs of running jobs: progress, throughput, ETA and JSON status files.
+
+    wns watch autodock_runs/wrapper_*.dlg
+    wns watch replica_*/md.log --status-dir /srv/monitoring/wns --interval 30
+    wns watch gmx/md.log --once
+
+For jobs started outside this process (queue workers, cluster jobs on a
+shared file system).  Tools started by the drivers already write their own
+status files next to their logs (see utils/process_runner.py).  Each file
+gets ``<file without suffix>.status.json`` beside it, or
+``<status-dir>/<name>.json``; the command returns once every job is complete.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from telemetry import STATUS_INTERVAL, FileTail, Telemetry, file_parser, format_eta, write_status
+
+
+def status_names(paths: List[Path]) -> Dict[Path, str]:
+    """File stem, prefixed with the directory name where stems repeat (``replica_01_md``)."""
+    stems = [path.stem for path in paths]
+    return {path: path.stem if stems.count(path.stem) == 1 else f"{path.parent.name}_{path.stem}"
+            for path in paths}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path, help="AutoDock .dlg or mdrun .log files")
+    parser.add_argument("--status-dir", type=Path, help="Write the status files into this directory")
+    parser.add_argument("--interval", type=float, default=STATUS_INTERVAL,
+                        help=f"Seconds between updates (default: {STATUS_INTERVAL})")
+    parser.add_argument("--once", action="store_true", help="Report the current state once and exit")
+    args = parser.parse_args(argv)
+
+    names = status_names(args.files)
+    watched = {path: (FileTail(path, skip_existing=False), Telemetry(file_parser(path))) for path in args.files}
+    while True:
+        complete = 0
+        for path, (tail, telemetry) in watched.items():
+            for line in tail.read():
+                telemetry.progress.feed(line)
+            telemetry.sample()
+            fraction = telemetry.progress.fraction
+            state = "waiting" if fraction is None else "done" if fraction >= 1.0 else "running"
+            complete += state == "done"
+            record = {"name": names[path], "state": state, "file": str(path)}
+            record.update(telemetry.snapshot())
+            status_path = (args.status_dir / f"{names[path]}.json" if args.status_dir
+                           else path.with_suffix(".status.json"))
+            write_status(status_path, record)
+
+            parts = [telemetry.progress.describe() or state]
+            if fraction is not None:
+                parts.append(f"({fraction:.0%})")
+            if record.get("ns_per_day") is not None:
+                parts.append(f"{record['ns_per_day']:.1f} ns/day")
+            elif record["rate_per_s"] is not None:
+                parts.append(f"{record['rate_per_s']:.1f} {record['unit']}/s")
+            if state == "running":
+                parts.append(format_eta(telemetry.eta_s))
+            print(f"{names[path]:<24} " + " ".join(part for part in parts if part))
+        if args.once or complete == len(watched):
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Single entry point for the Wrap 'n' Shake scripts.
+
+    python scripts/wns.py dock --config config.yml
+    python scripts/wns.py wash ../gmx -c 6.0
+    python scripts/wns.py <command> --help
+
+Every subcommand is the ``main(argv)`` of an existing script, imported only
+when that subcommand runs: PyYAML, NumPy and MDAnalysis are loaded by the
+command that needs them, so ``wns --help`` and the light commands start
+without them, and orchestrators can call stages in-process instead of
+starting another interpreter.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from typing import Dict, List, Tuple
+
+# command -> (module in scripts/, one-line help)
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "dock": ("wrap_n_shake_docking", "Wrapper: iterative masked AutoDock docking"),
+    "mask": ("mask_pdbqt", "Mask receptor atoms near docked ligands"),
+    "hotspots": ("find_hotspots", "Rank low-energy surface hotspots in AutoGrid maps"),
+    "coverage": ("coverage_report", "Receptor surface covered by docked ligands, and the largest gaps"),
+    "rescore": ("rescore_poses", "AutoDock4 energies of poses against existing AutoGrid maps"),
+    "maps": ("archive_maps", "Pack AutoGrid maps into a compressed delta archive, or restore them"),
+    "watch": ("watch_jobs", "Progress, throughput and ETA of running AutoDock/mdrun jobs from their logs"),
+    "wash": ("washing_cycle", "Shaker: one MD washing cycle"),
+    "pipeline": ("run_full_wrap_n_shake", "Complete Wrapper + Shaker pipeline"),
+    "score": ("generate_score_report", "WnS score report for the survivors"),
+    "hbonds": ("analyze_hbonds", "Count protein-ligand hydrogen bonds in a complex"),
+    "detect": ("run_hbond_detector", "Wrapper -> Shaker -> H-bond analysis in one process"),
+    "analyze": ("post_md_analysis", "MDAnalysis trajectory analysis (occupancy, contacts, RMSD)"),
+    "topology": ("build_ligand_topology", "Ligand .itp with bonds/angles/dihedrals perceived from coordinates"),
+    "queue": ("wns_queue", "Submit Shaker replicas to / inspect the shared work queue"),
+    "worker": ("wns_worker", "Claim and run queued docking seeds and Shaker replicas"),
+    "package": ("package_results", "Pack or restore the reproducibility archive"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    width = max(len(name) for name in COMMANDS)
+    epilog = "commands:\n" + "\n".join(
+        f"  {name:<{width}}  {help_text}" for name, (_, help_text) in COMMANDS.items())
+    parser = argparse.ArgumentParser(prog="wns", description=__doc__, epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command",
+                        help="Subcommand to run (see below)")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the subcommand")
+    return parser
+
+
+def run_command(command: str, argv: List[str]) -> int:
+    """Import the subcommand's module and call its ``main(argv)``."""
+    module_name, _ = COMMANDS[command]
+    module = importlib.import_module(module_name)
+    # argparse derives the usage line from argv[0]
+    saved_prog = sys.argv[0]
+    sys.argv[0] = f"wns {command}"
+    try:
+        result = module.main(argv)
+    finally:
+        sys.argv[0] = saved_prog
+    return result if isinstance(result, int) else 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return run_command(args.command, args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Submit work to, and inspect, the shared work queue used by ``wns worker``.
+
+    python scripts/wns.py queue status /shared/run/queue
+    python scripts/wns.py queue submit-shaker /shared/run/queue --gmx-dir ../gmx --replicas 4
+    python scripts/wns.py queue reclaim /shared/run/queue --stale-after 300
+
+Docking seeds are queued by ``run_autodock_batch.py --queue DIR``.
+``submit-shaker`` copies the equilibrated GROMACS directory once per replica
+(``<gmx-dir>_rep<N>``, kept if it already exists) and queues one
+``shaker_replica`` task for each copy.  Each replica writes its washing
+results to its own ``<gmx-dir>_rep<N>/wns_results.sqlite``: SQLite must not
+be shared between nodes over NFS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import yaml  # type: ignore
+except ImportError as exc:  # pragma: no cover
+    raise SystemExit("PyYAML is required. Install it via 'pip install pyyaml'.") from exc
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from work_queue import STATES, WorkQueue
+
+
+def load_config(config_path: Path) -> Dict:
+    """Load YAML configuration file."""
+    if not config_path.exists():
+        raise FileNotFoundError(
+            f"Configuration file '{config_path}' missing. Copy config.example.yml and adjust paths."
+        )
+    with config_path.open("r", encoding="utf-8") as handle:
+        return yaml.safe_load(handle)
+
+
+def submit_shaker_replicas(queue: WorkQueue, gmx_dir: Path, config: Dict, replicas: int,
+                           gmx_exe: str = "gmx", run_id: str | None = None) -> List[str]:
+    """Copy ``gmx_dir`` per replica and queue one ``shaker_replica`` task each; returns the task ids."""
+    gmx_dir = gmx_dir.resolve()
+    task_ids = []
+    for replica in range(1, replicas + 1):
+        replica_dir = gmx_dir.with_name(f"{gmx_dir.name}_rep{replica}")
+        if not replica_dir.exists():
+            shutil.copytree(gmx_dir, replica_dir)
+        replica_config = dict(config)
+        if (config.get("results") or {}).get("db"):
+            # One SQLite file per replica: only one node ever writes to it
+            replica_config["results"] = dict(config["results"], db=f"{replica_dir.name}/wns_results.sqlite")
+        payload = {"gmx_dir": str(replica_dir), "config": replica_config, "gmx": gmx_exe,
+                   "run_id": f"{run_id}-rep{replica}" if run_id else None}
+        task_ids.append(queue.submit("shaker_replica", payload, task_id=f"shaker_{replica_dir.name}"))
+    return task_ids
+
+
+def print_status(queue: WorkQueue) -> None:
+    counts = queue.status()
+    print("  ".join(f"{state}: {counts[state]}" for state in STATES))
+    for task_id in sorted(path.stem for path in (queue.root / "claimed").glob("*.json")):
+        claim = queue.root / "claimed" / f"{task_id}.claim"
+        worker = json.loads(claim.read_text(encoding="utf-8")).get("worker") if claim.exists() else "?"
+        print(f"  running  {task_id}  ({worker})")
+    for task_id in sorted(path.stem for path in (queue.root / "failed").glob("*.json")):
+        record = queue.result(task_id) or {}
+        print(f"  failed   {task_id}  {record.get('error', '')}")
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    status = subparsers.add_parser("status", help="Task counts, running claims and failures")
+    status.add_argument("queue", type=Path)
+
+    reclaim = subparsers.add_parser("reclaim", help="Requeue tasks of workers that stopped heartbeating")
+    reclaim.add_argument("queue", type=Path)
+    reclaim.add_argument("--stale-after", type=float, default=180.0)
+
+    shaker = subparsers.add_parser("submit-shaker", help="Queue Shaker replicas of an equilibrated system")
+    shaker.add_argument("queue", type=Path)
+    shaker.add_argument("--config", type=Path, default=Path("config.yml"), help="Path to YAML config file")
+    shaker.add_argument("--gmx-dir", type=Path, required=True, help="Equilibrated GROMACS directory")
+    shaker.add_argument("--replicas", type=int, default=1)
+    shaker.add_argument("--gmx", default="gmx", help="GROMACS executable on the worker nodes")
+    shaker.add_argument("--run-id", help="Results-store run id (suffixed with -rep<N>)")
+    shaker.add_argument("--wait", action="store_true", help="Block until every replica has finished")
+    args = parser.parse_args(argv)
+
+    if args.action == "status":
+        print_status(WorkQueue(args.queue))
+    elif args.action == "reclaim":
+        reclaimed = WorkQueue(args.queue, stale_after=args.stale_after).reclaim_stale()
+        print(f"Reclaimed {len(reclaimed)} task(s): {' '.join(reclaimed)}")
+    else:
+        queue = WorkQueue(args.queue)
+        task_ids = submit_shaker_replicas(queue, args.gmx_dir, load_config(args.config),
+                                          args.replicas, args.gmx, args.run_id)
+        print(f"Queued {len(task_ids)} Shaker replica(s) in {args.queue}")
+        if args.wait:
+            for task_id, record in queue.wait(task_ids).items():
+                print(f"  {task_id}: {record['state']} {record.get('result') or record.get('error', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Queue worker: claim docking seeds and Shaker replicas from a shared queue.
+
+Start any number of these, on any node that sees the shared run directory::
+
+    python scripts/wns.py worker /shared/run/queue
+    python scripts/wns.py worker /shared/run/queue --kinds shaker_replica --idle-exit 600
+
+Each worker reclaims stale claims, claims the oldest pending task, touches
+its heartbeat while the task runs, and writes the result (or error) back
+into the queue.  Tasks are queued by ``run_autodock_batch.py --queue``
+(docking seeds) and ``wns queue submit-shaker`` (Shaker replicas).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from work_queue import WorkQueue, default_worker_id
+from run_metrics import measured_run
+
+
+def run_command_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """``command`` task: run ``payload["cmd"]`` in ``payload["cwd"]``."""
+    start = time.perf_counter()
+    result = measured_run(payload["cmd"], cwd=payload.get("cwd"))
+    if result.returncode != 0:
+        raise RuntimeError(f"Command '{payload['cmd']}' failed with exit code {result.returncode}")
+    return {"returncode": result.returncode, "wall_s": round(time.perf_counter() - start, 3)}
+
+
+def run_shaker_replica(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """``shaker_replica`` task: the washing cycles in one replica's GROMACS directory."""
+    from run_full_wrap_n_shake import run_shaker_cycles
+    from washing_cycle import get_ligand_residues, read_gro_file
+
+    gmx_dir = Path(payload["gmx_dir"])
+    config = payload["config"]
+    start = time.perf_counter()
+    # A failed cycle must fail the task, not report the replica as finished
+    run_shaker_cycles(gmx_dir, config, payload.get("gmx", "gmx"), payload.get("run_id"), reraise=True)
+    atoms, _ = read_gro_file(gmx_dir / "npt.gro")
+    ligand_resname = config.get("shaker", {}).get("ligand_resname", "LIG")
+    return {"surviving_ligands": len(get_ligand_residues(atoms, ligand_resname)),
+            "wall_s": round(time.perf_counter() - start, 3)}
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "command": run_command_task,
+    "shaker_replica": run_shaker_replica,
+}
+
+
+def run_worker(queue: WorkQueue, worker_id: Optional[str] = None, kinds: Optional[List[str]] = None,
+               poll: float = 10.0, idle_exit: Optional[float] = None, max_tasks: Optional[int] = None) -> int:
+    """Process tasks until the queue stays empty for ``idle_exit`` seconds; returns tasks run.
+
+    Args:
+        queue: Shared work queue
+        worker_id: Name recorded in claims (default: host-pid)
+        kinds: Task kinds to accept (default: every kind with a handler)
+        poll: Seconds between looks at an empty queue
+        idle_exit: Stop after this long without work (None: run forever)
+        max_tasks: Stop after this many tasks
+    """
+    worker_id = worker_id or default_worker_id()
+    kinds = kinds or list(HANDLERS)
+    processed = 0
+    idle_since = time.monotonic()
+    while max_tasks is None or processed < max_tasks:
+        for task_id in queue.reclaim_stale():
+            print(f"[QUEUE] Reclaimed stale task {task_id}")
+        claim = queue.claim(worker_id, kinds)
+        if claim is None:
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                break
+            time.sleep(poll)
+            continue
+
+        print(f"[QUEUE] {worker_id} running {claim.id} ({claim.task['kind']}, attempt {claim.task['attempts']})")
+        try:
+            with claim.heartbeat():
+                result = HANDLERS[claim.task["kind"]](claim.task["payload"])
+        except KeyboardInterrupt:
+            queue.fail(claim, "worker interrupted")
+            raise
+        except Exception as exc:
+            state = queue.fail(claim, f"{type(exc).__name__}: {exc}")
+            print(f"[QUEUE] {claim.id} failed ({exc}); task is now {state}")
+        else:
+            if not queue.complete(claim, result):
+                print(f"[QUEUE] {claim.id} was already finished by another worker")
+        processed += 1
+        idle_since = time.monotonic()
+    return processed
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queue", type=Path, help="Queue directory on the shared volume")
+    parser.add_argument("--kinds", nargs="+", choices=list(HANDLERS), help="Only claim these task kinds")
+    parser.add_argument("--worker-id", help="Name recorded in claims (default: host-pid)")
+    parser.add_argument("--poll", type=float, default=10.0, help="Seconds between checks of an empty queue")
+    parser.add_argument("--idle-exit", type=float, help="Exit after this many seconds without work")
+    parser.add_argument("--max-tasks", type=int, help="Exit after this many tasks")
+    parser.add_argument("--heartbeat", type=float, default=30.0, help="Heartbeat interval in seconds")
+    parser.add_argument("--stale-after", type=float, default=180.0,
+                        help="Reclaim claims whose heartbeat is older than this")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Claims per task before it fails")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.queue, heartbeat_interval=args.heartbeat, stale_after=args.stale_after,
+                      max_attempts=args.max_attempts)
+    processed = run_worker(queue, args.worker_id, args.kinds, args.poll, args.idle_exit, args.max_tasks)
+    print(f"[QUEUE] Worker finished after {processed} task(s); queue: {queue.status()}")
+
+
+if __name__ == "__main__":
+    main()
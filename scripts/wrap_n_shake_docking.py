@@ -7,6 +7,7 @@ Supports checkpointing - can be interrupted and resumed from the last completed
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 import math
 import os
@@ -15,7 +16,7 @@ import subprocess
 import sys
 from pathlib import Path
 from string import Template
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 
 try:
     import yaml  # type: ignore
@@ -23,7 +24,20 @@ except ImportError as exc:  # pragma: no cover
     raise SystemExit("PyYAML is required. Install it via 'pip install pyyaml'.") from exc
 
 # Import our masking function
-from mask_pdbqt import mask_receptor
+from mask_pdbqt import find_coords_to_mask, mask_receptor
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'utils'))
+from structure_cache import load_structure
+from pose_dedup import read_pose
+from grid_maps import crop_maps, load_maps
+from hotspots import (DEFAULT_CONTACT, DEFAULT_ENERGY_CUTOFF, DEFAULT_MIN_VOLUME, DEFAULT_PADDING,
+                      find_hotspots, focus_box, focus_extent)
+from results_store import default_run_id, open_from_config
+from run_metrics import METRICS
+from process_runner import run_process
+from ga_budget import adaptive_from_config, best_docked_run, fld_box, ga_mapping
+from surface_coverage import CoverageStop, SurfaceCoverage, coverage_from_config, ligand_reach
+from profiling import add_profile_argument, enable as enable_profiling, profiled
 
 
 class CheckpointState:
@@ -37,6 +51,7 @@ class CheckpointState:
             "current_receptor": None,
             "autogrid_complete": False,
             "successful_docks": 0,
+            "tried_hotspots": [],
         }
     
     def load(self) -> bool:
@@ -68,8 +83,11 @@ class CheckpointState:
     def is_seed_completed(self, seed: int) -> bool:
         return seed in self.state["completed_seeds"]
     
-    def mark_seed_completed(self, seed: int, ligand_file: Optional[str], receptor_file: str) -> None:
+    def mark_seed_completed(self, seed: int, ligand_file: Optional[str], receptor_file: str,
+                            tried_hotspot: Optional[Sequence[float]] = None) -> None:
         self.state["completed_seeds"].append(seed)
+        if tried_hotspot is not None:
+            self.state.setdefault("tried_hotspots", []).append([float(value) for value in tried_hotspot])
         if ligand_file:
             self.state["docked_ligand_files"].append(ligand_file)
             self.state["successful_docks"] = len(self.state["docked_ligand_files"])
@@ -85,6 +103,10 @@ class CheckpointState:
     def get_successful_docks(self) -> int:
         return self.state.get("successful_docks", 0)
     
+    def get_tried_hotspots(self) -> List[tuple]:
+        """Centres of hotspots or coverage targets whose pose was rejected, so a resumed run skips them too."""
+        return [tuple(center) for center in self.state.get("tried_hotspots", [])]
+    
     def reset(self) -> None:
         """Reset checkpoint state."""
         self.state = {
@@ -93,6 +115,7 @@ class CheckpointState:
             "current_receptor": None,
             "autogrid_complete": False,
             "successful_docks": 0,
+            "tried_hotspots": [],
         }
         if self.checkpoint_file.exists():
             self.checkpoint_file.unlink()
@@ -165,38 +188,35 @@ def build_command(executable: str, args: List[str], use_wsl: bool = False) -> Li
     return [executable, *args]
 
 
-def run_command(cmd: List[str], dry_run: bool, cwd: Path | None = None) -> None:
-    """Run command and handle errors."""
+def run_command(cmd: List[str], dry_run: bool, cwd: Path | None = None, name: str | None = None,
+                log_dir: Path | None = None, tail: List[Path] = (), outputs: List[Path] | None = None) -> None:
+    """Run command and handle errors; output goes to ``<log_dir or cwd>/logs/<name>.log``."""
     print(" ".join(cmd))
     if dry_run:
         return
-    result = subprocess.run(cmd, check=False, cwd=cwd)
-    if result.returncode != 0:
-        raise RuntimeError(f"Command '{cmd}' failed with exit code {result.returncode}")
+    log_path = Path(log_dir or cwd or ".") / "logs" / f"{name}.log" if name else None
+    job = run_process(cmd, cwd=cwd, name=name, log_path=log_path, tail=tail, outputs=outputs)
+    if job.returncode != 0:
+        raise RuntimeError(f"Command '{cmd}' failed with exit code {job.returncode} (log: {job.log_path})")
+
+
+@profiled
+def autodock_command(autodock_exe: str, dpf_name: str, dlg_name: str, directory: Path) -> tuple:
+    """``(cmd, cwd)`` running autodock4 inside ``directory``, through WSL when it only exists there."""
+    if not windows_command_exists(autodock_exe) and wsl_command_exists(autodock_exe):
+        return ["wsl", "bash", "-c", f"cd {to_wsl_path(directory)} && {autodock_exe} -p {dpf_name} -l {dlg_name}"], None
+    return build_command(autodock_exe, ["-p", dpf_name, "-l", dlg_name], use_wsl=False), directory
 
 
 def extract_best_pose(dlg_file: Path, output_pdbqt: Path) -> None:
     """Extract the best (lowest energy) pose from AutoDock DLG file."""
-    best_pose_lines = []
-    found_best = False
-    
-    with dlg_file.open('r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-# Find the best pose section
-    for i, line in enumerate(lines):
-        if "DOCKED: USER    Run = 1" in line:
-            # Found best pose, extract coordinates
-            j = i
-            while j < len(lines) and not lines[j].startswith("DOCKED: USER    Run = 2"):
-                if lines[j].startswith("DOCKED: ATOM"):
-                    best_pose_lines.append(lines[j][8:])  # Remove "DOCKED: " prefix
-                j += 1
-            found_best = True
-            break
-    
-    if not found_best:
+    # Run = 1 is only the best model in merged DLGs; pick the lowest energy
+    best = best_docked_run(dlg_file)
+    if best is None:
         raise RuntimeError(f"Could not find best pose in {dlg_file}")
+    # Keep the energy so pose deduplication can rank the poses
+    best_pose_lines = [line[8:] + "\n" for line in best.lines  # Remove "DOCKED: " prefix
+                       if line.startswith(("DOCKED: ATOM", "DOCKED: USER    Estimated Free Energy"))]
     
 # Write best pose to PDBQT file
     with output_pdbqt.open('w', encoding='utf-8') as f:
@@ -209,65 +229,132 @@ def extract_best_pose(dlg_file: Path, output_pdbqt: Path) -> None:
     print(f"Extracted best pose to {output_pdbqt}")
 
 
+@profiled
 def check_ligand_clash(new_ligand_path: Path, existing_ligands: List[Path], 
                        min_distance: float = 2.0) -> bool:
     """Check if new ligand clashes with existing ligands."""
     if not existing_ligands:
         return False
     
-    # Load new ligand atoms
-    new_atoms = []
-    for line in new_ligand_path.read_text(encoding="utf-8").splitlines():
-        if line.startswith(("ATOM", "HETATM")):
-            try:
-                coord = (
-                    float(line[30:38]),
-                    float(line[38:46]),
-                    float(line[46:54]),
-                )
-                new_atoms.append(coord)
-            except (ValueError, IndexError):
-                continue
+    # Load new ligand atoms (parsed records are cached by content hash)
+    new_atoms = list(load_structure(new_ligand_path).valid_coords())
     
     if not new_atoms:
         return True  # Treat as clash if no valid atoms
     
     # Check against existing ligands
     for existing_ligand in existing_ligands:
-        existing_atoms = []
-        for line in existing_ligand.read_text(encoding="utf-8").splitlines():
-            if line.startswith(("ATOM", "HETATM")):
-                try:
-                    coord = (
-                        float(line[30:38]),
-                        float(line[38:46]),
-                        float(line[46:54]),
-                    )
-                    existing_atoms.append(coord)
-                except (ValueError, IndexError):
-                    continue
-        
-        # Calculate minimum distance
-        for new_coord in new_atoms:
-            for existing_coord in existing_atoms:
-                dist = math.sqrt(
-                    (new_coord[0] - existing_coord[0])**2 +
-                    (new_coord[1] - existing_coord[1])**2 +
-                    (new_coord[2] - existing_coord[2])**2
-                )
-                if dist < min_distance:
-                    return True  # Clash detected
+        existing_atoms = load_structure(existing_ligand).valid_coords()
+        if find_coords_to_mask(new_atoms, existing_atoms, min_distance):
+            return True  # Clash detected
     
     return False  # No clash
 
 
-def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoint: bool = False) -> None:
+def record_pose(results_store, run_id: str, cycle: int, seed: int,
+                pose_path: Path, accepted: bool) -> None:
+    """Append one docked pose (accepted or discarded) to the results store."""
+    if results_store is None:
+        return
+    coords = list(load_structure(pose_path).valid_coords())
+    center = None
+    if coords:
+        center = tuple(sum(float(c[k]) for c in coords) / len(coords) for k in range(3))
+    results_store.add_pose(run_id, cycle, seed, pose_path.stem, str(pose_path),
+                           accepted, energy=read_pose(pose_path)[2], center=center, n_atoms=len(coords))
+
+
+def focus_docking_box(gridfld: Path, ligand_types: List[str], receptor: Path, focus_dir: Path,
+                      settings: Dict, tried: List, coverage: Optional[SurfaceCoverage] = None) -> Optional[tuple]:
+    """Crop the AutoGrid maps around the best remaining surface hotspot.
+
+    Args:
+        gridfld: Field file of the full-receptor maps
+        ligand_types: AutoDock atom types of the ligand
+        receptor: Current (masked) receptor PDBQT
+        focus_dir: Directory for the cropped maps
+        settings: ``wrapper.hotspots`` config section
+        tried: Centres of hotspots whose pose was rejected; these are skipped
+        coverage: Surface coverage; hotspots with no uncovered surface
+            within ``contact`` are skipped
+
+    Returns:
+        ``(hotspot, fld_path, center)`` or None when no hotspot is left.
+    """
+    maps = load_maps(gridfld)
+    contact = settings.get("contact", DEFAULT_CONTACT)
+    hotspots = find_hotspots(maps, ligand_types, receptor.read_text(encoding="utf-8").splitlines(),
+                             energy_cutoff=settings.get("energy_cutoff", DEFAULT_ENERGY_CUTOFF),
+                             contact=contact, min_volume=settings.get("min_volume", DEFAULT_MIN_VOLUME))
+    grid = maps[ligand_types[0]]
+    for hotspot in hotspots:
+        if any(math.dist(hotspot.center, center) < contact for center in tried):
+            continue
+        if coverage is not None and not coverage.uncovered_area_near(hotspot.center, contact):
+            continue
+        lower, upper = focus_box(hotspot, grid, settings.get("padding", DEFAULT_PADDING))
+        fld_path = crop_maps(gridfld, lower, upper, focus_dir)
+        center = grid.point([(low + high) // 2 for low, high in zip(lower, upper)])
+        print(f"Hotspot {hotspot.rank}/{len(hotspots)}: volume {hotspot.volume:.1f} A^3, "
+              f"energy {hotspot.energy:.2f}, box {[high - low for low, high in zip(lower, upper)]} points")
+        return hotspot, fld_path, center
+    return None
+
+
+def focus_uncovered_box(gridfld: Path, ligand_types: List[str], coverage: SurfaceCoverage, focus_dir: Path,
+                        padding: float, radius: float, tried: List) -> Optional[tuple]:
+    """Crop the AutoGrid maps around the densest ligand-sized uncovered target inside the grid.
+
+    Args:
+        gridfld: Field file of the full-receptor maps
+        ligand_types: AutoDock atom types of the ligand
+        coverage: Surface coverage of the receptor
+        focus_dir: Directory for the cropped maps
+        padding: Box margin around the target (Å)
+        radius: Target radius (Å), the ligand's reach
+        tried: Centres of targets whose pose was rejected; these are skipped
+
+    Returns:
+        ``(target, fld_path, center)`` or None when the grid holds no uncovered target.
+    """
+    grid = load_maps(gridfld)[ligand_types[0]]
+    target = coverage.uncovered_target(radius, tried, grid)
+    if target is None:
+        return None
+    lower, upper = focus_extent(*target.extent(grid), grid, padding)
+    fld_path = crop_maps(gridfld, lower, upper, focus_dir)
+    center = grid.point([(low + high) // 2 for low, high in zip(lower, upper)])
+    uncovered = coverage.total_area - coverage.covered_area
+    print(f"Uncovered target: {target.area:.0f} of {uncovered:.0f} A^2 within {radius:.1f} A, "
+          f"box {[high - low for low, high in zip(lower, upper)]} points")
+    return target, fld_path, center
+
+
+def track_coverage(coverage: SurfaceCoverage, stop: CoverageStop, report: Path, cycle: int, seed: int,
+                   ligand: Optional[Path], receptor: Path) -> bool:
+    """Add one cycle's pose (None if rejected) to the coverage, report it; True once the loop should end."""
+    if ligand is None:
+        gain = coverage.update()
+    else:
+        gain = coverage.update(load_structure(ligand).valid_coords(),
+                               receptor.read_text(encoding="utf-8").splitlines())
+    entry = coverage.record(cycle, seed, gain, accepted=ligand is not None)
+    print(f"Surface coverage: {coverage.fraction:.1%} (+{gain:.1%}) of {entry['total_area']:.0f} A^2, "
+          f"{entry['residues_covered']}/{entry['residues']} residues covered")
+    with report.open("w", encoding="utf-8") as f:
+        json.dump(coverage.to_dict(), f, indent=2)
+    return stop.update(gain, coverage.fraction)
+
+
+def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoint: bool = False,
+                             run_id: Optional[str] = None) -> None:
     """Run Wrap 'n' Shake docking pipeline with checkpoint support.
     
     Args:
         config: Configuration dictionary
         dry_run: If True, only print commands without executing
         reset_checkpoint: If True, reset checkpoint and start fresh
+        run_id: Run key for the results store (``results.db`` in config)
     """
     scripts_dir = Path(__file__).resolve().parent
     working_dir = (scripts_dir / config["paths"]["working_dir"]).resolve()
@@ -278,6 +365,12 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
     output_dir = working_dir / config["wrapper"]["output_dir"]
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    # Optional results store for per-cycle pose records
+    results_store = None if dry_run else open_from_config(config, working_dir)
+    run_id = run_id or default_run_id(config)
+    if results_store is not None:
+        results_store.add_run(run_id, config)
+    
     # Initialize checkpoint system
     checkpoint_file = output_dir / "docking_checkpoint.json"
     checkpoint = CheckpointState(checkpoint_file)
@@ -335,7 +428,9 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
         else:
             autogrid_cmd = build_command(autogrid_exe, ["-p", gpf_path.name, "-l", "autogrid.log"], use_wsl=False)
         
-        run_command(autogrid_cmd, dry_run, cwd=output_dir if not use_wsl_autogrid else None)
+        map_files = [output_dir / f"{name}.map" for name in [*ligand_types, "e", "d"]]
+        run_command(autogrid_cmd, dry_run, cwd=output_dir if not use_wsl_autogrid else None,
+                    name="autogrid", log_dir=output_dir, outputs=[gridfld, output_dir / "autogrid.log", *map_files])
         
         if not dry_run:
             checkpoint.mark_autogrid_complete()
@@ -345,10 +440,32 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
     max_cycles = config.get("wrapper", {}).get("max_cycles", 20)
     min_ligand_distance = config.get("wrapper", {}).get("min_ligand_distance", 2.0)
     
+    # Optional hotspot pre-scan: dock each cycle into the best remaining low-energy region
+    hotspot_settings = config.get("wrapper", {}).get("hotspots") or {}
+    use_hotspots = bool(hotspot_settings.get("enabled", False))
+    tried_centers: List = checkpoint.get_tried_hotspots()
+    # Optional adaptive GA: stop each seed's runs once its best pose converged
+    adaptive = adaptive_from_config(config)
+    
     # Restore docked ligands from checkpoint
     docked_ligands = [Path(p) for p in checkpoint.get_docked_ligands()]
     successful_docks = checkpoint.get_successful_docks()
     
+    # Optional surface coverage: reported per cycle, steers the box, ends the loop once gains stall
+    coverage_settings = config.get("wrapper", {}).get("coverage") or {}
+    tracking = None if dry_run else coverage_from_config(config, receptor_pdbqt.read_text(encoding="utf-8").splitlines())
+    coverage, coverage_stop = tracking or (None, None)
+    steer = coverage is not None and bool(coverage_settings.get("steer", True))
+    coverage_report = output_dir / "coverage.json"
+    if steer:
+        target_radius = float(coverage_settings.get("target_radius") or
+                              ligand_reach(load_structure(ligand_pdbqt).valid_coords(), coverage.contact))
+    if coverage is not None:
+        coverage.update([coord for path in docked_ligands for coord in load_structure(path).valid_coords()],
+                        receptor_current.read_text(encoding="utf-8").splitlines())
+        print(f"Surface coverage: {coverage.fraction:.1%} of {coverage.total_area:.0f} A^2 "
+              f"({len(coverage.coords)} surface points)")
+    
     for i, seed in enumerate(seeds):
         if successful_docks >= max_cycles:
             print(f"\n=== Maximum cycles ({max_cycles}) reached, stopping ===")
@@ -361,6 +478,34 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
         
         print(f"\n=== Docking cycle {i+1}/{len(seeds)} (seed: {seed}) ===")
         
+        dock_dir = output_dir
+        dock_fld = gridfld
+        center = config["autogrid"]["center"]
+        tried_center = None
+        if use_hotspots and not dry_run:
+            focus = focus_docking_box(gridfld, config["inputs"]["ligand_types"].split(), receptor_current,
+                                      output_dir / "hotspots" / f"seed_{seed}", hotspot_settings, tried_centers,
+                                      coverage if steer else None)
+            if focus is None:
+                print("\n=== No unmasked hotspot left, stopping ===")
+                break
+            hotspot, dock_fld, center = focus
+            tried_center = hotspot.center
+            dock_dir = dock_fld.parent
+            shutil.copy2(ligand_pdbqt, dock_dir / ligand_pdbqt.name)
+        elif steer:
+            focus = focus_uncovered_box(gridfld, config["inputs"]["ligand_types"].split(), coverage,
+                                        output_dir / "coverage" / f"seed_{seed}",
+                                        float(coverage_settings.get("padding", DEFAULT_PADDING)),
+                                        target_radius, tried_centers)
+            if focus is None:
+                print("\n=== No untried uncovered surface left in the grid, stopping ===")
+                break
+            target, dock_fld, center = focus
+            tried_center = target.center
+            dock_dir = dock_fld.parent
+            shutil.copy2(ligand_pdbqt, dock_dir / ligand_pdbqt.name)
+        
         # Generate DPF file
         dpf_template = template_dir / "dpf_template.txt"
         map_definitions = "\n".join([
@@ -370,33 +515,34 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
         mapping = {
             "seed": str(seed),
             "ligand_types": config["inputs"]["ligand_types"],
-            "gridfld": gridfld.name,
+            "gridfld": dock_fld.name,
             "maps": map_definitions,
             "ligand_pdbqt": ligand_pdbqt.name,
             "receptor": receptor_current.stem,
-            "center_x": str(config["autogrid"]["center"][0]),
-            "center_y": str(config["autogrid"]["center"][1]),
-            "center_z": str(config["autogrid"]["center"][2]),
+            "center_x": str(center[0]),
+            "center_y": str(center[1]),
+            "center_z": str(center[2]),
         }
+        # The focused box of a hotspot is smaller than the configured one
+        npts, spacing = fld_box(dock_fld) or (config["autogrid"]["npts"], float(config["autogrid"]["spacing"]))
+        mapping.update(ga_mapping(config, ligand_pdbqt, npts, spacing))
         
         dpf_content = render_template(dpf_template, mapping)
-        dpf_path = output_dir / f"wrapper_{seed}.dpf"
+        dpf_path = dock_dir / f"wrapper_{seed}.dpf"
         write_file(dpf_path, dpf_content)
         
         # Run AutoDock
         autodock_exe = config["paths"]["autodock4"]
-        use_wsl_autodock = not windows_command_exists(autodock_exe) and wsl_command_exists(autodock_exe)
         
-        dlg_path = output_dir / f"wrapper_{seed}.dlg"
+        dlg_path = dock_dir / f"wrapper_{seed}.dlg"
         docked_ligand_path = output_dir / f"docked_ligand_{seed}.pdbqt"
         
-        if use_wsl_autodock:
-            wsl_output_dir = to_wsl_path(output_dir)
-            cmd = ["wsl", "bash", "-c", f"cd {wsl_output_dir} && {autodock_exe} -p {dpf_path.name} -l {dlg_path.name}"]
+        if adaptive is not None:
+            adaptive.dock(dpf_template, mapping, dock_dir, seed, functools.partial(autodock_command, autodock_exe),
+                          run_command, dry_run)
         else:
-            cmd = build_command(autodock_exe, ["-p", dpf_path.name, "-l", dlg_path.name], use_wsl=False)
-        
-        run_command(cmd, dry_run, cwd=output_dir if not use_wsl_autodock else None)
+            cmd, cwd = autodock_command(autodock_exe, dpf_path.name, dlg_path.name, dock_dir)
+            run_command(cmd, dry_run, cwd=cwd, name=f"autodock_{seed}", log_dir=dock_dir, tail=[dlg_path])
         
         # Skip post-processing in dry-run mode
         if dry_run:
@@ -409,12 +555,20 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
         # Check for ligand clashes
         if check_ligand_clash(docked_ligand_path, docked_ligands, min_ligand_distance):
             print(f"WARNING: Ligand {seed} clashes with existing ligands, discarding...")
+            record_pose(results_store, run_id, i + 1, seed, docked_ligand_path, accepted=False)
             docked_ligand_path.unlink()  # Remove the clashed ligand
+            if tried_center is not None:
+                tried_centers.append(tried_center)
             # Save checkpoint even for failed ligands
-            checkpoint.mark_seed_completed(seed, None, str(receptor_current))
+            checkpoint.mark_seed_completed(seed, None, str(receptor_current), tried_center)
+            if coverage is not None and track_coverage(coverage, coverage_stop, coverage_report, i + 1, seed,
+                                                       None, receptor_current):
+                print(f"\n=== {coverage_stop.reason.capitalize()}, stopping ===")
+                break
             continue
         
         # Accept this ligand
+        record_pose(results_store, run_id, i + 1, seed, docked_ligand_path, accepted=True)
         docked_ligands.append(docked_ligand_path)
         successful_docks += 1
         
@@ -427,6 +581,14 @@ def run_wrap_n_shake_docking(config: Dict, dry_run: bool = False, reset_checkpoi
         
         # Save checkpoint after successful docking
         checkpoint.mark_seed_completed(seed, str(docked_ligand_path), str(receptor_current))
+        
+        if coverage is not None and track_coverage(coverage, coverage_stop, coverage_report, i + 1, seed,
+                                                   docked_ligand_path, receptor_current):
+            print(f"\n=== {coverage_stop.reason.capitalize()}, stopping ===")
+            break
+    
+    if results_store is not None:
+        results_store.close()
     
     print(f"\n=== Wrap 'n' Shake docking completed ===")
     print(f"Successfully docked {len(docked_ligands)} ligands out of {len(seeds)} attempts:")
@@ -439,10 +601,16 @@ def main(argv: List[str] | None = None) -> None:
     parser.add_argument("--config", default="config.yml", help="Path to YAML config file")
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing")
     parser.add_argument("--reset", action="store_true", help="Reset checkpoint and start fresh")
+    add_profile_argument(parser)
     args = parser.parse_args(argv)
     
     config = load_config(Path(args.config))
-    run_wrap_n_shake_docking(config, args.dry_run, args.reset)
+    if args.profile:
+        work_dir = (Path(__file__).resolve().parent / config["paths"]["working_dir"]).resolve()
+        enable_profiling(args.profile, output_dir=work_dir / config["wrapper"]["output_dir"] / "profile")
+    with METRICS.stage("wrapper"):
+        run_wrap_n_shake_docking(config, args.dry_run, args.reset)
+    METRICS.print_summary()
 
 
 if __name__ == "__main__":
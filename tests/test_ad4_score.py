@@ -0,0 +1,141 @@
+import unittest
+import sys
+import math
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import ad4_score
+import synthetic
+from ad4_score import AD4Scorer, OUTSIDE_PENALTY, intramolecular_pairs, read_ligand_poses
+from grid_maps import GridMap
+
+NPTS = (20, 20, 20)
+
+
+def linear_map(a, b, c, d):
+    """Map with value ``a + b*x + c*y + d*z`` over a 10 Å cube at the origin (exact under trilinear interpolation)."""
+    values = [a + b * (-5 + 0.5 * i) + c * (-5 + 0.5 * j) + d * (-5 + 0.5 * k)
+              for k in range(NPTS[2] + 1) for j in range(NPTS[1] + 1) for i in range(NPTS[0] + 1)]
+    return GridMap(values, NPTS, 0.5, (0.0, 0.0, 0.0))
+
+
+def chain_pdbqt(path, coords, tree=None):
+    """Carbon chain PDBQT; ``tree`` lists (branch start index) to split it into rigid pieces."""
+    lines = ["ROOT"] if tree else []
+    for index, coord in enumerate(coords):
+        if tree and index in tree:
+            lines.append(f"BRANCH {index:>3} {index + 1:>3}")
+        lines.append(synthetic.pdbqt_line("HETATM", index + 1, f"C{index + 1}", "UNL", "A", 1, coord, 0.0, "C"))
+        if tree and index == tree[0] - 1:
+            lines.append("ENDROOT")
+    lines.extend("ENDBRANCH" for _ in (tree or []))
+    lines.append(f"TORSDOF {len(tree or [])}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+class TestAD4Score(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_intermolecular_terms(self):
+        """Affinity, charge x electrostatic and |charge| x desolvation maps are interpolated per atom."""
+        maps = {"C": linear_map(-0.3, 0.02, 0.0, 0.01), "OA": linear_map(-0.5, 0.0, 0.03, 0.0),
+                "e": linear_map(0.1, 0.05, 0.0, 0.0), "d": linear_map(0.2, 0.0, 0.0, -0.02)}
+        scorer = AD4Scorer(maps, ["C", "OA"], [0.1, -0.4], torsdof=2)
+
+        def expected(pose):
+            (x1, y1, z1), (x2, y2, z2) = pose
+            return ((-0.3 + 0.02 * x1 + 0.01 * z1) + 0.1 * (0.1 + 0.05 * x1) + 0.1 * (0.2 - 0.02 * z1)
+                    + (-0.5 + 0.03 * y2) - 0.4 * (0.1 + 0.05 * x2) + 0.4 * (0.2 - 0.02 * z2))
+
+        rng = random.Random(1)
+        poses = [[(rng.uniform(-4.9, 4.9), rng.uniform(-4.9, 4.9), rng.uniform(-4.9, 4.9)) for _ in range(2)]
+                 for _ in range(50)]
+        energies = scorer.score(poses)
+        for pose, inter, binding in zip(poses, energies["inter"], energies["binding"]):
+            self.assertAlmostEqual(inter, expected(pose), places=9)
+            self.assertAlmostEqual(binding, inter + 2 * 0.2983, places=9)
+        with mock.patch.object(ad4_score, "np", None):
+            self.assertEqual([round(value, 9) for value in scorer.score(poses)["inter"]],
+                             [round(value, 9) for value in energies["inter"]])
+
+        # An atom outside the grid costs the penalty instead of its map values
+        outside = scorer.score([[(7.0, 0.0, 0.0), (0.0, 0.0, 0.0)]])["inter"][0]
+        self.assertAlmostEqual(outside, OUTSIDE_PENALTY - 0.5 - 0.4 * 0.1 + 0.4 * 0.2, places=9)
+        with self.assertRaises(ValueError):
+            AD4Scorer(maps, ["C", "N"], [0.0, 0.0])
+
+    def test_intramolecular_pairs_follow_torsion_tree(self):
+        """Only atoms in different rigid pieces and more than three bonds apart interact."""
+        coords = [(1.5 * index, 0.0, 0.0) for index in range(6)]
+        flexible = read_ligand_poses(chain_pdbqt(self.dir / "chain.pdbqt", coords))
+        pairs = intramolecular_pairs(coords, flexible.names, flexible.types, flexible.segments)
+        self.assertEqual(pairs, [(0, 4), (0, 5), (1, 5)])
+
+        rigid_tail = read_ligand_poses(chain_pdbqt(self.dir / "tree.pdbqt", coords, tree=[2]))
+        self.assertEqual(rigid_tail.torsdof, 1)
+        self.assertEqual(rigid_tail.segments, [0, 0, 1, 1, 1, 1])
+        self.assertEqual(intramolecular_pairs(coords, rigid_tail.names, rigid_tail.types, rigid_tail.segments),
+                         [(0, 4), (0, 5), (1, 5)])
+        rigid = read_ligand_poses(chain_pdbqt(self.dir / "rigid.pdbqt", coords, tree=[5]))
+        self.assertEqual(intramolecular_pairs(coords, rigid.names, rigid.types, rigid.segments), [(0, 5), (1, 5)])
+
+        # Uncharged carbons: 12-6 van der Waals plus desolvation
+        maps = {"C": linear_map(0.0, 0.0, 0.0, 0.0)}
+        scorer = AD4Scorer(maps, flexible.types, flexible.charges, pairs)
+
+        def pair(r):
+            vdw = 0.1662 * 0.15 * ((4.0 / r) ** 12 - 2 * (4.0 / r) ** 6)
+            desolv = 0.1322 * 2 * (-0.00143 * 33.5103) * math.exp(-r * r / (2 * 3.6 ** 2))
+            return vdw + desolv
+
+        intra = scorer.score([coords])["intra"][0]
+        self.assertAlmostEqual(intra, 2 * pair(6.0) + pair(7.5), places=9)
+        with mock.patch.object(ad4_score, "np", None):
+            self.assertAlmostEqual(scorer.score([coords])["intra"][0], intra, places=9)
+
+    def test_rescore_cli_ranks_models(self):
+        """``wns rescore`` scores every MODEL of every file and ranks them by binding energy."""
+        import json
+        import wns
+
+        maps_dir = self.dir / "maps"
+        maps_dir.mkdir()
+        for name, grid in (("C", linear_map(-0.2, 0.05, 0.0, 0.0)), ("e", linear_map(0.0, 0.0, 0.0, 0.0)),
+                           ("d", linear_map(0.0, 0.0, 0.0, 0.0))):
+            grid.write(maps_dir / f"{name}.map")
+        (maps_dir / "protein.maps.fld").write_text(
+            "variable 1 file=C.map filetype=ascii skip=6\nvariable 2 file=e.map filetype=ascii skip=6\n"
+            "variable 3 file=d.map filetype=ascii skip=6\n", encoding="utf-8")
+        models = []
+        for model, shift in enumerate((2.0, -3.0, 0.0), start=1):
+            atoms = [synthetic.pdbqt_line("HETATM", index + 1, f"C{index + 1}", "UNL", "A", 1,
+                                          (shift + 1.5 * index, 0.0, 0.0), 0.0, "C") for index in range(3)]
+            models.append("\n".join([f"MODEL {model}", *atoms, "ENDMDL"]))
+        poses = self.dir / "vina_out.pdbqt"
+        poses.write_text("\n".join(models) + "\n", encoding="utf-8")
+
+        output = self.dir / "scores.json"
+        self.assertEqual(wns.main(["rescore", str(maps_dir / "protein.maps.fld"), str(poses),
+                                   "--json", str(output)]), 0)
+        records = json.loads(output.read_text(encoding="utf-8"))
+        self.assertEqual([record["model"] for record in records], [2, 3, 1])
+        self.assertAlmostEqual(records[0]["inter"], 3 * -0.2 + 0.05 * (-3.0 * 3 + 4.5), places=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import synthetic
+from run_benchmarks import compare, run_benchmarks
+from washing_cycle import read_gro_file
+from structure_cache import parse_structure_text
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_synthetic_files_parse(self):
+        """Generated receptor and GRO files have the requested size and valid columns."""
+        receptor = synthetic.write_receptor_pdbqt(self.dir / "receptor.pdbqt", 1003)
+        structure = parse_structure_text(receptor.read_text(encoding="utf-8"))
+        self.assertEqual(len(structure), 1003)
+        self.assertTrue(all(structure.valid))
+        self.assertEqual(set(structure.atom_type), {"N", "HD", "C", "OA"})
+
+        gro = synthetic.write_gro_system(self.dir / "system.gro", 500, n_ligands=3)
+        atoms, header = read_gro_file(gro)
+        self.assertEqual(len(atoms), 500 + 3 * len(synthetic.LIGAND_TEMPLATE))
+        self.assertEqual(atoms[0].residue_name, "ALA")
+        self.assertEqual(atoms[-1].residue_name, "LIG")
+        self.assertAlmostEqual(atoms[1].coord[1] - atoms[0].coord[1], 0.101, places=3)
+
+    def test_quick_run_and_compare(self):
+        """The quick preset times every benchmark; compare flags slower medians."""
+        document = run_benchmarks("quick", repeats=1, workdir=self.dir)
+        names = {row["benchmark"] for row in document["results"]}
+        self.assertEqual(names, {"find_atoms_to_mask", "check_ligand_clash", "count_hydrogen_bonds",
+                                 "read_gro_file", "extract_best_pose", "analyze_structure",
+                                 "build_ligand_topology", "cluster_poses", "rescore_poses", "archive_maps"})
+
+        slower = {"results": [dict(row, median_s=row["median_s"] * 2) for row in document["results"]]}
+        rows = compare(document, slower, threshold=1.25)
+        self.assertEqual(len(rows), len(document["results"]))
+        self.assertTrue(all(row["regression"] for row in rows))
+        self.assertFalse(any(row["regression"] for row in compare(document, document)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import sys
+import math
+import tempfile
+import shutil
+from pathlib import Path
+from unittest import mock
+
+# Add project root, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import complex_assembly
+from complex_assembly import AssemblyError, assemble_complex
+
+# Ethanol (nm) in ACPYPE order: C1 C2 O1 then the hydrogens
+ETHANOL = [
+    ("C1", "c3", 12.01, (0.000, 0.000, 0.000)),
+    ("C2", "c3", 12.01, (0.152, 0.000, 0.000)),
+    ("O1", "oh", 16.00, (0.200, 0.135, 0.000)),
+    ("H1", "hc", 1.008, (-0.036, -0.103, 0.000)),
+    ("H2", "hc", 1.008, (-0.036, 0.051, 0.089)),
+    ("H3", "hc", 1.008, (-0.036, 0.051, -0.089)),
+    ("H4", "h1", 1.008, (0.188, -0.051, 0.089)),
+    ("H5", "h1", 1.008, (0.188, -0.051, -0.089)),
+    ("H6", "ho", 1.008, (0.297, 0.135, 0.000)),
+]
+BONDS = [(1, 2), (2, 3), (1, 4), (1, 5), (1, 6), (2, 7), (2, 8), (3, 9)]
+
+
+def rotate(point, angle, offset):
+    """Rotate about z then x by ``angle`` and translate by ``offset``."""
+    x, y, z = point
+    x, y = x * math.cos(angle) - y * math.sin(angle), x * math.sin(angle) + y * math.cos(angle)
+    y, z = y * math.cos(angle) - z * math.sin(angle), y * math.sin(angle) + z * math.cos(angle)
+    return (x + offset[0], y + offset[1], z + offset[2])
+
+
+def distance(a, b):
+    return math.sqrt(sum((p - q) ** 2 for p, q in zip(a, b)))
+
+
+class TestComplexAssembly(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        acpype = self.test_dir / "ligand.acpype"
+        acpype.mkdir()
+        itp = ["[ moleculetype ]\n ligand 3\n\n[ atoms ]\n"]
+        itp += [f"{i:>6} {t:>4} 1 LIG {name:>5} {i:>5} 0.0 {mass:8.3f}\n"
+                for i, (name, t, mass, _) in enumerate(ETHANOL, start=1)]
+        itp += ["\n[ bonds ]\n"] + [f"{i:>6} {j:>6}   1\n" for i, j in BONDS]
+        (acpype / "ligand_GMX.itp").write_text("".join(itp), encoding="utf-8")
+        (acpype / "posre_ligand.itp").write_text("[ position_restraints ]\n", encoding="utf-8")
+        gro = [f"{1:>5}{'LIG':<5}{name:>5}{i:>5}{x:8.3f}{y:8.3f}{z:8.3f}"
+               for i, (name, _, _, (x, y, z)) in enumerate(ETHANOL, start=1)]
+        (acpype / "ligand_GMX.gro").write_text("ligand\n9\n" + "\n".join(gro) + "\n   3.0   3.0   3.0\n",
+                                               encoding="utf-8")
+        self.acpype = acpype
+
+        (self.test_dir / "protein.gro").write_text(
+            "protein\n2\n   41ALA      N    1   1.000   1.000   1.000\n"
+            "   41ALA     CA    2   1.100   1.000   1.000\n   5.00000   5.00000   5.00000\n",
+            encoding="utf-8")
+        (self.test_dir / "topol.top").write_text(
+            '#include "amber99sb-ildn.ff/forcefield.itp"\n\n#include "amber99sb-ildn.ff/tip3p.itp"\n\n'
+            "[ system ]\nProtein\n\n[ molecules ]\n; Compound        #mols\nProtein_chain_A     1\n",
+            encoding="utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write_complex(self, copies):
+        """AutoDock-style ligands: duplicate names, no non-polar H, shuffled order, rotated poses."""
+        order = [2, 8, 1, 0]  # O, polar H, C, C
+        lines = ["ATOM      1  N   ALA A  41      10.000  10.000  10.000  1.00  0.00"]
+        self.poses = []
+        for copy in range(copies):
+            pose = {index: rotate(ETHANOL[index][3], 0.4 * copy, (0.5 * copy, 1.0, 2.0)) for index in order}
+            self.poses.append(pose)
+            for index in order:
+                x, y, z = (value * 10 for value in pose[index])
+                name = ETHANOL[index][0][0]
+                lines.append(f"HETATM{len(lines) + 1:>5}  {name:<3} UNL A{copy + 1:>4}    "
+                             f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00")
+        path = self.test_dir / "complex.pdb"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
+    def check_assembly(self, copies):
+        count = assemble_complex(self.write_complex(copies), self.acpype, self.test_dir)
+        self.assertEqual(count, copies)
+
+        lines = (self.test_dir / "complex.gro").read_text(encoding="utf-8").splitlines()
+        self.assertEqual(int(lines[1]), 2 + 9 * copies)
+        self.assertEqual(lines[-1].split(), ["5.00000", "5.00000", "5.00000"])
+        atoms = lines[4:-1]
+        self.assertEqual(sorted({int(line[:5]) for line in atoms}), list(range(42, 42 + copies)))
+        for copy in range(copies):
+            block = atoms[9 * copy:9 * copy + 9]
+            self.assertEqual([line[10:15].strip() for line in block], [atom[0] for atom in ETHANOL])
+            coords = [tuple(float(line[20 + 8 * k:28 + 8 * k]) for k in range(3)) for line in block]
+            for index, expected in self.poses[copy].items():
+                self.assertAlmostEqual(distance(coords[index], expected), 0.0, delta=0.001)
+            for hydrogen, parent in ((3, 0), (4, 0), (5, 0), (6, 1), (7, 1)):
+                self.assertAlmostEqual(distance(coords[hydrogen], coords[parent]), 0.109, delta=0.003)
+            # Fitted hydrogens sit where the template puts them relative to O1
+            self.assertAlmostEqual(distance(coords[3], coords[2]), distance(ETHANOL[3][3], ETHANOL[2][3]),
+                                   delta=0.003)
+
+        top = (self.test_dir / "topol.top").read_text(encoding="utf-8")
+        self.assertIn('forcefield.itp"\n#include "ligand.itp"', top)
+        self.assertTrue(top.rstrip().endswith(f"ligand              {copies}"))
+        self.assertTrue((self.test_dir / "ligand.itp").read_text(encoding="utf-8").startswith("[ moleculetype ]"))
+
+    def test_many_copies_graph_mapped(self):
+        """Duplicate-named poses are mapped by bond graph; missing hydrogens are fitted."""
+        self.check_assembly(25)
+        # Rerunning (stage retry) replaces the count instead of adding a second entry
+        self.check_assembly(3)
+        self.assertEqual((self.test_dir / "topol.top").read_text(encoding="utf-8").count("#include \"ligand.itp\""), 1)
+
+    def test_python_fallback(self):
+        """The pure-Python fit gives the same placement."""
+        with mock.patch.object(complex_assembly, "np", None):
+            self.check_assembly(4)
+
+    def test_mismatched_pose_rejected(self):
+        """A pose that is not the parameterized ligand fails loudly."""
+        path = self.write_complex(1)
+        lines = path.read_text(encoding="utf-8").splitlines()
+        path.write_text("\n".join(lines[:-1]) + "\n", encoding="utf-8")
+        with self.assertRaises(AssemblyError):
+            assemble_complex(path, self.acpype, self.test_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
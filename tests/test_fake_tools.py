@@ -0,0 +1,86 @@
+import unittest
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import synthetic
+from bench_orchestration import run_once
+from washing_cycle import read_gro_file
+
+
+class TestFakeTools(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.env = dict(os.environ, WNS_FAKE_STATE_DIR=str(self.dir / "state"))
+        self.env.pop("WNS_FAKE_FAIL", None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_shim(self, tool, *args):
+        shim = self.dir / "bin" / (f"{tool}.cmd" if os.name == "nt" else tool)
+        return subprocess.run([str(shim), *args], cwd=self.dir, env=self.env,
+                              capture_output=True, text=True)
+
+    def test_gmx_round_trip(self):
+        """grompp -> mdrun -> trjconv outputs parse as GRO; washed ligands move away."""
+        fake_tools.install(self.dir / "bin")
+        self.env["WNS_FAKE_WASH_FRACTION"] = "1.0"
+        synthetic.write_gro_system(self.dir / "start.gro", 300, n_ligands=4)
+        (self.dir / "run.mdp").write_text("nsteps = 1000\nnstxout-compressed = 100\n", encoding="utf-8")
+        (self.dir / "topol.top").write_text("[ molecules ]\nProtein 1\nLIG 4\n", encoding="utf-8")
+
+        self.assertEqual(self.run_shim("gmx", "grompp", "-f", "run.mdp", "-c", "start.gro",
+                                       "-o", "run.tpr").returncode, 0)
+        self.assertEqual(self.run_shim("gmx", "mdrun", "-deffnm", "run").returncode, 0)
+        result = self.run_shim("gmx", "trjconv", "-s", "run.tpr", "-f", "run.xtc",
+                               "-o", "last.gro", "-dump", "10")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        start, _ = read_gro_file(self.dir / "start.gro")
+        final, _ = read_gro_file(self.dir / "run.gro")
+        dumped, _ = read_gro_file(self.dir / "last.gro")
+        self.assertEqual(len(final), len(start))
+        self.assertEqual(len(dumped), len(start))
+        moved = [max(abs(a - b) for a, b in zip(before.coord, after.coord))
+                 for before, after in zip(start, final)]
+        self.assertLess(max(moved[:300]), 0.5)
+        self.assertGreater(min(moved[300:]), 0.5)
+
+    def test_injected_failure(self):
+        """WNS_FAKE_FAIL fails only the requested call."""
+        fake_tools.install(self.dir / "bin")
+        self.env["WNS_FAKE_FAIL"] = "gmx make_ndx:2"
+        synthetic.write_gro_system(self.dir / "start.gro", 50)
+        codes = [self.run_shim("gmx", "make_ndx", "-f", "start.gro", "-o", "index.ndx").returncode
+                 for _ in range(3)]
+        self.assertEqual(codes, [0, 1, 0])
+
+    def test_orchestration_resume(self):
+        """A crashed docking run resumes and completes every seed exactly once."""
+        args = argparse.Namespace(seeds=3, cycles=1, receptor_atoms=300, npts=10, latency=0.0,
+                                  mdrun_latency=None, busy=False, crash_at=2)
+        result = run_once(args, workdir=self.dir)
+        phases = [phase["phase"] for phase in result["phases"]]
+        self.assertEqual(phases, ["docking_crash", "docking_resume", "washing"])
+        self.assertIn("error", result["phases"][0])
+        self.assertNotIn("error", result["phases"][1])
+        self.assertEqual(result["seeds_completed"], 3)
+        self.assertTrue(result["seeds_unique"])
+        self.assertGreaterEqual(result["ligands_docked"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import synthetic
+from ga_budget import DEFAULT_GA, GABudget, best_docked_run, fld_box, ga_mapping, read_dlg_runs, search_volume, torsion_count
+
+
+class TestGABudget(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_evals_scale_with_torsions_and_volume(self):
+        """A rigid ligand in the reference box gets base_evals; torsions and volume add to it."""
+        budget = GABudget()
+        self.assertEqual(budget.evals(0, search_volume((60, 60, 60), 0.375)), 250000)
+        self.assertAlmostEqual(budget.evals(10, 47.0 ** 3), 4530000, delta=20000)
+        self.assertEqual(budget.evals(0, 10.0 ** 3), 250000)  # clamped to min_evals
+        self.assertEqual(budget.evals(40, 120.0 ** 3), 25000000)  # clamped to max_evals
+        with self.assertRaises(ValueError):
+            GABudget(min_evals=10, max_evals=5)
+
+        ligand = self.dir / "ligand.pdbqt"
+        ligand.write_text("ROOT\nENDROOT\nBRANCH 1 2\nENDBRANCH 1 2\nTORSDOF 3\n", encoding="utf-8")
+        self.assertEqual(torsion_count(ligand), 3)
+        fld = self.dir / "protein.maps.fld"
+        fld.write_text("# AVS field file\n#SPACING 0.375\n#NELEMENTS 60 60 60\n", encoding="utf-8")
+        self.assertEqual(fld_box(fld), ((60, 60, 60), 0.375))
+
+        # Off by default: the values dpf_template.txt used to hard-code
+        self.assertEqual(ga_mapping({}, ligand, (60, 60, 60), 0.375),
+                         {key: str(value) for key, value in DEFAULT_GA.items()})
+        config = {"wrapper": {"ga_budget": {"enabled": True, "max_runs": 6}}}
+        mapping = ga_mapping(config, ligand, (60, 60, 60), 0.375)
+        self.assertEqual((mapping["ga_num_evals"], mapping["ga_run"]), ("625000", "6"))
+
+    def test_best_pose_is_the_lowest_energy_model(self):
+        """Both drivers extract the lowest-energy model of an unsorted DLG, not Run = 1."""
+        from run_autodock_batch import extract_best_pose as batch_extract
+        from wrap_n_shake_docking import extract_best_pose as wrapper_extract
+
+        dlg = synthetic.write_dlg(self.dir / "wrapper_101.dlg", n_runs=6, generations=2, seed=3)
+        runs = read_dlg_runs(dlg)
+        best = best_docked_run(dlg)
+        self.assertEqual(best.energy, min(docked.energy for docked in runs))
+        self.assertNotEqual(best.run, 1)
+        for extract in (batch_extract, wrapper_extract):
+            pose = self.dir / f"{extract.__module__}.pdbqt"
+            extract(dlg, pose)
+            text = pose.read_text(encoding="utf-8")
+            self.assertIn(f"{best.energy:7.2f} kcal/mol", text)
+            atoms = [line for line in text.splitlines() if line.startswith("ATOM")]
+            self.assertEqual(atoms, [line[8:] for line in best.lines if line.startswith("DOCKED: ATOM")])
+        # A clashing pose's energy is written in e-notation and must not read as its mantissa
+        clash = synthetic.write_dlg(self.dir / "clash.dlg", n_runs=2, generations=2, seed=3)
+        energies = iter(["+1.07e+03", "+5.00"])
+        clash.write_text(re.sub(r"(Estimated Free Energy of Binding\s*=\s*)\S+",
+                                lambda match: match.group(1) + next(energies), clash.read_text(encoding="utf-8")),
+                         encoding="utf-8")
+        self.assertEqual([docked.energy for docked in read_dlg_runs(clash)], [1070.0, 5.0])
+        self.assertEqual(best_docked_run(clash).run, 2)
+        empty = self.dir / "empty.dlg"
+        empty.write_text("autodock4: Successful Completion.\n", encoding="utf-8")
+        self.assertIsNone(best_docked_run(empty))
+
+    def run_adaptive_batch(self, funnel, queue=None):
+        """Run ``run_autodock_batch.py`` with the adaptive GA; returns output dir and autodock4 calls."""
+        from run_autodock_batch import main as run_batch
+        from wns_worker import run_worker
+        from work_queue import WorkQueue
+
+        (self.dir / "pdbqt").mkdir(exist_ok=True)
+        lines = [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", 1, (1.5 * index, 3.0, 3.0), 0.0, "C")
+                 for index in range(6)]
+        (self.dir / "pdbqt" / "protein.pdbqt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (4.0, 3.0, 3.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [60, 60, 60], "center": [4, 3, 3], "spacing": 0.375},
+            "wrapper": {"seeds": [101], "output_dir": f"runs_{funnel}",
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates"),
+                        "ga_budget": {"enabled": True, "adaptive": True, "chunk_runs": 2, "max_runs": 12}},
+        }
+        config_path = self.dir / "config.yml"
+        config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        state_dir = self.dir / f"state_{funnel}"
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(state_dir), "WNS_FAKE_FUNNEL": str(funnel)}
+        with mock.patch.dict(os.environ, env):
+            if queue is None:
+                run_batch(["--config", str(config_path)])
+            else:
+                worker = threading.Thread(target=run_worker, args=(WorkQueue(queue),),
+                                          kwargs={"poll": 0.05, "max_tasks": 1})
+                worker.start()
+                run_batch(["--config", str(config_path), "--queue", str(queue)])
+                worker.join(timeout=60)
+        return self.dir / f"runs_{funnel}", (state_dir / "autodock4.calls").stat().st_size
+
+    def test_adaptive_runs_stop_once_converged(self):
+        """A funnelled search stops after a few chunks; the merged DLG ranks the best run first."""
+        output_dir, calls = self.run_adaptive_batch(0.8)
+        self.assertLess(calls, 6)
+        runs = read_dlg_runs(output_dir / "wrapper_101.dlg")
+        self.assertEqual(len(runs), 2 * calls)
+        self.assertEqual([docked.run for docked in runs], list(range(1, len(runs) + 1)))
+        self.assertEqual(runs[0].energy, min(docked.energy for docked in runs))
+        text = (output_dir / "wrapper_101.dlg").read_text(encoding="utf-8")
+        self.assertIn(f"DPF> ga_run {len(runs)}", text)
+        self.assertIn("converged", text)
+        self.assertIn("ga_num_evals 250000", (output_dir / "ga_chunk_101_01.dpf").read_text(encoding="utf-8"))
+        self.assertTrue((output_dir / "wrapped_complex.pdb").exists())
+
+    def test_adaptive_runs_without_convergence_reach_max_runs(self):
+        """Without a funnel the best pose keeps moving, so every run up to max_runs is spent."""
+        output_dir, calls = self.run_adaptive_batch(0)
+        self.assertEqual(calls, 6)
+        self.assertEqual(len(read_dlg_runs(output_dir / "wrapper_101.dlg")), 12)
+        self.assertIn("stopped at max_runs 12", (output_dir / "wrapper_101.dlg").read_text(encoding="utf-8"))
+
+    def test_queued_seeds_warn_that_adaptive_runs_do_not_apply(self):
+        """Queued seeds are single autodock4 commands: they run all max_runs, and the batch says so."""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            output_dir, calls = self.run_adaptive_batch(0.8, queue=self.dir / "queue")
+        self.assertIn("adaptive does not apply to --queue", output.getvalue())
+        self.assertEqual(calls, 1)
+        self.assertEqual(len(read_dlg_runs(output_dir / "wrapper_101.dlg")), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
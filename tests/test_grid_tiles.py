@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+import json
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import synthetic
+from grid_tiles import MAX_NPTS, crop_receptor, plan_tiles, surface_atoms
+
+
+def receptor_lines(length, rng):
+    """A rod of atoms along x, ``length`` Å long and 6 Å thick."""
+    coords = [(rng.uniform(0, length), rng.uniform(0, 6), rng.uniform(0, 6)) for _ in range(int(length * 20))]
+    return [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", 1 + index // 10, coord, 0.0, "C")
+            for index, coord in enumerate(coords)], coords
+
+
+class TestGridTiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tiles_cover_surface_within_limit(self):
+        """A 243 Å receptor gets 0.375 Å tiles of at most 126 points that overlap and cover its surface."""
+        _, coords = receptor_lines(243.0, random.Random(1))
+        tiles = plan_tiles(coords, overlap=10.0)
+        self.assertEqual(len(tiles), 8)
+        for tile in tiles:
+            self.assertTrue(all(n <= MAX_NPTS and n % 2 == 0 for n in tile.npts))
+            self.assertEqual(tile.spacing, 0.375)
+        for first, second in zip(tiles, tiles[1:]):
+            self.assertAlmostEqual(first.upper[0] - second.lower[0], 10.0, places=6)
+        for point in surface_atoms(coords):
+            self.assertTrue(any(tile.contains(point) for tile in tiles))
+
+        lines, _ = receptor_lines(243.0, random.Random(1))
+        cropped = crop_receptor(lines, tiles, margin=5.0)
+        with mock.patch("grid_tiles.np", None):
+            self.assertEqual(crop_receptor(lines, tiles, margin=5.0), cropped)
+        self.assertEqual(set().union(*cropped), set(lines))
+
+    def test_tiled_docking_reuses_unchanged_tiles(self):
+        """Only tiles whose cropped receptor changed are regridded; poses from all tiles are merged."""
+        from run_autodock_batch import main as run_batch
+
+        rng = random.Random(2)
+        lines, _ = receptor_lines(20.0, rng)
+        (self.dir / "pdbqt").mkdir()
+        receptor = self.dir / "pdbqt" / "protein.pdbqt"
+        receptor.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (10.0, 3.0, 3.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [20, 20, 20], "center": [0, 0, 0], "spacing": 0.375,
+                         "tiling": {"enabled": True, "max_npts": 24, "overlap": 2.0, "padding": 1.0,
+                                    "margin": 2.0}},
+            "wrapper": {"seeds": [101, 202], "output_dir": "autodock_runs",
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates")},
+            "scheduler": {"cores": 2},
+        }
+        config_path = self.dir / "config.yml"
+        config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        state = self.dir / "state"
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}", "WNS_FAKE_STATE_DIR": str(state)}
+        grid_calls = lambda: (state / "autogrid4.calls").stat().st_size
+        with mock.patch.dict(os.environ, env):
+            run_batch(["--config", str(config_path)])
+            tiles = sorted((self.dir / "autodock_runs" / "tiles").iterdir())
+            self.assertEqual(len(tiles), 4)
+            self.assertEqual(grid_calls(), 4)
+            self.assertEqual((state / "autodock4.calls").stat().st_size, 8)
+            record = json.loads((tiles[0] / "tile.json").read_text(encoding="utf-8"))
+            self.assertIn("receptor.maps.fld", record["maps"])
+            self.assertTrue((self.dir / "autodock_runs" / "best_pose_tile_00_00_00_101.pdbqt").exists())
+            self.assertTrue((self.dir / "autodock_runs" / "wrapped_complex.pdb").exists())
+
+            # Unchanged receptor: every grid is reused
+            run_batch(["--config", str(config_path)])
+            self.assertEqual(grid_calls(), 4)
+
+            # Moving the atom at the far end of the rod only invalidates the last tile
+            last = max(range(len(lines)), key=lambda index: float(lines[index][30:38]))
+            lines[last] = synthetic.pdbqt_line("ATOM", last + 1, "C", "ALA", "A", 1, (20.0, 3.0, 3.5), 0.0, "C")
+            receptor.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            run_batch(["--config", str(config_path)])
+            self.assertEqual(grid_calls(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import os
+import sys
+import math
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import hotspots
+import synthetic
+from grid_maps import GridMap, crop_maps, load_maps, read_map
+from hotspots import find_hotspots, focus_box
+
+NPTS = (40, 40, 40)
+SPACING = 0.5
+
+
+def well_map(wells):
+    """Map over a 20 Å cube at the origin with Gaussian wells ``(center, depth)``."""
+    values = []
+    for k in range(NPTS[2] + 1):
+        for j in range(NPTS[1] + 1):
+            for i in range(NPTS[0] + 1):
+                point = (-10 + i * SPACING, -10 + j * SPACING, -10 + k * SPACING)
+                values.append(sum(depth * math.exp(-math.dist(point, center) ** 2 / 4.5)
+                                  for center, depth in wells))
+    return GridMap(values, NPTS, SPACING, (0.0, 0.0, 0.0))
+
+
+def atom_line(serial, coord, atom_type="C"):
+    return synthetic.pdbqt_line("ATOM", serial, "C", "ALA", "A", serial, coord, 0.0, atom_type)
+
+
+class TestHotspots(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ranked_hotspots_next_to_unmasked_atoms(self):
+        """Wells touching the receptor are ranked by energy; solvent and masked sites drop out."""
+        maps = {
+            "C": well_map([((-5.0, 0.0, 0.0), -1.0), ((0.0, 6.0, 6.0), -1.5)]),
+            "OA": well_map([((5.0, 0.0, 0.0), -0.6)]),
+        }
+        site_a = [(-5.0 + dx, -3.5, dz) for dx in (-1.0, 0.0, 1.0) for dz in (-1.0, 0.0, 1.0)]
+        site_b = [(5.0 + dx, -3.5, dz) for dx in (-1.0, 0.0, 1.0) for dz in (-1.0, 0.0, 1.0)]
+        lines = [atom_line(index + 1, coord) for index, coord in enumerate(site_a + site_b)]
+
+        found = find_hotspots(maps, ["C", "OA"], lines, energy_cutoff=-0.3, min_volume=1.0)
+        self.assertEqual(len(found), 2)  # the deepest well has no receptor atom next to it
+        self.assertLess(found[0].center[0], -3.0)
+        self.assertGreater(found[1].center[0], 3.0)
+        self.assertEqual([hotspot.rank for hotspot in found], [1, 2])
+        self.assertLess(found[0].energy, found[1].energy)
+        with mock.patch.object(hotspots, "np", None):
+            self.assertEqual([hotspot.to_dict() for hotspot in find_hotspots(
+                maps, ["C", "OA"], lines, energy_cutoff=-0.3, min_volume=1.0)],
+                [hotspot.to_dict() for hotspot in found])
+
+        lower, upper = focus_box(found[0], maps["C"], padding=2.0)
+        for low, high, spot_low, spot_high, limit in zip(lower, upper, found[0].lower, found[0].upper, NPTS):
+            self.assertEqual((high - low) % 2, 0)
+            self.assertTrue(0 <= low <= spot_low and spot_high <= high <= limit)
+
+        # Masking the atoms around site A leaves only site B
+        masked = [atom_line(index + 1, coord, "X" if index < len(site_a) else "C")
+                  for index, coord in enumerate(site_a + site_b)]
+        remaining = find_hotspots(maps, ["C", "OA"], masked, energy_cutoff=-0.3, min_volume=1.0)
+        self.assertEqual(len(remaining), 1)
+        self.assertGreater(remaining[0].center[0], 3.0)
+
+        with self.assertRaises(ValueError):
+            find_hotspots(maps, ["C", "N"], lines)
+
+    def test_maps_round_trip_and_crop(self):
+        """Maps written, read back and cropped keep their values and geometry."""
+        rng = random.Random(4)
+        npts = (6, 4, 8)
+        size = 7 * 5 * 9
+        for name in ("C.map", "e.map"):
+            grid = GridMap([round(rng.uniform(-1, 1), 3) for _ in range(size)], npts, 0.375, (1.0, 2.0, 3.0),
+                           {"MACROMOLECULE": "protein.pdbqt", "GRID_PARAMETER_FILE": "grid.gpf"})
+            grid.write(self.dir / name, data_file="protein.maps.fld")
+        (self.dir / "protein.maps.fld").write_text(
+            "label=C-affinity\nlabel=Electrostatics\n"
+            "variable 1 file=C.map filetype=ascii skip=6\nvariable 2 file=e.map filetype=ascii skip=6\n",
+            encoding="utf-8")
+
+        maps = load_maps(self.dir / "protein.maps.fld")
+        self.assertEqual(sorted(maps), ["C", "e"])
+        grid = maps["C"]
+        self.assertEqual((grid.npts, grid.shape, grid.center), (npts, (7, 5, 9), (1.0, 2.0, 3.0)))
+        self.assertIs(read_map(self.dir / "C.map"), grid)
+
+        fld = crop_maps(self.dir / "protein.maps.fld", (2, 0, 2), (6, 2, 6), self.dir / "focus")
+        cropped = load_maps(fld)
+        self.assertEqual(sorted(cropped), ["C", "e"])
+        small = cropped["C"]
+        self.assertEqual(small.npts, (4, 2, 4))
+        self.assertEqual(small.origin, grid.point((2, 0, 2)))
+        for flat in range(small.size):
+            i, j, k = small.index(flat)
+            self.assertAlmostEqual(float(small.values[flat]),
+                                   float(grid.values[(i + 2) + 7 * (j + 5 * (k + 2))]), places=6)
+        self.assertIn("#NELEMENTS 4 2 4", fld.read_text(encoding="utf-8"))
+
+    def test_wrapper_docks_into_hotspots(self):
+        """With hotspots enabled every cycle docks into cropped maps around a receptor hotspot."""
+        from wrap_n_shake_docking import run_wrap_n_shake_docking
+
+        rng = random.Random(6)
+        (self.dir / "pdbqt").mkdir()
+        coords = [(rng.uniform(4, 8), rng.uniform(0, 4), rng.uniform(0, 4)) for _ in range(60)]
+        (self.dir / "pdbqt" / "protein.pdbqt").write_text(
+            "".join(atom_line(index + 1, coord) + "\n" for index, coord in enumerate(coords)), encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (6.0, 2.0, 2.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [40, 40, 40], "center": [6.0, 2.0, 2.0], "spacing": 1.0},
+            "wrapper": {"seeds": [101, 202], "output_dir": "autodock_runs", "min_ligand_distance": 0.5,
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates"),
+                        "hotspots": {"enabled": True, "energy_cutoff": -0.45, "min_volume": 0.5,
+                                     "padding": 2.0}},
+        }
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(self.dir / "state")}
+        with mock.patch.dict(os.environ, env):
+            run_wrap_n_shake_docking(config)
+
+        output = self.dir / "autodock_runs"
+        focus = output / "hotspots" / "seed_101"
+        small = load_maps(focus / "protein.maps.fld")["A"]
+        self.assertTrue(all(n < full for n, full in zip(small.npts, (40, 40, 40))))
+        dpf = (focus / "wrapper_101.dpf").read_text(encoding="utf-8")
+        self.assertIn("about {} {} {}".format(*small.center), dpf)
+        self.assertTrue((output / "docked_ligand_101.pdbqt").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
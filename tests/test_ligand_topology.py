@@ -0,0 +1,138 @@
+import unittest
+import sys
+import math
+import tempfile
+import shutil
+from pathlib import Path
+from unittest import mock
+
+# Add project root, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import ligand_topology
+from ligand_topology import LigandTopology, element_of, perceive_bonds, topology_from_file
+
+
+def benzene(offset=(0.0, 0.0, 0.0), turn=0.0):
+    """Benzene in nm: C1..C6 then H1..H6, rotated by ``turn`` about z."""
+    names, coords = [], []
+    for radius, element in ((0.139, "C"), (0.248, "H")):
+        for k in range(6):
+            angle = turn + k * math.pi / 3
+            names.append(f"{element}{k + 1}")
+            coords.append((offset[0] + radius * math.cos(angle), offset[1] + radius * math.sin(angle), offset[2]))
+    return names, coords
+
+
+def write_gro(path, copies, resname="UNL"):
+    lines = []
+    for resid, (names, coords) in enumerate(copies, start=1):
+        for name, (x, y, z) in zip(names, coords):
+            lines.append(f"{resid:>5}{resname:<5}{name:>5}{len(lines) + 1:>5}{x:8.3f}{y:8.3f}{z:8.3f}")
+    path.write_text(f"test\n{len(lines)}\n" + "\n".join(lines) + "\n   9.00000   9.00000   9.00000\n",
+                    encoding="utf-8")
+
+
+class TestLigandTopology(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_benzene_terms_and_geometry(self):
+        """Bonds, angles, dihedrals and 1-4 pairs of benzene, with measured geometry."""
+        names, coords = benzene()
+        elements = [element_of(name) for name in names]
+        topology = LigandTopology.from_copies(names, elements, [coords])
+
+        self.assertEqual(len(topology.bonds), 12)
+        self.assertEqual(len(topology.angles), 18)
+        self.assertEqual(len(topology.dihedrals), 24)
+        # 3 para C-C, 12 H-meta C, 6 ortho H-H
+        self.assertEqual(len(topology.pairs), 21)
+        self.assertEqual(topology.fragments(), 1)
+        lengths = dict(zip(topology.bonds, topology.bond_lengths))
+        self.assertAlmostEqual(lengths[(0, 1)], 0.139, places=3)
+        self.assertAlmostEqual(lengths[(0, 6)], 0.109, places=3)
+        for theta in topology.angle_values:
+            self.assertAlmostEqual(theta, 120.0, delta=0.5)
+
+        text = topology.itp_text()
+        self.assertIn("[ pairs ]", text)
+        self.assertIn("    1     2  1     0.13900", text)
+
+    def test_many_copies_share_one_graph(self):
+        """Stacked copies never bond to each other; a broken copy is reported, not averaged."""
+        copies = [benzene((0.0, 0.0, 0.35 * index), turn=0.1 * index) for index in range(200)]
+        broken_names, broken_coords = copies[57]
+        broken_coords = list(broken_coords)
+        broken_coords[6] = (broken_coords[6][0] + 0.3, broken_coords[6][1], broken_coords[6][2])
+        copies[57] = (broken_names, broken_coords)
+        gro = self.test_dir / "system.gro"
+        write_gro(gro, copies)
+
+        topology = topology_from_file(gro, "UNL")
+        self.assertEqual(topology.copies, 199)
+        self.assertEqual(topology.mismatched, [57])
+        self.assertEqual(len(topology.bonds), 12)
+        self.assertAlmostEqual(topology.bond_lengths[0], 0.139, places=3)
+
+    def test_python_fallback_matches(self):
+        """The pure-Python cell list finds the same bonds as the NumPy one."""
+        coords = [xyz for index in range(30) for xyz in benzene((0.2 * (index % 5), 0.0, 0.33 * index))[1]]
+        elements = (["C"] * 6 + ["H"] * 6) * 30
+        groups = [index // 12 for index in range(len(coords))]
+        with mock.patch.object(ligand_topology, "np", None):
+            reference = perceive_bonds(coords, elements, groups=groups)
+        self.assertEqual(len(reference), 12 * 30)
+        self.assertEqual(perceive_bonds(coords, elements, groups=groups), reference)
+
+    def test_pdbqt_wrapper(self):
+        """The old generate_topology_from_geometry entry point reads AutoDock types."""
+        from generate_topology_from_geometry import main as from_geometry
+
+        names, coords = benzene()
+        lines = []
+        for serial, (name, (x, y, z)) in enumerate(zip(names, coords), start=1):
+            ad_type = "A" if name.startswith("C") else "H"
+            lines.append(f"HETATM{serial:>5} {name:<4} UNL     1    {x * 10:8.3f}{y * 10:8.3f}{z * 10:8.3f}"
+                         f"  1.00  0.00     0.000 {ad_type:<2}")
+        pdbqt = self.test_dir / "ligand.pdbqt"
+        pdbqt.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        itp = self.test_dir / "ligand.itp"
+        from_geometry(str(pdbqt), str(itp))
+
+        text = itp.read_text(encoding="utf-8")
+        self.assertNotIn("[ dihedrals ]", text)
+        bonds = text.split("[ bonds ]")[1].split("[")[0]
+        self.assertEqual(len([line for line in bonds.splitlines() if line and not line.startswith(";")]), 12)
+        self.assertIn("12.011", text)
+
+    def test_mol2_bond_table_wins(self):
+        """mol2 connectivity is used as-is, even for a flat 2D depiction."""
+        from generate_ligand_top import generate_ligand_itp
+
+        mol2 = self.test_dir / "ethanol.mol2"
+        mol2.write_text(
+            "@<TRIPOS>MOLECULE\nETH\n 3 2 0 0 0\nSMALL\nGASTEIGER\n\n@<TRIPOS>ATOM\n"
+            "      1 C1   0.0000  0.0000  0.0000 C.3  1  UNL1  0.0\n"
+            "      2 C2   1.0000  0.0000  0.0000 C.3  1  UNL1  0.0\n"
+            "      3 O1   2.0000  0.0000  0.0000 O.3  1  UNL1  0.0\n"
+            "@<TRIPOS>BOND\n     1     1     2    1\n     2     2     3    1\n",
+            encoding="utf-8")
+        topology = topology_from_file(mol2, resname=None)
+        self.assertEqual(topology.bonds, [(0, 1), (1, 2)])
+        self.assertEqual(topology.elements, ["C", "C", "O"])
+        self.assertAlmostEqual(topology.angle_values[0], 180.0, places=3)
+
+        itp = self.test_dir / "ethanol.itp"
+        generate_ligand_itp(mol2, itp)
+        self.assertIn("    1     2  1     0.10000", itp.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+from manifest_writer import ManifestWriter
+from update_manifest import load_manifest
+
+
+class TestManifestWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "manifest" / "run-manifest.yml"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_updates_are_batched_until_stage_ends(self):
+        """Nothing is written inside a stage; everything is written at its end."""
+        manifest = ManifestWriter(self.path)
+        with manifest.stage():
+            manifest.record(commands=["python prep.py a.pdb"], seeds=["42"],
+                            outputs={"receptor_pdbqt": "pdbqt/protein.pdbqt"})
+            self.assertFalse(self.path.exists())
+        saved = load_manifest(str(self.path))
+        self.assertEqual(saved["commands"], ["python prep.py a.pdb"])
+        self.assertEqual(saved["outputs"], {"receptor_pdbqt": "pdbqt/protein.pdbqt"})
+
+    def test_reruns_do_not_duplicate_entries(self):
+        """Repeated commands, seeds and notes are recorded once."""
+        for _ in range(3):
+            manifest = ManifestWriter(self.path)
+            with manifest.stage():
+                manifest.record(commands=["python  prep.py a.pdb"], seeds=[42, "42"],
+                                notes="Skipped AmberTools")
+        saved = load_manifest(str(self.path))
+        self.assertEqual(len(saved["commands"]), 1)
+        self.assertEqual(saved["random_seeds"], ["42"])
+        self.assertEqual(saved["notes"], "Skipped AmberTools")
+
+    def test_concurrent_writer_changes_are_kept(self):
+        """A flush merges its queued updates into changes written by another writer."""
+        first = ManifestWriter(self.path)
+        second = ManifestWriter(self.path)
+        first.add_commands(["cmd-1"])
+        second.add_commands(["cmd-2"])
+        first.flush()
+        second.flush()
+        self.assertEqual(load_manifest(str(self.path))["commands"], ["cmd-1", "cmd-2"])
+
+    def test_large_records_go_to_sidecar(self):
+        """Records above the threshold are stored compressed and read back intact."""
+        payload = {"energies": [float(i) for i in range(2000)]}
+        manifest = ManifestWriter(self.path, sidecar_threshold=1024)
+        manifest.add_record("docking_energies", payload)
+        manifest.add_record("grid", {"npts": [126, 54, 126]})
+        manifest.flush()
+
+        saved = load_manifest(str(self.path))
+        self.assertIn("sidecar", saved["records"]["docking_energies"])
+        self.assertEqual(saved["records"]["grid"], {"npts": [126, 54, 126]})
+        self.assertLess(manifest.sidecar_path.stat().st_size, len(str(payload)))
+        self.assertEqual(ManifestWriter(self.path).read_record("docking_energies"), payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+import sys
+import json
+import math
+import os
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import map_archive
+import synthetic
+from grid_maps import GridMap, read_map
+from map_archive import CHUNK_POINTS, MapArchive
+
+NPTS = (40, 40, 40)
+
+
+def write_map_set(directory, values_by_type):
+    """AutoGrid-style map set (``protein.<type>.map`` plus ``protein.maps.fld``) in ``directory``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    variables = []
+    for index, (map_type, values) in enumerate(values_by_type.items(), start=1):
+        GridMap(values, NPTS, 0.375, (1.0, 2.0, 3.0), {"MACROMOLECULE": "protein.pdbqt"}).write(
+            directory / f"protein.{map_type}.map", data_file="protein.maps.fld")
+        variables.append(f"variable {index} file=protein.{map_type}.map filetype=ascii skip=6")
+    fld = directory / "protein.maps.fld"
+    fld.write_text("# AVS field file\n" + "\n".join(variables) + "\n", encoding="utf-8")
+    (directory / "protein.maps.xyz").write_text("-6.500 8.500\n-5.500 9.500\n-4.500 10.500\n", encoding="utf-8")
+    return fld
+
+
+def smooth_values(rng, offset=0.0):
+    size = (NPTS[0] + 1) * (NPTS[1] + 1) * (NPTS[2] + 1)
+    phase = rng.uniform(0, math.pi)
+    return [round(offset + 0.8 * math.sin(0.05 * index + phase) + rng.gauss(0, 0.05), 3) for index in range(size)]
+
+
+class TestMapArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_within_error_bound(self):
+        """Every restored value is within the bound; values beyond float16 come back exactly."""
+        rng = random.Random(3)
+        values = smooth_values(rng)
+        # Clash energies: larger than float16 can hold, must survive exactly
+        values[10] = 100000.0
+        values[CHUNK_POINTS + 5] = -70000.0
+        values[20] = 512.437
+        fld = write_map_set(self.dir / "maps", {"C": values, "e": smooth_values(rng, 1.0)})
+
+        archive = MapArchive(self.dir / "archive", max_error=0.005)
+        entry = archive.add("base", fld)
+        self.assertEqual(entry["maps"][0]["exceptions"][2], 2)
+        self.assertLess(entry["stored_bytes"], entry["ascii_bytes"] / 3)
+        restored = archive.materialize("base", self.dir / "restored")
+        self.assertEqual(restored.read_text(encoding="utf-8"), fld.read_text(encoding="utf-8"))
+        self.assertTrue((self.dir / "restored" / "protein.maps.xyz").exists())
+
+        original = read_map(self.dir / "maps" / "protein.C.map", cache=False)
+        decoded = read_map(self.dir / "restored" / "protein.C.map", cache=False)
+        self.assertEqual((decoded.npts, decoded.center, decoded.header["MACROMOLECULE"]),
+                         (original.npts, original.center, "protein.pdbqt"))
+        for before, after in zip(original.values, decoded.values):
+            # Written back with 3 decimals like AutoGrid: the bound plus half a unit of the last digit
+            self.assertLessEqual(abs(before - after), max(0.005, 1e-3 * abs(before)) + 0.0005)
+        self.assertEqual((decoded.values[10], decoded.values[CHUNK_POINTS + 5]), (100000.0, -70000.0))
+
+        # NumPy and pure Python write the same chunks
+        with mock.patch.object(map_archive, "np", None):
+            MapArchive(self.dir / "plain", max_error=0.005).add("base", fld)
+        self.assertEqual((self.dir / "plain" / "base.bin").read_bytes(),
+                         (self.dir / "archive" / "base.bin").read_bytes())
+        with self.assertRaises(ValueError):
+            archive.add("base", fld)
+        with self.assertRaises(KeyError):
+            archive.load("missing")
+
+    def test_cycle_stored_as_sparse_delta(self):
+        """A masked cycle only stores the points that moved; ``wns maps`` restores it on top of the base."""
+        import wns
+
+        rng = random.Random(4)
+        base_values = {"C": smooth_values(rng), "e": smooth_values(rng, 1.0)}
+        base_fld = write_map_set(self.dir / "cycle_00", base_values)
+        masked = dict(base_values, C=list(base_values["C"]))
+        changed = list(range(2000, 2400)) + list(range(50000, 50100))
+        for index in changed:
+            masked["C"][index] = round(masked["C"][index] + 1.5, 3)
+        cycle_fld = write_map_set(self.dir / "cycle_01", masked)
+
+        archive_dir = self.dir / "archive"
+        self.assertEqual(wns.main(["maps", "pack", str(archive_dir), "cycle_00", str(base_fld)]), 0)
+        self.assertEqual(wns.main(["maps", "pack", str(archive_dir), "cycle_01", str(cycle_fld),
+                                   "--base", "cycle_00", "--remove"]), 0)
+        self.assertFalse((self.dir / "cycle_01" / "protein.C.map").exists())
+
+        archive = MapArchive(archive_dir)
+        self.assertEqual(archive.names, ["cycle_00", "cycle_01"])
+        full, delta = archive.info("cycle_00"), archive.info("cycle_01")
+        self.assertEqual([record["changed"] for record in delta["maps"]], [len(changed), 0])
+        self.assertLess(delta["stored_bytes"] * 20, full["stored_bytes"])
+
+        self.assertEqual(wns.main(["maps", "unpack", str(archive_dir), "cycle_01", str(self.dir / "out")]), 0)
+        restored = read_map(self.dir / "out" / "protein.C.map", cache=False).values
+        for index in (1999, 2000, 2399, 50050, 60000):
+            self.assertAlmostEqual(restored[index], masked["C"][index], delta=0.0055)
+        decoded = archive.load("cycle_01")["protein.C.map"].values
+        with mock.patch.object(map_archive, "np", None):
+            plain = MapArchive(archive_dir).load("cycle_01")["protein.C.map"].values
+        self.assertEqual([round(value, 6) for value in plain], [round(float(value), 6) for value in decoded])
+
+    def test_tiled_docking_restores_archived_maps(self):
+        """With ``archive_maps`` tiles keep no ASCII maps; reruns restore them instead of rerunning AutoGrid."""
+        from run_autodock_batch import main as run_batch
+
+        lines = [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", 1, (1.5 * index, 3.0, 3.0), 0.0, "C")
+                 for index in range(12)]
+        (self.dir / "pdbqt").mkdir()
+        receptor = self.dir / "pdbqt" / "protein.pdbqt"
+        receptor.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (8.0, 3.0, 3.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [20, 20, 20], "center": [0, 0, 0], "spacing": 0.375,
+                         "tiling": {"enabled": True, "max_npts": 24, "overlap": 2.0, "padding": 1.0,
+                                    "margin": 2.0, "archive_maps": True}},
+            "wrapper": {"seeds": [101], "output_dir": "autodock_runs",
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates")},
+            "scheduler": {"cores": 2},
+        }
+        config_path = self.dir / "config.yml"
+        config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        state = self.dir / "state"
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}", "WNS_FAKE_STATE_DIR": str(state)}
+        grid_calls = lambda: (state / "autogrid4.calls").stat().st_size
+        with mock.patch.dict(os.environ, env):
+            run_batch(["--config", str(config_path)])
+            tiles = sorted((self.dir / "autodock_runs" / "tiles").iterdir())
+            calls = grid_calls()
+            self.assertEqual(calls, len(tiles))
+            for tile_dir in tiles:
+                self.assertEqual(list(tile_dir.glob("*.map")), [])
+                self.assertEqual(len(MapArchive(tile_dir / "map_archive").names), 1)
+            self.assertTrue((self.dir / "autodock_runs" / "wrapped_complex.pdb").exists())
+
+            # Same inputs: maps come back from the archive and AutoDock still finds them
+            (state / "autodock4.calls").unlink()
+            run_batch(["--config", str(config_path)])
+            self.assertEqual(grid_calls(), calls)
+            self.assertEqual((state / "autodock4.calls").stat().st_size, len(tiles))
+
+            # Masking the last atom regrids only the tiles holding it; their new maps are deltas from the first set
+            lines[-1] = synthetic.pdbqt_line("ATOM", 12, "C", "ALA", "A", 1, (16.5, 3.0, 3.0), 0.0, "X")
+            receptor.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            run_batch(["--config", str(config_path)])
+            archives = [MapArchive(tile_dir / "map_archive") for tile_dir in tiles]
+            regridded = [archive for archive in archives if len(archive.names) == 2]
+            self.assertTrue(0 < len(regridded) < len(tiles))
+            self.assertEqual(grid_calls(), calls + len(regridded))
+            for archive in regridded:
+                record = archive.info(archive.names[1])
+                self.assertEqual(record["base"], archive.names[0])
+                self.assertTrue(all(entry["delta"] for entry in record["maps"]))
+            for tile_dir, archive in zip(tiles, archives):
+                self.assertIn(json.loads((tile_dir / "tile.json").read_text(encoding="utf-8"))["key"][:16], archive)
+
+
+if __name__ == "__main__":
+    unittest.main()
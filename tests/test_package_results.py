@@ -0,0 +1,77 @@
+import unittest
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Add project root and scripts folder to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+
+from package_results import build_archive, restore_archive
+
+
+class TestPackageResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "project"
+        receptor = "ATOM      1  N   ALA A   1       0.000   0.000   0.000\n" * 200
+        files = {
+            "manifest/run-manifest.yml": "commands: []\n",
+            "autodock_runs/cycle_1/protein.pdbqt": receptor,
+            "autodock_runs/cycle_2/protein.pdbqt": receptor,
+            "autodock_runs/cycle_2/run.dlg": "DOCKED: USER    Run = 1\n",
+            "gmx/__pycache__/skip.pyc": "x",
+        }
+        for rel_path, text in files.items():
+            path = self.root / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding="utf-8")
+        self.include = ["manifest/run-manifest.yml", "autodock_runs", "gmx", "md"]
+        self.out_dir = Path(self.tmp.name) / "packs"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_identical_files_are_stored_once(self):
+        """Repeated receptors share one object; excluded folders are skipped."""
+        index = build_archive(self.root, self.include, self.out_dir / "full", workers=2)
+        self.assertEqual(len(index["files"]), 4)
+        self.assertEqual(index["stats"]["stored_objects"], 3)
+        with zipfile.ZipFile(self.out_dir / "full.zip") as zf:
+            objects = [name for name in zf.namelist() if name.startswith("objects/")]
+        self.assertEqual(len(objects), 3)
+
+    def test_incremental_archive_restores_through_base(self):
+        """An incremental pack stores only changed content and restores completely."""
+        build_archive(self.root, self.include, self.out_dir / "full")
+        (self.root / "autodock_runs/cycle_2/run.dlg").write_text("DOCKED: USER    Run = 2\n", encoding="utf-8")
+        index = build_archive(self.root, self.include, self.out_dir / "incr",
+                              base=self.out_dir / "full.zip")
+        self.assertEqual(index["stats"]["stored_objects"], 1)
+        self.assertEqual(index["base"], "full.zip")
+
+        dest = Path(self.tmp.name) / "restored"
+        self.assertEqual(restore_archive(self.out_dir / "incr.zip", dest), 4)
+        for rel_path in index["files"]:
+            self.assertEqual((dest / rel_path).read_bytes(), (self.root / rel_path).read_bytes())
+
+    def test_repacking_onto_the_base_archive_restores(self):
+        """Packing twice onto the same path copies the reused objects out of the replaced base."""
+        archive = self.out_dir / "repro_pack.zip"
+        build_archive(self.root, self.include, archive)
+        (self.root / "autodock_runs/cycle_2/run.dlg").write_text("DOCKED: USER    Run = 2\n", encoding="utf-8")
+        index = build_archive(self.root, self.include, archive, base=archive)
+        self.assertIsNone(index["base"])
+        self.assertEqual(set(index["objects"].values()), {"."})
+        self.assertEqual(index["stats"]["stored_objects"], 1)
+
+        dest = Path(self.tmp.name) / "restored"
+        self.assertEqual(restore_archive(archive, dest), 4)
+        for rel_path in index["files"]:
+            self.assertEqual((dest / rel_path).read_bytes(), (self.root / rel_path).read_bytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+from param_cache import ParameterCache, parameter_key
+
+MOL2 = (
+    "@<TRIPOS>MOLECULE\nLIG\n 2 1 0 0 0\nSMALL\nGASTEIGER\n\n@<TRIPOS>ATOM\n"
+    "      1 C1   0.0000  0.0000  0.0000 C.3  1  UNL1  0.0\n"
+    "      2 O1   1.4300  0.0000  0.0000 O.3  1  UNL1  0.0\n"
+    "@<TRIPOS>BOND\n     1     1     2    1\n"
+)
+
+
+class TestParameterCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.mol2 = self.dir / "ligand.mol2"
+        self.mol2.write_text(MOL2, encoding="utf-8")
+        self.cache = ParameterCache(self.dir / "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fake_build(self, work_dir, calls, delay=0.0):
+        def build():
+            calls.append(work_dir)
+            time.sleep(delay)
+            out = work_dir / "ligand.acpype"
+            out.mkdir(parents=True, exist_ok=True)
+            for name in ("ligand_GMX.itp", "ligand_GMX.gro", "ligand_AC.frcmod", "acpype.log"):
+                (out / name).write_text(f"; {name}\n", encoding="utf-8")
+            return out
+        return build
+
+    def test_key_options_and_restore(self):
+        """Charge method, atom types and contents change the key; a hit restores the files."""
+        keys = {parameter_key(self.mol2), parameter_key(self.mol2, "gas"),
+                parameter_key(self.mol2, atom_type="gaff"), parameter_key(self.mol2, net_charge=1)}
+        self.assertEqual(len(keys), 4)
+
+        calls = []
+        first = self.dir / "run1"
+        _, hit = self.cache.get_or_create(self.mol2, first, self.fake_build(first, calls))
+        self.assertFalse(hit)
+        second = self.dir / "run2"
+        restored, hit = self.cache.get_or_create(self.mol2, second, self.fake_build(second, calls))
+        self.assertTrue(hit)
+        self.assertEqual(calls, [first])
+        self.assertEqual(sorted(path.name for path in restored.iterdir()),
+                         ["ligand_AC.frcmod", "ligand_GMX.gro", "ligand_GMX.itp"])
+
+        self.mol2.write_text(MOL2.replace("1.4300", "1.4200"), encoding="utf-8")
+        _, hit = self.cache.get_or_create(self.mol2, second, self.fake_build(second, calls))
+        self.assertFalse(hit)
+        self.assertEqual(len(self.cache.keys()), 2)
+
+    def test_parallel_workers_build_once(self):
+        """Workers asking for the same ligand at once wait for the first build."""
+        calls, hits = [], []
+
+        def worker(index):
+            work_dir = self.dir / f"worker{index}"
+            cache = ParameterCache(self.dir / "cache")  # own lock objects, like separate processes
+            hits.append(cache.get_or_create(self.mol2, work_dir, self.fake_build(work_dir, calls, 0.2))[1])
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(hits), [False, True, True, True])
+        for index in range(4):
+            self.assertTrue((self.dir / f"worker{index}" / "ligand.acpype" / "ligand_GMX.itp").exists())
+
+    def test_pipeline_stage_uses_cache(self):
+        """parameterize_ligand runs ACPYPE once and restores it for the next work directory."""
+        from gromacs_pipeline import parameterize_ligand
+
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(self.dir / "state")}
+        with mock.patch.dict(os.environ, env):
+            for run in ("md1", "md2"):
+                work_dir = self.dir / run
+                work_dir.mkdir()
+                self.assertTrue(parameterize_ligand(self.mol2, work_dir, cache=self.cache))
+                self.assertTrue((work_dir / "ligand.acpype" / "ligand_GMX.itp").exists())
+        self.assertEqual((self.dir / "state" / "acpype.calls").stat().st_size, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
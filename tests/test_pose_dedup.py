@@ -0,0 +1,107 @@
+import unittest
+import sys
+import random
+import tempfile
+import shutil
+from pathlib import Path
+from unittest import mock
+
+# Add project root, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import pose_dedup
+from pose_dedup import cluster_poses, deduplicate_pose_files, pairwise_rmsd, read_pose
+
+SHAPE = [(0.0, 0.0, 0.0), (1.5, 0.0, 0.0), (2.2, 1.3, 0.0), (3.7, 1.3, 0.2), (4.4, 2.6, 0.5)]
+
+
+def pose_at(site, rng, jitter):
+    return [(x + site[0] + rng.uniform(-jitter, jitter), y + site[1] + rng.uniform(-jitter, jitter),
+             z + site[2] + rng.uniform(-jitter, jitter)) for x, y, z in SHAPE]
+
+
+def write_pose(path, coords, energy=None, elements="CCNCO"):
+    lines = ["TORSDOF 0"]
+    if energy is not None:
+        value = energy if isinstance(energy, str) else f"{energy:7.2f}"
+        lines.append(f"USER    Estimated Free Energy of Binding    = {value} kcal/mol")
+    for serial, ((x, y, z), element) in enumerate(zip(coords, elements), start=1):
+        lines.append(f"HETATM{serial:>5}  {element:<3} UNL     1    {x:8.3f}{y:8.3f}{z:8.3f}"
+                     f"  1.00  0.00     0.000 {element:<2}")
+    lines.append(f"HETATM{len(coords) + 1:>5}  H   UNL     1    {coords[0][0]:8.3f}{coords[0][1]:8.3f}"
+                 f"{coords[0][2] + 1.0:8.3f}  1.00  0.00     0.000 HD")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+class TestPoseDedup(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_clusters_keep_lowest_energy(self):
+        """Poses at one site collapse onto the lowest-energy one; other sites stay separate."""
+        rng = random.Random(3)
+        sites = [(0.0, 0.0, 0.0), (12.0, 0.0, 0.0), (0.0, 15.0, 3.0)]
+        coords = [pose_at(sites[index % 3], rng, 0.4) for index in range(30)]
+        energies = [rng.uniform(-9.0, -3.0) for _ in coords]
+
+        clusters = cluster_poses(coords, energies, cutoff=2.0)
+        self.assertEqual(len(clusters), 3)
+        self.assertEqual(sorted(len(cluster) for cluster in clusters), [10, 10, 10])
+        for cluster in clusters:
+            self.assertEqual(cluster[0], min(cluster, key=lambda index: energies[index]))
+            self.assertEqual({index % 3 for index in cluster}, {cluster[0] % 3})
+        representatives = [energies[cluster[0]] for cluster in clusters]
+        self.assertEqual(representatives, sorted(representatives))
+
+        # Small blocks and the pure-Python path give the same clusters
+        self.assertEqual(cluster_poses(coords, energies, 2.0, block_size=7), clusters)
+        with mock.patch.object(pose_dedup, "np", None):
+            self.assertEqual(cluster_poses(coords, energies, 2.0), clusters)
+            reference = pairwise_rmsd(coords[:5])
+        matrix = pairwise_rmsd(coords[:5], block_size=2)
+        for row, expected in zip(matrix, reference):
+            for value, wanted in zip(row, expected):
+                self.assertAlmostEqual(float(value), wanted, places=6)
+
+    def test_files_compare_same_ligand_only(self):
+        """Files are ranked by the recorded energy and only compared with the same ligand."""
+        rng = random.Random(5)
+        paths = [
+            write_pose(self.test_dir / "best_pose_1.pdbqt", pose_at((0, 0, 0), rng, 0.2), -5.0),
+            write_pose(self.test_dir / "best_pose_2.pdbqt", pose_at((0, 0, 0), rng, 0.2), -7.5),
+            write_pose(self.test_dir / "best_pose_3.pdbqt", pose_at((20, 0, 0), rng, 0.2), -4.0),
+            # Same place, different ligand: never a duplicate
+            write_pose(self.test_dir / "other.pdbqt", pose_at((0, 0, 0), rng, 0.2), -9.0, "CCCCO"),
+        ]
+        kept, clusters = deduplicate_pose_files(paths, cutoff=2.0)
+        self.assertEqual([path.name for path in kept], ["best_pose_2.pdbqt", "best_pose_3.pdbqt", "other.pdbqt"])
+        self.assertIn([paths[1], paths[0]], clusters)
+
+    def test_clashing_energy_in_e_notation(self):
+        """A clash written as +1.07e+03 ranks behind a weak real pose instead of reading as +1.07."""
+        rng = random.Random(9)
+        clash = write_pose(self.test_dir / "clash.pdbqt", pose_at((0, 0, 0), rng, 0.2), "+1.07e+03")
+        real = write_pose(self.test_dir / "real.pdbqt", pose_at((0, 0, 0), rng, 0.2), 3.0)
+        self.assertEqual(read_pose(clash)[2], 1070.0)
+        kept, _ = deduplicate_pose_files([clash, real], cutoff=2.0)
+        self.assertEqual(kept, [real])
+
+    def test_thousands_of_poses(self):
+        """Thousands of poses cluster in blocks without the full matrix."""
+        rng = random.Random(7)
+        sites = [(rng.uniform(-40, 40), rng.uniform(-40, 40), rng.uniform(-40, 40)) for _ in range(40)]
+        coords = [pose_at(sites[index % 40], rng, 0.3) for index in range(2000)]
+        clusters = cluster_poses(coords, cutoff=1.5, block_size=256)
+        self.assertEqual(len(clusters), 40)
+        self.assertEqual(sum(len(cluster) for cluster in clusters), 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
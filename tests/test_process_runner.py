@@ -0,0 +1,200 @@
+import unittest
+import sys
+import io
+import os
+import signal
+import subprocess
+import tempfile
+import textwrap
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import process_runner
+import synthetic
+from process_runner import DONE, FAILED, ProcessRunner
+from telemetry import AutoDockProgress, MdrunProgress, progress_parser
+
+# Child printing like ``gmx mdrun``: the step line is overwritten with \r
+MDRUN_CHILD = textwrap.dedent("""
+    import sys, time
+    sys.stderr.write("starting mdrun 'anneal'\\n5000 steps,     10.0 ps.\\n")
+    for step in range(1000, 5001, 1000):
+        sys.stderr.write(f"\\rstep {step}, will finish Sun Oct 18 12:00:00 2026")
+        sys.stderr.flush()
+        time.sleep(0.05)
+    sys.stderr.write("\\n               (ns/day)    (hour/ns)\\nPerformance:       42.500        0.565\\n")
+    sys.exit(int(sys.argv[1]))
+""")
+
+# Driver waiting in run_process on a tool that started a grandchild
+DRIVER = textwrap.dedent("""
+    import sys
+    sys.path.append(sys.argv[1])
+    from process_runner import RUNNER, run_process
+    RUNNER.grace = 2.0
+    child = "import subprocess, time; p = subprocess.Popen(['sleep', '60']); print(p.pid, flush=True); time.sleep(60)"
+    try:
+        run_process([sys.executable, "-c", child], cwd=sys.argv[2], name="tool")
+    except KeyboardInterrupt:
+        sys.exit(130)
+""")
+
+
+def alive(pid):
+    """Running (zombies count as gone)."""
+    try:
+        state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+    except (FileNotFoundError, ProcessLookupError, IndexError):
+        return False
+    return state not in ("Z", "X")
+
+
+class TestProcessRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_autodock_progress_tailed_from_dlg(self):
+        """Seeds run on the process runner: logs per job, GA progress parsed from the growing DLG."""
+        from run_autodock_batch import main as run_batch
+
+        (self.dir / "pdbqt").mkdir()
+        lines = [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", 1, (1.5 * index, 3.0, 3.0), 0.0, "C")
+                 for index in range(6)]
+        (self.dir / "pdbqt" / "protein.pdbqt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (4.0, 3.0, 3.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [20, 20, 20], "center": [4, 3, 3], "spacing": 0.375},
+            "wrapper": {"seeds": [101, 202], "output_dir": "autodock_runs",
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates")},
+            "scheduler": {"cores": 2},
+        }
+        config_path = self.dir / "config.yml"
+        config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(self.dir / "state"), "WNS_FAKE_LATENCY_AUTODOCK4": "1.5"}
+
+        output_dir = self.dir / "autodock_runs"
+        seen = []
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(0.05):
+                seen.extend(record["fraction"] for record in process_runner.RUNNER.status()
+                            if record["log"] == str(output_dir / "logs" / "autodock_101.log")
+                            and record["state"] == "running" and record["fraction"] is not None)
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        try:
+            with mock.patch.dict(os.environ, env):
+                run_batch(["--config", str(config_path)])
+        finally:
+            stop.set()
+            sampler.join()
+
+        self.assertTrue((output_dir / "logs" / "autogrid.log").exists())
+        jobs = {job.name: job for job in process_runner.RUNNER.jobs if job.log_path.parent == output_dir / "logs"}
+        self.assertEqual(set(jobs), {"autogrid", "autodock_101", "autodock_202"})
+        dock = jobs["autodock_101"]
+        self.assertEqual((dock.state, dock.returncode), (DONE, 0))
+        self.assertIsInstance(dock.progress, AutoDockProgress)
+        self.assertEqual(dock.progress.fraction, 1.0)
+        self.assertEqual((dock.progress.values["ga_run"], dock.progress.values["runs_done"],
+                          dock.progress.values["ga_num_generations"]), (10, 10, 27000))
+        self.assertTrue(any(0.0 < fraction < 1.0 for fraction in seen), seen)
+        self.assertEqual(seen, sorted(seen))
+        self.assertTrue((output_dir / "wrapped_complex.pdb").exists())
+
+    def test_mdrun_progress_and_failure_report(self):
+        """``\\r`` step updates and the performance line are parsed; a failure prints the log tail."""
+        self.assertIsInstance(progress_parser(["gmx", "mdrun", "-deffnm", "md"]), MdrunProgress)
+        self.assertIsInstance(progress_parser(["wsl", "bash", "-c", "cd /mnt/c/x && gmx_mpi mdrun -deffnm md"]),
+                              MdrunProgress)
+        self.assertIsInstance(progress_parser(["/opt/ad4/autodock4", "-p", "a.dpf"]), AutoDockProgress)
+
+        stream = io.StringIO()
+        runner = ProcessRunner(display=True, refresh=0.05, stream=stream)
+        try:
+            job = runner.run([sys.executable, "-c", MDRUN_CHILD, "0"], cwd=self.dir, name="mdrun_anneal",
+                             progress=MdrunProgress())
+            self.assertEqual(job.log_path, self.dir / "logs" / "mdrun_anneal.log")
+            self.assertIn("Performance:", job.log_path.read_text(encoding="utf-8"))
+            self.assertEqual(job.progress.values, {"nsteps": 5000, "total_ps": 10.0, "step": 5000,
+                                                   "ns_per_day": 42.5, "hour_per_ns": 0.565})
+            self.assertEqual(job.describe(), "mdrun_anneal step 5000/5000 42.5 ns/day (100%)")
+
+            failed = runner.run([sys.executable, "-c", MDRUN_CHILD, "3"], cwd=self.dir, name="mdrun_fail",
+                                progress=MdrunProgress())
+            self.assertEqual((failed.state, failed.returncode), (FAILED, 3))
+            with self.assertRaises(subprocess.CalledProcessError):
+                runner.run([sys.executable, "-c", MDRUN_CHILD, "3"], cwd=self.dir, name="mdrun_fail", check=True)
+        finally:
+            runner.shutdown()
+        output = stream.getvalue()
+        self.assertIn("mdrun_fail failed with exit code 3", output)
+        self.assertIn("    Performance:       42.500        0.565", output)
+        self.assertIn("[wns] 0 running, 1 done, 0 failed", output)
+
+    @unittest.skipUnless(hasattr(os, "wait4"), "rusage needs os.wait4")
+    def test_tool_metrics_include_cpu_memory_and_declared_outputs(self):
+        """Jobs report the tool's own rusage; output bytes only count the declared outputs."""
+        from run_metrics import METRICS
+
+        child = ("import hashlib; open('result.dat', 'wb').write(b'x' * 3000); "
+                 "open('scratch.tmp', 'wb').write(b'y' * 5000); "
+                 "[hashlib.sha256(bytes(1000)).digest() for _ in range(20000)]")
+        runner = ProcessRunner(display=False)
+        try:
+            job = runner.run([sys.executable, "-c", child], cwd=self.dir, name="busy",
+                             outputs=[self.dir / "result.dat"])
+        finally:
+            runner.shutdown()
+        self.assertEqual((job.state, job.returncode), (DONE, 0))
+        record = [entry for entry in METRICS.records if entry["kind"] == "tool"][-1]
+        self.assertEqual(record["output_bytes"], 3000)
+        self.assertGreater(record["cpu_user_s"] + record["cpu_sys_s"], 0.0)
+        self.assertGreater(record["peak_rss_mb"], 1.0)
+
+    @unittest.skipUnless(os.name == "posix", "process groups are POSIX")
+    def test_interrupt_stops_process_tree(self):
+        """Ctrl-C in the driver stops the tool and the processes it started."""
+        driver = subprocess.Popen([sys.executable, "-c", DRIVER, str(PROJECT_ROOT / "utils"), str(self.dir)],
+                                  env=dict(os.environ, WNS_PROGRESS="0"))
+        log = self.dir / "logs" / "tool.log"
+        deadline = time.time() + 20
+        while time.time() < deadline and not (log.exists() and log.read_text().strip()):
+            time.sleep(0.05)
+        grandchild = int(log.read_text().split()[0])
+        self.assertTrue(alive(grandchild))
+
+        driver.send_signal(signal.SIGINT)
+        self.assertEqual(driver.wait(timeout=20), 130)
+        deadline = time.time() + 5
+        while time.time() < deadline and alive(grandchild):
+            time.sleep(0.05)
+        self.assertFalse(alive(grandchild))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import pstats
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root and utils folder to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import profiling
+from run_metrics import RunMetrics
+
+
+@profiling.profiled
+def inner(n):
+    return sum(i * i for i in range(n))
+
+
+@profiling.profiled
+def outer(n):
+    return inner(n) + inner(n // 2)
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"WNS_PROFILE_DIR": self.tmp.name})
+        self.env.start()
+        # Keep the at-exit report out of the test run
+        self.no_atexit = patch.object(profiling, "_register_report")
+        self.no_atexit.start()
+        self.saved_mode = profiling._mode
+        profiling._stats.clear()
+
+    def tearDown(self):
+        profiling._mode = self.saved_mode
+        profiling._stats.clear()
+        os.environ.pop("WNS_PROFILE", None)
+        self.no_atexit.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_disabled_records_nothing(self):
+        profiling._mode = None
+        self.assertEqual(outer(100), sum(i * i for i in range(100)) + sum(i * i for i in range(50)))
+        self.assertEqual(profiling.timer_stats(), {})
+
+    def test_timers_count_calls(self):
+        profiling.enable("timers")
+        outer(1000)
+        outer(1000)
+        stats = profiling.timer_stats()
+        self.assertEqual(stats[f"{__name__}.outer"]["calls"], 2)
+        self.assertEqual(stats[f"{__name__}.inner"]["calls"], 4)
+        self.assertEqual(os.environ["WNS_PROFILE"], "timers")
+
+    def test_cprofile_stage_writes_pstats_and_collapsed(self):
+        """Stages write a .pstats file and collapsed stacks naming each decorated function."""
+        profiling.enable("cprofile")
+        metrics = RunMetrics()
+        with metrics.stage("washing cycle 1"):
+            outer(20000)
+
+        out_dir = Path(self.tmp.name)
+        stats = pstats.Stats(str(out_dir / "washing_cycle_1.pstats"))
+        self.assertTrue(any(name == "inner" for _, _, name in stats.stats))
+        collapsed = (out_dir / "washing_cycle_1.collapsed").read_text(encoding="utf-8")
+        self.assertIn("profiled<outer>", collapsed)
+        self.assertIn("profiled<inner>", collapsed)
+        for line in collapsed.splitlines():
+            self.assertTrue(line.rsplit(" ", 1)[1].isdigit())
+
+
+if __name__ == "__main__":
+    unittest.main()
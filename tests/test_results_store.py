@@ -0,0 +1,108 @@
+import unittest
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import synthetic
+from results_store import ResultsStore, parse_hbond_csv
+
+HBOND_CSV = (
+    "ligand_id,cluster_id,score,e_inter,n_hbonds,hbond_details,coords_x,coords_y,coords_z\n"
+    "1,0,10.5,12.5,2,THR761(OG1)-LIG1(N) d=3.41Å a=127.0°; LIG1(O1)-ASP9(OD2) d=2.90Å a=160.5°,0,0,0\n"
+    "2,,3.0,4.0,0,,1,1,1\n"
+)
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.store = ResultsStore(self.root / "results.sqlite")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_hbond_csv_round_trip(self):
+        """Packed hbond_details strings become one indexed row per H-bond."""
+        csv_path = self.root / "hbonds.csv"
+        csv_path.write_text(HBOND_CSV, encoding="utf-8")
+        scores = parse_hbond_csv(csv_path)
+        self.assertEqual(len(scores), 2)
+        self.assertIsNone(scores[1]["cluster_id"])
+
+        self.assertEqual(self.store.add_hbond_scores("r1", scores, cycle=3, seed=42), 2)
+        rows = self.store.query(
+            "SELECT donor_residue, acceptor_residue, distance, angle FROM hbonds "
+            "WHERE run_id = ? AND cycle = ? ORDER BY distance", ("r1", 3))
+        self.assertEqual([tuple(row) for row in rows],
+                         [("LIG1", "ASP9", 2.9, 160.5), ("THR761", "LIG1", 3.41, 127.0)])
+
+    def test_rows_are_appended_not_replaced(self):
+        """Re-recording a cycle keeps both results, and runs are registered once."""
+        self.store.add_run("r1", {"wrapper": {"max_cycles": 2}})
+        self.store.add_run("r1")
+        for _ in range(2):
+            self.store.add_displacements("r1", {5: 0.4, 6: 3.2}, cutoff=2.0, cycle=1)
+        self.assertEqual(self.store.query("SELECT COUNT(*) FROM runs")[0][0], 1)
+        washed = self.store.query("SELECT COUNT(*) FROM displacements WHERE washed = 1")[0][0]
+        self.assertEqual(washed, 2)
+
+    def test_batch_scores_keep_same_named_poses_and_seed_zero(self):
+        """Poses sharing a file name get their own report; seed 0 is stored as 0, not NULL."""
+        from generate_score_report import main as score_main
+
+        receptor = self.root / "protein.pdbqt"
+        receptor.write_text("\n".join(
+            synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", index + 1, (1.5 * index, 0.0, 0.0), 0.0, "C")
+            for index in range(6)) + "\n", encoding="utf-8")
+        for offset, seed_dir in enumerate(("seed_1", "seed_2")):
+            synthetic.write_ligand_pdbqt(self.root / "poses" / seed_dir / "docked_ligand_0.pdbqt",
+                                         (3.0 + offset, 4.0, 0.0))
+        out_dir = self.root / "reports"
+        score_main(["--poses", str(self.root / "poses" / "*" / "*.pdbqt"), "--receptor", str(receptor),
+                    "--out-dir", str(out_dir), "--workers", "1", "--no-hbonds",
+                    "--results-db", str(self.root / "results.sqlite"), "--run-id", "r1"])
+
+        self.assertEqual(sorted(path.name for path in out_dir.glob("*.json")),
+                         ["seed_1__docked_ligand_0.json", "seed_2__docked_ligand_0.json"])
+        report = json.loads((out_dir / "seed_2__docked_ligand_0.json").read_text(encoding="utf-8"))
+        self.assertTrue(report["input_files"]["pose"].endswith("seed_2/docked_ligand_0.pdbqt"))
+        seeds = [row[0] for row in self.store.query("SELECT seed FROM scores")]
+        self.assertEqual(seeds, [0, 0])
+
+    def test_recorded_poses_keep_their_docking_energy(self):
+        """The wrapper stores the pose's Estimated Free Energy of Binding alongside its centre."""
+        from wrap_n_shake_docking import record_pose
+
+        pose = self.root / "docked_ligand_1.pdbqt"
+        synthetic.write_ligand_pdbqt(pose, (2.0, 4.0, 6.0))
+        pose.write_text("USER    Estimated Free Energy of Binding    =   -7.25 kcal/mol\n"
+                        + pose.read_text(encoding="utf-8"), encoding="utf-8")
+        record_pose(self.store, "r1", 1, 101, pose, accepted=True)
+        row = self.store.query("SELECT energy, accepted FROM poses")[0]
+        self.assertEqual(tuple(row), (-7.25, 1))
+
+    def test_score_report_reads_clashing_energies_in_e_notation(self):
+        """A clash written as +1.07e+03 scores 1070, not 1.07, so it ranks last."""
+        from generate_score_report import read_first_model
+
+        pose = self.root / "docked_ligand_2.pdbqt"
+        synthetic.write_ligand_pdbqt(pose, (2.0, 4.0, 6.0))
+        pose.write_text("USER    Estimated Free Energy of Binding    = +1.07e+03 kcal/mol\n"
+                        + pose.read_text(encoding="utf-8"), encoding="utf-8")
+        atoms, score = read_first_model(pose)
+        self.assertEqual(score, 1070.0)
+        self.assertTrue(atoms)
+
+
+if __name__ == "__main__":
+    unittest.main()
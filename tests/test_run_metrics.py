@@ -0,0 +1,62 @@
+import unittest
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root and utils folder to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+from run_metrics import RunMetrics, tool_label
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.work_dir = Path(self.tmp.name)
+        self.metrics = RunMetrics()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tool_call_inside_stage(self):
+        """Tool calls record their own output bytes and are attributed to the stage."""
+        script = "open('em.gro', 'w').write('x' * 4096)"
+        with self.metrics.stage("energy_min", outputs=[self.work_dir]):
+            self.metrics.run([sys.executable, "-c", script], label="gmx mdrun",
+                             cwd=self.work_dir, check=True)
+
+        tool, stage = self.metrics.records
+        self.assertEqual((tool["kind"], tool["name"], tool["stage"]), ("tool", "gmx mdrun", "energy_min"))
+        self.assertEqual(tool["output_bytes"], 4096)
+        self.assertEqual(stage["output_bytes"], 4096)
+        self.assertGreaterEqual(stage["wall_s"], tool["wall_s"])
+        if tool["peak_rss_mb"] is not None:
+            self.assertGreater(tool["peak_rss_mb"], 0)
+        self.assertIn("gmx mdrun", self.metrics.summary_table())
+
+    def test_input_capture_and_check(self):
+        """stdin/stdout behave like subprocess.run, including check=True."""
+        result = self.metrics.run([sys.executable, "-c", "print(input())"],
+                                  input="SOL\n", text=True, capture_output=True)
+        self.assertEqual(result.stdout.strip(), "SOL")
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.metrics.run([sys.executable, "-c", "raise SystemExit(3)"], check=True)
+        self.assertEqual(self.metrics.records[-1]["returncode"], 3)
+
+    def test_failed_stage_is_recorded(self):
+        with self.assertRaises(RuntimeError):
+            with self.metrics.stage("solvate"):
+                raise RuntimeError("boom")
+        self.assertEqual(self.metrics.records[0]["status"], "failed")
+
+    def test_tool_label(self):
+        self.assertEqual(tool_label(["wsl", "/usr/bin/gmx", "grompp", "-f", "em.mdp"]), "gmx grompp")
+        self.assertEqual(tool_label(["python3", "-m", "acpype", "-i", "lig.mol2"]), "acpype")
+        self.assertEqual(tool_label(["autodock4", "-p", "dock.dpf"]), "autodock4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root and utils folder to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+from scheduler import DONE, SKIPPED, JobError, Scheduler, scheduler_from_config
+
+
+class TestScheduler(unittest.TestCase):
+    def test_packs_jobs_within_core_limit(self):
+        """No more cores are busy than the scheduler has; priorities start first."""
+        scheduler = Scheduler(cores=4, memory_mb=1000)
+        lock = threading.Lock()
+        busy = {"now": 0, "peak": 0}
+        started = []
+
+        def job(name, cores):
+            def run():
+                with lock:
+                    started.append(name)
+                    busy["now"] += cores
+                    busy["peak"] = max(busy["peak"], busy["now"])
+                time.sleep(0.05)
+                with lock:
+                    busy["now"] -= cores
+                return name
+            return run
+
+        for seed in range(6):
+            scheduler.submit(f"dock_{seed}", job(f"dock_{seed}", 1))
+        scheduler.submit("mdrun", job("mdrun", 3), cores=3, priority=10)
+        jobs = scheduler.run()
+
+        self.assertEqual(started[0], "mdrun")
+        self.assertLessEqual(busy["peak"], 4)
+        self.assertTrue(all(job.status == DONE for job in jobs.values()))
+        self.assertEqual(jobs["dock_5"].result, "dock_5")
+
+    def test_dependencies_and_failures(self):
+        """Dependents wait for their jobs and are skipped when one fails."""
+        scheduler = Scheduler(cores=2)
+        order = []
+        grid = scheduler.submit("grid", lambda: order.append("grid"))
+        scheduler.submit("dock", lambda: order.append("dock"), after=[grid])
+
+        def fail():
+            raise RuntimeError("mdrun crashed")
+
+        scheduler.submit("cycle_1", fail)
+        scheduler.submit("cycle_2", lambda: order.append("cycle_2"), after=["cycle_1"])
+        scheduler.submit("cycle_3", lambda: order.append("cycle_3"), after=["cycle_2"])
+
+        with self.assertRaises(JobError) as ctx:
+            scheduler.run()
+        self.assertEqual([job.name for job in ctx.exception.failed], ["cycle_1"])
+        self.assertEqual(order, ["grid", "dock"])
+        self.assertEqual(scheduler.jobs["cycle_3"].status, SKIPPED)
+
+        with self.assertRaises(ValueError):
+            scheduler.submit("late", lambda: None, after=["missing"])
+
+    def test_oversized_requests_are_clamped(self):
+        """A job asking for more cores than exist still runs, on all of them."""
+        scheduler = scheduler_from_config({"scheduler": {"cores": 2, "memory_mb": 100}})
+        job = scheduler.submit("mdrun", lambda: "ok", cores=8, memory_mb=500)
+        self.assertEqual((job.cores, job.memory_mb), (2, 100))
+        self.assertEqual(scheduler.fit_cores(None), 2)
+        self.assertEqual(scheduler.run()["mdrun"].result, "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# Add project root and utils folder to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+from state_manager import StateManager
+
+
+def _worker(state_file, worker_id, n_updates):
+    with redirect_stdout(StringIO()):
+        state = StateManager(state_file, compact_every=7)
+        for i in range(n_updates):
+            state.update(f"worker_{worker_id}", i)
+
+
+class TestStateManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_file = str(Path(self.tmp.name) / "state" / "workflow_state.json")
+        self.quiet = redirect_stdout(StringIO())
+        self.quiet.__enter__()
+
+    def tearDown(self):
+        self.quiet.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def test_updates_survive_reload(self):
+        """Updates are journaled and replayed by a new instance."""
+        state = StateManager(self.state_file)
+        state.update("current_stage", "solvate")
+        state.update("completed_stages", ["prepare_receptor"])
+        self.assertFalse(os.path.exists(self.state_file))
+
+        reloaded = StateManager(self.state_file)
+        self.assertEqual(reloaded.get("current_stage"), "solvate")
+        self.assertEqual(reloaded.get("completed_stages"), ["prepare_receptor"])
+        self.assertEqual(reloaded.get("wrapper_cycle"), 0)
+
+    def test_torn_journal_tail_is_discarded(self):
+        """A half-written last record is ignored and trimmed before new appends."""
+        state = StateManager(self.state_file)
+        state.update("step", 1)
+        with open(state.journal_file, "a", encoding="utf-8") as f:
+            f.write('{"op": "set", "key": "step", "va')
+
+        reloaded = StateManager(self.state_file)
+        self.assertEqual(reloaded.get("step"), 1)
+        reloaded.update("step", 2)
+        self.assertEqual(StateManager(self.state_file).get("step"), 2)
+
+    def test_compaction_writes_snapshot(self):
+        """The journal is folded into an atomic snapshot every compact_every records."""
+        state = StateManager(self.state_file, compact_every=3)
+        for i in range(3):
+            state.update("step", i)
+        with open(self.state_file, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["step"], 2)
+        self.assertEqual(os.path.getsize(state.journal_file), 0)
+
+        state.update("step", 3)
+        self.assertEqual(StateManager(self.state_file).get("step"), 3)
+
+    def test_data_assignment_is_persisted(self):
+        """Resetting via ``state.data = ...`` replaces the stored state."""
+        state = StateManager(self.state_file)
+        state.update("current_stage", "nvt_eq")
+        state.data = {"step": 0, "current_stage": None}
+        state.update("reset", True)
+        self.assertEqual(StateManager(self.state_file).data,
+                         {"step": 0, "current_stage": None, "reset": True})
+
+    def test_corrupt_snapshot_is_moved_aside(self):
+        """A corrupt snapshot is kept for inspection; the journal still applies."""
+        state = StateManager(self.state_file, compact_every=1)
+        state.update("current_stage", "energy_min")
+        Path(self.state_file).write_text('{"current_stage": "ener', encoding="utf-8")
+        with open(state.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "set", "key": "step", "value": 4}) + "\n")
+
+        reloaded = StateManager(self.state_file)
+        self.assertEqual(reloaded.get("step"), 4)
+        self.assertEqual(len(list(Path(self.state_file).parent.glob("*.corrupt-*"))), 1)
+
+    def test_concurrent_writers(self):
+        """Several processes updating one state file lose no records."""
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_worker, args=(self.state_file, w, 15)) for w in range(4)]
+        for proc in workers:
+            proc.start()
+        for proc in workers:
+            proc.join(60)
+            self.assertEqual(proc.exitcode, 0)
+
+        final = StateManager(self.state_file)
+        for w in range(4):
+            self.assertEqual(final.get(f"worker_{w}"), 14)
+
+
+if __name__ == "__main__":
+    unittest.main()
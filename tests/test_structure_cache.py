@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import structure_cache
+from structure_cache import clear_memory_cache, load_structure
+from mask_pdbqt import mask_receptor
+
+
+def pdbqt_line(serial, name, resname, resid, x, y, z, charge, atom_type):
+    return (f"ATOM  {serial:5d} {name:<4} {resname:>3} A{resid:4d}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00    {charge:+6.3f} {atom_type:<2}")
+
+
+RECEPTOR = "\n".join([
+    "REMARK  synthetic receptor",
+    pdbqt_line(1, "N", "ALA", 1, 0.0, 0.0, 0.0, -0.35, "N"),
+    pdbqt_line(2, "CA", "ALA", 1, 1.5, 0.0, 0.0, 0.18, "C"),
+    pdbqt_line(3, "C", "ALA", 1, 10.0, 0.0, 0.0, 0.24, "C"),
+    "TER",
+]) + "\n"
+
+LIGAND = pdbqt_line(1, "C1", "UNL", 1, 2.0, 1.0, 0.0, 0.0, "C") + "\n"
+
+
+class TestStructureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache_dir = self.root / "cache"
+        self.receptor = self.root / "receptor.pdbqt"
+        self.receptor.write_text(RECEPTOR, encoding="utf-8")
+        # Loaders called without cache_dir must not touch the project cache
+        self.env = patch.dict(os.environ, {"WNS_STRUCTURE_CACHE": str(self.cache_dir)})
+        self.env.start()
+        clear_memory_cache()
+
+    def tearDown(self):
+        clear_memory_cache()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_parse_columns(self):
+        """Atom records are parsed into columns; non-atom lines are skipped."""
+        structure = load_structure(self.receptor, cache_dir=self.cache_dir)
+        self.assertEqual(len(structure), 3)
+        self.assertEqual(list(structure.line_index), [1, 2, 3])
+        self.assertEqual(structure.coord(1), (1.5, 0.0, 0.0))
+        self.assertEqual(str(structure.atom_type[0]), "N")
+        self.assertAlmostEqual(float(structure.charge[2]), 0.24)
+
+    def test_disk_entry_reused(self):
+        """A second process (simulated by clearing the memo) reads the disk entry."""
+        first = load_structure(self.receptor, cache_dir=self.cache_dir)
+        self.assertEqual(len(list(self.cache_dir.glob("v*"))), 1)
+        clear_memory_cache()
+        with patch.object(structure_cache, "parse_structure_text",
+                          side_effect=AssertionError("re-parsed")):
+            second = load_structure(self.receptor, cache_dir=self.cache_dir)
+        self.assertEqual(second.digest, first.digest)
+        self.assertEqual(second.coord(2), (10.0, 0.0, 0.0))
+
+    def test_content_change_invalidates(self):
+        """Edited files get a new digest even when read in the same process."""
+        first = load_structure(self.receptor, cache_dir=self.cache_dir)
+        self.receptor.write_text(RECEPTOR.replace("10.000", "11.000") + "END\n", encoding="utf-8")
+        second = load_structure(self.receptor, cache_dir=self.cache_dir)
+        self.assertNotEqual(first.digest, second.digest)
+        self.assertEqual(second.coord(2), (11.0, 0.0, 0.0))
+
+    def test_memory_cache_keeps_recent_paths_only(self):
+        """The in-process memo is bounded: the least recently read path is dropped first."""
+        paths = []
+        for index in range(structure_cache.MEMORY_CACHE_SIZE + 1):
+            paths.append(self.root / f"masked_{index}.pdbqt")
+            paths[-1].write_text(RECEPTOR, encoding="utf-8")
+        load_structure(paths[0], cache_dir=self.cache_dir)
+        for path in paths[2:]:
+            load_structure(path, cache_dir=self.cache_dir)
+        load_structure(paths[0], cache_dir=self.cache_dir)  # now the most recent
+        load_structure(paths[1], cache_dir=self.cache_dir)
+        memo = structure_cache._memory_cache
+        self.assertEqual(len(memo), structure_cache.MEMORY_CACHE_SIZE)
+        self.assertNotIn(str(paths[2].resolve()), memo)
+        self.assertIn(str(paths[0].resolve()), memo)
+
+    def test_cache_pruned_to_size_limit(self):
+        """New entries evict the least recently used ones once the cache exceeds its limit."""
+        stale = self.cache_dir / "v0-old.pickle"
+        self.cache_dir.mkdir()
+        stale.write_bytes(b"x" * 64)
+        first = load_structure(self.receptor, cache_dir=self.cache_dir)
+        entry_size = structure_cache._entry_size(structure_cache._entry_path(self.cache_dir, first.digest))
+        limit_mb = 2.5 * entry_size / (1024 * 1024)
+
+        receptors = []
+        with patch.dict(os.environ, {"WNS_STRUCTURE_CACHE_MAX_MB": str(limit_mb)}):
+            for index in range(3):
+                path = self.root / f"masked_{index}.pdbqt"
+                path.write_text(RECEPTOR.replace("10.000", f"1{index}.500"), encoding="utf-8")
+                receptors.append(load_structure(path, cache_dir=self.cache_dir))
+                os.utime(structure_cache._entry_path(self.cache_dir, receptors[-1].digest),
+                         ns=(index + 10 ** 18, index + 10 ** 18))
+        names = {entry.name for entry in self.cache_dir.glob("v*")}
+        self.assertNotIn(stale.name, names)
+        self.assertEqual(len(names), 2)
+        self.assertIn(structure_cache._entry_path(self.cache_dir, receptors[-1].digest).name, names)
+        self.assertEqual(structure_cache.prune_cache(self.cache_dir, 0), 2)
+
+    def test_mask_receptor_uses_cached_records(self):
+        """Masking patches only the records within the cutoff."""
+        ligand = self.root / "ligand.pdbqt"
+        ligand.write_text(LIGAND, encoding="utf-8")
+        output = self.root / "masked.pdbqt"
+        mask_receptor(self.receptor, [ligand], output, cutoff=3.5)
+
+        lines = output.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(lines[0], "REMARK  synthetic receptor")
+        self.assertEqual(lines[1][77:79].strip(), "X")
+        self.assertEqual(lines[2][77:79].strip(), "X")
+        self.assertEqual(lines[3][77:79].strip(), "C")
+        self.assertEqual(lines[4], "TER")
+
+        # No cell grid for a non-positive cutoff: nothing is masked
+        mask_receptor(self.receptor, [ligand], output, cutoff=0.0)
+        self.assertNotIn(" X", "".join(line[76:] for line in output.read_text(encoding="utf-8").splitlines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
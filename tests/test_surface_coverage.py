@@ -0,0 +1,186 @@
+import unittest
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import hotspots
+import synthetic
+from grid_maps import load_maps
+from surface_coverage import CoverageStop, SurfaceCoverage, ligand_reach
+
+SEEDS = [101, 202, 303, 404, 505, 606, 707, 808]
+
+
+def block_lines(size=5, step=1.5):
+    """A ``size``^3 block of carbon atoms, one residue per x-layer."""
+    lines = []
+    for i in range(size):
+        for j in range(size):
+            for k in range(size):
+                lines.append(synthetic.pdbqt_line("ATOM", len(lines) + 1, "C", "ALA", "A", i + 1,
+                                                  (step * i, step * j, step * k), 0.0, "C"))
+    return lines
+
+
+def rod_lines(length=12, step=1.5):
+    """A 2 x 2 x ``length`` rod of carbon atoms along x, one residue per x-layer."""
+    return [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", index // 4 + 1,
+                                 (step * (index // 4), step * (index // 2 % 2), step * (index % 2)), 0.0, "C")
+            for index in range(4 * length)]
+
+
+class TestSurfaceCoverage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_coverage_from_ligands_and_masking(self):
+        """Ligand contacts and masked atoms cover surface points; the rest forms uncovered patches."""
+        lines = block_lines()
+        coverage = SurfaceCoverage(lines)
+        self.assertTrue(coverage.coords)
+        self.assertEqual(coverage.fraction, 0.0)
+        # Interior atoms are buried: every surface point belongs to an atom on the block's faces
+        self.assertTrue(all(residue in ("A:ALA1", "A:ALA5") or
+                            any(coord[axis] < 0.0 or coord[axis] > 6.0 for axis in (1, 2))
+                            for residue, coord in zip(coverage.residues, coverage.coords)))
+        with mock.patch.object(hotspots, "np", None):
+            self.assertEqual(len(SurfaceCoverage(lines).coords), len(coverage.coords))
+
+        gain = coverage.update([(9.0, 3.0, 3.0)])
+        self.assertGreater(gain, 0.0)
+        self.assertAlmostEqual(coverage.fraction, gain)
+        self.assertEqual(coverage.update([(9.0, 3.0, 3.0)]), 0.0)
+        patches = coverage.uncovered_patches()
+        self.assertEqual(len(patches), 1)
+        self.assertAlmostEqual(patches[0].area + coverage.covered_area, coverage.total_area)
+        self.assertLess(patches[0].center[0], 3.0)
+        self.assertEqual(coverage.uncovered_area_near((30.0, 0.0, 0.0), 5.0), 0.0)
+
+        # Masking the x = 0 layer covers its residue completely
+        masked = [line[:77] + " X" + line[79:] if float(line[30:38]) == 0.0 else line for line in lines]
+        coverage.update(receptor_lines=masked)
+        residues = coverage.residue_coverage()
+        self.assertEqual(residues["A:ALA1"], 1.0)
+        self.assertLess(residues["A:ALA3"], 1.0)
+        entry = coverage.record(1, 101, gain, accepted=True)
+        self.assertEqual((entry["cycle"], entry["residues"]), (1, 5))
+        self.assertEqual(coverage.to_dict()["history"], [entry])
+
+        stop = CoverageStop(min_gain=0.05, patience=2)
+        self.assertFalse(stop.update(0.2, 0.2))
+        self.assertFalse(stop.update(0.01, 0.21))
+        self.assertTrue(stop.update(0.0, 0.21))
+        self.assertIn("2 cycles", stop.reason)
+        target = CoverageStop(target=0.5)
+        self.assertTrue(target.update(0.6, 0.6))
+        with self.assertRaises(ValueError):
+            SurfaceCoverage(lines, points=0)
+
+    def test_uncovered_target_is_ligand_sized(self):
+        """A target is the uncovered surface within the radius of one spot; rejected spots are skipped."""
+        coverage = SurfaceCoverage(rod_lines())
+        patches = coverage.uncovered_patches()
+        self.assertEqual(len(patches), 1)
+        target = coverage.uncovered_target(5.0)
+        self.assertLess(target.area, patches[0].area / 2)
+        self.assertLessEqual(max(coord[0] for coord in target.coords) - min(coord[0] for coord in target.coords), 10.0)
+        self.assertIn(target.area, [coverage.uncovered_area_near(coord, 5.0) for coord in target.coords])
+
+        retry = coverage.uncovered_target(5.0, [target.center])
+        self.assertGreater(math.dist(retry.center, target.center), 2.5)
+        self.assertIsNone(coverage.uncovered_target(5.0, coverage.coords))
+        coverage.update(coverage.coords)
+        self.assertIsNone(coverage.uncovered_target(5.0))
+        self.assertAlmostEqual(ligand_reach([(0.0, 0.0, 0.0), (2.0, 0.0, 0.0)]), 4.0)
+        with self.assertRaises(ValueError):
+            coverage.uncovered_target(0.0)
+
+    def run_wrapper(self, output_dir, coverage, lines=None, min_ligand_distance=0.5):
+        """Wrapper over a small receptor (random by default) with 8 seeds; returns the coverage report."""
+        from wrap_n_shake_docking import run_wrap_n_shake_docking
+
+        rng = random.Random(6)
+        (self.dir / "pdbqt").mkdir(exist_ok=True)
+        lines = lines or [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", index // 4 + 1,
+                                               (rng.uniform(4, 8), rng.uniform(0, 4), rng.uniform(0, 4)), 0.0, "C")
+                          for index in range(60)]
+        (self.dir / "pdbqt" / "protein.pdbqt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (6.0, 2.0, 2.0))
+        # Docking into the full box reads the ligand from the output directory
+        synthetic.write_ligand_pdbqt(self.dir / output_dir / "ligand.pdbqt", (6.0, 2.0, 2.0))
+        config = {
+            "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+            "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                       "ligand_types": "A C OA HD"},
+            "autogrid": {"npts": [40, 40, 40], "center": [6.0, 2.0, 2.0], "spacing": 1.0},
+            "wrapper": {"seeds": SEEDS, "output_dir": output_dir, "min_ligand_distance": min_ligand_distance,
+                        "template_dir": str(PROJECT_ROOT / "scripts" / "templates"),
+                        "coverage": dict(coverage, enabled=True)},
+        }
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(self.dir / "state")}
+        with mock.patch.dict(os.environ, env):
+            run_wrap_n_shake_docking(config)
+        return json.loads((self.dir / output_dir / "coverage.json").read_text(encoding="utf-8"))
+
+    def test_wrapper_steers_to_uncovered_patches(self):
+        """Each cycle docks around an uncovered target; the loop ends once none is left."""
+        report = self.run_wrapper("steered", {"padding": 2.0})
+        history = report["history"]
+        self.assertLess(len(history), len(SEEDS))
+        self.assertEqual([entry["seed"] for entry in history], SEEDS[:len(history)])
+        self.assertEqual(report["fraction"], 1.0)
+        self.assertTrue(all(value == 1.0 for value in report["residues"].values()))
+
+        focus = self.dir / "steered" / "coverage" / "seed_101"
+        small = load_maps(focus / "protein.maps.fld")["A"]
+        self.assertIn("about {} {} {}".format(*small.center), (focus / "wrapper_101.dpf").read_text(encoding="utf-8"))
+
+    def test_wrapper_moves_on_from_rejected_targets(self):
+        """On a long receptor each box covers one target; a rejected target is not docked into again."""
+        report = self.run_wrapper("rod", {"padding": 2.0, "patience": 3}, rod_lines(16), min_ligand_distance=100.0)
+        history = report["history"]
+        self.assertEqual([entry["accepted"] for entry in history], [True, False, False, False])
+        self.assertLess(history[0]["fraction"], 0.5)
+
+        boxes = [load_maps(self.dir / "rod" / "coverage" / f"seed_{entry['seed']}" / "protein.maps.fld")["A"]
+                 for entry in history]
+        self.assertTrue(all(box.npts[0] < 40 for box in boxes))
+        centers = [box.center for box in boxes[1:]]
+        self.assertTrue(all(math.dist(first, second) > 1.0
+                            for index, first in enumerate(centers) for second in centers[index + 1:]))
+        checkpoint = json.loads((self.dir / "rod" / "docking_checkpoint.json").read_text(encoding="utf-8"))
+        self.assertEqual(len(checkpoint["tried_hotspots"]), 3)
+
+    def test_wrapper_stops_when_coverage_gain_stalls(self):
+        """Without steering, cycles that add too little of the surface end the loop."""
+        report = self.run_wrapper("unsteered", {"steer": False, "min_gain": 0.1, "patience": 2})
+        history = report["history"]
+        self.assertLess(len(history), len(SEEDS))
+        self.assertTrue(all(entry["gain"] < 0.1 for entry in history[-2:]))
+        self.assertEqual(report["fraction"], history[-1]["fraction"])
+        self.assertFalse((self.dir / "unsteered" / "coverage").exists())
+        self.assertFalse((self.dir / "unsteered" / f"wrapper_{SEEDS[-1]}.dlg").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import sys
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import process_runner
+import synthetic
+from telemetry import AutoDockProgress, FileTail, MdrunProgress, Telemetry, format_eta
+
+DLG_HEAD = ["DPF> ga_num_evals 2500000", "DPF> ga_num_generations 27000", "DPF> ga_run 4"]
+
+
+def generation(number, evals):
+    return (f"Generation: {number:3d}   Oldest's energy: -1.000    Lowest energy: -5.000    "
+            f"Num.evals.: {evals}   Timing: 0.010 sec real, 0.010 sec CPU")
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_autodock_eta_from_generations(self):
+        """Work is counted in generations; the ETA follows the measured generation rate."""
+        progress = AutoDockProgress()
+        telemetry = Telemetry(progress, window=60.0)
+        for line in DLG_HEAD + ["BEGINNING GENETIC ALGORITHM DOCKING 1 of 4", generation(2700, 100000)]:
+            progress.feed(line)
+        telemetry.sample(now=1000.0)
+        self.assertIsNone(telemetry.eta_s)
+        progress.feed(generation(5400, 200000))
+        telemetry.sample(now=1010.0)
+        # 2700 generations in 10 s; 4 x 27000 - 5400 left
+        self.assertAlmostEqual(telemetry.rate, 270.0)
+        self.assertAlmostEqual(telemetry.eta_s, (108000 - 5400) / 270.0)
+        record = telemetry.snapshot(now=1010.0)
+        self.assertEqual((record["unit"], record["done"], record["total"]), ("generations", 5400, 108000))
+        self.assertAlmostEqual(record["fraction"], 0.05)
+
+        # A run limited by ga_num_evals counts as complete once it is finished
+        for line in [generation(6000, 2500000), "DOCKED: USER    Run = 1",
+                     "BEGINNING GENETIC ALGORITHM DOCKING 2 of 4"]:
+            progress.feed(line)
+        self.assertEqual(progress.work[0], 27000)
+        self.assertEqual(format_eta(3725), "ETA 1h02m")
+        self.assertEqual(format_eta(250), "ETA 4m10s")
+
+        # Samples older than the window no longer count
+        progress.feed(generation(13500, 1250000))
+        telemetry.sample(now=1100.0)
+        self.assertAlmostEqual(telemetry.rate, (40500 - 5400) / 90.0)
+
+    def test_mdrun_log_and_restart(self):
+        """Steps come from the "Step Time" blocks of md.log; ns/day from steps/s and dt."""
+        log = self.dir / "md.log"
+        log.write_text("stale run\n", encoding="utf-8")
+        tail = FileTail(log)
+        self.assertEqual(tail.read(), [])
+
+        progress = MdrunProgress()
+        telemetry = Telemetry(progress)
+        log.write_text("Input Parameters:\n   nsteps                         = 500000\n"
+                       "   dt                             = 0.002\n"
+                       "           Step           Time\n              0        0.00000\n\n", encoding="utf-8")
+        with log.open("a", encoding="utf-8") as handle:
+            handle.write("           Step           Time\n          10000       20.00000\n\n           Step")
+        for line in tail.read():
+            progress.feed(line)
+        self.assertEqual(progress.values, {"nsteps": 500000, "dt": 0.002, "step": 10000})
+        telemetry.sample(now=0.0)
+        with log.open("a", encoding="utf-8") as handle:
+            handle.write("           Time\n          20000       40.00000\n")
+        for line in tail.read():
+            progress.feed(line)
+        telemetry.sample(now=100.0)
+        record = telemetry.snapshot(now=100.0)
+        # 100 steps/s x 0.002 ps -> 17.28 ns/day
+        self.assertEqual((record["done"], record["rate_per_s"], record["ns_per_day"]), (20000, 100.0, 17.28))
+        self.assertAlmostEqual(record["eta_s"], 4800.0)
+
+        # Restarted from a checkpoint with a rewritten log: measured again from there
+        log.write_text("           Step           Time\n          15000       30.00000\n", encoding="utf-8")
+        for line in tail.read():
+            progress.feed(line)
+        telemetry.sample(now=101.0)
+        self.assertEqual(progress.values["step"], 15000)
+        self.assertIsNone(telemetry.rate)
+
+    def test_status_files_while_tools_run(self):
+        """mdrun started through gmx_runner refreshes its status file; ``wns watch`` reports a DLG."""
+        import wns
+        from gmx_runner import run_gmx_mdrun_safe
+
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        synthetic.write_gro_system(self.dir / "start.gro", 50, n_ligands=1)
+        (self.dir / "run.mdp").write_text("nsteps = 50000\ndt = 0.002\n", encoding="utf-8")
+        (self.dir / "topol.top").write_text("[ molecules ]\nProtein 1\nLIG 1\n", encoding="utf-8")
+        env = {"WNS_FAKE_STATE_DIR": str(self.dir / "state"), "WNS_FAKE_LATENCY_GMX_MDRUN": "2.0"}
+        gmx = str(bin_dir / ("gmx.cmd" if os.name == "nt" else "gmx"))
+        with mock.patch.dict(os.environ, env):
+            job = process_runner.RUNNER.run([gmx, "grompp", "-f", "run.mdp", "-c", "start.gro", "-o", "run.tpr"],
+                                            cwd=self.dir, name="grompp")
+            self.assertEqual(job.returncode, 0)
+
+            status_path = self.dir / "logs" / "mdrun_run.status.json"
+            seen = []
+            stop = threading.Event()
+
+            def poll():
+                while not stop.wait(0.05):
+                    if status_path.exists():
+                        seen.append(json.loads(status_path.read_text(encoding="utf-8")))
+
+            poller = threading.Thread(target=poll)
+            poller.start()
+            try:
+                with mock.patch.object(process_runner.RUNNER, "status_interval", 0.2):
+                    run_gmx_mdrun_safe("run", gmx, cwd=str(self.dir))
+            finally:
+                stop.set()
+                poller.join()
+
+        running = [record for record in seen if record["state"] == "running" and record["eta_s"]]
+        self.assertTrue(running, seen)
+        self.assertEqual((running[-1]["unit"], running[-1]["total"]), ("steps", 50000))
+        self.assertGreater(running[-1]["ns_per_day"], 0)
+        final = json.loads(status_path.read_text(encoding="utf-8"))
+        self.assertEqual((final["state"], final["fraction"], final["eta_s"]), ("done", 1.0, 0.0))
+        self.assertEqual(final["progress"]["ns_per_day"], 100.0)
+
+        dlg = self.dir / "dock" / "wrapper_101.dlg"
+        dlg.parent.mkdir()
+        dlg.write_text("\n".join(DLG_HEAD + ["BEGINNING GENETIC ALGORITHM DOCKING 1 of 4",
+                                             generation(13500, 1000000)]) + "\n", encoding="utf-8")
+        self.assertEqual(wns.main(["watch", str(dlg), "--once", "--status-dir", str(self.dir / "status")]), 0)
+        record = json.loads((self.dir / "status" / "wrapper_101.json").read_text(encoding="utf-8"))
+        self.assertEqual((record["state"], record["done"], record["total"]), ("running", 13500, 108000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import synthetic
+import wns
+
+
+class TestWnsCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_help_imports_no_subcommand(self):
+        """``wns --help`` lists every command without importing any of their modules."""
+        code = ("import json, sys, wns\n"
+                "try:\n    wns.main(['--help'])\nexcept SystemExit:\n    pass\n"
+                "print(json.dumps(sorted(sys.modules)))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT / "scripts",
+                                capture_output=True, text=True, check=True)
+        loaded = set(json.loads(result.stdout.splitlines()[-1]))
+        modules = {module for module, _ in wns.COMMANDS.values()}
+        self.assertFalse(loaded & (modules | {"yaml", "numpy", "MDAnalysis", "structure_cache"}))
+        for command in wns.COMMANDS:
+            self.assertIn(command, result.stdout)
+
+    def test_subcommand_help_without_optional_dependencies(self):
+        """``wns analyze --help`` works even where MDAnalysis is not installed."""
+        result = subprocess.run([sys.executable, str(PROJECT_ROOT / "scripts" / "wns.py"), "analyze", "--help"],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("--occupancy", result.stdout)
+
+    def test_dispatch_in_process(self):
+        """A subcommand runs its script's main() with the remaining arguments."""
+        receptor = synthetic.write_receptor_pdbqt(self.dir / "receptor.pdbqt", 200)
+        low, high = synthetic.receptor_extent(200)
+        ligand = synthetic.write_ligand_pdbqt(self.dir / "ligand.pdbqt",
+                                              tuple((low[k] + high[k]) / 2 for k in range(3)))
+        output = self.dir / "masked.pdbqt"
+        self.assertEqual(wns.main(["mask", str(receptor), str(ligand), "-o", str(output)]), 0)
+        self.assertTrue(output.exists())
+
+        with self.assertRaises(SystemExit):
+            wns.main(["nosuchcommand"])
+
+
+if __name__ == "__main__":
+    unittest.main()
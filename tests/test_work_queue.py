@@ -0,0 +1,192 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add project root, benchmarks, scripts and utils folders to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "benchmarks"))
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+sys.path.append(str(PROJECT_ROOT / "utils"))
+
+import fake_tools
+import synthetic
+import work_queue
+from work_queue import WorkQueue
+from wns_worker import run_worker
+
+
+def append_command(path, text):
+    code = f"open({str(path)!r}, 'a').write({text!r} + '\\n')"
+    return {"cmd": [sys.executable, "-c", code], "cwd": None}
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.queue = WorkQueue(self.dir / "queue", heartbeat_interval=0.05, stale_after=60.0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_claims_are_exclusive(self):
+        """Each task is claimed once; finished ids are not re-queued."""
+        first = self.queue.submit("command", {}, task_id="a")
+        self.queue.submit("command", {}, task_id="b")
+        claim_a = self.queue.claim("w1")
+        claim_b = self.queue.claim("w2")
+        self.assertEqual({claim_a.id, claim_b.id}, {"a", "b"})
+        self.assertIsNone(self.queue.claim("w3"))
+
+        self.assertTrue(self.queue.complete(claim_a, {"ok": True}))
+        self.assertEqual(self.queue.submit("command", {}, task_id=first), first)
+        self.assertEqual(self.queue.status(), {"pending": 0, "claimed": 1, "done": 1, "failed": 0})
+        self.assertEqual(self.queue.result("a")["result"], {"ok": True})
+
+        self.assertEqual(self.queue.fail(claim_b, "boom"), "pending")
+        self.assertEqual(self.queue.claim("w1").task["attempts"], 2)
+
+    def test_stale_claims_are_reclaimed(self):
+        """A claim without heartbeats returns to pending, then fails after max_attempts."""
+        queue = WorkQueue(self.dir / "queue", stale_after=0.0, max_attempts=2)
+        queue.submit("command", {}, task_id="seed_101")
+        dead = queue.claim("dead-worker")
+        self.assertEqual(queue.reclaim_stale(), ["seed_101"])
+        self.assertFalse(dead.touch())
+        self.assertTrue(dead.lost)
+        # A late result still counts; the requeued copy is then dropped at claim time
+        self.assertTrue(queue.complete(dead, {"late": True}))
+        self.assertIsNone(queue.claim("other-worker"))
+        self.assertEqual(queue.status()["pending"], 0)
+
+        queue.submit("command", {}, task_id="seed_202")
+        for _ in range(2):
+            queue.claim("dead-worker")
+            queue.reclaim_stale()
+        self.assertEqual(queue.state_of("seed_202"), "failed")
+        self.assertIn("heartbeat", queue.result("seed_202")["error"])
+
+    def test_failed_task_is_released_before_requeue(self):
+        """The claim is gone before the task is back in pending/, so a new owner keeps theirs."""
+        self.queue.submit("command", {}, task_id="seed_101")
+        claim = self.queue.claim("w1")
+        replace = os.replace
+        taken = []
+
+        def publish(source, target):
+            replace(source, target)
+            if Path(target).parent.name == "pending":
+                self.assertFalse(claim.path.exists())
+                self.assertFalse(claim.claim_path.exists())
+                taken.append(self.queue.claim("w2"))
+
+        with mock.patch.object(work_queue.os, "replace", side_effect=publish):
+            self.assertEqual(self.queue.fail(claim, "boom"), "pending")
+        self.assertTrue(self.queue.owns(taken[0]))
+        self.assertEqual(self.queue.status(), {"pending": 0, "claimed": 1, "done": 0, "failed": 0})
+
+    def test_reclaimed_task_is_released_before_requeue(self):
+        """A stale claim is dropped before the task is back in pending/, so a new owner keeps theirs."""
+        queue = WorkQueue(self.dir / "queue", stale_after=0.0)
+        queue.submit("command", {}, task_id="seed_101")
+        dead = queue.claim("dead-worker")
+        replace = os.replace
+        taken = []
+
+        def publish(source, target):
+            replace(source, target)
+            if Path(target).parent.name == "pending":
+                self.assertFalse(dead.claim_path.exists())
+                taken.append(queue.claim("w2"))
+
+        with mock.patch.object(work_queue.os, "replace", side_effect=publish):
+            self.assertEqual(queue.reclaim_stale(), ["seed_101"])
+        self.assertTrue(queue.owns(taken[0]))
+
+        # A reclaimer can move the task away between the rename and the heartbeat reset
+        queue.submit("command", {}, task_id="seed_202")
+        with mock.patch.object(work_queue.os, "utime", side_effect=FileNotFoundError):
+            self.assertIsNone(queue.claim("w3", kinds=["command"]))
+
+    def test_batches_sharing_a_queue_dock_separately(self):
+        """A second batch on the same queue runs its own seeds instead of reusing the first one's results."""
+        from run_autodock_batch import main as run_batch
+
+        (self.dir / "pdbqt").mkdir()
+        lines = [synthetic.pdbqt_line("ATOM", index + 1, "C", "ALA", "A", 1, (1.5 * index, 3.0, 3.0), 0.0, "C")
+                 for index in range(6)]
+        (self.dir / "pdbqt" / "protein.pdbqt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        synthetic.write_ligand_pdbqt(self.dir / "wrapper" / "ligand.pdbqt", (4.0, 3.0, 3.0))
+        bin_dir = self.dir / "bin"
+        fake_tools.install(bin_dir)
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               "WNS_FAKE_STATE_DIR": str(self.dir / "state")}
+        with mock.patch.dict(os.environ, env):
+            worker = threading.Thread(target=run_worker, args=(WorkQueue(self.queue.root),),
+                                      kwargs={"poll": 0.05, "max_tasks": 2})
+            worker.start()
+            for output_dir in ("first", "second"):
+                config = {
+                    "paths": {"working_dir": str(self.dir), "autogrid4": "autogrid4", "autodock4": "autodock4"},
+                    "inputs": {"receptor_pdbqt": "pdbqt/protein.pdbqt", "ligand_pdbqt": "wrapper/ligand.pdbqt",
+                               "ligand_types": "A C OA HD"},
+                    "autogrid": {"npts": [40, 40, 40], "center": [4, 3, 3], "spacing": 0.375},
+                    "wrapper": {"seeds": [101], "output_dir": output_dir,
+                                "template_dir": str(PROJECT_ROOT / "scripts" / "templates")},
+                }
+                config_path = self.dir / f"{output_dir}.yml"
+                config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+                run_batch(["--config", str(config_path), "--queue", str(self.queue.root)])
+            worker.join(timeout=60)
+        for output_dir in ("first", "second"):
+            self.assertTrue((self.dir / output_dir / "wrapper_101.dlg").exists())
+        self.assertEqual(self.queue.status()["done"], 2)
+
+    def test_failed_shaker_cycle_fails_the_task(self):
+        """A washing cycle error reaches the worker instead of completing the replica."""
+        from wns_worker import run_worker as worker
+
+        queue = WorkQueue(self.dir / "queue", max_attempts=1)
+        gmx_dir = self.dir / "replica_1" / "gmx"
+        gmx_dir.mkdir(parents=True)
+        queue.submit("shaker_replica", {"gmx_dir": str(gmx_dir), "config": {"shaker": {"n_cycles": 2}}},
+                     task_id="replica_1")
+        with mock.patch("run_full_wrap_n_shake.washing_cycle", side_effect=RuntimeError("mdrun crashed")):
+            worker(queue, "w1", poll=0.05, max_tasks=1)
+        record = queue.result("replica_1")
+        self.assertEqual(record["state"], "failed")
+        self.assertIn("mdrun crashed", record["error"])
+
+    def test_workers_run_every_task_once(self):
+        """Two worker processes plus an in-process worker drain the queue without duplicates."""
+        log = self.dir / "log.txt"
+        ids = [self.queue.submit("command", append_command(log, f"task{i}"), task_id=f"t{i:02d}")
+               for i in range(12)]
+        self.queue.submit("command", {"cmd": [sys.executable, "-c", "raise SystemExit(3)"]}, task_id="bad")
+
+        workers = [subprocess.Popen([sys.executable, str(PROJECT_ROOT / "scripts" / "wns.py"), "worker",
+                                     str(self.queue.root), "--poll", "0.05", "--idle-exit", "0.5",
+                                     "--max-attempts", "1"],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                   for _ in range(2)]
+        run_worker(WorkQueue(self.queue.root, max_attempts=1), "local", poll=0.05, idle_exit=0.5)
+        for worker in workers:
+            self.assertEqual(worker.wait(timeout=60), 0)
+
+        lines = log.read_text().split()
+        self.assertEqual(sorted(lines), sorted(f"task{i}" for i in range(12)))
+        records = self.queue.wait(ids + ["bad"], poll=0.05, timeout=5)
+        self.assertTrue(all(records[task_id]["state"] == "done" for task_id in ids))
+        self.assertEqual(records["bad"]["state"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import json
+import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch, mock_open
 
@@ -16,9 +17,14 @@ from wrap_n_shake_docking import CheckpointState
 
 class TestWrapNShakeResume(unittest.TestCase):
     def setUp(self):
-        self.checkpoint_path = Path("fake_checkpoint.json")
+        # Unmocked saves land in a scratch directory, not in the working tree
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint_path = Path(self.tmp.name) / "fake_checkpoint.json"
         self.checkpoint = CheckpointState(self.checkpoint_path)
 
+    def tearDown(self):
+        self.tmp.cleanup()
+
     def test_initial_state(self):
         """Test default state when initialized."""
         self.assertEqual(self.checkpoint.state["completed_seeds"], [])
@@ -116,6 +122,19 @@ class TestWrapNShakeResume(unittest.TestCase):
         # Successful docks count should not increase
         self.assertEqual(self.checkpoint.get_successful_docks(), 1)
 
+    @patch("pathlib.Path.open", new_callable=mock_open)
+    def test_tried_hotspots_survive_a_restart(self, mock_file):
+        """Rejected hotspot centres are saved with the seed and restored on load."""
+        self.checkpoint.mark_seed_completed(101, None, "rec.pdbqt", tried_hotspot=(1.5, 2.0, -3.25))
+        self.assertEqual(self.checkpoint.get_tried_hotspots(), [(1.5, 2.0, -3.25)])
+        saved_state = json.loads(json.dumps(self.checkpoint.state))
+
+        resumed = CheckpointState(self.checkpoint_path)
+        self.assertEqual(resumed.get_tried_hotspots(), [])
+        with patch("pathlib.Path.exists", return_value=True), patch("json.load", return_value=saved_state):
+            self.assertTrue(resumed.load())
+        self.assertEqual(resumed.get_tried_hotspots(), [(1.5, 2.0, -3.25)])
+
 
 if __name__ == "__main__":
     unittest.main()
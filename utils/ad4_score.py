@@ -0,0 +1,374 @@
+"""AutoDock4 scoring of ligand poses against cached AutoGrid maps.
+
+Re-evaluating a pose after moving, trimming or merging it used to mean
+another ``autodock4`` run.  ``AD4Scorer`` computes the same terms directly:
+
+* intermolecular: the affinity map of each atom's type, plus its charge times
+  the electrostatic map and ``|charge|`` times the desolvation map, all
+  trilinearly interpolated.  Atoms outside the grid get ``OUTSIDE_PENALTY``
+  instead, like AutoDock's out-of-grid penalty;
+* intramolecular: AutoDock 4.1 pair terms (12-6 van der Waals, 12-10
+  hydrogen bonds, electrostatics with the Mehler-Solmajer distance-dependent
+  dielectric and desolvation) between atoms that can move relative to each
+  other: pairs in different rigid pieces of the PDBQT torsion tree that are
+  more than three bonds apart, within ``INTRA_CUTOFF`` Å;
+* torsional: ``FE_coeff_tors`` times ``TORSDOF``.
+
+``binding`` is intermolecular plus torsional, which is AutoDock's "Estimated
+Free Energy of Binding" when the unbound state equals the bound one (the
+AD4.2 default).  ``total`` is intermolecular plus intramolecular.
+
+The maps come from ``grid_maps.load_maps`` and are indexed in place, without
+copies.  With NumPy every term is evaluated for a whole batch of poses
+(poses x atoms x 3) at once: one gather per atom type and map corner, and
+one array expression per pair term.  Without NumPy the same formulas run
+per atom and per pair.
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from grid_maps import GridMap
+from ligand_topology import adjacency, element_of, perceive_bonds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OUTSIDE_PENALTY = 500.0   # kcal/mol per atom outside the grid
+INTRA_CUTOFF = 8.0        # Å
+PAIR_CLAMP = 100000.0     # kcal/mol, upper limit of one intramolecular pair
+BATCH_SIZE = 4096         # poses per vectorised batch
+
+# Mehler-Solmajer distance-dependent dielectric
+_DIELECTRIC_A = -8.5525
+_DIELECTRIC_B = 78.4 - _DIELECTRIC_A
+_DIELECTRIC_LAMBDA = 0.003627
+_DIELECTRIC_K = 7.7839
+_COULOMB = 332.06363
+_DESOLV_SIGMA = 3.6
+_QSOLPAR = 0.01097
+
+FE_COEFFICIENTS = {"vdW": 0.1662, "hbond": 0.1209, "estat": 0.1406, "desolv": 0.1322, "tors": 0.2983}
+
+# AutoDock 4.1 bound parameters: Rii, epsii, vol, solpar, Rij_hb, epsij_hb, hbond type
+# (hbond type 1/2: donor hydrogen, 3/4/5: acceptor)
+ATOM_PARAMETERS: Dict[str, Tuple[float, float, float, float, float, float, int]] = {
+    "H": (2.00, 0.020, 0.0000, 0.00051, 0.0, 0.0, 0),
+    "HD": (2.00, 0.020, 0.0000, 0.00051, 0.0, 0.0, 2),
+    "HS": (2.00, 0.020, 0.0000, 0.00051, 0.0, 0.0, 1),
+    "C": (4.00, 0.150, 33.5103, -0.00143, 0.0, 0.0, 0),
+    "A": (4.00, 0.150, 33.5103, -0.00052, 0.0, 0.0, 0),
+    "N": (3.50, 0.160, 22.4493, -0.00162, 0.0, 0.0, 0),
+    "NA": (3.50, 0.160, 22.4493, -0.00162, 1.9, 5.0, 4),
+    "NS": (3.50, 0.160, 22.4493, -0.00162, 1.9, 5.0, 3),
+    "OA": (3.20, 0.200, 17.1573, -0.00251, 1.9, 5.0, 5),
+    "OS": (3.20, 0.200, 17.1573, -0.00251, 1.9, 5.0, 3),
+    "F": (3.09, 0.080, 15.4480, -0.00110, 0.0, 0.0, 0),
+    "Mg": (1.30, 0.875, 1.5600, -0.00110, 0.0, 0.0, 0),
+    "P": (4.20, 0.200, 38.7924, -0.00110, 0.0, 0.0, 0),
+    "SA": (4.00, 0.200, 33.5103, -0.00214, 2.5, 1.0, 5),
+    "S": (4.00, 0.200, 33.5103, -0.00214, 0.0, 0.0, 0),
+    "Cl": (4.09, 0.276, 35.8235, -0.00110, 0.0, 0.0, 0),
+    "Ca": (1.98, 0.550, 2.7700, -0.00110, 0.0, 0.0, 0),
+    "Mn": (1.30, 0.875, 2.1400, -0.00110, 0.0, 0.0, 0),
+    "Fe": (1.30, 0.010, 1.8400, -0.00110, 0.0, 0.0, 0),
+    "Zn": (1.48, 0.550, 1.7000, -0.00110, 0.0, 0.0, 0),
+    "Br": (4.33, 0.389, 42.5661, -0.00110, 0.0, 0.0, 0),
+    "I": (4.72, 0.550, 55.0585, -0.00110, 0.0, 0.0, 0),
+}
+
+Coord = Tuple[float, float, float]
+_CORNERS = [(dx, dy, dz) for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)]
+
+
+def load_parameters(path: Optional[Path] = None) -> Tuple[Dict[str, Tuple], Dict[str, float]]:
+    """Atom parameters and FE coefficients: the AD4.1 defaults updated from an AutoDock parameter file.
+
+    Only the entries present in ``path`` are replaced, so a file that just
+    adds a type (such as the masking type ``X``) keeps every default.
+    """
+    atoms = dict(ATOM_PARAMETERS)
+    coefficients = dict(FE_COEFFICIENTS)
+    if path is None:
+        return atoms, coefficients
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        fields = line.split("#", 1)[0].split()
+        if len(fields) >= 9 and fields[0] == "atom_par":
+            values = [float(value) for value in fields[2:8]]
+            atoms[fields[1]] = (*values, int(fields[8]))
+        elif len(fields) >= 2 and fields[0].startswith("FE_coeff_"):
+            coefficients[fields[0][len("FE_coeff_"):]] = float(fields[1])
+    return atoms, coefficients
+
+
+class LigandPoses:
+    def __init__(self, names: List[str], types: List[str], charges: List[float], poses: List[List[Coord]],
+                 segments: List[int], torsdof: int) -> None:
+        """
+        Args:
+            names: Atom names.
+            types: AutoDock atom types.
+            charges: Partial charges.
+            poses: Coordinates (Å) of every model, same atom order.
+            segments: Rigid piece of the torsion tree each atom belongs to.
+            torsdof: ``TORSDOF`` of the ligand.
+        """
+        self.names = names
+        self.types = types
+        self.charges = charges
+        self.poses = poses
+        self.segments = segments
+        self.torsdof = torsdof
+
+
+def read_ligand_poses(path: Path) -> LigandPoses:
+    """Every ``MODEL`` of a ligand PDBQT (a single pose when there are none)."""
+    names: List[str] = []
+    types: List[str] = []
+    charges: List[float] = []
+    segments: List[int] = []
+    poses: List[List[Coord]] = []
+    current: List[Coord] = []
+    stack: List[int] = []
+    n_segments = 0
+    torsdof = 0
+    first = True
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if line.startswith(("ROOT", "BRANCH")):
+            stack.append(n_segments)
+            n_segments += 1
+        elif line.startswith(("ENDROOT", "ENDBRANCH")):
+            if stack:
+                stack.pop()
+        elif line.startswith("TORSDOF"):
+            torsdof = int(line.split()[1])
+        elif line.startswith(("ATOM", "HETATM")):
+            current.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+            if first:
+                names.append(line[12:16].strip())
+                types.append(line[77:79].strip())
+                charges.append(float(line[70:76].strip() or 0.0))
+                segments.append(stack[-1] if stack else -1)
+        elif line.startswith("ENDMDL") and current:
+            poses.append(current)
+            current = []
+            first = False
+    if current:
+        poses.append(current)
+    if -1 in segments or not n_segments:
+        # No torsion tree: every atom moves on its own
+        segments = list(range(len(names)))
+    for pose in poses:
+        if len(pose) != len(names):
+            raise ValueError(f"{path}: models have different atom counts")
+    return LigandPoses(names, types, charges, poses, segments, torsdof)
+
+
+def intramolecular_pairs(coords: Sequence[Coord], names: Sequence[str], types: Sequence[str],
+                         segments: Sequence[int]) -> List[Tuple[int, int]]:
+    """Atom pairs in different rigid pieces that are more than three bonds apart."""
+    elements = [element_of(name, atom_type) for name, atom_type in zip(names, types)]
+    bonds = perceive_bonds([(x / 10.0, y / 10.0, z / 10.0) for x, y, z in coords], elements)
+    neighbours = adjacency(len(coords), bonds)
+    pairs = []
+    for i in range(len(coords)):
+        # Atoms up to three bonds from i
+        near = {i}
+        frontier = {i}
+        for _ in range(3):
+            frontier = {other for atom in frontier for other in neighbours[atom]} - near
+            near |= frontier
+        pairs.extend((i, j) for j in range(i + 1, len(coords)) if j not in near and segments[i] != segments[j])
+    return pairs
+
+
+def _dielectric(r, exp):
+    return _DIELECTRIC_A + _DIELECTRIC_B / (1.0 + _DIELECTRIC_K * exp(-_DIELECTRIC_LAMBDA * _DIELECTRIC_B * r))
+
+
+def _pair_energy(r, repulsion, attraction, power, coulomb, desolvation, exp):
+    """One intramolecular pair term; works on floats and on NumPy arrays alike."""
+    return (repulsion / r ** 12 - attraction / r ** power
+            + coulomb / (_dielectric(r, exp) * r)
+            + desolvation * exp(-r * r / (2.0 * _DESOLV_SIGMA ** 2)))
+
+
+class AD4Scorer:
+    def __init__(self, maps: Mapping[str, GridMap], types: Sequence[str], charges: Sequence[float],
+                 pairs: Sequence[Tuple[int, int]] = (), torsdof: int = 0,
+                 parameter_file: Optional[Path] = None) -> None:
+        """
+        Args:
+            maps: AutoGrid maps keyed by atom type, with ``e``/``d`` for the
+                electrostatic and desolvation maps (``grid_maps.load_maps``)
+            types: AutoDock type of each ligand atom
+            charges: Partial charge of each ligand atom
+            pairs: Intramolecular pairs (see ``intramolecular_pairs``)
+            torsdof: Torsional degrees of freedom
+            parameter_file: AutoDock parameter file overriding the AD4.1 defaults
+        """
+        missing = sorted({atom_type for atom_type in types if atom_type not in maps})
+        if missing:
+            raise ValueError(f"No AutoGrid map for ligand atom types: {' '.join(missing)}")
+        self.maps = maps
+        self.types = list(types)
+        self.charges = [float(charge) for charge in charges]
+        self.pairs = list(pairs)
+        atoms, coefficients = load_parameters(parameter_file)
+        unknown = sorted({atom_type for atom_type in self.types if atom_type not in atoms})
+        if unknown and self.pairs:
+            raise ValueError(f"No AutoDock parameters for atom types: {' '.join(unknown)}")
+        self.torsional = coefficients["tors"] * torsdof
+        self.by_type: Dict[str, List[int]] = {}
+        for index, atom_type in enumerate(self.types):
+            self.by_type.setdefault(atom_type, []).append(index)
+        self.pair_terms = [self._pair_parameters(i, j, atoms, coefficients) for i, j in self.pairs]
+
+    @classmethod
+    def from_pdbqt(cls, maps: Mapping[str, GridMap], path: Path,
+                   parameter_file: Optional[Path] = None) -> Tuple["AD4Scorer", LigandPoses]:
+        """Scorer for the ligand in ``path`` (topology from its first model) and the poses it holds."""
+        ligand = read_ligand_poses(path)
+        if not ligand.poses:
+            raise ValueError(f"{path}: no atoms")
+        pairs = intramolecular_pairs(ligand.poses[0], ligand.names, ligand.types, ligand.segments)
+        return cls(maps, ligand.types, ligand.charges, pairs, ligand.torsdof, parameter_file), ligand
+
+    def _pair_parameters(self, i: int, j: int, atoms: Dict[str, Tuple], coefficients: Dict[str, float]):
+        Ri, epsi, voli, soli, Rhbi, epshbi, hbi = atoms[self.types[i]]
+        Rj, epsj, volj, solj, Rhbj, epshbj, hbj = atoms[self.types[j]]
+        qi, qj = self.charges[i], self.charges[j]
+        if hbi in (1, 2) and hbj in (3, 4, 5) or hbj in (1, 2) and hbi in (3, 4, 5):
+            # 12-10 hydrogen bond with the acceptor's parameters
+            radius, depth = (Rhbj, epshbj) if hbj in (3, 4, 5) else (Rhbi, epshbi)
+            depth *= coefficients["hbond"]
+            repulsion, attraction, power = 5.0 * depth * radius ** 12, 6.0 * depth * radius ** 10, 10
+        else:
+            radius, depth = (Ri + Rj) / 2.0, math.sqrt(epsi * epsj) * coefficients["vdW"]
+            repulsion, attraction, power = depth * radius ** 12, 2.0 * depth * radius ** 6, 6
+        coulomb = coefficients["estat"] * _COULOMB * qi * qj
+        desolvation = coefficients["desolv"] * ((soli + _QSOLPAR * abs(qi)) * volj
+                                                + (solj + _QSOLPAR * abs(qj)) * voli)
+        return repulsion, attraction, power, coulomb, desolvation
+
+    def score(self, poses) -> Dict[str, List[float]]:
+        """Energies of ``poses`` (poses x atoms x 3, Å) in kcal/mol.
+
+        Returns:
+            Lists with one value per pose under ``inter``, ``intra``,
+            ``torsional``, ``total`` and ``binding``.
+        """
+        if np is not None:
+            inter, intra = [], []
+            for start in range(0, len(poses), BATCH_SIZE):
+                batch = np.asarray(poses[start:start + BATCH_SIZE], dtype=float).reshape(-1, len(self.types), 3)
+                inter.extend(self._inter_np(batch).tolist())
+                intra.extend(self._intra_np(batch).tolist())
+        else:
+            inter = [self._inter(pose) for pose in poses]
+            intra = [self._intra(pose) for pose in poses]
+        return {
+            "inter": inter,
+            "intra": intra,
+            "torsional": [self.torsional] * len(inter),
+            "total": [a + b for a, b in zip(inter, intra)],
+            "binding": [a + self.torsional for a in inter],
+        }
+
+    # ------------------------------------------------------------------
+    # NumPy
+    # ------------------------------------------------------------------
+    def _interpolate_np(self, grid: GridMap, points):
+        """Trilinear map values at ``points`` (n x 3) and a mask of points outside the grid."""
+        shape = np.asarray(grid.shape)
+        frac = (points - np.asarray(grid.origin)) / grid.spacing
+        outside = np.any((frac < 0) | (frac > shape - 1), axis=1)
+        frac = np.clip(frac, 0, shape - 1)
+        base = np.minimum(np.floor(frac).astype(np.int64), shape - 2)
+        t = frac - base
+        nx, ny = int(shape[0]), int(shape[1])
+        flat = base[:, 0] + nx * (base[:, 1] + ny * base[:, 2])
+        values = np.asarray(grid.values)
+        result = np.zeros(len(points))
+        for dx, dy, dz in _CORNERS:
+            weight = ((t[:, 0] if dx else 1 - t[:, 0]) * (t[:, 1] if dy else 1 - t[:, 1])
+                      * (t[:, 2] if dz else 1 - t[:, 2]))
+            result += weight * values[flat + dx + nx * (dy + ny * dz)]
+        return result, outside
+
+    def _inter_np(self, batch):
+        n_poses, n_atoms, _ = batch.shape
+        energy = np.zeros((n_poses, n_atoms))
+        for atom_type, columns in self.by_type.items():
+            values, outside = self._interpolate_np(self.maps[atom_type], batch[:, columns].reshape(-1, 3))
+            energy[:, columns] = np.where(outside, OUTSIDE_PENALTY, values).reshape(n_poses, len(columns))
+        points = batch.reshape(-1, 3)
+        charges = np.tile(np.asarray(self.charges), n_poses)
+        for key, weights in (("e", charges), ("d", np.abs(charges))):
+            if key in self.maps:
+                values, outside = self._interpolate_np(self.maps[key], points)
+                energy += np.where(outside, 0.0, values * weights).reshape(n_poses, n_atoms)
+        return energy.sum(axis=1)
+
+    def _intra_np(self, batch):
+        if not self.pairs:
+            return np.zeros(len(batch))
+        first = [i for i, _ in self.pairs]
+        second = [j for _, j in self.pairs]
+        r = np.linalg.norm(batch[:, first] - batch[:, second], axis=2)
+        repulsion, attraction, power, coulomb, desolvation = (np.asarray(column) for column in zip(*self.pair_terms))
+        with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+            energy = _pair_energy(np.maximum(r, 1e-6), repulsion, attraction, power, coulomb, desolvation, np.exp)
+        energy = np.minimum(np.nan_to_num(energy, nan=PAIR_CLAMP, posinf=PAIR_CLAMP), PAIR_CLAMP)
+        return np.where(r <= INTRA_CUTOFF, energy, 0.0).sum(axis=1)
+
+    # ------------------------------------------------------------------
+    # Pure Python
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _interpolate(grid: GridMap, point: Coord) -> Optional[float]:
+        """Trilinear map value at ``point``; None outside the grid."""
+        shape = grid.shape
+        frac = [(value - low) / grid.spacing for value, low in zip(point, grid.origin)]
+        if any(f < 0 or f > n - 1 for f, n in zip(frac, shape)):
+            return None
+        base = [min(int(math.floor(f)), n - 2) for f, n in zip(frac, shape)]
+        t = [f - b for f, b in zip(frac, base)]
+        nx, ny, _ = shape
+        flat = base[0] + nx * (base[1] + ny * base[2])
+        result = 0.0
+        for dx, dy, dz in _CORNERS:
+            weight = ((t[0] if dx else 1 - t[0]) * (t[1] if dy else 1 - t[1]) * (t[2] if dz else 1 - t[2]))
+            result += weight * grid.values[flat + dx + nx * (dy + ny * dz)]
+        return result
+
+    def _inter(self, pose: Sequence[Coord]) -> float:
+        energy = 0.0
+        for point, atom_type, charge in zip(pose, self.types, self.charges):
+            value = self._interpolate(self.maps[atom_type], point)
+            if value is None:
+                energy += OUTSIDE_PENALTY
+                continue
+            energy += value
+            for key, weight in (("e", charge), ("d", abs(charge))):
+                if key in self.maps:
+                    energy += weight * (self._interpolate(self.maps[key], point) or 0.0)
+        return energy
+
+    def _intra(self, pose: Sequence[Coord]) -> float:
+        energy = 0.0
+        for (i, j), terms in zip(self.pairs, self.pair_terms):
+            r = math.dist(pose[i], pose[j])
+            if r > INTRA_CUTOFF:
+                continue
+            try:
+                value = _pair_energy(max(r, 1e-6), *terms, math.exp)
+            except OverflowError:
+                value = PAIR_CLAMP
+            energy += min(value, PAIR_CLAMP)
+        return energy
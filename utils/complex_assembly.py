@@ -0,0 +1,416 @@
+"""Protein + N docked ligand copies -> ``complex.gro`` and ``topol.top``.
+
+The wrapper accepts many poses of one ligand; the MD system needs every one
+of them in the parameterized ligand's atom order.  ``assemble_complex``:
+
+1. reads the ACPYPE template (``*_GMX.itp`` atom order, names, masses and
+   bonds; ``*_GMX.gro`` reference coordinates);
+2. maps the docked atoms onto the template once - by atom name when the
+   names are unique, otherwise by matching the pose's perceived bond graph
+   onto the template's (elements and heavy-atom degrees must agree), since
+   AutoDock ligands often carry duplicate names such as ``C``/``H``;
+3. places every copy: mapped atoms take the docked coordinates, atoms the
+   pose lacks (AutoDock drops non-polar hydrogens) are fitted from the
+   template around their bonded neighbours, one fit per anchor for all
+   copies at once (vectorized when NumPy is available);
+4. writes ``complex.gro`` (protein first, one residue number per copy) and
+   adds the ``#include`` and the copy count to ``topol.top``.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ligand_topology import MASSES, element_of, perceive_bonds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LIGAND_RESNAMES = ("UNL", "LIG", "MOL")
+
+Coord = Tuple[float, float, float]
+
+
+class AssemblyError(RuntimeError):
+    """Raised when docked poses cannot be mapped onto the ligand template."""
+
+
+def element_from_mass(mass: float) -> str:
+    return min(MASSES, key=lambda element: abs(MASSES[element] - mass))
+
+
+def _itp_sections(text: str) -> Dict[str, List[List[str]]]:
+    sections: Dict[str, List[List[str]]] = {}
+    current = None
+    for raw in text.splitlines():
+        line = raw.split(";", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        match = re.match(r"\[\s*(\w+)\s*\]", line)
+        if match:
+            current = match.group(1).lower()
+            # Only the first molecule of the file is the ligand
+            if current == "moleculetype" and current in sections:
+                break
+            sections.setdefault(current, [])
+            continue
+        if current is not None:
+            sections[current].append(line.split())
+    return sections
+
+
+class LigandTemplate:
+    """The parameterized ligand: atom order, names, elements, bonds and reference coordinates (nm)."""
+
+    def __init__(self, itp: Path, gro: Path) -> None:
+        self.itp = Path(itp)
+        self.gro = Path(gro)
+        sections = _itp_sections(self.itp.read_text(encoding="utf-8"))
+        if not sections.get("moleculetype") or not sections.get("atoms"):
+            raise AssemblyError(f"{itp} has no [ moleculetype ] / [ atoms ] section")
+        self.molname = sections["moleculetype"][0][0]
+        atoms = sections["atoms"]
+        self.names = [fields[4] for fields in atoms]
+        self.resname = atoms[0][3]
+        self.elements = [element_from_mass(float(fields[7])) if len(fields) > 7 else element_of(fields[4])
+                         for fields in atoms]
+        self.bonds = sorted({(min(int(f[0]), int(f[1])) - 1, max(int(f[0]), int(f[1])) - 1)
+                             for f in sections.get("bonds", [])})
+        self.neighbours: List[List[int]] = [[] for _ in self.names]
+        for i, j in self.bonds:
+            self.neighbours[i].append(j)
+            self.neighbours[j].append(i)
+
+        lines = self.gro.read_text(encoding="utf-8").splitlines()
+        count = int(lines[1])
+        if count != len(self.names):
+            raise AssemblyError(f"{gro} has {count} atoms, {itp} has {len(self.names)}")
+        self.coords: List[Coord] = [(float(line[20:28]), float(line[28:36]), float(line[36:44]))
+                                    for line in lines[2:2 + count]]
+
+    @classmethod
+    def from_acpype_dir(cls, acpype_dir: Path) -> "LigandTemplate":
+        acpype_dir = Path(acpype_dir)
+        itps = sorted(acpype_dir.glob("*_GMX.itp")) or sorted(
+            path for path in acpype_dir.glob("*.itp") if not path.name.startswith("posre"))
+        gros = sorted(acpype_dir.glob("*_GMX.gro")) or sorted(acpype_dir.glob("*.gro"))
+        if not itps or not gros:
+            raise AssemblyError(f"No ligand .itp/.gro in {acpype_dir}")
+        return cls(itps[0], gros[0])
+
+    def heavy_degree(self, index: int) -> int:
+        return sum(1 for other in self.neighbours[index] if self.elements[other] != "H")
+
+
+class Pose:
+    """One docked ligand copy (coordinates in nm)."""
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.elements: List[str] = []
+        self.coords: List[Coord] = []
+
+
+def read_poses(pdb: Path, resnames: Sequence[str] = LIGAND_RESNAMES) -> List[Pose]:
+    """Ligand residues of a complex PDB/PDBQT, one ``Pose`` per residue (or TER/MODEL block)."""
+    poses: List[Pose] = []
+    current_key = None
+    pdbqt = Path(pdb).suffix.lower() == ".pdbqt"
+    for line in Path(pdb).read_text(encoding="utf-8").splitlines():
+        if line.startswith(("TER", "MODEL", "ENDMDL")):
+            current_key = None
+            continue
+        if not line.startswith(("ATOM", "HETATM")) or line[17:20].strip() not in resnames:
+            continue
+        key = line[17:27]
+        if key != current_key:
+            poses.append(Pose())
+            current_key = key
+        pose = poses[-1]
+        name = line[12:16].strip()
+        pose.names.append(name)
+        pose.elements.append(element_of(name, line[77:79] if pdbqt else line[76:78]))
+        pose.coords.append((float(line[30:38]) / 10.0, float(line[38:46]) / 10.0, float(line[46:54]) / 10.0))
+    return poses
+
+
+# ----------------------------------------------------------------------
+# Atom mapping
+# ----------------------------------------------------------------------
+def map_pose_atoms(template: LigandTemplate, pose: Pose) -> List[int]:
+    """Template index of every pose atom (by unique names, else by bond-graph matching)."""
+    heavy_pose = sum(1 for element in pose.elements if element != "H")
+    heavy_template = sum(1 for element in template.elements if element != "H")
+    if heavy_pose != heavy_template or len(pose.names) > len(template.names):
+        raise AssemblyError(f"Pose has {heavy_pose} heavy atoms ({len(pose.names)} total), "
+                            f"template {template.itp.name} has {heavy_template} ({len(template.names)})")
+
+    by_name = {name.upper(): index for index, name in enumerate(template.names)}
+    if len(by_name) == len(template.names) and len(set(pose.names)) == len(pose.names):
+        mapping = [by_name.get(name.upper()) for name in pose.names]
+        if None not in mapping and all(template.elements[index] == element
+                                       for index, element in zip(mapping, pose.elements)):
+            return mapping
+    return _match_graph(template, pose)
+
+
+def _match_graph(template: LigandTemplate, pose: Pose) -> List[int]:
+    """Map the pose's bond graph into the template's with backtracking."""
+    n_atoms = len(pose.names)
+    neighbours: List[List[int]] = [[] for _ in range(n_atoms)]
+    for i, j in perceive_bonds(pose.coords, pose.elements):
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    heavy_degree = [sum(1 for other in row if pose.elements[other] != "H") for row in neighbours]
+
+    # Visit order: breadth first from the most connected heavy atom, so every atom
+    # after the first has an already-mapped neighbour that restricts its candidates
+    start = max(range(n_atoms), key=lambda index: (pose.elements[index] != "H", len(neighbours[index])))
+    order, parent, seen = [start], {start: None}, {start}
+    for atom in order:
+        for other in sorted(neighbours[atom], key=lambda index: pose.elements[index] == "H"):
+            if other not in seen:
+                seen.add(other)
+                parent[other] = atom
+                order.append(other)
+    if len(order) != n_atoms:
+        raise AssemblyError("Docked pose is not one connected molecule; cannot map it onto the template")
+
+    def compatible(atom: int, candidate: int) -> bool:
+        if template.elements[candidate] != pose.elements[atom]:
+            return False
+        if pose.elements[atom] != "H" and template.heavy_degree(candidate) != heavy_degree[atom]:
+            return False
+        return len(template.neighbours[candidate]) >= len(neighbours[atom])
+
+    mapping: Dict[int, int] = {}
+    used = set()
+
+    def extend(position: int) -> bool:
+        if position == n_atoms:
+            return True
+        atom = order[position]
+        if parent[atom] is None:
+            candidates = range(len(template.names))
+        else:
+            candidates = template.neighbours[mapping[parent[atom]]]
+        for candidate in candidates:
+            if candidate in used or not compatible(atom, candidate):
+                continue
+            if any(other in mapping and mapping[other] not in template.neighbours[candidate]
+                   for other in neighbours[atom]):
+                continue
+            mapping[atom] = candidate
+            used.add(candidate)
+            if extend(position + 1):
+                return True
+            del mapping[atom]
+            used.discard(candidate)
+        return False
+
+    if not extend(0):
+        raise AssemblyError(f"Docked pose does not match the bond graph of {template.itp.name}")
+    return [mapping[atom] for atom in range(n_atoms)]
+
+
+# ----------------------------------------------------------------------
+# Placement
+# ----------------------------------------------------------------------
+def _fit_anchors(template: LigandTemplate, mapped: Dict[int, int], atom: int) -> List[int]:
+    """Mapped template atoms around an unmapped ``atom``: its neighbours, then theirs, up to 4."""
+    anchors: List[int] = []
+    frontier = [atom]
+    seen = {atom}
+    while frontier and len(anchors) < 4:
+        next_frontier = []
+        for current in frontier:
+            for other in template.neighbours[current]:
+                if other in seen:
+                    continue
+                seen.add(other)
+                next_frontier.append(other)
+                if other in mapped and len(anchors) < 4:
+                    anchors.append(other)
+        frontier = next_frontier
+    return anchors
+
+
+def _max_eigenvector(matrix: List[List[float]]) -> List[float]:
+    """Eigenvector of the largest eigenvalue of a symmetric matrix (cyclic Jacobi)."""
+    n = len(matrix)
+    a = [row[:] for row in matrix]
+    v = [[float(i == j) for j in range(n)] for i in range(n)]
+    for _ in range(50):
+        if sum(a[i][j] ** 2 for i in range(n) for j in range(i + 1, n)) < 1e-24:
+            break
+        for p in range(n):
+            for q in range(p + 1, n):
+                if abs(a[p][q]) < 1e-30:
+                    continue
+                theta = (a[q][q] - a[p][p]) / (2 * a[p][q])
+                t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1))
+                c = 1 / math.sqrt(t * t + 1)
+                s = t * c
+                for k in range(n):
+                    a[k][p], a[k][q] = c * a[k][p] - s * a[k][q], s * a[k][p] + c * a[k][q]
+                for k in range(n):
+                    a[p][k], a[q][k] = c * a[p][k] - s * a[q][k], s * a[p][k] + c * a[q][k]
+                for k in range(n):
+                    v[k][p], v[k][q] = c * v[k][p] - s * v[k][q], s * v[k][p] + c * v[k][q]
+    best = max(range(n), key=lambda i: a[i][i])
+    return [v[k][best] for k in range(n)]
+
+
+def _fit_transform(reference: Sequence[Coord], target: Sequence[Coord]):
+    """Rotation (3x3 rows) and centroids of the least-squares fit of ``reference`` onto ``target``."""
+    count = len(reference)
+    ref_c = [sum(point[axis] for point in reference) / count for axis in range(3)]
+    tgt_c = [sum(point[axis] for point in target) / count for axis in range(3)]
+    if count < 2:
+        return [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], ref_c, tgt_c
+    s = [[0.0] * 3 for _ in range(3)]
+    for p, q in zip(reference, target):
+        for a in range(3):
+            for b in range(3):
+                s[a][b] += (p[a] - ref_c[a]) * (q[b] - tgt_c[b])
+    (sxx, sxy, sxz), (syx, syy, syz), (szx, szy, szz) = s
+    # Horn's quaternion: the best rotation is the top eigenvector of this matrix
+    w, x, y, z = _max_eigenvector([
+        [sxx + syy + szz, syz - szy, szx - sxz, sxy - syx],
+        [syz - szy, sxx - syy - szz, sxy + syx, szx + sxz],
+        [szx - sxz, sxy + syx, -sxx + syy - szz, syz + szy],
+        [sxy - syx, szx + sxz, syz + szy, -sxx - syy + szz],
+    ])
+    rotation = [
+        [w * w + x * x - y * y - z * z, 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), w * w - x * x + y * y - z * z, 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), w * w - x * x - y * y + z * z],
+    ]
+    return rotation, ref_c, tgt_c
+
+
+def place_copies(template: LigandTemplate, mapping: Sequence[int], poses: Sequence[Pose]):
+    """Coordinates (nm) of every copy in template order; returns an array or a list of lists."""
+    mapped = {template_index: pose_index for pose_index, template_index in enumerate(mapping)}
+    missing = [index for index in range(len(template.names)) if index not in mapped]
+    # Unmapped atoms that share anchors are placed by the same fit
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for atom in missing:
+        groups.setdefault(tuple(_fit_anchors(template, mapped, atom)), []).append(atom)
+    if () in groups:
+        raise AssemblyError("Some template atoms are not bonded to any docked atom")
+
+    if np is not None:
+        reference = np.asarray(template.coords, dtype=float)
+        docked = np.asarray([pose.coords for pose in poses], dtype=float)  # (copies, pose atoms, 3)
+        placed = np.empty((len(poses), len(template.names), 3))
+        placed[:, list(mapped)] = docked[:, list(mapped.values())]
+        for anchors, atoms in groups.items():
+            ref = reference[list(anchors)]
+            tgt = docked[:, [mapped[anchor] for anchor in anchors]]
+            ref_c, tgt_c = ref.mean(axis=0), tgt.mean(axis=1)
+            if len(anchors) < 2:
+                rotation = np.broadcast_to(np.eye(3), (len(poses), 3, 3))
+            else:
+                h = np.einsum("ma,kmb->kab", ref - ref_c, tgt - tgt_c[:, None])
+                u, _, vt = np.linalg.svd(h)
+                sign = np.sign(np.linalg.det(np.einsum("kba,kcb->kac", vt, u)))
+                vt[:, 2] *= sign[:, None]
+                rotation = np.einsum("kba,kcb->kac", vt, u)  # V diag(1,1,d) U^T
+            placed[:, atoms] = np.einsum("kab,mb->kma", rotation, reference[atoms] - ref_c) + tgt_c[:, None]
+        return placed
+
+    placed_lists = []
+    for pose in poses:
+        coords: List[Optional[Coord]] = [None] * len(template.names)
+        for template_index, pose_index in mapped.items():
+            coords[template_index] = pose.coords[pose_index]
+        for anchors, atoms in groups.items():
+            rotation, ref_c, tgt_c = _fit_transform([template.coords[anchor] for anchor in anchors],
+                                                    [pose.coords[mapped[anchor]] for anchor in anchors])
+            for atom in atoms:
+                local = [template.coords[atom][axis] - ref_c[axis] for axis in range(3)]
+                coords[atom] = tuple(sum(rotation[a][b] * local[b] for b in range(3)) + tgt_c[a]
+                                     for a in range(3))
+        placed_lists.append(coords)
+    return placed_lists
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+def write_complex_gro(protein_gro: Path, template: LigandTemplate, copies, output: Path) -> int:
+    """Protein atoms followed by every ligand copy; returns the total atom count."""
+    lines = Path(protein_gro).read_text(encoding="utf-8").splitlines()
+    count = int(lines[1])
+    protein = lines[2:2 + count]
+    box = lines[2 + count] if len(lines) > 2 + count else "   0.00000   0.00000   0.00000"
+    resid = int(protein[-1][0:5]) if protein else 0
+    serial = count
+    out = protein[:]
+    copies = copies.tolist() if np is not None and hasattr(copies, "tolist") else copies
+    for coords in copies:
+        resid += 1
+        for name, (x, y, z) in zip(template.names, coords):
+            serial += 1
+            out.append(f"{resid % 100000:>5}{template.resname:<5}{name:>5}{serial % 100000:>5}"
+                       f"{x:8.3f}{y:8.3f}{z:8.3f}")
+    tmp = Path(output).with_name(f".{Path(output).name}.tmp")
+    tmp.write_text(f"{lines[0]}\n{len(out)}\n" + "\n".join(out) + f"\n{box}\n", encoding="utf-8")
+    os.replace(tmp, output)
+    return len(out)
+
+
+def add_ligand_to_topology(topology: Path, itp_name: str, molname: str, copies: int) -> None:
+    """Include the ligand .itp after the force field and set its count in ``[ molecules ]``."""
+    lines = Path(topology).read_text(encoding="utf-8").splitlines()
+    include = f'#include "{itp_name}"'
+    if include not in (line.strip() for line in lines):
+        position = next((index + 1 for index, line in enumerate(lines)
+                         if line.startswith("#include") and "forcefield.itp" in line), 0)
+        lines.insert(position, include)
+
+    in_molecules = False
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("["):
+            in_molecules = stripped.replace(" ", "") == "[molecules]"
+        elif in_molecules and stripped.split()[:1] == [molname]:
+            continue  # replaced below (idempotent on retries)
+        kept.append(line)
+    if not any(line.strip().replace(" ", "") == "[molecules]" for line in kept):
+        kept += ["", "[ molecules ]", "; Compound        #mols"]
+    kept.append(f"{molname:<20}{copies}")
+    Path(topology).write_text("\n".join(kept) + "\n", encoding="utf-8")
+
+
+def assemble_complex(complex_pdb: Path, acpype_dir: Path, work_dir: Path, protein_gro: str = "protein.gro",
+                     topology: str = "topol.top", output: str = "complex.gro") -> int:
+    """Build ``complex.gro`` with every docked ligand of ``complex_pdb``; returns the number of copies.
+
+    Without docked ligands in ``complex_pdb`` the template coordinates are used as the one copy.
+    """
+    work_dir = Path(work_dir)
+    template = LigandTemplate.from_acpype_dir(acpype_dir)
+    shutil.copy2(template.itp, work_dir / "ligand.itp")
+    shutil.copy2(template.gro, work_dir / "ligand.gro")
+
+    poses = read_poses(complex_pdb)
+    if poses:
+        mapping = map_pose_atoms(template, poses[0])
+        if any(pose.names != poses[0].names for pose in poses):
+            raise AssemblyError(f"Docked ligands in {complex_pdb} do not all have the same atoms")
+        copies = place_copies(template, mapping, poses)
+    else:
+        copies = [template.coords]
+    write_complex_gro(work_dir / protein_gro, template, copies, work_dir / output)
+    add_ligand_to_topology(work_dir / topology, "ligand.itp", template.molname, len(copies))
+    return len(copies)
@@ -0,0 +1,331 @@
+"""GA budget for AutoDock runs: an a-priori evaluation count and adaptive early stopping.
+
+``dpf_template.txt`` used to hard-code ``ga_num_evals 2500000`` and ``ga_run 10``
+whatever the ligand or the box.  Two independent pieces replace that:
+
+* ``GABudget`` scales ``ga_num_evals`` with the ligand's torsions (each one
+  adds a dimension to the search) and the search volume::
+
+      evals = base_evals * (1 + torsion_factor * TORSDOF)
+                         * (box volume / reference_volume) ** volume_exponent
+
+  clamped to ``[min_evals, max_evals]`` (AutoDock's "short" and "long"
+  settings).  With the defaults a rigid ligand in a 22.5 Å box gets 250k
+  evaluations, ten torsions in a 47 Å box about 4.5M.
+
+* ``AdaptiveGA`` runs the GA runs of one seed in chunks of ``chunk_runs``
+  (one autodock4 call each, with its own seed) and stops once the best
+  pose has converged: after at least ``min_runs`` runs, a chunk that
+  neither improves the best energy by more than ``energy_tol`` nor moves
+  the best pose by more than ``rmsd_tol`` Å, with at least ``min_cluster``
+  runs in the best pose's RMSD cluster.  Easy cycles stop after a few
+  runs, hard ones still get ``max_runs``.  The runs of all chunks are
+  merged, best first, into the seed's usual ``wrapper_<seed>.dlg``.
+
+Both are configured under ``wrapper.ga_budget`` (see ``config.example.yml``)
+and off by default; without them the template gets the old fixed values.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from pathlib import Path
+from string import Template
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ligand_topology import element_of
+from pose_dedup import DEFAULT_RMSD_CUTOFF, FREE_ENERGY, cluster_poses, rmsd
+
+# Values dpf_template.txt used to hard-code
+DEFAULT_GA = {"ga_pop_size": 150, "ga_num_evals": 2500000, "ga_num_generations": 27000, "ga_run": 10}
+
+BASE_EVALS = 250000
+TORSION_FACTOR = 0.5
+# 60 points at 0.375 Å: AutoDock's default box
+REFERENCE_VOLUME = 22.5 ** 3
+VOLUME_EXPONENT = 0.5
+MIN_EVALS = 250000
+MAX_EVALS = 25000000
+
+CHUNK_RUNS = 2
+MIN_RUNS = 4
+ENERGY_TOL = 0.2
+MIN_CLUSTER = 2
+
+_RUN = re.compile(r"^DOCKED: USER\s+Run = (\d+)")
+_GA_RUN = re.compile(r"^DPF>\s*ga_run\s+\d+")
+
+
+def torsion_count(ligand_pdbqt: Path) -> int:
+    """``TORSDOF`` of a ligand PDBQT (its ``BRANCH`` count without one, 0 if unreadable)."""
+    try:
+        lines = Path(ligand_pdbqt).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return 0
+    for line in lines:
+        if line.startswith("TORSDOF"):
+            return int(line.split()[1])
+    return sum(line.startswith("BRANCH") for line in lines)
+
+
+def fld_box(fld_path: Path) -> Optional[Tuple[Tuple[int, int, int], float]]:
+    """``(npts, spacing)`` from the ``#NELEMENTS``/``#SPACING`` header of a ``.maps.fld``."""
+    try:
+        text = Path(fld_path).read_text(encoding="utf-8")
+    except OSError:
+        return None
+    spacing = re.search(r"#SPACING\s+([\d.]+)", text)
+    elements = re.search(r"#NELEMENTS\s+(\d+)\s+(\d+)\s+(\d+)", text)
+    if not (spacing and elements):
+        return None
+    return tuple(int(value) for value in elements.groups()), float(spacing.group(1))
+
+
+def search_volume(npts: Sequence[int], spacing: float) -> float:
+    """Box volume in Å³."""
+    return math.prod(float(n) * spacing for n in npts)
+
+
+class GABudget:
+    def __init__(self, base_evals: int = BASE_EVALS, torsion_factor: float = TORSION_FACTOR,
+                 reference_volume: float = REFERENCE_VOLUME, volume_exponent: float = VOLUME_EXPONENT,
+                 min_evals: int = MIN_EVALS, max_evals: int = MAX_EVALS) -> None:
+        """
+        Args:
+            base_evals: Evaluations per run for a rigid ligand in the reference box.
+            torsion_factor: Extra share of ``base_evals`` per torsion.
+            reference_volume: Box volume (Å³) that gets ``base_evals``.
+            volume_exponent: How strongly the budget grows with the volume.
+            min_evals: Lower bound on ``ga_num_evals``.
+            max_evals: Upper bound on ``ga_num_evals``.
+        """
+        if base_evals <= 0 or reference_volume <= 0 or min_evals > max_evals:
+            raise ValueError("GA budget needs base_evals > 0, reference_volume > 0 and min_evals <= max_evals")
+        self.base_evals = base_evals
+        self.torsion_factor = torsion_factor
+        self.reference_volume = reference_volume
+        self.volume_exponent = volume_exponent
+        self.min_evals = min_evals
+        self.max_evals = max_evals
+
+    def evals(self, torsdof: int, volume: float) -> int:
+        """``ga_num_evals`` for a ligand with ``torsdof`` torsions in a box of ``volume`` Å³."""
+        scale = (1 + self.torsion_factor * torsdof) * (volume / self.reference_volume) ** self.volume_exponent
+        evals = min(max(self.base_evals * scale, self.min_evals), self.max_evals)
+        return int(round(evals, -3))
+
+
+def budget_from_config(config: Dict) -> Optional[GABudget]:
+    """``GABudget`` from ``wrapper.ga_budget`` (None unless ``enabled``)."""
+    settings = (config.get("wrapper") or {}).get("ga_budget") or {}
+    if not settings.get("enabled", False):
+        return None
+    return GABudget(base_evals=int(settings.get("base_evals", BASE_EVALS)),
+                    torsion_factor=float(settings.get("torsion_factor", TORSION_FACTOR)),
+                    reference_volume=float(settings.get("reference_volume", REFERENCE_VOLUME)),
+                    volume_exponent=float(settings.get("volume_exponent", VOLUME_EXPONENT)),
+                    min_evals=int(settings.get("min_evals", MIN_EVALS)),
+                    max_evals=int(settings.get("max_evals", MAX_EVALS)))
+
+
+def ga_mapping(config: Dict, ligand_pdbqt: Path, npts: Sequence[int], spacing: float) -> Dict[str, str]:
+    """``ga_*`` values for ``dpf_template.txt``: the budget model's, or the old fixed ones."""
+    mapping = dict(DEFAULT_GA)
+    settings = (config.get("wrapper") or {}).get("ga_budget") or {}
+    mapping["ga_run"] = int(settings.get("max_runs", DEFAULT_GA["ga_run"]))
+    budget = budget_from_config(config)
+    if budget is not None:
+        mapping["ga_num_evals"] = budget.evals(torsion_count(ligand_pdbqt), search_volume(npts, spacing))
+    return {key: str(value) for key, value in mapping.items()}
+
+
+class DockedRun:
+    """One ``DOCKED:`` model of a DLG."""
+
+    def __init__(self, run: int, energy: Optional[float], lines: List[str], coords: List[Tuple[float, float, float]],
+                 source: Path) -> None:
+        self.run = run
+        self.energy = energy
+        self.lines = lines
+        self.coords = coords
+        self.source = source
+
+    def __repr__(self) -> str:
+        return f"DockedRun({self.source.name} run {self.run}, energy={self.energy})"
+
+
+def read_dlg_runs(dlg_path: Path) -> List[DockedRun]:
+    """Every ``DOCKED: MODEL ... ENDMDL`` block with its energy and heavy-atom coordinates."""
+    runs: List[DockedRun] = []
+    block: Optional[List[str]] = None
+    for line in Path(dlg_path).read_text(encoding="utf-8").splitlines():
+        if line.startswith("DOCKED: MODEL"):
+            block = [line]
+        elif block is not None and line.startswith("DOCKED:"):
+            block.append(line)
+            if line.startswith("DOCKED: ENDMDL"):
+                runs.append(_docked_run(block, Path(dlg_path)))
+                block = None
+    return runs
+
+
+def _docked_run(block: List[str], source: Path) -> DockedRun:
+    run, energy, coords = 0, None, []
+    for line in block:
+        record = line[8:]
+        if record.startswith(("ATOM", "HETATM")):
+            if element_of(record[12:16], record[77:79]) != "H":
+                coords.append((float(record[30:38]), float(record[38:46]), float(record[46:54])))
+        elif _RUN.match(line):
+            run = int(_RUN.match(line).group(1))
+        elif energy is None:
+            match = FREE_ENERGY.search(line)
+            if match:
+                energy = float(match.group(1))
+    return DockedRun(run, energy, block, coords, source)
+
+
+def _energy_key(docked: DockedRun) -> Tuple[bool, float]:
+    return docked.energy is None, docked.energy if docked.energy is not None else 0.0
+
+
+def best_docked_run(dlg_path: Path) -> Optional[DockedRun]:
+    """The lowest-energy model of a DLG, whatever its run number (None if it has none)."""
+    runs = read_dlg_runs(dlg_path)
+    return min(runs, key=_energy_key) if runs else None
+
+
+def write_merged_dlg(runs: Sequence[DockedRun], header_dlg: Path, output: Path, note: str = "") -> None:
+    """One DLG with ``runs`` renumbered best first (so ``Run = 1`` is the best pose).
+
+    The header (DPF echo, ligand) is taken from ``header_dlg`` with
+    ``ga_run`` set to the number of runs kept.
+    """
+    header = []
+    for line in Path(header_dlg).read_text(encoding="utf-8").splitlines():
+        if "BEGINNING GENETIC ALGORITHM DOCKING" in line or line.startswith("DOCKED:"):
+            break
+        header.append(f"DPF> ga_run {len(runs)}" if _GA_RUN.match(line) else line)
+    out = list(header)
+    for number, docked in enumerate(sorted(runs, key=_energy_key), start=1):
+        for line in docked.lines:
+            out.append(f"DOCKED: USER    Run = {number}" if _RUN.match(line) else line)
+        out.append("_" * 80)
+    out.extend(["", f"{len(runs)} docking runs completed." + (f" {note}" if note else ""),
+                "autodock4: Successful Completion."])
+    Path(output).write_text("\n".join(out) + "\n", encoding="utf-8")
+
+
+class AdaptiveGA:
+    def __init__(self, chunk_runs: int = CHUNK_RUNS, max_runs: int = DEFAULT_GA["ga_run"],
+                 min_runs: int = MIN_RUNS, energy_tol: float = ENERGY_TOL,
+                 rmsd_tol: float = DEFAULT_RMSD_CUTOFF, min_cluster: int = MIN_CLUSTER) -> None:
+        """
+        Args:
+            chunk_runs: GA runs per autodock4 call.
+            max_runs: Runs after which the seed stops even without convergence.
+            min_runs: Runs before convergence is checked.
+            energy_tol: Largest best-energy improvement (kcal/mol) a chunk may
+                bring for the search to count as converged.
+            rmsd_tol: Largest move (Å) of the best pose, and the cluster radius.
+            min_cluster: Runs the best pose's cluster needs (the site was found
+                more than once).
+        """
+        if chunk_runs < 1 or max_runs < 1:
+            raise ValueError("chunk_runs and max_runs must be at least 1")
+        self.chunk_runs = chunk_runs
+        self.max_runs = max_runs
+        self.min_runs = min_runs
+        self.energy_tol = energy_tol
+        self.rmsd_tol = rmsd_tol
+        self.min_cluster = min_cluster
+
+    def converged(self, runs: Sequence[DockedRun], previous_best: Optional[DockedRun]) -> bool:
+        """Whether the last chunk left the best pose (energy and position) in place."""
+        scored = [docked for docked in runs if docked.energy is not None and docked.coords]
+        if len(runs) < self.min_runs or previous_best is None or not scored:
+            return False
+        best = min(scored, key=_energy_key)
+        if previous_best.energy - best.energy > self.energy_tol:
+            return False
+        if len(best.coords) != len(previous_best.coords) or rmsd(best.coords, previous_best.coords) > self.rmsd_tol:
+            return False
+        same_ligand = [docked for docked in scored if len(docked.coords) == len(best.coords)]
+        clusters = cluster_poses([docked.coords for docked in same_ligand],
+                                 [docked.energy for docked in same_ligand], self.rmsd_tol)
+        return len(clusters[0]) >= self.min_cluster
+
+    def run(self, run_chunk: Callable[[int, int], Path], output_dlg: Path) -> Dict:
+        """Call ``run_chunk(chunk, n_runs)`` (returns its DLG) until converged; merge into ``output_dlg``.
+
+        Returns:
+            ``{"runs", "max_runs", "chunks", "converged", "best_energy"}``
+        """
+        runs: List[DockedRun] = []
+        chunk_dlgs: List[Path] = []
+        previous_best: Optional[DockedRun] = None
+        converged = False
+        done = 0
+        while done < self.max_runs:
+            n_runs = min(self.chunk_runs, self.max_runs - done)
+            chunk_dlgs.append(Path(run_chunk(len(chunk_dlgs) + 1, n_runs)))
+            runs.extend(read_dlg_runs(chunk_dlgs[-1]))
+            done += n_runs
+            if self.converged(runs, previous_best):
+                converged = True
+                break
+            scored = [docked for docked in runs if docked.energy is not None and docked.coords]
+            previous_best = min(scored, key=_energy_key) if scored else None
+        note = (f"Adaptive GA: {len(chunk_dlgs)} chunks, "
+                + ("converged" if converged else f"stopped at max_runs {self.max_runs}") + ".")
+        write_merged_dlg(runs, chunk_dlgs[0], output_dlg, note)
+        best = min(runs, key=_energy_key) if runs else None
+        return {"runs": done, "max_runs": self.max_runs, "chunks": len(chunk_dlgs), "converged": converged,
+                "best_energy": best.energy if best else None}
+
+    def dock(self, dpf_template: Path, mapping: Dict[str, str], directory: Path, seed: Any,
+             command: Callable[[str, str, Path], Tuple[List[str], Optional[Path]]], run_command: Callable[..., None],
+             dry_run: bool = False, name: Optional[str] = None) -> Optional[Dict]:
+        """Dock one seed in chunks of GA runs until its best pose converged; merged into ``wrapper_<seed>.dlg``.
+
+        Chunk ``n`` writes ``ga_chunk_<seed>_<n>.dpf`` from ``dpf_template`` with the
+        seed pair ``<seed> <n>``.  ``command(dpf_name, dlg_name, directory)`` builds the
+        driver's ``(cmd, cwd)`` for autodock4 and ``run_command`` is the driver's runner
+        (``run_command(cmd, dry_run, cwd=, name=, log_dir=, tail=)``).  A dry run renders
+        and prints the first chunk only.  Returns ``run``'s summary (None on a dry run).
+        """
+        name = name or f"autodock_{seed}"
+        template = Template(Path(dpf_template).read_text(encoding="utf-8"))
+
+        def run_chunk(chunk: int, runs: int) -> Path:
+            stem = f"ga_chunk_{seed}_{chunk:02d}"
+            dpf = directory / f"{stem}.dpf"
+            dpf.parent.mkdir(parents=True, exist_ok=True)
+            dpf.write_text(template.safe_substitute(dict(mapping, seed=f"{seed} {chunk}", ga_run=str(runs))),
+                           encoding="utf-8")
+            cmd, cwd = command(dpf.name, f"{stem}.dlg", directory)
+            run_command(cmd, dry_run, cwd=cwd, name=f"{name}_{chunk:02d}", log_dir=directory,
+                        tail=[directory / f"{stem}.dlg"])
+            return directory / f"{stem}.dlg"
+
+        if dry_run:
+            run_chunk(1, self.chunk_runs)
+            return None
+        result = self.run(run_chunk, directory / f"wrapper_{seed}.dlg")
+        print(f"{name}: {result['runs']}/{result['max_runs']} GA runs in {result['chunks']} chunks "
+              f"({'converged' if result['converged'] else 'not converged'}), best {result['best_energy']} kcal/mol")
+        return result
+
+
+def adaptive_from_config(config: Dict) -> Optional[AdaptiveGA]:
+    """``AdaptiveGA`` from ``wrapper.ga_budget`` (None unless ``adaptive``)."""
+    settings = (config.get("wrapper") or {}).get("ga_budget") or {}
+    if not settings.get("adaptive", False):
+        return None
+    return AdaptiveGA(chunk_runs=int(settings.get("chunk_runs", CHUNK_RUNS)),
+                      max_runs=int(settings.get("max_runs", DEFAULT_GA["ga_run"])),
+                      min_runs=int(settings.get("min_runs", MIN_RUNS)),
+                      energy_tol=float(settings.get("energy_tol", ENERGY_TOL)),
+                      rmsd_tol=float(settings.get("rmsd_tol", DEFAULT_RMSD_CUTOFF)),
+                      min_cluster=int(settings.get("min_cluster", MIN_CLUSTER)))
@@ -1,14 +1,24 @@
 import os
 import subprocess
 
-def run_gmx_mdrun_safe(deffnm, gmx_cmd="gmx"):
+from process_runner import run_process
+
+# Files ``mdrun -deffnm`` writes, measured for the run metrics
+MDRUN_OUTPUTS = ("log", "edr", "gro", "xtc", "trr", "cpt")
+
+def run_gmx_mdrun_safe(deffnm, gmx_cmd="gmx", cwd=None, ntomp=None):
     """
     Runs gmx mdrun with automatic checkpoint detection.
+
+    ``cwd`` is the directory holding ``<deffnm>.tpr`` (the checkpoint is
+    looked up there too); ``ntomp`` sets the OpenMP thread count.
     """
     cpt_file = f"{deffnm}.cpt"
     cmd = [gmx_cmd, "mdrun", "-deffnm", deffnm]
+    if ntomp:
+        cmd.extend(["-ntomp", str(ntomp)])
 
-    if os.path.exists(cpt_file):
+    if os.path.exists(os.path.join(cwd or ".", cpt_file)):
         print(f"🔄 Found checkpoint '{cpt_file}'. Resuming simulation...")
         # -cpi: Continue Previous simulation
         # -append: Append output to log/edr/trr files instead of creating new ones
@@ -17,7 +27,10 @@ def run_gmx_mdrun_safe(deffnm, gmx_cmd="gmx"):
         print(f"🚀 Starting new simulation for '{deffnm}'...")
 
     try:
-        subprocess.run(cmd, check=True)
+        # Without -v mdrun only reports its progress in <deffnm>.log
+        log = os.path.join(cwd or ".", f"{deffnm}.log")
+        outputs = [os.path.join(cwd or ".", f"{deffnm}.{ext}") for ext in MDRUN_OUTPUTS]
+        run_process(cmd, cwd=cwd, name=f"mdrun_{deffnm}", tail=[log], outputs=outputs, check=True)
     except subprocess.CalledProcessError as e:
         print(f"❌ MD Simulation failed for {deffnm}")
-        raise e
\ No newline at end of file
+        raise e
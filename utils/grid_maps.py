@@ -0,0 +1,205 @@
+"""Read, crop and write AutoGrid ``.map`` files.
+
+An AutoGrid map is a 6-line header (parameter file, field file, receptor,
+``SPACING``, ``NELEMENTS`` and ``CENTER``) followed by one value per grid
+point, x fastest and z slowest.  ``NELEMENTS`` holds the even ``npts`` of the
+GPF, so each axis has ``npts + 1`` points centred on ``CENTER``.
+
+``load_maps`` reads every map listed in a ``.maps.fld`` and keeps the parsed
+grids in memory keyed by path, size and mtime, so the wrapper can scan the
+same maps once per cycle without parsing them again.  ``crop_maps`` cuts an
+even-sized sub-box out of all of them; the grid points are unchanged, so
+AutoDock sees exactly the values AutoGrid computed for that region.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Index = Tuple[int, int, int]
+
+_CACHE: Dict[Path, Tuple[Tuple[int, int], "GridMap"]] = {}
+
+
+class GridMap:
+    def __init__(self, values, npts: Sequence[int], spacing: float, center: Sequence[float],
+                 header: Optional[Dict[str, str]] = None) -> None:
+        """
+        Args:
+            values: One value per grid point in file order (x fastest); a
+                NumPy array when NumPy is available, else a list.
+            npts: ``NELEMENTS`` of the map (even; ``npts + 1`` points per axis).
+            spacing: Grid spacing (Å).
+            center: Grid centre (Å).
+            header: ``GRID_PARAMETER_FILE``/``GRID_DATA_FILE``/``MACROMOLECULE`` entries.
+        """
+        self.values = values
+        self.npts = tuple(int(value) for value in npts)
+        self.spacing = float(spacing)
+        self.center = tuple(float(value) for value in center)
+        self.header = dict(header or {})
+        if len(values) != self.size:
+            raise ValueError(f"Map has {len(values)} values, expected {self.size} for NELEMENTS {self.npts}")
+
+    @property
+    def shape(self) -> Index:
+        """Grid points per axis."""
+        return tuple(n + 1 for n in self.npts)
+
+    @property
+    def size(self) -> int:
+        nx, ny, nz = self.shape
+        return nx * ny * nz
+
+    @property
+    def origin(self) -> Tuple[float, float, float]:
+        """Coordinates of grid point (0, 0, 0)."""
+        return tuple(c - n * self.spacing / 2 for c, n in zip(self.center, self.npts))
+
+    def index(self, flat: int) -> Index:
+        nx, ny, _ = self.shape
+        return flat % nx, (flat // nx) % ny, flat // (nx * ny)
+
+    def point(self, index: Sequence[int]) -> Tuple[float, float, float]:
+        return tuple(o + i * self.spacing for o, i in zip(self.origin, index))
+
+    def crop(self, lower: Sequence[int], upper: Sequence[int]) -> "GridMap":
+        """Sub-grid from point ``lower`` to point ``upper`` (inclusive) per axis."""
+        nx, ny, _ = self.shape
+        (i0, j0, k0), (i1, j1, k1) = lower, upper
+        if np is not None and not isinstance(self.values, list):
+            block = np.asarray(self.values).reshape(self.shape[::-1])[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1]
+            values = block.ravel()
+        else:
+            values = [self.values[i + nx * (j + ny * k)]
+                      for k in range(k0, k1 + 1) for j in range(j0, j1 + 1) for i in range(i0, i1 + 1)]
+        npts = [high - low for low, high in zip(lower, upper)]
+        center = [o + (low + high) / 2 * self.spacing for o, low, high in zip(self.origin, lower, upper)]
+        return GridMap(values, npts, self.spacing, center, self.header)
+
+    def write(self, path: Path, data_file: Optional[str] = None) -> None:
+        header = [
+            f"GRID_PARAMETER_FILE {self.header.get('GRID_PARAMETER_FILE', 'unknown.gpf')}",
+            f"GRID_DATA_FILE {data_file or self.header.get('GRID_DATA_FILE', 'unknown.maps.fld')}",
+            f"MACROMOLECULE {self.header.get('MACROMOLECULE', 'unknown.pdbqt')}",
+            f"SPACING {self.spacing:.3f}",
+            "NELEMENTS {} {} {}".format(*self.npts),
+            "CENTER {:.3f} {:.3f} {:.3f}".format(*self.center),
+        ]
+        values = self.values.tolist() if hasattr(self.values, "tolist") else self.values
+        Path(path).write_text("\n".join(header + [f"{value:.3f}" for value in values]) + "\n", encoding="utf-8")
+
+
+def read_map(path: Path, cache: bool = True) -> GridMap:
+    """Parse an ASCII AutoGrid map (cached by path, size and mtime)."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    if cache and path in _CACHE and _CACHE[path][0] == stamp:
+        return _CACHE[path][1]
+
+    text = path.read_text(encoding="utf-8")
+    header: Dict[str, str] = {}
+    position = 0
+    while len(header) < 6:
+        end = text.find("\n", position)
+        if end < 0:
+            raise ValueError(f"{path}: truncated AutoGrid map header")
+        key, _, value = text[position:end].strip().partition(" ")
+        header[key] = value.strip()
+        position = end + 1
+    try:
+        spacing = float(header["SPACING"])
+        npts = [int(value) for value in header["NELEMENTS"].split()]
+        center = [float(value) for value in header["CENTER"].split()]
+    except (KeyError, ValueError) as exc:
+        raise ValueError(f"{path}: not an AutoGrid map ({exc})") from exc
+    fields = text[position:].split()
+    values = np.array(fields, dtype=float) if np is not None else [float(value) for value in fields]
+    grid = GridMap(values, npts, spacing, center,
+                   {key: header[key] for key in ("GRID_PARAMETER_FILE", "GRID_DATA_FILE", "MACROMOLECULE")
+                    if key in header})
+    if cache:
+        _CACHE[path] = (stamp, grid)
+    return grid
+
+
+def map_type(name: str) -> str:
+    """AutoDock atom type of a map file: ``A.map`` and ``protein.A.map`` are both ``A``."""
+    stem = Path(name).name
+    if stem.endswith(".map"):
+        stem = stem[:-4]
+    return stem.rsplit(".", 1)[-1]
+
+
+def read_fld(fld_path: Path) -> List[Path]:
+    """Map files listed by the ``variable`` lines of a ``.maps.fld``, in order."""
+    fld_path = Path(fld_path)
+    files = []
+    for line in fld_path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("variable"):
+            for field in line.split():
+                if field.startswith("file="):
+                    files.append(fld_path.parent / field[len("file="):])
+    return files
+
+
+def load_maps(fld_path: Path, types: Optional[Sequence[str]] = None) -> Dict[str, GridMap]:
+    """Maps of a ``.maps.fld`` keyed by atom type (``e`` and ``d`` for electrostatics/desolvation)."""
+    maps = {}
+    for path in read_fld(fld_path):
+        key = map_type(path.name)
+        if types is None or key in types:
+            maps[key] = read_map(path)
+    return maps
+
+
+def crop_maps(fld_path: Path, lower: Sequence[int], upper: Sequence[int], out_dir: Path,
+              fld_name: Optional[str] = None) -> Path:
+    """Write every map of ``fld_path`` cropped to ``lower``..``upper`` into ``out_dir``.
+
+    The maps keep their file names and get a matching ``.maps.fld`` and
+    ``.maps.xyz``, so a DPF written for the full grid only needs the new
+    ``fld`` line.  Returns the new field file.
+    """
+    fld_path = Path(fld_path)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fld_out = out_dir / (fld_name or fld_path.name)
+    xyz_out = fld_out.with_suffix(".xyz")
+
+    cropped = None
+    variables = []
+    for index, path in enumerate(read_fld(fld_path), start=1):
+        cropped = read_map(path).crop(lower, upper)
+        cropped.write(out_dir / path.name, data_file=fld_out.name)
+        variables.append(f"variable {index} file={path.name} filetype=ascii skip=6")
+    if cropped is None:
+        raise ValueError(f"{fld_path} lists no maps")
+
+    half = [n * cropped.spacing / 2 for n in cropped.npts]
+    xyz_out.write_text("".join(f"{c - h:.3f} {c + h:.3f}\n" for c, h in zip(cropped.center, half)),
+                       encoding="utf-8")
+    labels = [line for line in fld_path.read_text(encoding="utf-8").splitlines() if line.startswith("label=")]
+    fld = ["# AVS field file", "#", "# AutoDock Atomic Affinity and Electrostatic Grids", "#",
+           f"# Cropped from {fld_path.name}", "#", f"#SPACING {cropped.spacing:.3f}",
+           "#NELEMENTS {} {} {}".format(*cropped.npts),
+           "#CENTER {:.3f} {:.3f} {:.3f}".format(*cropped.center),
+           f"#MACROMOLECULE {cropped.header.get('MACROMOLECULE', 'unknown.pdbqt')}",
+           f"#GRID_PARAMETER_FILE {cropped.header.get('GRID_PARAMETER_FILE', 'unknown.gpf')}", "#",
+           "ndim=3\t\t\t# number of dimensions in the field",
+           *(f"dim{k + 1}={cropped.shape[k]}\t\t\t# number of {'xyz'[k]}-elements" for k in range(3)),
+           "nspace=3\t\t# number of physical coordinates per point",
+           f"veclen={len(variables)}\t\t# number of affinity values at each point",
+           "data=float\t\t# data type (byte, integer, float, double)",
+           "field=uniform\t\t# field type (uniform, rectilinear, irregular)",
+           *(f"coord {k + 1} file={xyz_out.name} filetype=ascii offset={2 * k}" for k in range(3)),
+           *labels, "#", "# location of affinity grid files and how to read them", "#", *variables]
+    fld_out.write_text("\n".join(fld) + "\n", encoding="utf-8")
+    return fld_out
@@ -0,0 +1,211 @@
+"""Overlapping AutoGrid tiles for receptors larger than one AutoDock grid.
+
+AutoDock4 allows at most 126 points per axis, i.e. 47.25 Å at the normal
+0.375 Å spacing, while the receptors wrapped here can be 200+ Å across.
+``plan_tiles`` covers the receptor's bounding box (plus ``padding``) with a
+fixed lattice of boxes that overlap by ``overlap`` Å - enough for a ligand lying
+on a boundary to fit completely inside one of them - and keeps only the
+boxes that contain surface atoms, so the buried core gets no grid.
+
+Each tile is computed from a receptor cropped to the tile plus ``margin``
+(the atoms that actually contribute to its maps), and is keyed by the hash
+of everything AutoGrid reads: the cropped receptor, the GPF and the
+parameter file.  ``tile_is_current`` lets a rerun skip tiles whose inputs
+did not change, e.g. after masking only one region of the receptor.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import itertools
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_NPTS = 126
+DEFAULT_SPACING = 0.375
+DEFAULT_OVERLAP = 10.0
+DEFAULT_PADDING = 5.0
+DEFAULT_MARGIN = 12.0
+# Coarse voxels for the surface test: an atom is on the surface when a face
+# neighbour of its voxel holds no atom
+SURFACE_VOXEL = 4.0
+
+Coord = Tuple[float, float, float]
+
+
+class GridTile:
+    def __init__(self, index: Tuple[int, int, int], center: Sequence[float], npts: Sequence[int],
+                 spacing: float) -> None:
+        """
+        Args:
+            index: Position of the tile in the lattice (i, j, k).
+            center: Grid centre (Å).
+            npts: AutoGrid ``npts`` per axis (even, at most ``MAX_NPTS``).
+            spacing: Grid spacing (Å).
+        """
+        self.index = tuple(index)
+        self.center = tuple(float(value) for value in center)
+        self.npts = tuple(int(value) for value in npts)
+        self.spacing = float(spacing)
+
+    @property
+    def name(self) -> str:
+        return "tile_{:02d}_{:02d}_{:02d}".format(*self.index)
+
+    @property
+    def lower(self) -> Coord:
+        return tuple(c - n * self.spacing / 2 for c, n in zip(self.center, self.npts))
+
+    @property
+    def upper(self) -> Coord:
+        return tuple(c + n * self.spacing / 2 for c, n in zip(self.center, self.npts))
+
+    def contains(self, point: Sequence[float], margin: float = 0.0) -> bool:
+        return all(low - margin <= value <= high + margin
+                   for value, low, high in zip(point, self.lower, self.upper))
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "center": list(self.center), "npts": list(self.npts),
+                "spacing": self.spacing}
+
+    def __repr__(self) -> str:
+        return f"GridTile({self.name}, center={self.center}, npts={self.npts})"
+
+
+def atom_coords(lines: Iterable[str]) -> List[Coord]:
+    return [(float(line[30:38]), float(line[38:46]), float(line[46:54]))
+            for line in lines if line.startswith(("ATOM", "HETATM"))]
+
+
+def surface_atoms(coords: Sequence[Coord], voxel: float = SURFACE_VOXEL) -> List[Coord]:
+    """Atoms in a coarse voxel that has an empty face neighbour."""
+    occupied = {}
+    for point in coords:
+        occupied.setdefault(tuple(int(math.floor(value / voxel)) for value in point), []).append(point)
+    faces = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+    surface: List[Coord] = []
+    for (x, y, z), points in occupied.items():
+        if any((x + dx, y + dy, z + dz) not in occupied for dx, dy, dz in faces):
+            surface.extend(points)
+    return surface
+
+
+def _axis_spans(low: float, high: float, edge: float, overlap: float) -> List[Tuple[float, float]]:
+    """``(centre, length)`` of the tiles covering ``[low, high]`` along one axis.
+
+    Axes longer than one tile use a lattice anchored at the origin rather than
+    at the bounding box, so a small change of the receptor does not shift
+    every tile (and invalidate every grid).
+    """
+    length = high - low
+    if length <= edge:
+        return [((low + high) / 2, length)]
+    step = edge - overlap
+    first = math.floor(low / step)
+    last = max(first, math.ceil((high - edge) / step))
+    return [(k * step + edge / 2, edge) for k in range(first, last + 1)]
+
+
+def plan_tiles(coords: Sequence[Coord], spacing: float = DEFAULT_SPACING, max_npts: int = MAX_NPTS,
+               overlap: float = DEFAULT_OVERLAP, padding: float = DEFAULT_PADDING) -> List[GridTile]:
+    """Overlapping grid boxes covering the receptor surface.
+
+    Args:
+        coords: Receptor atom coordinates (Å)
+        spacing: Grid spacing (Å)
+        max_npts: Largest ``npts`` per axis (AutoDock4: 126)
+        overlap: Overlap of neighbouring tiles (Å); at least the ligand's size
+        padding: Space added around the receptor's bounding box (Å)
+    """
+    if not coords:
+        raise ValueError("Receptor has no atoms to tile")
+    max_npts -= max_npts % 2
+    edge = max_npts * spacing
+    if overlap >= edge:
+        raise ValueError(f"Tile overlap {overlap} Å must be smaller than the tile edge {edge} Å")
+    low = [min(point[axis] for point in coords) - padding for axis in range(3)]
+    high = [max(point[axis] for point in coords) + padding for axis in range(3)]
+    spans = [_axis_spans(low[axis], high[axis], edge, overlap) for axis in range(3)]
+
+    # Lattice positions holding a surface atom, found per axis instead of per tile
+    wanted = set()
+    for point in surface_atoms(coords):
+        hits = [[k for k, (center, length) in enumerate(spans[axis])
+                 if abs(point[axis] - center) <= length / 2] for axis in range(3)]
+        wanted.update(itertools.product(*hits))
+
+    tiles = []
+    for index in sorted(wanted):
+        picked = [spans[axis][index[axis]] for axis in range(3)]
+        npts = [min(max_npts, 2 * math.ceil(length / spacing / 2)) for _, length in picked]
+        tiles.append(GridTile(index, [center for center, _ in picked], npts, spacing))
+    return tiles
+
+
+def crop_receptor(lines: Sequence[str], tiles: Sequence[GridTile],
+                  margin: float = DEFAULT_MARGIN) -> List[List[str]]:
+    """Receptor records within ``margin`` Å of each tile (non-atom records are dropped)."""
+    atoms = [line for line in lines if line.startswith(("ATOM", "HETATM"))]
+    coords = atom_coords(atoms)
+    cropped = []
+    if np is not None and coords:
+        array = np.asarray(coords)
+        for tile in tiles:
+            inside = np.all((array >= np.asarray(tile.lower) - margin)
+                            & (array <= np.asarray(tile.upper) + margin), axis=1)
+            cropped.append([atoms[index] for index in np.flatnonzero(inside).tolist()])
+        return cropped
+    # Atoms sorted by x: each tile only checks y/z of the slab that bisect finds
+    order = sorted(range(len(coords)), key=lambda index: coords[index][0])
+    xs = [coords[index][0] for index in order]
+    for tile in tiles:
+        low = [value - margin for value in tile.lower]
+        high = [value + margin for value in tile.upper]
+        slab = order[bisect.bisect_left(xs, low[0]):bisect.bisect_right(xs, high[0])]
+        cropped.append([atoms[index] for index in sorted(slab)
+                        if low[1] <= coords[index][1] <= high[1] and low[2] <= coords[index][2] <= high[2]])
+    return cropped
+
+
+def tile_key(receptor_lines: Sequence[str], gpf_text: str, parameters: Optional[bytes] = None) -> str:
+    """Hash of every input AutoGrid reads for one tile."""
+    sha = hashlib.sha256()
+    for line in receptor_lines:
+        sha.update(line.rstrip("\r\n").encode())
+        sha.update(b"\n")
+    sha.update(gpf_text.encode())
+    if parameters is not None:
+        sha.update(parameters)
+    return sha.hexdigest()
+
+
+def tile_is_current(tile_dir: Path, key: str) -> bool:
+    """True when ``tile_dir`` holds complete maps computed from inputs hashing to ``key``."""
+    marker = Path(tile_dir) / "tile.json"
+    if not marker.exists():
+        return False
+    try:
+        record = json.loads(marker.read_text(encoding="utf-8"))
+    except ValueError:
+        return False
+    return record.get("key") == key and all((Path(tile_dir) / name).exists() for name in record.get("maps", []))
+
+
+def mark_tile_current(tile_dir: Path, key: str, tile: Optional[GridTile] = None) -> None:
+    """Record the maps in ``tile_dir`` as computed for ``key`` (call after AutoGrid succeeded)."""
+    tile_dir = Path(tile_dir)
+    maps = sorted(path.name for path in tile_dir.iterdir() if path.name.endswith((".map", ".fld", ".xyz")))
+    record = {"key": key, "maps": maps}
+    if tile is not None:
+        record["tile"] = tile.to_dict()
+    tmp = tile_dir / ".tile.json.tmp"
+    tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+    tmp.replace(tile_dir / "tile.json")
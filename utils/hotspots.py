@@ -0,0 +1,333 @@
+"""Find low-energy surface regions in AutoGrid maps to focus docking boxes.
+
+Blind docking over a whole-protein box spends most GA evaluations in empty
+solvent.  ``find_hotspots`` scans the maps AutoGrid already computed
+instead: every grid point gets the best (lowest) affinity over the ligand's
+atom types, points at or below ``energy_cutoff`` whose nearest receptor atom
+is an unmasked one within ``contact`` Å are kept, and face-connected groups
+of kept points form the hotspots.  Sites next to receptor atoms that the
+wrapper already masked (type ``X``) therefore drop out as ligands are
+placed.  Hotspots are ranked by their integrated energy (sum over the
+region times the voxel volume), so a large shallow groove can beat a single
+deep point.
+
+``focus_box`` turns a hotspot into an even-sized sub-box of the grid, which
+``grid_maps.crop_maps`` cuts out of the cached maps for AutoDock.
+
+With NumPy the distance test uses a sorted cell list and the components come
+from vectorised label propagation; without NumPy the same steps run as
+dictionary lookups and a breadth-first search.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from grid_maps import GridMap, Index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_ENERGY_CUTOFF = -0.3   # kcal/mol
+DEFAULT_CONTACT = 4.5          # Å from the nearest receptor atom
+DEFAULT_MIN_VOLUME = 10.0      # Å^3
+DEFAULT_PADDING = 4.0          # Å added around a hotspot for the docking box
+MASKED_TYPE = "X"
+
+Coord = Tuple[float, float, float]
+
+_NEIGHBOUR_CELLS = list(itertools.product((-1, 0, 1), repeat=3))
+
+
+class Hotspot:
+    def __init__(self, points: Sequence[int], lower: Sequence[int], upper: Sequence[int], center: Sequence[float],
+                 volume: float, energy: float, best: float) -> None:
+        """
+        Args:
+            points: Flat grid indices of the region.
+            lower: Smallest grid index of the region per axis.
+            upper: Largest grid index of the region per axis.
+            center: Energy-weighted centroid (Å).
+            volume: Region volume (Å^3).
+            energy: Integrated best-type affinity (kcal/mol * Å^3).
+            best: Lowest affinity in the region (kcal/mol).
+        """
+        self.points = list(points)
+        self.lower: Index = tuple(int(value) for value in lower)
+        self.upper: Index = tuple(int(value) for value in upper)
+        self.center: Coord = tuple(float(value) for value in center)
+        self.volume = float(volume)
+        self.energy = float(energy)
+        self.best = float(best)
+        self.rank = 0
+
+    def to_dict(self) -> Dict:
+        return {"rank": self.rank, "center": [round(value, 3) for value in self.center],
+                "volume": round(self.volume, 3), "energy": round(self.energy, 3), "best": round(self.best, 3),
+                "lower": list(self.lower), "upper": list(self.upper)}
+
+    def __repr__(self) -> str:
+        return (f"Hotspot(rank={self.rank}, center=({self.center[0]:.1f}, {self.center[1]:.1f}, "
+                f"{self.center[2]:.1f}), volume={self.volume:.1f}, energy={self.energy:.2f})")
+
+
+def receptor_atoms(lines: Sequence[str]) -> Tuple[List[Coord], List[Coord]]:
+    """Coordinates of the ``(unmasked, masked)`` atoms of a receptor PDBQT."""
+    unmasked: List[Coord] = []
+    masked: List[Coord] = []
+    for line in lines:
+        if line.startswith(("ATOM", "HETATM")):
+            coord = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+            (masked if line[77:79].strip() == MASKED_TYPE else unmasked).append(coord)
+    return unmasked, masked
+
+
+def best_affinity(maps: Mapping[str, GridMap], ligand_types: Sequence[str]):
+    """Point-wise minimum over the affinity maps of ``ligand_types``."""
+    missing = [atom_type for atom_type in ligand_types if atom_type not in maps]
+    if missing:
+        raise ValueError(f"No AutoGrid map for ligand atom types: {' '.join(missing)}")
+    grids = [maps[atom_type] for atom_type in ligand_types]
+    if any(grid.shape != grids[0].shape for grid in grids):
+        raise ValueError("Affinity maps have different grid sizes")
+    if np is not None:
+        return np.minimum.reduce([np.asarray(grid.values, dtype=float) for grid in grids])
+    return [min(values) for values in zip(*(grid.values for grid in grids))]
+
+
+def nearest_distance(points: Sequence[Coord], atoms: Sequence[Coord], cutoff: float):
+    """Distance from each point to its nearest atom, ``inf`` beyond ``cutoff``."""
+    if np is not None:
+        return _nearest_distance_np(points, atoms, cutoff)
+    cells: Dict[Tuple[int, int, int], List[Coord]] = {}
+    for atom in atoms:
+        cells.setdefault(tuple(int(math.floor(value / cutoff)) for value in atom), []).append(atom)
+    limit = cutoff * cutoff
+    distances = []
+    for x, y, z in points:
+        cx, cy, cz = int(math.floor(x / cutoff)), int(math.floor(y / cutoff)), int(math.floor(z / cutoff))
+        best = math.inf
+        for dx, dy, dz in _NEIGHBOUR_CELLS:
+            for ax, ay, az in cells.get((cx + dx, cy + dy, cz + dz), ()):
+                squared = (x - ax) ** 2 + (y - ay) ** 2 + (z - az) ** 2
+                if squared < best:
+                    best = squared
+        distances.append(math.sqrt(best) if best <= limit else math.inf)
+    return distances
+
+
+def _nearest_distance_np(points, atoms, cutoff: float):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    atoms = np.asarray(atoms, dtype=float).reshape(-1, 3)
+    best = np.full(len(points), np.inf)
+    if not len(points) or not len(atoms):
+        return best
+    low = np.minimum(points.min(axis=0), atoms.min(axis=0))
+    # One empty cell of padding on each side keeps the neighbour offsets in range
+    atom_cells = np.floor((atoms - low) / cutoff).astype(np.int64) + 1
+    point_cells = np.floor((points - low) / cutoff).astype(np.int64) + 1
+    dims = np.maximum(atom_cells.max(axis=0), point_cells.max(axis=0)) + 2
+
+    def linear(cells):
+        return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    atom_ids = linear(atom_cells)
+    order = np.argsort(atom_ids, kind="stable")
+    atom_ids, atoms = atom_ids[order], atoms[order]
+    for offset in _NEIGHBOUR_CELLS:
+        wanted = linear(point_cells + np.asarray(offset))
+        start = np.searchsorted(atom_ids, wanted, side="left")
+        counts = np.searchsorted(atom_ids, wanted, side="right") - start
+        total = int(counts.sum())
+        if not total:
+            continue
+        offsets = np.cumsum(counts) - counts
+        point_index = np.repeat(np.arange(len(points)), counts)
+        atom_index = np.repeat(start - offsets, counts) + np.arange(total)
+        delta = points[point_index] - atoms[atom_index]
+        squared = np.einsum("ij,ij->i", delta, delta)
+        # Pairs are grouped by point, so one reduceat gives each point's minimum
+        hit = counts > 0
+        best[hit] = np.minimum(best[hit], np.minimum.reduceat(squared, offsets[hit]))
+    best = np.sqrt(best)
+    best[best > cutoff] = np.inf
+    return best
+
+
+def connected_components(flat: Sequence[int], shape: Index) -> List[int]:
+    """Face-connected components of grid points; each point gets the position of its component's first point.
+
+    ``flat`` must be sorted flat indices (x fastest).
+    """
+    nx, ny, nz = shape
+    if np is not None:
+        flat = np.asarray(flat, dtype=np.int64)
+        if not flat.size:
+            return []
+        i, j, k = flat % nx, (flat // nx) % ny, flat // (nx * ny)
+        first, second = [], []
+        for stride, inside in ((1, i < nx - 1), (nx, j < ny - 1), (nx * ny, k < nz - 1)):
+            target = flat[inside] + stride
+            position = np.minimum(np.searchsorted(flat, target), flat.size - 1)
+            hit = flat[position] == target
+            first.append(np.flatnonzero(inside)[hit])
+            second.append(position[hit])
+        first, second = np.concatenate(first), np.concatenate(second)
+        labels = np.arange(flat.size)
+        while True:
+            updated = labels.copy()
+            np.minimum.at(updated, first, labels[second])
+            np.minimum.at(updated, second, labels[first])
+            updated = updated[updated]  # pointer jumping: follow each label to its own label
+            if np.array_equal(updated, labels):
+                return labels.tolist()
+            labels = updated
+
+    position = {value: index for index, value in enumerate(flat)}
+    labels = [-1] * len(flat)
+    for start, value in enumerate(flat):
+        if labels[start] >= 0:
+            continue
+        labels[start] = start
+        queue = [value]
+        while queue:
+            current = queue.pop()
+            x, y, z = current % nx, (current // nx) % ny, current // (nx * ny)
+            for step, allowed in ((1, x < nx - 1), (-1, x > 0), (nx, y < ny - 1), (-nx, y > 0),
+                                  (nx * ny, z < nz - 1), (-nx * ny, z > 0)):
+                other = position.get(current + step) if allowed else None
+                if other is not None and labels[other] < 0:
+                    labels[other] = start
+                    queue.append(current + step)
+    return labels
+
+
+def find_hotspots(maps: Mapping[str, GridMap], ligand_types: Sequence[str], receptor_lines: Sequence[str],
+                  energy_cutoff: float = DEFAULT_ENERGY_CUTOFF, contact: float = DEFAULT_CONTACT,
+                  min_volume: float = DEFAULT_MIN_VOLUME, top: Optional[int] = None) -> List[Hotspot]:
+    """Ranked low-energy regions next to unmasked receptor atoms.
+
+    Args:
+        maps: AutoGrid maps keyed by atom type (see ``grid_maps.load_maps``)
+        ligand_types: AutoDock atom types of the ligand
+        receptor_lines: Receptor PDBQT lines; atoms typed ``X`` are masked
+        energy_cutoff: Highest best-type affinity (kcal/mol) of a hotspot point
+        contact: A point's nearest receptor atom must be unmasked and this close (Å)
+        min_volume: Smallest hotspot volume (Å^3)
+        top: Return at most this many hotspots (all when None)
+
+    Returns:
+        Hotspots sorted by integrated energy, most favourable first.
+    """
+    grid = maps[ligand_types[0]] if ligand_types else None
+    if grid is None:
+        raise ValueError("No ligand atom types given")
+    score = best_affinity(maps, ligand_types)
+    unmasked, masked = receptor_atoms(receptor_lines)
+
+    if np is not None:
+        candidates = np.flatnonzero(score <= energy_cutoff)
+        coords = _grid_coords(grid, candidates)
+        near = _nearest_distance_np(coords, unmasked, contact)
+        reached = np.flatnonzero(np.isfinite(near))
+        # Masked atoms only matter for points that an unmasked atom reaches
+        blocked = _nearest_distance_np(coords[reached], masked, contact)
+        kept = candidates[reached[near[reached] < blocked]]
+        labels = np.asarray(connected_components(kept, grid.shape), dtype=np.int64)
+        hotspots = _summarise_np(grid, kept, score[kept], labels, min_volume)
+    else:
+        candidates = [flat for flat, value in enumerate(score) if value <= energy_cutoff]
+        coords = [grid.point(grid.index(flat)) for flat in candidates]
+        near = nearest_distance(coords, unmasked, contact)
+        blocked = nearest_distance(coords, masked, contact)
+        kept = [flat for flat, open_distance, masked_distance in zip(candidates, near, blocked)
+                if open_distance < math.inf and open_distance < masked_distance]
+        labels = connected_components(kept, grid.shape)
+        hotspots = _summarise(grid, kept, [score[flat] for flat in kept], labels, min_volume)
+
+    hotspots.sort(key=lambda hotspot: (hotspot.energy, hotspot.points[0]))
+    for rank, hotspot in enumerate(hotspots, start=1):
+        hotspot.rank = rank
+    return hotspots if top is None else hotspots[:top]
+
+
+def _grid_coords(grid: GridMap, flat):
+    nx, ny, _ = grid.shape
+    indices = np.stack([flat % nx, (flat // nx) % ny, flat // (nx * ny)], axis=1)
+    return np.asarray(grid.origin) + indices * grid.spacing
+
+
+def _summarise(grid: GridMap, kept: Sequence[int], energies: Sequence[float], labels: Sequence[int],
+               min_volume: float) -> List[Hotspot]:
+    groups: Dict[int, List[int]] = {}
+    for position, label in enumerate(labels):
+        groups.setdefault(label, []).append(position)
+    voxel = grid.spacing ** 3
+    hotspots = []
+    for members in groups.values():
+        if len(members) * voxel < min_volume:
+            continue
+        indices = [grid.index(kept[position]) for position in members]
+        values = [energies[position] for position in members]
+        weights = [-value for value in values]
+        total = sum(weights)
+        points = [grid.point(index) for index in indices]
+        center = [sum(w * point[axis] for w, point in zip(weights, points)) / total for axis in range(3)]
+        hotspots.append(Hotspot([kept[position] for position in members],
+                                [min(index[axis] for index in indices) for axis in range(3)],
+                                [max(index[axis] for index in indices) for axis in range(3)],
+                                center, len(members) * voxel, sum(values) * voxel, min(values)))
+    return hotspots
+
+
+def _summarise_np(grid: GridMap, kept, energies, labels, min_volume: float) -> List[Hotspot]:
+    if not kept.size:
+        return []
+    roots, group = np.unique(labels, return_inverse=True)
+    counts = np.bincount(group)
+    voxel = grid.spacing ** 3
+    nx, ny, _ = grid.shape
+    indices = np.stack([kept % nx, (kept // nx) % ny, kept // (nx * ny)], axis=1)
+    lower = np.full((roots.size, 3), np.iinfo(np.int64).max)
+    upper = np.full((roots.size, 3), -1)
+    np.minimum.at(lower, group, indices)
+    np.maximum.at(upper, group, indices)
+    best = np.full(roots.size, np.inf)
+    np.minimum.at(best, group, energies)
+    sums = np.bincount(group, weights=energies)
+    coords = np.asarray(grid.origin) + indices * grid.spacing
+    center = np.stack([np.bincount(group, weights=-energies * coords[:, axis]) for axis in range(3)], axis=1)
+    center /= -sums[:, None]
+    order = np.argsort(group, kind="stable")
+    members = np.split(kept[order], np.cumsum(counts)[:-1])
+    return [Hotspot(members[g].tolist(), lower[g], upper[g], center[g], counts[g] * voxel, sums[g] * voxel, best[g])
+            for g in range(roots.size) if counts[g] * voxel >= min_volume]
+
+
+def focus_box(hotspot: Hotspot, grid: GridMap, padding: float = DEFAULT_PADDING,
+              max_npts: int = 126) -> Tuple[Index, Index]:
+    """Grid points ``(lower, upper)`` of an even-sized box around ``hotspot`` plus ``padding`` Å.
+
+    The box is centred on the hotspot's extent, limited to ``max_npts`` per
+    axis and shifted, not shrunk, where it would leave the grid.
+    """
+    return focus_extent(hotspot.lower, hotspot.upper, grid, padding, max_npts)
+
+
+def focus_extent(extent_lower: Sequence[int], extent_upper: Sequence[int], grid: GridMap,
+                 padding: float = DEFAULT_PADDING, max_npts: int = 126) -> Tuple[Index, Index]:
+    """``focus_box`` for any region given by its smallest and largest grid index per axis."""
+    pad = int(math.ceil(padding / grid.spacing))
+    lower, upper = [], []
+    for axis in range(3):
+        span = extent_upper[axis] - extent_lower[axis] + 2 * pad
+        npts = min(max_npts - max_npts % 2, grid.npts[axis], span + span % 2)
+        middle = (extent_lower[axis] + extent_upper[axis] + 1) // 2
+        low = min(max(0, middle - npts // 2), grid.npts[axis] - npts)
+        lower.append(low)
+        upper.append(low + npts)
+    return tuple(lower), tuple(upper)
@@ -0,0 +1,499 @@
+"""Ligand topology (``.itp``) from coordinates: bonds, angles, dihedrals, pairs.
+
+Bonds are perceived from covalent radii: atoms ``i`` and ``j`` are bonded
+when ``d_ij <= r_i + r_j + tolerance``.  Atoms are hashed into cubic cells at
+least one bond cutoff wide, so every atom is only compared with the atoms of
+its own cell and the 13 forward neighbour cells; perception is linear in the
+number of atoms instead of quadratic.  Angles, proper dihedrals and 1-4
+pairs are then walked from the bond graph, and the reference bond lengths
+and angles are measured from the structure (vectorized when NumPy is
+available).
+
+A system usually holds many copies of the same ligand (one residue per
+docked pose).  ``LigandTopology.from_copies`` perceives all of them in one
+pass, keeps the bond graph most copies agree on and averages the reference
+geometry over those copies; copies with a different graph are reported in
+``mismatched``.  Coordinates are in nm throughout.
+
+    topology = topology_from_file(Path("npt.gro"), resname="UNL")
+    topology.write_itp(Path("ligand.itp"))
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Single-bond covalent radii in nm (Cordero et al. 2008)
+COVALENT_RADII: Dict[str, float] = {
+    "H": 0.031, "B": 0.084, "C": 0.076, "N": 0.071, "O": 0.066, "F": 0.057,
+    "Si": 0.111, "P": 0.107, "S": 0.105, "Cl": 0.102, "Se": 0.120, "Br": 0.120, "I": 0.139,
+}
+MASSES: Dict[str, float] = {
+    "H": 1.008, "B": 10.811, "C": 12.011, "N": 14.007, "O": 15.999, "F": 18.998,
+    "Si": 28.086, "P": 30.974, "S": 32.066, "Cl": 35.453, "Se": 78.971, "Br": 79.904, "I": 126.904,
+}
+DEFAULT_RADIUS = 0.076
+BOND_TOLERANCE = 0.045  # nm, the usual 0.45 A slack on the radius sum
+MIN_BOND_LENGTH = 0.04  # nm; closer atoms are overlapping copies, not bonds
+
+# Force constants for the measured reference geometry
+BOND_FORCE = 250000.0  # kJ mol^-1 nm^-2
+ANGLE_FORCE = 400.0  # kJ mol^-1 rad^-2
+# Generic threefold torsion (function 9: phi_s, k_phi, multiplicity)
+DIHEDRAL_PARAMS = (0.0, 0.65, 3)
+
+# AutoDock atom types that are not element symbols
+AD_TYPE_ELEMENTS = {"A": "C", "NA": "N", "NS": "N", "OA": "O", "OS": "O",
+                    "SA": "S", "HD": "H", "HS": "H", "G0": "C", "G1": "C", "CG0": "C", "CG1": "C"}
+
+# The 13 neighbour cells "after" a cell; with the cell itself they cover every pair once
+_FORWARD_CELLS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                  if (dx, dy, dz) > (0, 0, 0)]
+
+Bond = Tuple[int, int]
+Angle = Tuple[int, int, int]
+Dihedral = Tuple[int, int, int, int]
+
+
+def element_of(name: str, hint: str = "") -> str:
+    """Element symbol from an element/AutoDock-type column (``hint``) or an atom name."""
+    hint = hint.strip()
+    if hint:
+        if hint.upper() in AD_TYPE_ELEMENTS:
+            return AD_TYPE_ELEMENTS[hint.upper()]
+        symbol = hint[:2].capitalize()
+        return symbol if symbol in COVALENT_RADII else hint[0].upper()
+    letters = name.strip().lstrip("0123456789")
+    if letters[:2].capitalize() in ("Cl", "Br"):
+        return letters[:2].capitalize()
+    return letters[:1].upper() or "C"
+
+
+# ----------------------------------------------------------------------
+# Bond perception
+# ----------------------------------------------------------------------
+def perceive_bonds(coords: Sequence[Sequence[float]], elements: Sequence[str],
+                   tolerance: float = BOND_TOLERANCE,
+                   groups: Optional[Sequence[int]] = None) -> List[Bond]:
+    """Sorted ``(i, j)`` bonds (``i < j``) between atoms closer than their radius sum plus ``tolerance``.
+
+    Args:
+        coords: Atom positions in nm
+        elements: Element symbol of each atom
+        tolerance: Slack added to the sum of covalent radii (nm)
+        groups: Optional molecule index per atom; atoms of different groups never bond
+    """
+    if not len(coords):
+        return []
+    radii = [COVALENT_RADII.get(element, DEFAULT_RADIUS) for element in elements]
+    cell = 2 * max(radii) + tolerance
+    if np is not None:
+        return _perceive_bonds_numpy(coords, radii, cell, tolerance, groups)
+
+    # The molecule index is part of the cell key, so atoms of different copies are never compared
+    cells: Dict[Tuple[int, int, int, int], List[int]] = {}
+    points = [(float(x), float(y), float(z)) for x, y, z in coords]
+    for index, (x, y, z) in enumerate(points):
+        key = (groups[index] if groups is not None else 0,
+               math.floor(x / cell), math.floor(y / cell), math.floor(z / cell))
+        cells.setdefault(key, []).append(index)
+
+    min_sq = MIN_BOND_LENGTH * MIN_BOND_LENGTH
+
+    def bonded(i: int, j: int) -> bool:
+        xi, yi, zi = points[i]
+        xj, yj, zj = points[j]
+        d_sq = (xi - xj)**2 + (yi - yj)**2 + (zi - zj)**2
+        cutoff = radii[i] + radii[j] + tolerance
+        return min_sq < d_sq <= cutoff * cutoff
+
+    bonds = []
+    for (group, cx, cy, cz), members in cells.items():
+        for a, i in enumerate(members):
+            for j in members[a + 1:]:
+                if bonded(i, j):
+                    bonds.append((min(i, j), max(i, j)))
+        for dx, dy, dz in _FORWARD_CELLS:
+            others = cells.get((group, cx + dx, cy + dy, cz + dz))
+            if not others:
+                continue
+            for i in members:
+                for j in others:
+                    if bonded(i, j):
+                        bonds.append((min(i, j), max(i, j)))
+    bonds.sort()
+    return bonds
+
+
+def _perceive_bonds_numpy(coords, radii, cell, tolerance, groups) -> List[Bond]:
+    """``perceive_bonds`` with the cell list as a sorted array of linear cell ids."""
+    xyz = np.asarray(coords, dtype=float).reshape(-1, 3)
+    radius = np.asarray(radii)
+    keys = np.floor(xyz / cell).astype(np.int64)
+    keys -= keys.min(axis=0) - 1  # one empty layer of cells on every side
+    dims = keys.max(axis=0) + 2
+    cell_id = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+    if groups is not None:
+        # One block of cell ids per molecule; the padding keeps neighbours inside the block
+        cell_id += np.asarray(groups, dtype=np.int64) * int(dims.prod())
+    order = np.argsort(cell_id, kind="stable")
+    sorted_id = cell_id[order]
+    atom_index = np.arange(len(xyz))
+
+    first, second = [], []
+    for offset in [(0, 0, 0)] + _FORWARD_CELLS:
+        neighbour = cell_id + (offset[0] * dims[1] + offset[1]) * dims[2] + offset[2]
+        lo = np.searchsorted(sorted_id, neighbour, side="left")
+        counts = np.searchsorted(sorted_id, neighbour, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        # Expand every atom into (atom, member of the neighbour cell) candidate pairs
+        i = np.repeat(atom_index, counts)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        j = order[starts + np.arange(total)]
+        if offset == (0, 0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        first.append(i)
+        second.append(j)
+    if not first:
+        return []
+    i, j = np.concatenate(first), np.concatenate(second)
+    d_sq = ((xyz[i] - xyz[j])**2).sum(axis=1)
+    cutoff = radius[i] + radius[j] + tolerance
+    keep = (d_sq > MIN_BOND_LENGTH**2) & (d_sq <= cutoff * cutoff)
+    low, high = np.minimum(i[keep], j[keep]), np.maximum(i[keep], j[keep])
+    # Every pair is generated once, so sorting is all that is left
+    order = np.argsort(low * len(xyz) + high, kind="stable")
+    return list(zip(low[order].tolist(), high[order].tolist()))
+
+
+# ----------------------------------------------------------------------
+# Graph walks
+# ----------------------------------------------------------------------
+def adjacency(n_atoms: int, bonds: Sequence[Bond]) -> List[List[int]]:
+    neighbours: List[List[int]] = [[] for _ in range(n_atoms)]
+    for i, j in bonds:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    for row in neighbours:
+        row.sort()
+    return neighbours
+
+
+def enumerate_angles(neighbours: Sequence[Sequence[int]]) -> List[Angle]:
+    """Every ``(i, j, k)`` with ``i < k`` both bonded to the centre ``j``."""
+    angles = []
+    for j, row in enumerate(neighbours):
+        for a, i in enumerate(row):
+            for k in row[a + 1:]:
+                angles.append((i, j, k))
+    angles.sort(key=lambda angle: (angle[1], angle[0], angle[2]))
+    return angles
+
+
+def enumerate_dihedrals(bonds: Sequence[Bond], neighbours: Sequence[Sequence[int]]) -> List[Dihedral]:
+    """Every proper dihedral ``(i, j, k, l)`` around each central bond ``j-k`` (3-rings excluded)."""
+    dihedrals = []
+    for j, k in bonds:
+        for i in neighbours[j]:
+            if i == k:
+                continue
+            for l in neighbours[k]:
+                if l != j and l != i:
+                    dihedrals.append((i, j, k, l))
+    return dihedrals
+
+
+def enumerate_pairs(bonds: Sequence[Bond], angles: Sequence[Angle],
+                    dihedrals: Sequence[Dihedral]) -> List[Bond]:
+    """1-4 pairs: dihedral end atoms that are not also 1-2 or 1-3 neighbours (small rings)."""
+    closer = set(bonds)
+    closer.update((min(i, k), max(i, k)) for i, _, k in angles)
+    pairs = {(min(i, l), max(i, l)) for i, _, _, l in dihedrals}
+    return sorted(pairs - closer)
+
+
+# ----------------------------------------------------------------------
+# Geometry
+# ----------------------------------------------------------------------
+def bond_lengths(copies: Sequence[Sequence[Sequence[float]]], bonds: Sequence[Bond]) -> List[float]:
+    """Bond lengths (nm) averaged over ``copies`` (coordinate sets with the same atom order)."""
+    if not bonds:
+        return []
+    if np is not None:
+        xyz = np.asarray(copies, dtype=float)
+        index = np.asarray(bonds)
+        lengths = np.linalg.norm(xyz[:, index[:, 0]] - xyz[:, index[:, 1]], axis=2)
+        return lengths.mean(axis=0).tolist()
+    return [sum(math.dist(coords[i], coords[j]) for coords in copies) / len(copies) for i, j in bonds]
+
+
+def angle_values(copies: Sequence[Sequence[Sequence[float]]], angles: Sequence[Angle]) -> List[float]:
+    """Angles (degrees) averaged over ``copies``."""
+    if not angles:
+        return []
+    if np is not None:
+        xyz = np.asarray(copies, dtype=float)
+        index = np.asarray(angles)
+        u = xyz[:, index[:, 0]] - xyz[:, index[:, 1]]
+        v = xyz[:, index[:, 2]] - xyz[:, index[:, 1]]
+        cosine = (u * v).sum(axis=2) / (np.linalg.norm(u, axis=2) * np.linalg.norm(v, axis=2))
+        return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0))).mean(axis=0).tolist()
+
+    def angle(coords, i, j, k) -> float:
+        u = [a - b for a, b in zip(coords[i], coords[j])]
+        v = [a - b for a, b in zip(coords[k], coords[j])]
+        cosine = sum(a * b for a, b in zip(u, v)) / (math.hypot(*u) * math.hypot(*v))
+        return math.degrees(math.acos(max(-1.0, min(1.0, cosine))))
+
+    return [sum(angle(coords, i, j, k) for coords in copies) / len(copies) for i, j, k in angles]
+
+
+# ----------------------------------------------------------------------
+# Topology
+# ----------------------------------------------------------------------
+class LigandTopology:
+    """Bonded terms and reference geometry of one ligand molecule (0-based atom indices)."""
+
+    def __init__(self, names: Sequence[str], elements: Sequence[str], bonds: Sequence[Bond],
+                 copies: Sequence[Sequence[Sequence[float]]], resname: str = "UNL",
+                 dihedrals: bool = True) -> None:
+        """
+        Args:
+            names: Atom names
+            elements: Element symbol of each atom
+            bonds: Bond graph
+            copies: One or more coordinate sets (nm) the reference geometry is averaged over
+            resname: Residue and molecule name in the ``.itp``
+            dihedrals: Whether to write dihedrals and 1-4 pairs
+        """
+        self.names = list(names)
+        self.elements = list(elements)
+        self.resname = resname
+        self.bonds = list(bonds)
+        self.neighbours = adjacency(len(self.names), self.bonds)
+        self.angles = enumerate_angles(self.neighbours)
+        self.dihedrals = enumerate_dihedrals(self.bonds, self.neighbours) if dihedrals else []
+        self.pairs = enumerate_pairs(self.bonds, self.angles, self.dihedrals)
+        self.copies = len(copies)
+        self.mismatched: List[int] = []
+        self.bond_lengths = bond_lengths(copies, self.bonds)
+        self.angle_values = angle_values(copies, self.angles)
+
+    @classmethod
+    def from_copies(cls, names: Sequence[str], elements: Sequence[str],
+                    copies: Sequence[Sequence[Sequence[float]]], resname: str = "UNL",
+                    tolerance: float = BOND_TOLERANCE, dihedrals: bool = True) -> "LigandTopology":
+        """Perceive the bonds of every copy at once and keep the graph most copies share."""
+        n_atoms = len(names)
+        flat = [xyz for coords in copies for xyz in coords]
+        groups = [copy for copy in range(len(copies)) for _ in range(n_atoms)]
+        per_copy: List[List[Bond]] = [[] for _ in copies]
+        for i, j in perceive_bonds(flat, list(elements) * len(copies), tolerance, groups):
+            copy = i // n_atoms
+            per_copy[copy].append((i - copy * n_atoms, j - copy * n_atoms))
+
+        graphs = [tuple(bonds) for bonds in per_copy]
+        consensus, _ = Counter(graphs).most_common(1)[0]
+        agreeing = [copies[index] for index, graph in enumerate(graphs) if graph == consensus]
+        topology = cls(names, elements, consensus, agreeing, resname, dihedrals)
+        topology.mismatched = [index for index, graph in enumerate(graphs) if graph != consensus]
+        return topology
+
+    def fragments(self) -> int:
+        """Number of connected components of the bond graph (1 for a sane ligand)."""
+        seen = [False] * len(self.names)
+        count = 0
+        for start in range(len(self.names)):
+            if seen[start]:
+                continue
+            count += 1
+            stack = [start]
+            seen[start] = True
+            while stack:
+                for other in self.neighbours[stack.pop()]:
+                    if not seen[other]:
+                        seen[other] = True
+                        stack.append(other)
+        return count
+
+    def itp_text(self) -> str:
+        lines = [
+            f"; {self.resname}: bonded terms perceived from coordinates by ligand_topology.py",
+            f"; reference geometry averaged over {self.copies} cop{'y' if self.copies == 1 else 'ies'}",
+            "",
+            "[ moleculetype ]",
+            "; molname   nrexcl",
+            f"{self.resname:<10}  3",
+            "",
+            "[ atoms ]",
+            "; nr  type  resnr  residu  atom  cgnr   charge      mass",
+        ]
+        for index, (name, element) in enumerate(zip(self.names, self.elements), start=1):
+            mass = MASSES.get(element, MASSES["C"])
+            lines.append(f"{index:>5} {element:>5} {1:>6} {self.resname:>7} {name:>5} {index:>5}"
+                         f" {0.0:>8.3f} {mass:>9.3f}")
+
+        lines += ["", "[ bonds ]", "; ai    aj  funct     b0 (nm)    kb"]
+        lines += [f"{i + 1:>5} {j + 1:>5}  1  {length:>10.5f}  {BOND_FORCE:.1f}"
+                  for (i, j), length in zip(self.bonds, self.bond_lengths)]
+
+        if self.pairs:
+            lines += ["", "[ pairs ]", "; ai    aj  funct"]
+            lines += [f"{i + 1:>5} {j + 1:>5}  1" for i, j in self.pairs]
+
+        lines += ["", "[ angles ]", "; ai    aj    ak  funct   theta0     k"]
+        lines += [f"{i + 1:>5} {j + 1:>5} {k + 1:>5}  1  {theta:>8.3f}  {ANGLE_FORCE:.1f}"
+                  for (i, j, k), theta in zip(self.angles, self.angle_values)]
+
+        if self.dihedrals:
+            phi, k_phi, multiplicity = DIHEDRAL_PARAMS
+            lines += ["", "[ dihedrals ]", "; ai    aj    ak    al  funct    phi     kd  mult"]
+            lines += [f"{i + 1:>5} {j + 1:>5} {k + 1:>5} {l + 1:>5}  9  {phi:>6.1f} {k_phi:>6.2f}  {multiplicity}"
+                      for i, j, k, l in self.dihedrals]
+        return "\n".join(lines) + "\n"
+
+    def write_itp(self, path: Path) -> None:
+        Path(path).write_text(self.itp_text(), encoding="utf-8")
+
+    def summary(self) -> str:
+        return (f"{len(self.names)} atoms, {len(self.bonds)} bonds, {len(self.angles)} angles, "
+                f"{len(self.dihedrals)} dihedrals, {len(self.pairs)} pairs from {self.copies} copies")
+
+
+# ----------------------------------------------------------------------
+# Readers
+# ----------------------------------------------------------------------
+def _residues_from_gro(path: Path, resname: str) -> List[Tuple[List[str], List[str], List[Tuple[float, float, float]]]]:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    atom_count = int(lines[1])
+    residues = []
+    element_cache: Dict[str, str] = {}
+    current_key = None
+    for line in lines[2:2 + atom_count]:
+        if line[5:10].strip() != resname:
+            current_key = None
+            continue
+        key = line[0:5]
+        if key != current_key:
+            residues.append(([], [], []))
+            current_key = key
+        name = line[10:15].strip()
+        names, elements, coords = residues[-1]
+        names.append(name)
+        element = element_cache.get(name)
+        if element is None:
+            element = element_cache[name] = element_of(name)
+        elements.append(element)
+        coords.append((float(line[20:28]), float(line[28:36]), float(line[36:44])))
+    return residues
+
+
+def _residues_from_pdb(path: Path, resname: Optional[str]) -> List[Tuple[List[str], List[str], List[Tuple[float, float, float]]]]:
+    """PDB/PDBQT atoms (A converted to nm); every MODEL or residue is one copy."""
+    pdbqt = path.suffix.lower() == ".pdbqt"
+    residues = []
+    current_key = None
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith(("MODEL", "ENDMDL")):
+            current_key = None
+            continue
+        if not line.startswith(("ATOM", "HETATM")):
+            continue
+        if resname and line[17:20].strip() != resname:
+            continue
+        key = line[17:27]
+        if key != current_key:
+            residues.append(([], [], []))
+            current_key = key
+        name = line[12:16].strip()
+        hint = line[77:79] if pdbqt else line[76:78]
+        names, elements, coords = residues[-1]
+        names.append(name)
+        elements.append(element_of(name, hint))
+        coords.append((float(line[30:38]) / 10.0, float(line[38:46]) / 10.0, float(line[46:54]) / 10.0))
+    return residues
+
+
+def _residues_from_mol2(path: Path, resname: Optional[str]):
+    """Tripos mol2 atoms (A converted to nm) and the first molecule's ``@<TRIPOS>BOND`` table.
+
+    Every ``@<TRIPOS>MOLECULE`` block is one copy.  Returns ``(residues, bonds)``;
+    ``bonds`` is empty when the file has no bond table.
+    """
+    residues = []
+    bonds: List[Bond] = []
+    serials: Dict[str, int] = {}
+    section = ""
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("@<TRIPOS>"):
+            section = line.strip()[9:]
+            if section == "MOLECULE":
+                residues.append(([], [], []))
+            continue
+        fields = line.split()
+        if section == "BOND" and len(residues) == 1 and len(fields) >= 3:
+            if fields[1] in serials and fields[2] in serials:
+                i, j = serials[fields[1]], serials[fields[2]]
+                bonds.append((min(i, j), max(i, j)))
+            continue
+        if section != "ATOM" or len(fields) < 6:
+            continue
+        if resname and (len(fields) < 8 or fields[7][:len(resname)] != resname):
+            continue
+        if not residues:
+            residues.append(([], [], []))
+        names, elements, coords = residues[-1]
+        if len(residues) == 1:
+            serials[fields[0]] = len(names)
+        names.append(fields[1])
+        # SYBYL (C.ar, N.am, Cl) or GAFF (ca, hc, os) atom types
+        elements.append(element_of(fields[1], fields[5].split(".")[0]))
+        coords.append((float(fields[2]) / 10.0, float(fields[3]) / 10.0, float(fields[4]) / 10.0))
+    return [residue for residue in residues if residue[0]], sorted(set(bonds))
+
+
+def topology_from_file(path: Path, resname: Optional[str] = "UNL", tolerance: float = BOND_TOLERANCE,
+                       dihedrals: bool = True) -> LigandTopology:
+    """Build the topology of ``resname`` from a GRO, PDB, PDBQT or mol2 file with one or more copies.
+
+    Bonds are perceived from the coordinates, except for mol2 files with a
+    bond table.  Copies whose atom names differ from the first copy (e.g. a
+    truncated residue) are skipped and listed in ``mismatched`` together
+    with copies whose bond graph disagrees with the majority.
+    """
+    path = Path(path)
+    file_bonds: List[Bond] = []
+    if path.suffix.lower() == ".gro":
+        residues = _residues_from_gro(path, resname or "UNL")
+    elif path.suffix.lower() == ".mol2":
+        residues, file_bonds = _residues_from_mol2(path, resname)
+    else:
+        residues = _residues_from_pdb(path, resname)
+    if not residues:
+        raise ValueError(f"No {resname or 'ligand'} atoms found in {path}")
+
+    names, elements, _ = residues[0]
+    usable = [index for index, residue in enumerate(residues) if residue[0] == names]
+    if file_bonds:
+        # mol2 connectivity is authoritative (the coordinates may be a 2D depiction)
+        topology = LigandTopology(names, elements, file_bonds, [residues[index][2] for index in usable],
+                                  resname or "UNL", dihedrals)
+        topology.mismatched = [index for index in range(len(residues)) if index not in usable]
+        return topology
+    topology = LigandTopology.from_copies(names, elements, [residues[index][2] for index in usable],
+                                          resname or "UNL", tolerance, dihedrals)
+    mismatched = {usable[index] for index in topology.mismatched}
+    mismatched.update(index for index in range(len(residues)) if residues[index][0] != names)
+    topology.mismatched = sorted(mismatched)
+    return topology
@@ -0,0 +1,301 @@
+"""Compressed archive of AutoGrid map sets, stored as deltas from a base set.
+
+ASCII maps cost about 7 bytes per grid point, and every regridded cycle or
+tile adds another full set.  A ``MapArchive`` keeps them as:
+
+* float16 values (2 bytes per point) with a guaranteed error bound: a point
+  whose float16 value is further than ``max(max_error, rel_error * |v|)``
+  from the original - in practice only repulsive values beyond the float16
+  range - is also stored exactly in an exception list;
+* chunks of ``CHUNK_POINTS`` values, each compressed with zlib on its own;
+* sparse deltas: a set added with a ``base`` stores, per map, only the
+  points whose value differs from the base's decoded value by more than the
+  bound.  Masking changes the maps only around the masked atoms, so a
+  cycle usually costs a small fraction of a full set.
+
+``materialize`` writes a set back as ASCII maps plus its original
+``.maps.fld`` and ``.maps.xyz``, only when a job actually needs them.
+
+Layout: ``<archive>/index.json`` lists the sets and ``<archive>/<set>.bin``
+holds the chunks of one set.  The data file is complete before the index
+is replaced, so an interrupted ``add`` never leaves a set half-written.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from grid_maps import GridMap, read_fld, read_map
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+DEFAULT_MAX_ERROR = 0.005
+DEFAULT_REL_ERROR = 1e-3
+CHUNK_POINTS = 1 << 16
+COMPRESSION_LEVEL = 6
+# Magnitudes from here on round to infinity in float16
+FLOAT16_LIMIT = 65520.0
+
+_SET_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def quantize(values, max_error: float = DEFAULT_MAX_ERROR,
+             rel_error: float = DEFAULT_REL_ERROR) -> Tuple[bytes, List[int], List[float], float]:
+    """Float16 bytes of ``values``, the positions and exact values outside the bound, and the largest error left."""
+    if np is not None:
+        array = np.asarray(values, dtype=float)
+        with np.errstate(over="ignore", invalid="ignore"):
+            half = array.astype("<f2")
+            error = np.abs(half.astype(float) - array)
+            bad = ~(error <= np.maximum(max_error, rel_error * np.abs(array)))
+        half[bad] = 0
+        positions = np.flatnonzero(bad)
+        worst = float(error[~bad].max()) if len(positions) < len(array) else 0.0
+        return half.tobytes(), positions.tolist(), array[positions].tolist(), worst
+
+    values = [float(value) for value in values]
+    count = len(values)
+    clamped = [value if abs(value) < FLOAT16_LIMIT else 0.0 for value in values]
+    decoded = struct.unpack(f"<{count}e", struct.pack(f"<{count}e", *clamped))
+    positions, exact, worst = [], [], 0.0
+    for index, (value, half) in enumerate(zip(values, decoded)):
+        error = abs(half - value)
+        if error <= max(max_error, rel_error * abs(value)):
+            worst = max(worst, error)
+        else:
+            positions.append(index)
+            exact.append(value)
+            clamped[index] = 0.0
+    return struct.pack(f"<{count}e", *clamped), positions, exact, worst
+
+
+def dequantize(data: bytes):
+    """Values of float16 bytes (NumPy array when available, else a list)."""
+    if np is not None:
+        return np.frombuffer(data, dtype="<f2").astype(float)
+    return list(struct.unpack(f"<{len(data) // 2}e", data))
+
+
+def _changed_points(values, base_values, max_error: float, rel_error: float) -> Tuple[List[int], float]:
+    """Positions where ``values`` is off the decoded base by more than the bound, and the largest error elsewhere."""
+    if np is not None:
+        new = np.asarray(values, dtype=float)
+        old = np.asarray(base_values, dtype=float)
+        with np.errstate(invalid="ignore"):
+            error = np.abs(new - old)
+            changed = ~(error <= np.maximum(max_error, rel_error * np.abs(new)))
+        kept = error[~changed]
+        return np.flatnonzero(changed).tolist(), float(kept.max()) if len(kept) else 0.0
+    changed, worst = [], 0.0
+    for index, (value, old) in enumerate(zip(values, base_values)):
+        error = abs(value - old)
+        if error <= max(max_error, rel_error * abs(value)):
+            worst = max(worst, error)
+        else:
+            changed.append(index)
+    return changed, worst
+
+
+def _same_grid(grid: GridMap, other: Optional[GridMap]) -> bool:
+    return (other is not None and grid.npts == other.npts and grid.spacing == other.spacing
+            and grid.center == other.center)
+
+
+class MapArchive:
+    def __init__(self, path: Path, max_error: float = DEFAULT_MAX_ERROR,
+                 rel_error: float = DEFAULT_REL_ERROR, level: int = COMPRESSION_LEVEL) -> None:
+        """
+        Args:
+            path: Archive directory (created by the first ``add``).
+            max_error: Absolute error bound of stored values (kcal/mol).
+            rel_error: Relative error bound; the larger of the two applies.
+            level: zlib compression level.
+        """
+        self.path = Path(path)
+        self.max_error = float(max_error)
+        self.rel_error = float(rel_error)
+        self.level = int(level)
+
+    @property
+    def index(self) -> Dict:
+        index_path = self.path / INDEX_NAME
+        if not index_path.exists():
+            return {"version": INDEX_VERSION, "sets": {}}
+        return json.loads(index_path.read_text(encoding="utf-8"))
+
+    @property
+    def names(self) -> List[str]:
+        """Set names in the order they were added."""
+        return list(self.index["sets"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index["sets"]
+
+    def info(self, name: str) -> Dict:
+        """Index record of one set."""
+        sets = self.index["sets"]
+        if name not in sets:
+            raise KeyError(f"No map set {name!r} in {self.path}")
+        return sets[name]
+
+    def add(self, name: str, fld_path: Path, base: Optional[str] = None) -> Dict:
+        """Store the maps listed in ``fld_path`` as set ``name``; returns its index record.
+
+        With ``base``, each map with the same grid as the base's map of the
+        same file is stored as a sparse delta from it; other maps are stored
+        in full.
+        """
+        if not _SET_NAME.match(name):
+            raise ValueError(f"Invalid map set name {name!r} (letters, digits, '_', '.', '-')")
+        if name in self:
+            raise ValueError(f"Map set {name!r} already exists in {self.path}")
+        fld_path = Path(fld_path)
+        base_maps = self.load(base) if base is not None else {}
+        xyz_path = fld_path.with_suffix(".xyz")
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / f".{name}.bin.tmp"
+        records = []
+        ascii_bytes = 0
+        with tmp.open("wb") as handle:
+            for map_path in read_fld(fld_path):
+                grid = read_map(map_path, cache=False)
+                ascii_bytes += map_path.stat().st_size
+                file_name = map_path.relative_to(fld_path.parent).as_posix()
+                reference = base_maps.get(file_name)
+                record = {"file": file_name, "npts": list(grid.npts), "spacing": grid.spacing,
+                          "center": list(grid.center), "header": grid.header, "points": grid.size}
+                if _same_grid(grid, reference):
+                    record.update(self._write_delta(handle, grid.values, reference.values))
+                else:
+                    record.update(self._write_full(handle, grid.values))
+                records.append(record)
+            stored = handle.tell()
+        if not records:
+            tmp.unlink()
+            raise ValueError(f"{fld_path} lists no maps")
+        tmp.replace(self.path / f"{name}.bin")
+
+        entry = {"base": base, "fld": fld_path.name, "fld_text": fld_path.read_text(encoding="utf-8"),
+                 "xyz": xyz_path.name if xyz_path.exists() else None,
+                 "xyz_text": xyz_path.read_text(encoding="utf-8") if xyz_path.exists() else None,
+                 "created": time.time(), "max_error": self.max_error, "rel_error": self.rel_error,
+                 "stored_bytes": stored, "ascii_bytes": ascii_bytes, "maps": records}
+        index = self.index
+        index["sets"][name] = entry
+        tmp_index = self.path / f".{INDEX_NAME}.tmp"
+        tmp_index.write_text(json.dumps(index, indent=1), encoding="utf-8")
+        tmp_index.replace(self.path / INDEX_NAME)
+        return entry
+
+    def _write_blob(self, handle, payload: bytes, count: int) -> List[int]:
+        offset = handle.tell()
+        handle.write(zlib.compress(payload, self.level))
+        return [offset, handle.tell() - offset, count]
+
+    def _write_exceptions(self, handle, positions: Sequence[int], exact: Sequence[float]) -> Optional[List[int]]:
+        if not positions:
+            return None
+        count = len(positions)
+        return self._write_blob(handle, struct.pack(f"<{count}I", *positions) + struct.pack(f"<{count}d", *exact),
+                                count)
+
+    def _write_full(self, handle, values) -> Dict:
+        data, positions, exact, worst = quantize(values, self.max_error, self.rel_error)
+        chunks = [self._write_blob(handle, data[start:start + 2 * CHUNK_POINTS],
+                                   len(data[start:start + 2 * CHUNK_POINTS]) // 2)
+                  for start in range(0, len(data), 2 * CHUNK_POINTS)]
+        return {"delta": False, "changed": len(values), "chunks": chunks,
+                "exceptions": self._write_exceptions(handle, positions, exact), "error": worst}
+
+    def _write_delta(self, handle, values, base_values) -> Dict:
+        changed, unchanged_error = _changed_points(values, base_values, self.max_error, self.rel_error)
+        if np is not None:
+            changed_values = np.asarray(values, dtype=float)[changed] if changed else []
+        else:
+            changed_values = [values[index] for index in changed]
+        data, positions, exact, worst = quantize(changed_values, self.max_error, self.rel_error)
+        chunks = []
+        previous = 0
+        for start in range(0, len(changed), CHUNK_POINTS):
+            block = changed[start:start + CHUNK_POINTS]
+            # Gaps between changed positions compress far better than the positions
+            gaps = [index - before for index, before in zip(block, [previous] + block[:-1])]
+            previous = block[-1]
+            chunks.append(self._write_blob(
+                handle, struct.pack(f"<{len(block)}I", *gaps) + data[2 * start:2 * (start + len(block))],
+                len(block)))
+        return {"delta": True, "changed": len(changed), "chunks": chunks,
+                "exceptions": self._write_exceptions(handle, [changed[p] for p in positions], exact),
+                "error": max(worst, unchanged_error)}
+
+    def load(self, name: str) -> Dict[str, GridMap]:
+        """Decoded maps of set ``name`` keyed by file name, in ``.maps.fld`` order."""
+        entry = self.info(name)
+        base_maps = self.load(entry["base"]) if entry["base"] is not None else {}
+        maps = {}
+        with (self.path / f"{name}.bin").open("rb") as handle:
+            for record in entry["maps"]:
+                if record["delta"]:
+                    values = self._read_delta(handle, record, base_maps[record["file"]].values)
+                else:
+                    values = dequantize(b"".join(self._read_blob(handle, chunk) for chunk in record["chunks"]))
+                if record["exceptions"]:
+                    payload = self._read_blob(handle, record["exceptions"])
+                    count = record["exceptions"][2]
+                    positions = struct.unpack(f"<{count}I", payload[:4 * count])
+                    for position, value in zip(positions, struct.unpack(f"<{count}d", payload[4 * count:])):
+                        values[position] = value
+                maps[record["file"]] = GridMap(values, record["npts"], record["spacing"], record["center"],
+                                               record["header"])
+        return maps
+
+    @staticmethod
+    def _read_blob(handle, chunk: Sequence[int]) -> bytes:
+        offset, length, _ = chunk
+        handle.seek(offset)
+        return zlib.decompress(handle.read(length))
+
+    def _read_delta(self, handle, record: Dict, base_values):
+        values = base_values.copy() if hasattr(base_values, "copy") else list(base_values)
+        position = 0
+        for chunk in record["chunks"]:
+            payload = self._read_blob(handle, chunk)
+            count = chunk[2]
+            gaps = struct.unpack(f"<{count}I", payload[:4 * count])
+            decoded = dequantize(payload[4 * count:])
+            if np is not None:
+                indices = position + np.cumsum(gaps)
+                values[indices] = decoded
+                position = int(indices[-1])
+            else:
+                for gap, value in zip(gaps, decoded):
+                    position += gap
+                    values[position] = value
+        return values
+
+    def materialize(self, name: str, out_dir: Path) -> Path:
+        """Write set ``name`` as AutoDock-readable ASCII maps into ``out_dir``; returns the ``.maps.fld``."""
+        entry = self.info(name)
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for file_name, grid in self.load(name).items():
+            target = out_dir / file_name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            grid.write(target)
+        if entry["xyz"]:
+            (out_dir / entry["xyz"]).write_text(entry["xyz_text"], encoding="utf-8")
+        fld_out = out_dir / entry["fld"]
+        fld_out.write_text(entry["fld_text"], encoding="utf-8")
+        return fld_out
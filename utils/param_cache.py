@@ -0,0 +1,157 @@
+"""Content-hash keyed cache of ligand parameterizations (ACPYPE/antechamber output).
+
+AM1-BCC charges take minutes per ligand, yet the ligand mol2 rarely changes
+between runs, retries and Shaker replicas.  ``ParameterCache`` stores the
+topology files ACPYPE writes (``*.itp``, ``*.gro``, ``*.top``, ``*.frcmod``)
+under a key built from the SHA-256 of the mol2 contents, the charge method,
+the atom type set (gaff/gaff2) and the net charge, and copies them back into
+a fresh ``<name>.acpype`` directory on later runs.
+
+    cache = ParameterCache()
+    acpype_dir, hit = cache.get_or_create(mol2, work_dir, build, "bcc", "gaff2")
+
+``build`` runs only on a miss.  It runs under an exclusive ``FileLock`` on
+the key, so parallel workers that need the same ligand wait for the first
+one and then restore its result instead of parameterizing it again.
+Entries are staged next to their final location and renamed into place, so
+readers never see a half-written entry.
+
+Cache location: ``$WNS_PARAM_CACHE`` (set it to ``off`` to disable) or
+``<project>/.cache/parameters`` by default.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from file_lock import FileLock
+
+# Bump whenever the stored layout changes so stale entries are ignored.
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "parameters"
+
+CACHED_SUFFIXES = (".itp", ".gro", ".top", ".frcmod")
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Resolve the cache directory, or None when disabled."""
+    configured = os.environ.get("WNS_PARAM_CACHE")
+    if configured is None:
+        return DEFAULT_CACHE_DIR
+    if configured.strip().lower() in ("", "0", "off", "none", "false"):
+        return None
+    return Path(configured)
+
+
+def parameter_key(mol2: Path, charge_method: str = "bcc", atom_type: str = "gaff2",
+                  net_charge: int = 0) -> str:
+    """Cache key of one parameterization: mol2 contents plus the options that change the output."""
+    sha = hashlib.sha256(Path(mol2).read_bytes())
+    sha.update(json.dumps([CACHE_VERSION, charge_method.lower(), atom_type.lower(), int(net_charge)]).encode())
+    return sha.hexdigest()
+
+
+class ParameterCache:
+    def __init__(self, cache_dir: Optional[Path] = None, lock_timeout: Optional[float] = None) -> None:
+        """
+        Args:
+            cache_dir: Cache root (default: ``get_cache_dir()``).
+            lock_timeout: Seconds to wait for another worker building the same
+                key before raising ``LockTimeout`` (None waits forever).
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else get_cache_dir()
+        self.lock_timeout = lock_timeout
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    def entry(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """The complete entry for ``key``, or None."""
+        if not self.enabled:
+            return None
+        entry = self.entry(key)
+        return entry if (entry / "meta.json").exists() else None
+
+    def restore(self, key: str, target_dir: Path) -> Optional[Path]:
+        """Copy the cached files into ``target_dir`` (created); None on a miss."""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        target_dir = Path(target_dir)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for name in json.loads((entry / "meta.json").read_text(encoding="utf-8"))["files"]:
+            shutil.copy2(entry / name, target_dir / name)
+        return target_dir
+
+    def store(self, key: str, source_dir: Path, info: Optional[dict] = None) -> Path:
+        """Publish the parameter files of ``source_dir`` under ``key``."""
+        files = sorted(path for path in Path(source_dir).iterdir()
+                       if path.is_file() and path.suffix.lower() in CACHED_SUFFIXES)
+        if not files:
+            raise FileNotFoundError(f"No {'/'.join(CACHED_SUFFIXES)} files in {source_dir} to cache")
+        entry = self.entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+        try:
+            for path in files:
+                shutil.copy2(path, staging / path.name)
+            meta = dict(info or {}, files=[path.name for path in files], source=str(source_dir),
+                        created=datetime.datetime.now().isoformat(timespec="seconds"))
+            (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+            os.replace(staging, entry)
+        except OSError:
+            # An identical entry was published first (only possible without the lock)
+            shutil.rmtree(staging, ignore_errors=True)
+            if self.lookup(key) is None:
+                raise
+        return entry
+
+    def get_or_create(self, mol2: Path, work_dir: Path, build: Callable[[], Path],
+                      charge_method: str = "bcc", atom_type: str = "gaff2",
+                      net_charge: int = 0) -> Tuple[Path, bool]:
+        """Restore ``<mol2 stem>.acpype`` into ``work_dir`` from the cache, or ``build`` it.
+
+        Args:
+            mol2: Ligand mol2 that is parameterized
+            work_dir: Directory the ``.acpype`` output belongs in
+            build: Runs the parameterization and returns its output directory
+            charge_method: Charge method passed to the tool (bcc, gas, ...)
+            atom_type: Atom type set (gaff or gaff2)
+            net_charge: Net molecular charge
+
+        Returns:
+            ``(output_dir, cache_hit)``
+        """
+        if not self.enabled:
+            return Path(build()), False
+        key = parameter_key(mol2, charge_method, atom_type, net_charge)
+        target = Path(work_dir) / f"{Path(mol2).stem}.acpype"
+        restored = self.restore(key, target)
+        if restored is not None:
+            return restored, True
+        with FileLock(self.entry(key).with_suffix(".lock"), timeout=self.lock_timeout):
+            # Another worker may have finished while we waited for the lock
+            restored = self.restore(key, target)
+            if restored is not None:
+                return restored, True
+            output_dir = Path(build())
+            self.store(key, output_dir, {"mol2": Path(mol2).name, "charge_method": charge_method,
+                                         "atom_type": atom_type, "net_charge": net_charge})
+        return output_dir, False
+
+    def keys(self) -> List[str]:
+        if not self.enabled or not self.cache_dir.exists():
+            return []
+        return sorted(path.name for path in self.cache_dir.iterdir() if (path / "meta.json").exists())
@@ -0,0 +1,180 @@
+"""Remove near-duplicate docked poses before complex building.
+
+Independent seeds often converge on the same surface site, and the 2 Å clash
+filter only drops a pose once it overlaps an accepted one; near-duplicates
+with a slight offset still go through masking, topology and MD.  Poses of
+the same ligand (same heavy-atom sequence) are compared by in-place
+heavy-atom RMSD - no superposition, so the same shape at another site is not
+a duplicate - and clustered greedily in energy order: the lowest-energy
+unassigned pose becomes a representative and takes every unassigned pose
+within ``cutoff`` Å, which is how AutoDock clusters its own runs.
+
+With NumPy the RMSDs come from ``|a|^2 + |b|^2 - 2 a.b`` on the flattened
+coordinates, one matrix product per block of rows, so thousands of poses
+never need the full n x n matrix in memory; rows and columns of poses that
+an earlier block already assigned are left out of the product.  Without NumPy the same loop
+runs in pure Python.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ligand_topology import element_of
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_RMSD_CUTOFF = 2.0
+BLOCK_SIZE = 512
+
+Coord = Tuple[float, float, float]
+
+# AutoDock writes large (clashing) energies in e-notation, e.g. +1.07e+03
+ENERGY_NUMBER = r"[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?"
+FREE_ENERGY = re.compile(rf"Estimated Free Energy of Binding\s*=\s*({ENERGY_NUMBER})")
+
+_ENERGY_PATTERNS = (
+    FREE_ENERGY,
+    re.compile(rf"VINA RESULT:\s*({ENERGY_NUMBER})"),
+)
+
+
+def read_pose(path: Path) -> Tuple[List[str], List[Coord], Optional[float]]:
+    """Heavy-atom elements and coordinates (Å) of the first model, plus its docking energy if recorded."""
+    elements: List[str] = []
+    coords: List[Coord] = []
+    energy = None
+    pdbqt = Path(path).suffix.lower() == ".pdbqt"
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if line.startswith("ENDMDL"):
+            break
+        if line.startswith(("ATOM", "HETATM")):
+            element = element_of(line[12:16], line[77:79] if pdbqt else line[76:78])
+            if element != "H":
+                elements.append(element)
+                coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+        elif energy is None and line.startswith(("REMARK", "USER")):
+            for pattern in _ENERGY_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    energy = float(match.group(1))
+                    break
+    return elements, coords, energy
+
+
+def pairwise_rmsd(coords, block_size: int = BLOCK_SIZE):
+    """All-pairs in-place RMSD of ``coords`` (poses x atoms x 3, same atom order)."""
+    if np is None:
+        return [[rmsd(a, b) for b in coords] for a in coords]
+    flat, norms, n_atoms = _flatten(coords)
+    return np.vstack([_rmsd_block(flat, norms, n_atoms, slice(start, start + block_size), slice(None))
+                      for start in range(0, len(flat), block_size)])
+
+
+def rmsd(a: Sequence[Coord], b: Sequence[Coord]) -> float:
+    """In-place heavy-atom RMSD (Å) of two poses with the same atom order."""
+    return math.sqrt(sum((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+                         for p, q in zip(a, b)) / len(a))
+
+
+def _flatten(coords):
+    array = np.asarray(coords, dtype=float)
+    # Centring on the mean keeps |a|^2 small, so the subtraction in _rmsd_block loses no precision
+    array = array - array.mean(axis=(0, 1))
+    flat = array.reshape(len(array), -1)
+    return flat, np.einsum("ij,ij->i", flat, flat), array.shape[1]
+
+
+def _rmsd_block(flat, norms, n_atoms: int, rows, cols):
+    squared = norms[rows][:, None] + norms[cols][None, :] - 2.0 * (flat[rows] @ flat[cols].T)
+    return np.sqrt(np.clip(squared, 0.0, None) / n_atoms)
+
+
+def cluster_poses(coords, energies: Optional[Sequence[Optional[float]]] = None,
+                  cutoff: float = DEFAULT_RMSD_CUTOFF, block_size: int = BLOCK_SIZE) -> List[List[int]]:
+    """Greedy RMSD clustering in energy order.
+
+    Args:
+        coords: Poses x atoms x 3 heavy-atom coordinates (Å), same atom order
+        energies: Docking energy of each pose (None sorts last); input order without it
+        cutoff: Poses within this RMSD (Å) of a representative join its cluster
+        block_size: Rows of the RMSD matrix computed per matrix product
+
+    Returns:
+        Clusters as lists of pose indices, representative first, ordered by
+        the representatives' energies.
+    """
+    n_poses = len(coords)
+    if not n_poses:
+        return []
+    if energies is None:
+        energies = [None] * n_poses
+    order = sorted(range(n_poses), key=lambda index: (energies[index] is None, energies[index] or 0.0, index))
+    owner = [-1] * n_poses  # position in ``order`` of each pose's representative
+    clusters: List[List[int]] = []
+
+    if np is None:
+        ordered = [coords[index] for index in order]
+        for position in range(n_poses):
+            if owner[position] >= 0:
+                continue
+            members = [other for other in range(position, n_poses)
+                       if owner[other] < 0 and rmsd(ordered[position], ordered[other]) <= cutoff]
+            for other in members:
+                owner[other] = position
+            clusters.append([order[other] for other in members])
+        return clusters
+
+    flat, norms, n_atoms = _flatten([coords[index] for index in order])
+    owner = np.full(n_poses, -1)
+    for start in range(0, n_poses, block_size):
+        # Poses already claimed can neither lead nor join a cluster: skip their rows and columns
+        rows = np.arange(start, min(start + block_size, n_poses))
+        rows = rows[owner[rows] < 0]
+        if not rows.size:
+            continue
+        cols = np.flatnonzero(owner < 0)
+        close = _rmsd_block(flat, norms, n_atoms, rows, cols) <= cutoff
+        for row, position in enumerate(rows.tolist()):
+            if owner[position] >= 0:
+                continue
+            members = cols[close[row] & (owner[cols] < 0)]
+            owner[members] = position
+            clusters.append([order[other] for other in members.tolist()])
+    return clusters
+
+
+def deduplicate_pose_files(paths: Sequence[Path], cutoff: float = DEFAULT_RMSD_CUTOFF
+                           ) -> Tuple[List[Path], List[List[Path]]]:
+    """Keep the lowest-energy pose of every RMSD cluster.
+
+    Poses are only compared with poses of the same ligand (same heavy-atom
+    element sequence); files without heavy atoms are kept as they are.
+
+    Returns:
+        ``(kept, clusters)``: the representatives in input order and every
+        cluster (representative first).
+    """
+    paths = [Path(path) for path in paths]
+    by_topology: Dict[Tuple[str, ...], List[int]] = {}
+    poses = [read_pose(path) for path in paths]
+    kept_indices = []
+    for index, (elements, _, _) in enumerate(poses):
+        if elements:
+            by_topology.setdefault(tuple(elements), []).append(index)
+        else:
+            kept_indices.append(index)
+
+    clusters: List[List[Path]] = []
+    for members in by_topology.values():
+        for cluster in cluster_poses([poses[index][1] for index in members],
+                                     [poses[index][2] for index in members], cutoff):
+            kept_indices.append(members[cluster[0]])
+            clusters.append([paths[members[position]] for position in cluster])
+    return [paths[index] for index in sorted(kept_indices)], clusters
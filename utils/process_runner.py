@@ -0,0 +1,473 @@
+"""Asyncio process layer: external tools with per-job logs, live progress and clean cancellation.
+
+Every tool the drivers start (``autogrid4``, ``autodock4``, ``gmx mdrun`` ...)
+runs on one asyncio event loop in a background thread.  Any number of them,
+started from the scheduler's worker threads or from a serial driver, share
+that loop instead of blocking in ``subprocess.run``::
+
+    from process_runner import run_process
+
+    job = run_process(["autodock4", "-p", "dock.dpf", "-l", "dock.dlg"], cwd=work_dir,
+                      name="autodock_101", tail=[work_dir / "dock.dlg"])
+    if job.returncode != 0:
+        raise RuntimeError(f"autodock4 failed, see {job.log_path}")
+
+* stdout and stderr are streamed into ``<cwd>/logs/<name>.log`` (or
+  ``log_path``) as they arrive;
+* their lines, and the lines appended to the ``tail`` files (autodock4 writes
+  its progress to the DLG, mdrun to ``<deffnm>.log``), feed a progress
+  parser: GA run, generation and evaluations for autodock4; step, total
+  steps and ns/day for ``gmx mdrun``;
+* with ``WNS_PROGRESS=1`` (the default when stderr is a terminal) one status
+  line of the running jobs is redrawn every second; ``WNS_PROGRESS=0``
+  turns it off, and on a non-terminal it is printed every ``LOG_INTERVAL``
+  seconds instead;
+* a JSON status file per job (``<name>.status.json`` next to the log, or
+  ``$WNS_STATUS_DIR/<name>.json``) is refreshed every ``STATUS_INTERVAL``
+  seconds with its state, progress, throughput and estimated completion
+  time (see ``telemetry.py``), for monitoring to read;
+* every tool starts in its own process group.  Ctrl-C in a thread waiting
+  in ``run_process``, ``cancel_all`` and interpreter exit stop each group
+  with SIGTERM (mdrun then writes a checkpoint), and with SIGKILL after
+  ``TERMINATE_GRACE`` seconds.
+
+Finished jobs are recorded in ``METRICS``: wall time, return code, CPU time
+and peak RSS (the tool is reaped with ``os.wait4`` in a thread, so its own
+rusage is known), and the bytes written to its ``outputs`` (default: the
+``tail`` files).  On Windows only wall time and output bytes are recorded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from run_metrics import METRICS, bytes_written, output_snapshot, tool_label
+from telemetry import (LINE_BREAK, STATUS_INTERVAL, FileTail, ProgressParser, Telemetry, format_eta,
+                       progress_parser, split_lines, write_status)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINATE_GRACE = 10.0
+TAIL_INTERVAL = 0.5
+REFRESH_INTERVAL = 1.0
+LOG_INTERVAL = 30.0
+READ_SIZE = 1 << 16
+# Log lines shown when a tool fails
+FAILURE_LINES = 20
+
+
+class ProcessCancelled(RuntimeError):
+    """The tool was stopped by ``cancel_all`` (or Ctrl-C) before it finished."""
+
+
+class ProcessJob:
+    def __init__(self, name: str, cmd: Sequence[str], cwd: Optional[Path], log_path: Path,
+                 tail: Iterable[Path] = (), progress: Optional[ProgressParser] = None,
+                 status_path: Optional[Path] = None, outputs: Optional[Iterable[Path]] = None) -> None:
+        """
+        Args:
+            name: Job name, shown in the status line and used for the log file.
+            cmd: Command and arguments.
+            cwd: Working directory of the tool.
+            log_path: File receiving the tool's stdout and stderr.
+            tail: Files the tool writes its progress to; followed while it runs.
+            progress: Output parser (default: chosen from the command).
+            status_path: JSON status file refreshed while the tool runs
+                (default: ``<log_path without .log>.status.json``).
+            outputs: Files or directories the tool writes, measured for the
+                output bytes metric (default: the ``tail`` files).
+        """
+        self.name = name
+        self.cmd = [str(part) for part in cmd]
+        self.cwd = Path(cwd) if cwd else None
+        self.log_path = Path(log_path)
+        self.tail = [Path(path) for path in tail]
+        self.outputs = self.tail if outputs is None else [Path(path) for path in outputs]
+        self.progress = progress or progress_parser(self.cmd)
+        self.telemetry = Telemetry(self.progress)
+        self.status_path = Path(status_path) if status_path else self.log_path.with_suffix(".status.json")
+        self.state = PENDING
+        self.returncode: Optional[int] = None
+        # rusage of the finished tool (None on Windows or before it exits)
+        self.usage: Any = None
+        self.pid: Optional[int] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Tail files are only read once the tool modifies them, so a stale
+        # file from an earlier run is not parsed
+        self._tails = [FileTail(path) for path in self.tail]
+
+    @property
+    def wall_s(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def describe(self) -> str:
+        """``name`` plus the parsed progress, e.g. ``autodock_101 run 3/10 gen 13500/27000 (25%) ETA 4m10s``."""
+        text = " ".join(part for part in (self.name, self.progress.describe()) if part)
+        fraction = self.progress.fraction
+        if fraction is not None:
+            text += f" ({fraction:.0%})"
+        eta = format_eta(self.telemetry.eta_s) if self.state == RUNNING else ""
+        return f"{text} {eta}" if eta else text
+
+    def log_tail(self, lines: int = FAILURE_LINES) -> List[str]:
+        """Last lines of the job's log."""
+        try:
+            data = self.log_path.read_bytes()
+        except OSError:
+            return []
+        text = [line.decode("utf-8", "replace") for line in LINE_BREAK.split(data) if line.strip()]
+        return text[-lines:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """State, progress and completion estimate (the content of the status file)."""
+        record = {"name": self.name, "state": self.state, "returncode": self.returncode, "pid": self.pid,
+                  "command": self.cmd, "started": self.started, "finished": self.finished,
+                  "wall_s": round(self.wall_s, 3) if self.wall_s is not None else None, "log": str(self.log_path)}
+        record.update(self.telemetry.snapshot())
+        return record
+
+    def __repr__(self) -> str:
+        return f"ProcessJob({self.name!r}, state={self.state}, returncode={self.returncode})"
+
+
+def _feed(job: ProcessJob, lines: List[str]) -> None:
+    for line in lines:
+        job.progress.feed(line)
+
+
+def _display_default() -> bool:
+    setting = os.environ.get("WNS_PROGRESS", "").strip().lower()
+    if setting:
+        return setting not in ("0", "no", "off", "false")
+    return sys.stderr.isatty()
+
+
+if os.name == "posix":
+    _GROUP_KWARGS: Dict[str, Any] = {"start_new_session": True}
+else:  # pragma: no cover - Windows
+    _GROUP_KWARGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def _signal_group(pid: int, kill: bool) -> None:
+    """SIGTERM (or SIGKILL) the process group led by ``pid``."""
+    try:
+        if os.name == "posix":
+            os.killpg(pid, signal.SIGKILL if kill else signal.SIGTERM)
+        else:  # pragma: no cover - Windows: taskkill stops the whole tree
+            subprocess.run(["taskkill", "/T", "/PID", str(pid)] + (["/F"] if kill else []),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _spawn(job: ProcessJob) -> tuple:
+    """Start the job's tool; returns ``(pid, stdout, stderr, exited, transports)``.
+
+    ``exited`` resolves to ``(returncode, rusage)``.  On POSIX the tool is a
+    plain ``Popen`` reaped by ``os.wait4`` in a thread (asyncio's child
+    watcher would reap it and drop the rusage); its pipes are read through
+    the event loop.  Windows uses asyncio's own subprocesses, without rusage.
+    """
+    kwargs = dict(cwd=str(job.cwd) if job.cwd else None, stdin=subprocess.DEVNULL,
+                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_GROUP_KWARGS)
+    if not hasattr(os, "wait4"):  # pragma: no cover - Windows
+        proc = await asyncio.create_subprocess_exec(*job.cmd, **kwargs)
+
+        async def wait() -> tuple:
+            return await proc.wait(), None
+
+        return proc.pid, proc.stdout, proc.stderr, asyncio.ensure_future(wait()), []
+
+    loop = asyncio.get_running_loop()
+    proc = subprocess.Popen(job.cmd, **kwargs)
+    exited = loop.create_future()
+
+    def reap() -> None:
+        _, status, usage = os.wait4(proc.pid, 0)
+        # Set the return code so Popen never waits for the reaped pid itself
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        with contextlib.suppress(RuntimeError):  # the loop was shut down meanwhile
+            loop.call_soon_threadsafe(exited.set_result, (proc.returncode, usage))
+
+    threading.Thread(target=reap, name=f"reap-{job.name}", daemon=True).start()
+    readers, transports = [], []
+    for pipe in (proc.stdout, proc.stderr):
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda reader=reader: asyncio.StreamReaderProtocol(reader), pipe)
+        readers.append(reader)
+        transports.append(transport)
+    return proc.pid, readers[0], readers[1], exited, transports
+
+
+class ProcessRunner:
+    def __init__(self, display: Optional[bool] = None, refresh: float = REFRESH_INTERVAL,
+                 grace: float = TERMINATE_GRACE, stream=None, status_interval: float = STATUS_INTERVAL,
+                 status_dir: Optional[Path] = None) -> None:
+        """
+        Args:
+            display: Show the status line (default: ``WNS_PROGRESS``, else
+                whether stderr is a terminal).
+            refresh: Seconds between status line updates.
+            grace: Seconds a tool gets between SIGTERM and SIGKILL.
+            stream: Where the status line goes (default: stderr).
+            status_interval: Seconds between status file refreshes.
+            status_dir: Write every job's status file as ``<status_dir>/<name>.json``
+                (default: ``WNS_STATUS_DIR``, else next to the job's log).
+        """
+        self.display = _display_default() if display is None else display
+        self.refresh = refresh
+        self.grace = grace
+        self.status_interval = status_interval
+        status_dir = status_dir or os.environ.get("WNS_STATUS_DIR")
+        self.status_dir = Path(status_dir) if status_dir else None
+        self.stream = stream
+        self.jobs: List[ProcessJob] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._display_task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Thread-safe entry points
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="wns-processes", daemon=True).start()
+                self._loop = loop
+                atexit.register(self.shutdown)
+            return self._loop
+
+    def submit(self, cmd: Sequence[str], cwd: Optional[Path] = None, name: Optional[str] = None,
+               log_path: Optional[Path] = None, tail: Iterable[Path] = (),
+               progress: Optional[ProgressParser] = None, outputs: Optional[Iterable[Path]] = None) -> tuple:
+        """Start ``cmd`` without waiting; returns ``(job, concurrent.futures.Future)``."""
+        name = name or tool_label(cmd).replace(" ", "_")
+        if log_path is None:
+            log_path = Path(cwd or ".") / "logs" / f"{name}.log"
+        status_path = self.status_dir / f"{name}.json" if self.status_dir else None
+        job = ProcessJob(name, cmd, cwd, log_path, tail, progress, status_path, outputs)
+        loop = self._ensure_loop()
+        with self._lock:
+            self.jobs.append(job)
+        return job, asyncio.run_coroutine_threadsafe(self._run(job), loop)
+
+    def run(self, cmd: Sequence[str], cwd: Optional[Path] = None, name: Optional[str] = None,
+            log_path: Optional[Path] = None, tail: Iterable[Path] = (), check: bool = False,
+            progress: Optional[ProgressParser] = None, outputs: Optional[Iterable[Path]] = None) -> ProcessJob:
+        """Run ``cmd`` and wait for it; Ctrl-C while waiting stops every running tool."""
+        job, future = self.submit(cmd, cwd, name, log_path, tail, progress, outputs)
+        try:
+            future.result()
+        except KeyboardInterrupt:
+            self.cancel_all()
+            raise
+        except concurrent.futures.CancelledError as exc:
+            raise ProcessCancelled(f"{job.name} was cancelled (log: {job.log_path})") from exc
+        if check and job.returncode != 0:
+            raise subprocess.CalledProcessError(job.returncode, job.cmd)
+        return job
+
+    def cancel_all(self) -> None:
+        """Stop every running tool (SIGTERM, then SIGKILL after ``grace``) and wait for them."""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self._cancel_all(), loop)
+        try:
+            future.result(timeout=self.grace + 5.0)
+        except concurrent.futures.TimeoutError:
+            pass
+
+    def shutdown(self) -> None:
+        """Stop the running tools and the event loop (registered with ``atexit``)."""
+        self.cancel_all()
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """``to_dict`` of every job started so far."""
+        with self._lock:
+            return [job.to_dict() for job in self.jobs]
+
+    def status_line(self) -> str:
+        with self._lock:
+            jobs = list(self.jobs)
+        counts = {state: sum(job.state == state for job in jobs) for state in (RUNNING, DONE, FAILED)}
+        running = sorted((job for job in jobs if job.state == RUNNING),
+                         key=lambda job: job.progress.fraction if job.progress.fraction is not None else -1.0)
+        parts = [f"[wns] {counts[RUNNING]} running, {counts[DONE]} done, {counts[FAILED]} failed"]
+        parts.extend(job.describe() for job in running)
+        return " | ".join(parts)
+
+    # ------------------------------------------------------------------
+    # Event loop side
+    # ------------------------------------------------------------------
+    async def _run(self, job: ProcessJob) -> None:
+        task = asyncio.current_task()
+        self._tasks[job.name + f"#{id(job)}"] = task
+        job.log_path.parent.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        before = await loop.run_in_executor(None, output_snapshot, job.outputs)
+        try:
+            with job.log_path.open("wb") as log:
+                try:
+                    pid, stdout, stderr, exited, transports = await _spawn(job)
+                except OSError as exc:
+                    log.write(f"{exc}\n".encode())
+                    job.state = FAILED
+                    raise
+                job.pid = pid
+                job.state = RUNNING
+                job.started = time.time()
+                self._start_display()
+                followers = [asyncio.ensure_future(self._follow(job, tail)) for tail in job._tails]
+                followers.append(asyncio.ensure_future(self._report(job)))
+                try:
+                    await asyncio.gather(self._pump(job, stdout, log), self._pump(job, stderr, log))
+                    job.returncode, job.usage = await asyncio.shield(exited)
+                except asyncio.CancelledError:
+                    job.state = CANCELLED
+                    await self._terminate(pid, exited)
+                    job.returncode, job.usage = exited.result()
+                    raise
+                finally:
+                    job.finished = time.time()
+                    for transport in transports:
+                        transport.close()
+                    for follower in followers:
+                        follower.cancel()
+                    await asyncio.gather(*followers, return_exceptions=True)
+            job.state = DONE if job.returncode == 0 else FAILED
+            job.telemetry.sample()
+            if job.state == FAILED:
+                self._write(f"{job.name} failed with exit code {job.returncode}; last lines of {job.log_path}:\n"
+                            + "".join(f"    {line}\n" for line in job.log_tail()))
+        finally:
+            self._tasks.pop(job.name + f"#{id(job)}", None)
+            if job.started is not None:
+                self._write_status(job)
+            if not self._tasks:
+                self._stop_display()
+            if job.started is not None:
+                after = await loop.run_in_executor(None, output_snapshot, job.outputs)
+                METRICS.record_tool(tool_label(job.cmd), job.returncode if job.returncode is not None else -1,
+                                    job.wall_s or 0.0, bytes_written(before, after), job.usage)
+
+    async def _pump(self, job: ProcessJob, stream: asyncio.StreamReader, log) -> None:
+        pending = b""
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            log.write(chunk)
+            log.flush()
+            lines, pending = split_lines(pending + chunk)
+            _feed(job, lines)
+        if pending:
+            job.progress.feed(pending.decode("utf-8", "replace"))
+
+    async def _follow(self, job: ProcessJob, tail: FileTail) -> None:
+        try:
+            while True:
+                _feed(job, tail.read())
+                await asyncio.sleep(TAIL_INTERVAL)
+        finally:
+            _feed(job, tail.flush())
+
+    async def _report(self, job: ProcessJob) -> None:
+        """Sample the job's progress and refresh its status file until cancelled."""
+        last_write = 0.0
+        while True:
+            job.telemetry.sample()
+            if time.time() - last_write >= self.status_interval:
+                self._write_status(job)
+                last_write = time.time()
+            await asyncio.sleep(min(TAIL_INTERVAL, self.status_interval))
+
+    @staticmethod
+    def _write_status(job: ProcessJob) -> None:
+        try:
+            write_status(job.status_path, job.to_dict())
+        except OSError as exc:
+            print(f"Warning: could not write {job.status_path}: {exc}", file=sys.stderr)
+
+    async def _terminate(self, pid: int, exited: asyncio.Future) -> None:
+        if exited.done():
+            return
+        _signal_group(pid, kill=False)
+        try:
+            await asyncio.wait_for(asyncio.shield(exited), self.grace)
+        except asyncio.TimeoutError:
+            _signal_group(pid, kill=True)
+            await exited
+
+    async def _cancel_all(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._stop_display()
+
+    def _start_display(self) -> None:
+        if self.display and (self._display_task is None or self._display_task.done()):
+            self._display_task = asyncio.ensure_future(self._show_status())
+
+    def _stop_display(self) -> None:
+        """Cancel the status line updates and print the final counts."""
+        if self._display_task is None or self._display_task.done():
+            return
+        self._display_task.cancel()
+        self._write(self.status_line() + "\n")
+
+    async def _show_status(self) -> None:
+        stream = self.stream or sys.stderr
+        interactive = hasattr(stream, "isatty") and stream.isatty()
+        last_print = time.time()
+        while True:
+            line = self.status_line()
+            if interactive:
+                width = shutil.get_terminal_size().columns - 1
+                stream.write("\r\x1b[K" + line[:width])
+                stream.flush()
+            elif time.time() - last_print >= LOG_INTERVAL:
+                stream.write(line + "\n")
+                stream.flush()
+                last_print = time.time()
+            await asyncio.sleep(self.refresh)
+
+    def _write(self, text: str) -> None:
+        stream = self.stream or sys.stderr
+        if self.display and hasattr(stream, "isatty") and stream.isatty():
+            text = "\r\x1b[K" + text
+        stream.write(text)
+        stream.flush()
+
+
+RUNNER = ProcessRunner()
+
+
+def run_process(cmd: Sequence[str], **kwargs: Any) -> ProcessJob:
+    """``ProcessRunner.run`` on the process-wide ``RUNNER``."""
+    return RUNNER.run(cmd, **kwargs)
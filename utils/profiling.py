@@ -0,0 +1,233 @@
+"""Opt-in profiling of the Python hot paths (DLG parsing, masking, clash checks,
+H-bond search, GRO parsing, scoring).
+
+Enable it with ``WNS_PROFILE`` or the ``--profile`` option of the scripts:
+
+* ``WNS_PROFILE=1`` (or ``timers``): functions decorated with ``@profiled``
+  record call counts and wall time; the table is printed at exit and written
+  to ``<profile dir>/profile_timers-<pid>.json``.
+* ``WNS_PROFILE=cprofile``: additionally runs every pipeline stage (the
+  ``run_metrics`` stages) under cProfile and writes ``<stage>.pstats`` plus a
+  collapsed-stack ``<stage>.collapsed`` file (flamegraph.pl / speedscope input).
+
+``WNS_PROFILE_DIR`` chooses the output directory (default ``./profile``).
+Both variables are inherited by child processes, so stages launched as
+subprocesses are profiled as well.  When disabled, a decorated call costs a
+single flag check.
+"""
+
+from __future__ import annotations
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+_MODES = {"1": "timers", "true": "timers", "on": "timers", "timers": "timers", "cprofile": "cprofile"}
+
+_mode: Optional[str] = _MODES.get(os.environ.get("WNS_PROFILE", "").strip().lower())
+_stats: Dict[str, List[float]] = {}  # name -> [calls, total_s, max_s]
+_stats_lock = threading.Lock()
+_active_profile: Optional[cProfile.Profile] = None
+_report_registered = False
+
+
+def enabled() -> bool:
+    return _mode is not None
+
+
+def profile_dir() -> Path:
+    return Path(os.environ.get("WNS_PROFILE_DIR") or "profile")
+
+
+def enable(mode: str = "timers", output_dir: Optional[Path] = None) -> None:
+    """Turn profiling on for this process and the subprocesses it starts.
+
+    Args:
+        mode: ``timers`` or ``cprofile``.
+        output_dir: Directory for the reports (sets ``WNS_PROFILE_DIR``).
+    """
+    global _mode
+    _mode = _MODES.get(mode, "timers")
+    os.environ["WNS_PROFILE"] = _mode
+    if output_dir is not None and not os.environ.get("WNS_PROFILE_DIR"):
+        os.environ["WNS_PROFILE_DIR"] = str(Path(output_dir).resolve())
+    _register_report()
+
+
+def add_profile_argument(parser) -> None:
+    """Add the shared ``--profile [timers|cprofile]`` option to an argparse parser."""
+    parser.add_argument("--profile", nargs="?", const="timers", choices=["timers", "cprofile"],
+                        help="Profile hot functions (timers) or whole stages (cprofile); "
+                             "same as WNS_PROFILE")
+
+
+# ----------------------------------------------------------------------
+# Function timers
+# ----------------------------------------------------------------------
+def profiled(func: Callable = None, *, name: Optional[str] = None):
+    """Decorator recording call count and wall time of ``func`` when enabled."""
+    if func is None:
+        return functools.partial(profiled, name=name)
+    label = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _mode is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _stats_lock:
+                entry = _stats.get(label)
+                if entry is None:
+                    _stats[label] = [1, elapsed, elapsed]
+                else:
+                    entry[0] += 1
+                    entry[1] += elapsed
+                    if elapsed > entry[2]:
+                        entry[2] = elapsed
+
+    # cProfile keys functions by code object; without a distinct name every
+    # decorated function would collapse into one "wrapper" node.
+    wrapper.__code__ = wrapper.__code__.replace(co_name=f"profiled<{func.__name__}>")
+    return wrapper
+
+
+def timer_stats() -> Dict[str, Dict[str, float]]:
+    with _stats_lock:
+        return {
+            label: {"calls": int(calls), "total_s": round(total, 6),
+                    "mean_ms": round(total / calls * 1000, 4), "max_ms": round(peak * 1000, 4)}
+            for label, (calls, total, peak) in _stats.items()
+        }
+
+
+def timer_table() -> str:
+    rows = sorted(timer_stats().items(), key=lambda item: item[1]["total_s"], reverse=True)
+    header = f"{'function':<52} {'calls':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"
+    lines = [header, "-" * len(header)]
+    for label, stat in rows:
+        lines.append(f"{label[-52:]:<52} {stat['calls']:>8} {stat['total_s']:>10.3f} "
+                     f"{stat['mean_ms']:>10.3f} {stat['max_ms']:>10.3f}")
+    return "\n".join(lines)
+
+
+def write_report() -> Optional[Path]:
+    """Print the timer table and write it as JSON into the profile directory."""
+    stats = timer_stats()
+    if not stats:
+        return None
+    out_dir = profile_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"profile_timers-{os.getpid()}.json"
+    path.write_text(json.dumps(stats, indent=2), encoding="utf-8")
+    print("\n=== Profile (hot functions) ===")
+    print(timer_table())
+    print(f"Profile written to {path}")
+    return path
+
+
+def _register_report() -> None:
+    global _report_registered
+    if not _report_registered:
+        atexit.register(write_report)
+        _report_registered = True
+
+
+if _mode is not None:
+    _register_report()
+
+
+# ----------------------------------------------------------------------
+# Stage profiles
+# ----------------------------------------------------------------------
+def start_stage_profile() -> Optional[cProfile.Profile]:
+    """Start cProfile for a stage (only in ``cprofile`` mode, outermost stage only)."""
+    global _active_profile
+    if _mode != "cprofile" or _active_profile is not None:
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # another profiler is already active
+        return None
+    _active_profile = profile
+    return profile
+
+
+def finish_stage_profile(profile: Optional[cProfile.Profile], stage: str) -> Optional[Path]:
+    """Stop a stage profile and write ``<stage>.pstats`` and ``<stage>.collapsed``."""
+    global _active_profile
+    if profile is None:
+        return None
+    profile.disable()
+    _active_profile = None
+    out_dir = profile_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base = out_dir / re.sub(r"[^\w.-]+", "_", stage)
+    pstats_path = base.with_name(base.name + ".pstats")
+    profile.dump_stats(str(pstats_path))
+    write_collapsed(pstats.Stats(profile), base.with_name(base.name + ".collapsed"))
+    return pstats_path
+
+
+def _frame_name(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in
+    return f"{Path(filename).stem}:{name}:{line}"
+
+
+def write_collapsed(stats: pstats.Stats, path: Path) -> None:
+    """Write approximate collapsed stacks (``a;b;c <microseconds>``) from a profile.
+
+    cProfile only keeps caller/callee edges, so a function's time is split over
+    its call paths in proportion to the time each caller spent in it.
+    """
+    raw: Dict[Tuple, Tuple] = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    # Roots are entered from frames that were already running when profiling
+    # started (so their caller was never recorded): no callers, or callers
+    # that account for only part of their time.
+    roots = []
+    for func, (_, _, _, ct, callers) in raw.items():
+        attributed = sum(edge[3] for edge in callers.values())
+        if not callers:
+            roots.append((func, 1.0))
+        elif ct > 0 and ct - attributed > 1e-6:
+            roots.append((func, (ct - attributed) / ct))
+    totals: Dict[str, float] = {}
+
+    def walk(func: Tuple, path: List[str], share: float, seen: frozenset) -> None:
+        cc, nc, tt, ct, _ = raw[func]
+        path = path + [_frame_name(func)]
+        key = ";".join(path)
+        totals[key] = totals.get(key, 0.0) + tt * share
+        for callee, edge_ct in callees.get(func, []):
+            if callee in seen or callee not in raw:
+                continue
+            callee_ct = raw[callee][3]
+            if callee_ct <= 0 or edge_ct * share < 1e-6:
+                continue  # drop sub-microsecond paths to keep the output small
+            walk(callee, path, share * edge_ct / callee_ct, seen | {callee})
+
+    for root, share in roots:
+        walk(root, [], share, frozenset([root]))
+    with Path(path).open("w", encoding="utf-8") as handle:
+        for key, seconds in sorted(totals.items()):
+            micros = int(round(seconds * 1e6))
+            if micros > 0:
+                handle.write(f"{key} {micros}\n")
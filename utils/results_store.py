@@ -0,0 +1,241 @@
+"""Append-only SQLite store for docking, scoring, H-bond and washing results.
+
+Every row is keyed by ``(run_id, cycle, seed, ligand)`` so results from
+hundreds of runs can be compared with indexed queries instead of re-parsing
+``score_report.json``, ``hbond_analysis.csv`` and printed displacement logs.
+Rows are only ever inserted; re-running a stage adds new rows with a new
+``recorded_at`` timestamp rather than rewriting old ones.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+SCHEMA_VERSION = 1
+
+_KEY_COLUMNS = """
+    run_id TEXT NOT NULL,
+    cycle INTEGER,
+    seed INTEGER,
+    ligand TEXT,
+    recorded_at TEXT NOT NULL"""
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    config TEXT,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS poses ({_KEY_COLUMNS},
+    pose_file TEXT,
+    energy REAL,
+    accepted INTEGER,
+    center_x REAL, center_y REAL, center_z REAL,
+    n_atoms INTEGER
+);
+CREATE TABLE IF NOT EXISTS scores ({_KEY_COLUMNS},
+    pose_file TEXT,
+    final_score REAL,
+    binding_energy REAL,
+    hbond_count INTEGER,
+    contact_residues INTEGER,
+    min_distance REAL,
+    ligand_group REAL,
+    protein_group REAL,
+    binding_group REAL,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS hbonds ({_KEY_COLUMNS},
+    cluster_id INTEGER,
+    donor_residue TEXT,
+    donor_atom TEXT,
+    acceptor_residue TEXT,
+    acceptor_atom TEXT,
+    distance REAL,
+    angle REAL,
+    wns_score REAL,
+    e_inter REAL
+);
+CREATE TABLE IF NOT EXISTS displacements ({_KEY_COLUMNS},
+    residue_id INTEGER,
+    displacement REAL,
+    cutoff REAL,
+    washed INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_poses_key ON poses (run_id, cycle, seed, ligand);
+CREATE INDEX IF NOT EXISTS idx_scores_key ON scores (run_id, cycle, seed, ligand);
+CREATE INDEX IF NOT EXISTS idx_scores_final ON scores (final_score);
+CREATE INDEX IF NOT EXISTS idx_hbonds_key ON hbonds (run_id, cycle, seed, ligand);
+CREATE INDEX IF NOT EXISTS idx_hbonds_residue ON hbonds (donor_residue, acceptor_residue);
+CREATE INDEX IF NOT EXISTS idx_displacements_key ON displacements (run_id, cycle, seed, ligand);
+"""
+
+# Packed format written by analyze_hbonds.save_results_to_csv
+HBOND_DETAIL_RE = re.compile(
+    r"(?P<donor_residue>\S+?)\((?P<donor_atom>[^)]*)\)-(?P<acceptor_residue>\S+?)\((?P<acceptor_atom>[^)]*)\)"
+    r"\s+d=(?P<distance>[-\d.]+)Å\s+a=(?P<angle>[-\d.]+)°"
+)
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+class ResultsStore:
+    """Thin append-only wrapper around one SQLite database file."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Shared with scheduler worker threads; every statement holds _lock
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets analysis queries read while a pipeline stage is appending
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _insert(self, table: str, rows: Iterable[Dict[str, Any]]) -> int:
+        rows = list(rows)
+        if not rows:
+            return 0
+        recorded_at = _now()
+        for row in rows:
+            row.setdefault("recorded_at", recorded_at)
+        columns = list(rows[0].keys())
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        with self._lock, self.conn:
+            self.conn.executemany(sql, [tuple(row.get(col) for col in columns) for row in rows])
+        return len(rows)
+
+    def add_run(self, run_id: str, config: Optional[Dict] = None, notes: Optional[str] = None) -> None:
+        """Register a run; registering an existing run id is a no-op."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, created_at, config, notes) VALUES (?, ?, ?, ?)",
+                (run_id, _now(), json.dumps(config) if config is not None else None, notes),
+            )
+
+    def add_pose(self, run_id: str, cycle: Optional[int], seed: Optional[int], ligand: Optional[str],
+                 pose_file: str, accepted: bool, energy: Optional[float] = None,
+                 center: Optional[Sequence[float]] = None, n_atoms: Optional[int] = None) -> None:
+        center = center if center is not None else (None, None, None)
+        self._insert("poses", [{
+            "run_id": run_id, "cycle": cycle, "seed": seed, "ligand": ligand,
+            "pose_file": pose_file, "energy": energy, "accepted": int(accepted),
+            "center_x": center[0], "center_y": center[1], "center_z": center[2],
+            "n_atoms": n_atoms,
+        }])
+
+    def add_score_report(self, run_id: str, report: Dict[str, Any], cycle: Optional[int] = None,
+                         seed: Optional[int] = None, ligand: Optional[str] = None,
+                         pose_file: Optional[str] = None) -> None:
+        """Append one generate_score_report result (the full JSON is kept too)."""
+        binding = report.get("binding", {}).get("raw", {})
+        self._insert("scores", [{
+            "run_id": run_id, "cycle": cycle, "seed": seed, "ligand": ligand,
+            "pose_file": pose_file,
+            "final_score": report.get("final_score"),
+            "binding_energy": binding.get("binding_energy"),
+            "hbond_count": int(binding.get("hbond_count", 0)),
+            "contact_residues": int(binding.get("contact_residues", 0)),
+            "min_distance": binding.get("min_distance"),
+            "ligand_group": report.get("ligand", {}).get("group_score"),
+            "protein_group": report.get("protein", {}).get("group_score"),
+            "binding_group": report.get("binding", {}).get("group_score"),
+            "report": json.dumps(report),
+        }])
+
+    def add_hbond_scores(self, run_id: str, scores: List[Dict[str, Any]],
+                         cycle: Optional[int] = None, seed: Optional[int] = None) -> int:
+        """Append the per-H-bond rows of analyze_hbonds.calculate_wns_score output."""
+        rows = []
+        for item in scores:
+            for detail in item["hbond_details"]:
+                rows.append({
+                    "run_id": run_id, "cycle": cycle, "seed": seed,
+                    "ligand": str(item["ligand_id"]),
+                    "cluster_id": item.get("cluster_id"),
+                    "donor_residue": detail["donor_residue"],
+                    "donor_atom": detail["donor_atom"],
+                    "acceptor_residue": detail["acceptor_residue"],
+                    "acceptor_atom": detail["acceptor_atom"],
+                    "distance": float(detail["distance"]),
+                    "angle": float(detail["angle"]),
+                    "wns_score": item.get("score"),
+                    "e_inter": item.get("e_inter"),
+                })
+        return self._insert("hbonds", rows)
+
+    def add_displacements(self, run_id: str, displacements: Dict[int, float], cutoff: float,
+                          cycle: Optional[int] = None, seed: Optional[int] = None,
+                          ligand: Optional[str] = None) -> int:
+        """Append washing_cycle ligand displacements (Å) for one Shaker cycle."""
+        return self._insert("displacements", [{
+            "run_id": run_id, "cycle": cycle, "seed": seed,
+            "ligand": ligand if ligand is not None else str(res_id),
+            "residue_id": res_id,
+            "displacement": float(disp),
+            "cutoff": float(cutoff),
+            "washed": int(disp > cutoff),
+        } for res_id, disp in displacements.items()])
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+
+def parse_hbond_csv(csv_path: Path) -> List[Dict[str, Any]]:
+    """Read an analyze_hbonds CSV back into calculate_wns_score-shaped records."""
+    import csv
+
+    scores = []
+    with Path(csv_path).open("r", encoding="utf-8", newline="") as handle:
+        for row in csv.DictReader(handle):
+            details = [
+                {key: (float(value) if key in ("distance", "angle") else value)
+                 for key, value in match.groupdict().items()}
+                for match in HBOND_DETAIL_RE.finditer(row.get("hbond_details", ""))
+            ]
+            scores.append({
+                "ligand_id": row["ligand_id"],
+                "cluster_id": int(row["cluster_id"]) if row.get("cluster_id") else None,
+                "score": float(row["score"]),
+                "e_inter": float(row["e_inter"]),
+                "hbond_details": details,
+            })
+    return scores
+
+
+def open_from_config(config: Dict[str, Any], working_dir: Path) -> Optional[ResultsStore]:
+    """Open the store named by ``results.db`` in config.yml, or None if unset."""
+    db = (config.get("results") or {}).get("db")
+    if not db:
+        return None
+    return ResultsStore((Path(working_dir) / db).resolve())
+
+
+def default_run_id(config: Dict[str, Any]) -> str:
+    """``results.run_id`` from config, else a timestamp-based id."""
+    run_id = (config.get("results") or {}).get("run_id")
+    return str(run_id) if run_id else datetime.datetime.now().strftime("run-%Y%m%d-%H%M%S")
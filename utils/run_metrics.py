@@ -0,0 +1,293 @@
+"""Wall time, CPU time, peak memory and output size of stages and tool calls.
+
+``METRICS`` is the process-wide recorder used by the pipeline scripts::
+
+    from run_metrics import METRICS, measured_run
+
+    with METRICS.stage("energy_min", outputs=[work_dir]):
+        measured_run([gmx, "mdrun", "-deffnm", "em"], cwd=work_dir, check=True)
+
+    manifest.add_record(metrics_record_name("gromacs_pipeline"), METRICS.records)
+    METRICS.print_summary()
+
+Tool calls are measured per child process with ``os.wait4`` (CPU and peak RSS
+of exactly that process tree).  Stages report the CPU of this process plus
+all children reaped during the stage, and the peak RSS reached so far.
+Output bytes are the sizes of files created or modified under ``outputs``
+(tool calls default to their ``cwd``); ``output_snapshot`` and
+``bytes_written`` compute them for tools run elsewhere.  Without the
+``resource`` module (Windows) only wall time and output bytes are recorded.
+"""
+
+from __future__ import annotations
+
+import datetime
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import profiling
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ru_maxrss is KiB on Linux and bytes on macOS
+_RSS_TO_MB = 1.0 / (1024 * 1024) if sys.platform == "darwin" else 1.0 / 1024
+
+
+def _walk_files(directory: Path) -> Iterator[Path]:
+    for root, dirnames, names in os.walk(directory):
+        # Skip .git, .cache and other hidden trees
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in names:
+            yield Path(root) / name
+
+
+def output_snapshot(paths: Iterable[Path]) -> Dict[str, Tuple[int, int]]:
+    """Size and mtime of every file in ``paths`` (files, or directories walked recursively)."""
+    snapshot: Dict[str, Tuple[int, int]] = {}
+    for path in paths:
+        path = Path(path)
+        if path.is_file():
+            candidates = [path]
+        elif path.is_dir():
+            candidates = _walk_files(path)
+        else:
+            continue
+        for candidate in candidates:
+            try:
+                stat = candidate.stat()
+            except OSError:
+                continue
+            snapshot[str(candidate)] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def bytes_written(before: Dict[str, Tuple[int, int]], after: Dict[str, Tuple[int, int]]) -> int:
+    """Size of files that are new or were modified between two snapshots."""
+    return sum(size for name, (size, mtime) in after.items()
+               if before.get(name) is None or before[name][1] != mtime)
+
+
+def tool_label(cmd: Sequence[str]) -> str:
+    """Short name of an external command, e.g. ``gmx mdrun`` or ``autodock4``."""
+    parts = [str(part) for part in cmd]
+    if parts and parts[0] == "wsl":
+        parts = parts[1:]
+        if parts[:2] == ["bash", "-lc"] or parts[:2] == ["bash", "-c"]:
+            parts = parts[2].split() if len(parts) > 2 else parts
+    if not parts:
+        return "?"
+    name = Path(parts[0]).name
+    if name.startswith("python") and len(parts) > 1:
+        name = parts[2] if parts[1] == "-m" and len(parts) > 2 else Path(parts[1]).name
+    elif name.startswith("gmx") and len(parts) > 1:
+        name = f"{name} {parts[1]}"
+    return name
+
+
+class RunMetrics:
+    def __init__(self) -> None:
+        self.records: List[Dict[str, Any]] = []
+        self._stages: List[str] = []
+        self._lock = threading.Lock()
+
+    def _add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+    def begin_stage(self, name: str, outputs: Iterable[Path] = ()) -> Dict[str, Any]:
+        """Start measuring a stage; pass the returned token to ``end_stage``."""
+        outputs = list(outputs)
+        self._stages.append(name)
+        return {
+            "name": name,
+            "outputs": outputs,
+            "files": output_snapshot(outputs),
+            "self": resource.getrusage(resource.RUSAGE_SELF) if resource else None,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None,
+            "profile": profiling.start_stage_profile(),
+            "start": time.perf_counter(),
+        }
+
+    def end_stage(self, token: Dict[str, Any], failed: bool = False) -> Dict[str, Any]:
+        if self._stages and self._stages[-1] == token["name"]:
+            self._stages.pop()
+        profiling.finish_stage_profile(token["profile"], token["name"])
+        record: Dict[str, Any] = {
+            "kind": "stage",
+            "name": token["name"],
+            "status": "failed" if failed else "ok",
+            "wall_s": round(time.perf_counter() - token["start"], 3),
+            "cpu_user_s": None,
+            "cpu_sys_s": None,
+            "peak_rss_mb": None,
+            "output_bytes": bytes_written(token["files"], output_snapshot(token["outputs"])),
+        }
+        if resource:
+            self_after = resource.getrusage(resource.RUSAGE_SELF)
+            child_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self_before, child_before = token["self"], token["children"]
+            record["cpu_user_s"] = round(
+                (self_after.ru_utime - self_before.ru_utime)
+                + (child_after.ru_utime - child_before.ru_utime), 3)
+            record["cpu_sys_s"] = round(
+                (self_after.ru_stime - self_before.ru_stime)
+                + (child_after.ru_stime - child_before.ru_stime), 3)
+            record["peak_rss_mb"] = round(
+                max(self_after.ru_maxrss, child_after.ru_maxrss) * _RSS_TO_MB, 1)
+        self._add(record)
+        return record
+
+    @contextmanager
+    def stage(self, name: str, outputs: Iterable[Path] = ()) -> Iterator[None]:
+        """Measure a block of work (in-process code plus the tools it runs)."""
+        token = self.begin_stage(name, outputs)
+        try:
+            yield
+        except BaseException:
+            self.end_stage(token, failed=True)
+            raise
+        self.end_stage(token)
+
+    # ------------------------------------------------------------------
+    # Tool calls
+    # ------------------------------------------------------------------
+    def run(
+        self,
+        cmd: Sequence[str],
+        label: Optional[str] = None,
+        outputs: Optional[Iterable[Path]] = None,
+        input: Optional[Any] = None,
+        capture_output: bool = False,
+        check: bool = False,
+        **popen_kwargs: Any,
+    ) -> subprocess.CompletedProcess:
+        """Drop-in for ``subprocess.run`` that records the call's metrics."""
+        cmd = [str(part) for part in cmd]
+        if outputs is None:
+            outputs = [popen_kwargs["cwd"]] if popen_kwargs.get("cwd") else []
+        outputs = list(outputs)
+        before_files = output_snapshot(outputs)
+        start = time.perf_counter()
+
+        usage = None
+        if hasattr(os, "wait4"):
+            if input is not None:
+                popen_kwargs["stdin"] = subprocess.PIPE
+            if capture_output:
+                popen_kwargs["stdout"] = subprocess.PIPE
+                popen_kwargs["stderr"] = subprocess.PIPE
+            proc = subprocess.Popen(cmd, **popen_kwargs)
+            stdout, stderr = _communicate(proc, input)
+            # Reap the child ourselves so its own rusage is returned
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            returncode = proc.returncode
+        else:
+            result = subprocess.run(cmd, input=input, capture_output=capture_output, **popen_kwargs)
+            stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
+
+        self.record_tool(label or tool_label(cmd), returncode, time.perf_counter() - start,
+                         bytes_written(before_files, output_snapshot(outputs)), usage)
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    def record_tool(self, name: str, returncode: int, wall_s: float, output_bytes: int = 0,
+                    usage: Any = None) -> Dict[str, Any]:
+        """Record a tool call run elsewhere (e.g. by ``process_runner``); ``usage`` is its rusage if known."""
+        record = {
+            "kind": "tool",
+            "name": name,
+            "stage": self._stages[-1] if self._stages else None,
+            "returncode": returncode,
+            "wall_s": round(wall_s, 3),
+            "cpu_user_s": round(usage.ru_utime, 3) if usage else None,
+            "cpu_sys_s": round(usage.ru_stime, 3) if usage else None,
+            "peak_rss_mb": round(usage.ru_maxrss * _RSS_TO_MB, 1) if usage else None,
+            "output_bytes": output_bytes,
+        }
+        self._add(record)
+        return record
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def summary_table(self) -> str:
+        def fmt(value: Any, spec: str) -> str:
+            return "-" if value is None else format(value, spec)
+
+        header = f"{'kind':<6} {'name':<28} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'out MB':>9}"
+        lines = [header, "-" * len(header)]
+        for record in self.records:
+            cpu = None
+            if record["cpu_user_s"] is not None:
+                cpu = record["cpu_user_s"] + record["cpu_sys_s"]
+            name = record["name"] if record["kind"] == "stage" else f"  {record['name']}"
+            lines.append(
+                f"{record['kind']:<6} {name[:28]:<28} {record['wall_s']:>9.2f} {fmt(cpu, '>9.2f')} "
+                f"{fmt(record['peak_rss_mb'], '>9.1f')} {record['output_bytes'] / 1e6:>9.2f}"
+            )
+        return "\n".join(lines)
+
+    def print_summary(self) -> None:
+        if not self.records:
+            return
+        print("\n=== Run metrics ===")
+        print(self.summary_table())
+
+    def clear(self) -> None:
+        with self._lock:
+            self.records.clear()
+
+
+def _communicate(proc: subprocess.Popen, input_data: Any) -> Tuple[Any, Any]:
+    """Feed stdin and drain pipes without letting Popen reap the child."""
+    results: Dict[str, Any] = {"stdout": None, "stderr": None}
+
+    def drain(name: str, stream) -> None:
+        results[name] = stream.read()
+        stream.close()
+
+    threads = [threading.Thread(target=drain, args=(name, getattr(proc, name)), daemon=True)
+               for name in ("stdout", "stderr") if getattr(proc, name) is not None]
+    for thread in threads:
+        thread.start()
+    if proc.stdin is not None:
+        try:
+            if input_data:
+                proc.stdin.write(input_data)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+    for thread in threads:
+        thread.join()
+    return results["stdout"], results["stderr"]
+
+
+def metrics_record_name(script: str) -> str:
+    """Manifest record name for one run of ``script``."""
+    return f"run_metrics_{script}_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+
+METRICS = RunMetrics()
+
+
+def measured_run(cmd: Sequence[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """``subprocess.run`` replacement recording into the process-wide ``METRICS``."""
+    return METRICS.run(cmd, **kwargs)
@@ -0,0 +1,215 @@
+"""Local resource-aware job scheduler for docking seeds and MD runs.
+
+Jobs declare the cores (OpenMP threads) and memory they need.  The scheduler
+starts them in priority order as soon as their dependencies have finished and
+enough cores and memory are free::
+
+    from scheduler import scheduler_from_config
+
+    scheduler = scheduler_from_config(config)
+    grid = scheduler.submit("autogrid", run_autogrid)
+    for seed in seeds:
+        scheduler.submit(f"dock_{seed}", functools.partial(dock, seed), after=[grid])
+    scheduler.submit("mdrun", run_md, cores=8, memory_mb=2000, priority=10)
+    scheduler.run()
+
+Jobs are Python callables executed on worker threads.  They spend their time
+waiting on an external tool (``measured_run``), so the GIL is not a limit.
+A job asking for more cores or memory than the scheduler has is clamped to
+the whole machine, so it still runs, alone.  When a job fails, every job that
+depends on it is skipped and ``run`` raises ``JobError`` once the remaining
+jobs have finished.
+
+Limits come from ``scheduler.cores`` / ``scheduler.memory_mb`` in the config,
+then ``WNS_MAX_CORES`` / ``WNS_MAX_MEMORY_MB``, then the machine (CPU
+affinity and ``MemAvailable``).
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class JobError(RuntimeError):
+    """One or more jobs failed; ``failed`` holds them (skipped dependents are not included)."""
+
+    def __init__(self, failed: List["Job"]) -> None:
+        self.failed = failed
+        details = "; ".join(f"{job.name}: {job.error}" for job in failed)
+        super().__init__(f"{len(failed)} job(s) failed: {details}")
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Any], cores: int, memory_mb: int,
+                 priority: int, after: List[str], order: int) -> None:
+        self.name = name
+        self.func = func
+        self.cores = cores
+        self.memory_mb = memory_mb
+        self.priority = priority
+        self.after = after
+        self.order = order
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.wall_s: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"Job({self.name!r}, cores={self.cores}, status={self.status})"
+
+
+def available_cores() -> int:
+    """Cores this process may use (CPU affinity where supported)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def available_memory_mb() -> Optional[int]:
+    """Currently available memory in MB, or None when it cannot be determined."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class Scheduler:
+    def __init__(self, cores: Optional[int] = None, memory_mb: Optional[int] = None) -> None:
+        self.cores = max(1, int(cores or os.environ.get("WNS_MAX_CORES") or available_cores()))
+        memory = memory_mb or os.environ.get("WNS_MAX_MEMORY_MB") or available_memory_mb()
+        # None: memory is not tracked
+        self.memory_mb = int(memory) if memory else None
+        self.jobs: Dict[str, Job] = {}
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._free_cores = self.cores
+        self._free_memory = self.memory_mb
+
+    def fit_cores(self, requested: Optional[int]) -> int:
+        """Thread count for a job asking for ``requested`` cores (None: all of them)."""
+        if not requested:
+            return self.cores
+        return max(1, min(int(requested), self.cores))
+
+    def submit(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        cores: int = 1,
+        memory_mb: int = 0,
+        priority: int = 0,
+        after: Iterable[Union[str, Job]] = (),
+    ) -> Job:
+        """Queue ``func``; higher ``priority`` starts first among ready jobs.
+
+        Args:
+            name: Unique job name, also used in ``after`` of later jobs
+            func: Callable without arguments; its return value becomes ``job.result``
+            cores: Cores (threads) the job keeps busy
+            memory_mb: Memory the job needs while running
+            priority: Larger values are started before smaller ones
+            after: Jobs (or their names) that must finish successfully first
+        """
+        if name in self.jobs:
+            raise ValueError(f"Duplicate job name: {name}")
+        dependencies = [dep.name if isinstance(dep, Job) else dep for dep in after]
+        for dep in dependencies:
+            if dep not in self.jobs:
+                raise ValueError(f"Job {name} depends on unknown job {dep}")
+        # Oversized requests are clamped so the job can still run on its own
+        cores = self.fit_cores(cores)
+        if self.memory_mb is not None:
+            memory_mb = min(memory_mb, self.memory_mb)
+        job = Job(name, func, cores, memory_mb, priority, dependencies, next(self._order))
+        with self._cond:
+            self.jobs[name] = job
+        return job
+
+    def _ready(self) -> List[Job]:
+        ready = []
+        for job in self.jobs.values():
+            if job.status != PENDING:
+                continue
+            states = [self.jobs[dep].status for dep in job.after]
+            if any(state in (FAILED, SKIPPED) for state in states):
+                job.status = SKIPPED
+            elif all(state == DONE for state in states):
+                ready.append(job)
+        ready.sort(key=lambda job: (-job.priority, job.order))
+        return ready
+
+    def _fits(self, job: Job) -> bool:
+        if job.cores > self._free_cores:
+            return False
+        return self._free_memory is None or job.memory_mb <= self._free_memory
+
+    def _execute(self, job: Job) -> None:
+        start = time.perf_counter()
+        try:
+            job.result = job.func()
+            status = DONE
+        except BaseException as exc:  # reported through JobError
+            job.error = exc
+            status = FAILED
+        with self._cond:
+            job.wall_s = round(time.perf_counter() - start, 3)
+            job.status = status
+            self._free_cores += job.cores
+            if self._free_memory is not None:
+                self._free_memory += job.memory_mb
+            self._cond.notify_all()
+
+    def run(self, raise_on_error: bool = True) -> Dict[str, Job]:
+        """Run every queued job and wait for them; returns the jobs by name."""
+        threads: List[threading.Thread] = []
+        with self._cond:
+            while True:
+                # Start ready jobs in priority order while they fit; a large job
+                # at the head does not block smaller ones behind it
+                started = False
+                for job in self._ready():
+                    if self._fits(job):
+                        job.status = RUNNING
+                        self._free_cores -= job.cores
+                        if self._free_memory is not None:
+                            self._free_memory -= job.memory_mb
+                        thread = threading.Thread(target=self._execute, args=(job,),
+                                                  name=f"wns-job-{job.name}", daemon=True)
+                        threads.append(thread)
+                        thread.start()
+                        started = True
+                if started:
+                    continue
+                if not any(job.status in (PENDING, RUNNING) for job in self.jobs.values()):
+                    break
+                self._cond.wait()
+        for thread in threads:
+            thread.join()
+
+        failed = [job for job in self.jobs.values() if job.status == FAILED]
+        if failed and raise_on_error:
+            raise JobError(failed)
+        return dict(self.jobs)
+
+
+def scheduler_from_config(config: Dict[str, Any]) -> Scheduler:
+    """Scheduler limited by the optional ``scheduler`` config section."""
+    section = config.get("scheduler") or {}
+    return Scheduler(cores=section.get("cores"), memory_mb=section.get("memory_mb"))
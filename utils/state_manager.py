@@ -1,30 +1,206 @@
+"""Crash-safe workflow state shared by the pipeline drivers.
+
+The state lives in two files next to each other:
+
+* ``<state_file>``          – JSON snapshot, always replaced atomically
+                              (write temp file, fsync, ``os.replace``).
+* ``<state_file>.journal``  – JSON Lines, one record appended per ``update``.
+
+Loading replays the journal on top of the snapshot.  A torn last journal line
+(the process died mid-write) is ignored and trimmed; every record is an
+absolute assignment, so replaying a record that is already folded into the
+snapshot is harmless.  After ``compact_every`` records the journal is folded
+into a new snapshot and truncated.
+
+All reads and writes of the files happen under ``<state_file>.lock``, and
+every ``update`` first picks up records appended by other processes, so
+several workers can share one state file.
+"""
+
+import datetime
 import json
 import os
+from pathlib import Path
+
+from file_lock import FileLock
+
 
 class StateManager:
-    def __init__(self, state_file="workflow_state.json"):
-        self.state_file = state_file
-        self.data = self._load_state()
-
-    def _load_state(self):
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"[Warning] State file {self.state_file} corrupted. Resetting.")
-        # Default state
+    def __init__(self, state_file="workflow_state.json", fsync_every=1, compact_every=64):
+        """
+        Args:
+            state_file: JSON snapshot path; the journal and lock sit next to it.
+            fsync_every: fsync the journal after this many appended records
+                (1 = every update; larger values trade durability for speed).
+            compact_every: Fold the journal into a new snapshot after this many records.
+        """
+        self.state_file = str(state_file)
+        self.journal_file = self.state_file + ".journal"
+        self.fsync_every = max(1, int(fsync_every))
+        self.compact_every = max(1, int(compact_every))
+        Path(self.state_file).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = FileLock(Path(self.state_file + ".lock"))
+        self._snapshot_stat = ()  # never equal to a real stat key, forces a full load
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._unsynced = 0
+        self._data = {}
+        with self._lock:
+            self._reload()
+
+    @staticmethod
+    def _default_state():
         return {
             "wrapper_cycle": 0,
             "shaker_stage": None,
             "current_receptor": "receptor.pdbqt"
         }
 
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def _load_snapshot(self):
+        if not os.path.exists(self.state_file):
+            return self._default_state()
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+            # Keep the damaged file for inspection instead of overwriting it.
+            stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            aside = f"{self.state_file}.corrupt-{stamp}"
+            os.replace(self.state_file, aside)
+            print(f"[ERROR] State snapshot {self.state_file} is corrupted ({exc}). "
+                  f"Moved it to {aside}; rebuilding from defaults and the journal.")
+            return self._default_state()
+
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "set":
+            self._data[record["key"]] = record["value"]
+        elif op == "replace":
+            self._data = dict(record["data"])
+
+    def _replay_journal(self, offset):
+        """Apply journal records from ``offset``; trim a torn trailing record."""
+        if not os.path.exists(self.journal_file):
+            self._journal_offset = 0
+            return
+        with open(self.journal_file, 'rb') as f:
+            f.seek(offset)
+            good_end = offset
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break
+                self._apply(record)
+                self._journal_records += 1
+                good_end += len(raw)
+        if os.path.getsize(self.journal_file) > good_end:
+            print(f"[Warning] Discarding incomplete record at the end of {self.journal_file}.")
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(good_end)
+        self._journal_offset = good_end
+
+    def _reload(self):
+        """Bring the in-memory state up to date with the files (lock held)."""
+        snapshot_stat = self._stat_key(self.state_file)
+        journal_size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if snapshot_stat == self._snapshot_stat and journal_size >= self._journal_offset:
+            # Only new journal records were appended since we last looked.
+            if journal_size > self._journal_offset:
+                self._replay_journal(self._journal_offset)
+            return
+        self._data = self._load_snapshot()
+        self._journal_records = 0
+        self._replay_journal(0)
+        self._snapshot_stat = self._stat_key(self.state_file)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _append(self, record):
+        line = (json.dumps(record) + "\n").encode('utf-8')
+        with open(self.journal_file, 'ab') as f:
+            f.write(line)
+            f.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                os.fsync(f.fileno())
+                self._unsynced = 0
+        self._journal_offset += len(line)
+        self._journal_records += 1
+        if self._journal_records >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        """Write the current state as the new snapshot and empty the journal."""
+        tmp_file = f"{self.state_file}.tmp-{os.getpid()}"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+        # A crash here leaves records that are already in the snapshot;
+        # replaying them again yields the same state.
+        with open(self.journal_file, 'wb') as f:
+            os.fsync(f.fileno())
+        self._snapshot_stat = self._stat_key(self.state_file)
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._unsynced = 0
+
+    def _write(self, record):
+        with self._lock:
+            self._reload()
+            self._apply(record)
+            self._append(record)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    @property
+    def data(self):
+        """Current state.  Mutate it through ``update`` or by assigning ``data``."""
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._write({"op": "replace", "data": dict(value)})
+
     def get(self, key, default=None):
-        return self.data.get(key, default)
+        return self._data.get(key, default)
+
+    def refresh(self):
+        """Pick up changes written by other processes."""
+        with self._lock:
+            self._reload()
+        return self._data
 
     def update(self, key, value):
-        self.data[key] = value
-        with open(self.state_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
-        print(f"✅ [Checkpoint] State saved: {key} = {value}")
\ No newline at end of file
+        self._write({"op": "set", "key": key, "value": value})
+        print(f"✅ [Checkpoint] State saved: {key} = {value}")
+
+    def compact(self):
+        """Force a snapshot now (e.g. at the end of a run)."""
+        with self._lock:
+            self._reload()
+            self._compact()
+
+    def sync(self):
+        """fsync journal records still pending under ``fsync_every``."""
+        if self._unsynced and os.path.exists(self.journal_file):
+            with open(self.journal_file, 'ab') as f:
+                os.fsync(f.fileno())
+        self._unsynced = 0
@@ -0,0 +1,317 @@
+"""Content-hash keyed cache of parsed PDB/PDBQT atom records.
+
+The receptor files (``pdbqt/protein.pdbqt``, ``pdb/protein_clean.pdb``) are read
+again by every wrapper cycle, masking pass, clash check, scoring run and H-bond
+analysis.  ``load_structure`` parses a file once, stores the parsed columns on
+disk keyed by the SHA-256 of the file contents and memory-maps them on later
+reads.  Within one process the parsed structure is also memoised by
+``(path, mtime, size)`` so repeated reads do not even hash the file again;
+the memo keeps the ``MEMORY_CACHE_SIZE`` most recently read paths, since
+every wrapper cycle writes a new masked receptor.
+
+Cache location: ``$WNS_STRUCTURE_CACHE`` (set it to ``off`` to disable the disk
+layer) or ``<project>/.cache/structures`` by default.  Every masked receptor
+of every wrapper cycle is a new entry, so after each new entry the least
+recently used ones are removed until the cache fits in
+``$WNS_STRUCTURE_CACHE_MAX_MB`` (default 512 MB; entries of older cache
+versions go first).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from profiling import profiled
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bump whenever the parsed layout changes so stale cache entries are ignored.
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "structures"
+DEFAULT_MAX_CACHE_MB = 512
+
+_NUMERIC_FIELDS = ("line_index", "serial", "resid", "coords", "charge", "valid")
+_STRING_FIELDS = ("record", "name", "resname", "chain", "atom_type", "element", "lines")
+
+# Parsed structures kept in memory, least recently read first
+MEMORY_CACHE_SIZE = 16
+_memory_cache: "OrderedDict[str, Tuple[int, int, Structure]]" = OrderedDict()
+
+
+class Structure:
+    """Column-oriented view of the ATOM/HETATM records of one file.
+
+    Every attribute is a sequence with one entry per atom record.  With NumPy
+    installed the columns are (possibly memory-mapped) arrays and ``coords`` is
+    an ``(N, 3)`` float array; without NumPy they are plain lists and
+    ``coords`` is a list of ``(x, y, z)`` tuples.
+
+    ``lines`` holds the original record text and ``line_index`` its position
+    in ``text.splitlines()`` so writers (e.g. masking) can patch records in place.
+    ``valid`` is False for records whose coordinates could not be parsed;
+    their coordinates are stored as zeros.
+    """
+
+    def __init__(self, digest: str, columns: Dict[str, object]) -> None:
+        self.digest = digest
+        self.line_index = columns["line_index"]
+        self.serial = columns["serial"]
+        self.resid = columns["resid"]
+        self.coords = columns["coords"]
+        self.charge = columns["charge"]
+        self.valid = columns["valid"]
+        self.record = columns["record"]
+        self.name = columns["name"]
+        self.resname = columns["resname"]
+        self.chain = columns["chain"]
+        self.atom_type = columns["atom_type"]
+        self.element = columns["element"]
+        self.lines = columns["lines"]
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def columns(self) -> Dict[str, object]:
+        return {field: getattr(self, field) for field in _NUMERIC_FIELDS + _STRING_FIELDS}
+
+    def coord(self, index: int) -> Tuple[float, float, float]:
+        """Return the coordinate of one atom as a plain tuple."""
+        x, y, z = self.coords[index]
+        return (float(x), float(y), float(z))
+
+    def valid_coords(self):
+        """Coordinates of records with parseable coordinates only."""
+        if np is not None:
+            return np.asarray(self.coords)[np.asarray(self.valid, dtype=bool)]
+        return [c for c, ok in zip(self.coords, self.valid) if ok]
+
+
+def _parse_int(field: str) -> int:
+    try:
+        return int(field)
+    except ValueError:
+        return 0
+
+
+def _parse_float(field: str) -> float:
+    try:
+        return float(field)
+    except ValueError:
+        return 0.0
+
+
+def parse_structure_text(text: str, digest: str = "") -> Structure:
+    """Parse ATOM/HETATM records from PDB or PDBQT text (no caching)."""
+    columns: Dict[str, List] = {field: [] for field in _NUMERIC_FIELDS + _STRING_FIELDS}
+    for index, raw in enumerate(text.splitlines()):
+        if not raw.startswith(("ATOM", "HETATM")):
+            continue
+        line = raw.rstrip("\n")
+        try:
+            coord = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+            valid = True
+        except ValueError:
+            coord = (0.0, 0.0, 0.0)
+            valid = False
+        columns["line_index"].append(index)
+        columns["serial"].append(_parse_int(line[6:11]))
+        columns["resid"].append(_parse_int(line[22:26]))
+        columns["coords"].append(coord)
+        columns["charge"].append(_parse_float(line[70:76]) if len(line) >= 76 else 0.0)
+        columns["valid"].append(valid)
+        columns["record"].append(line[0:6].strip())
+        columns["name"].append(line[12:16].strip())
+        columns["resname"].append(line[17:20].strip())
+        columns["chain"].append(line[21:22].strip())
+        columns["atom_type"].append(line[77:79].strip())
+        columns["element"].append(line[76:78].strip())
+        columns["lines"].append(line)
+
+    if np is not None:
+        arrays: Dict[str, object] = {
+            "line_index": np.asarray(columns["line_index"], dtype=np.int64),
+            "serial": np.asarray(columns["serial"], dtype=np.int64),
+            "resid": np.asarray(columns["resid"], dtype=np.int64),
+            "coords": np.asarray(columns["coords"], dtype=np.float64).reshape(-1, 3),
+            "charge": np.asarray(columns["charge"], dtype=np.float64),
+            "valid": np.asarray(columns["valid"], dtype=bool),
+        }
+        for field in _STRING_FIELDS:
+            arrays[field] = np.asarray(columns[field], dtype=str)
+        return Structure(digest, arrays)
+    return Structure(digest, columns)
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of the file contents, streamed in 1 MiB blocks."""
+    sha = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Resolve the on-disk cache directory, or None when disabled."""
+    configured = os.environ.get("WNS_STRUCTURE_CACHE")
+    if configured is None:
+        return DEFAULT_CACHE_DIR
+    if configured.strip().lower() in ("", "0", "off", "none", "false"):
+        return None
+    return Path(configured)
+
+
+def get_max_cache_bytes() -> int:
+    """Size limit of the on-disk cache (``$WNS_STRUCTURE_CACHE_MAX_MB``)."""
+    configured = os.environ.get("WNS_STRUCTURE_CACHE_MAX_MB", "").strip()
+    megabytes = float(configured) if configured else DEFAULT_MAX_CACHE_MB
+    return int(megabytes * 1024 * 1024)
+
+
+def _entry_size(entry: Path) -> int:
+    try:
+        if entry.is_dir():
+            return sum(item.stat().st_size for item in entry.iterdir())
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+
+def prune_cache(cache_dir: Path, max_bytes: int, keep: Optional[Path] = None) -> int:
+    """Remove least recently used entries until the cache fits in ``max_bytes``; returns how many.
+
+    Entries written by other cache versions are removed first; ``keep`` never is.
+    """
+    current = f"v{CACHE_VERSION}-"
+    entries = []
+    for entry in Path(cache_dir).glob("v*-*"):
+        try:
+            mtime = entry.stat().st_mtime_ns
+        except OSError:
+            continue
+        entries.append((entry.name.startswith(current), mtime, entry, _entry_size(entry)))
+    total = sum(size for _, _, _, size in entries)
+    removed = 0
+    for _, _, entry, size in sorted(entries, key=lambda item: (item[0], item[1])):
+        if total <= max_bytes:
+            break
+        if keep is not None and entry == keep:
+            continue
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+        except OSError:
+            # In use elsewhere (e.g. memory-mapped on Windows); try again next time
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def _entry_path(cache_dir: Path, digest: str) -> Path:
+    suffix = "npy" if np is not None else "pickle"
+    return cache_dir / f"v{CACHE_VERSION}-{digest}.{suffix}"
+
+
+def _read_entry(entry: Path, digest: str) -> Optional[Structure]:
+    try:
+        if np is not None:
+            columns = {
+                field: np.load(entry / f"{field}.npy", mmap_mode="r", allow_pickle=False)
+                for field in _NUMERIC_FIELDS + _STRING_FIELDS
+            }
+            return Structure(digest, columns)
+        with entry.open("rb") as handle:
+            return Structure(digest, pickle.load(handle))
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_entry(entry: Path, structure: Structure) -> None:
+    """Write an entry next to its final location, then rename it into place."""
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    if np is not None:
+        staging = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+        try:
+            for field, values in structure.columns().items():
+                np.save(staging / f"{field}.npy", np.asarray(values), allow_pickle=False)
+            os.replace(staging, entry)
+        except OSError:
+            # Another process published the same digest first; theirs is identical.
+            shutil.rmtree(staging, ignore_errors=True)
+        return
+
+    fd, staging_name = tempfile.mkstemp(prefix=".tmp-", dir=entry.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump(structure.columns(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(staging_name, entry)
+    except OSError:
+        if os.path.exists(staging_name):
+            os.unlink(staging_name)
+
+
+@profiled
+def load_structure(path: Path, cache_dir: Optional[Path] = None) -> Structure:
+    """Return the parsed atom records of a PDB/PDBQT file, using the caches.
+
+    Args:
+        path: PDB or PDBQT file to read.
+        cache_dir: Override for the on-disk cache directory.
+
+    Returns:
+        The parsed ``Structure``; treat its columns as read-only.
+    """
+    path = Path(path)
+    stat = path.stat()
+    memo_key = str(path.resolve())
+    cached = _memory_cache.get(memo_key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        _memory_cache.move_to_end(memo_key)
+        return cached[2]
+
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    directory = cache_dir if cache_dir is not None else get_cache_dir()
+
+    structure = None
+    if directory is not None:
+        entry = _entry_path(Path(directory), digest)
+        if entry.exists():
+            structure = _read_entry(entry, digest)
+            if structure is not None:
+                # The mtime orders entries for pruning (least recently used first)
+                try:
+                    os.utime(entry)
+                except OSError:
+                    pass
+    if structure is None:
+        structure = parse_structure_text(data.decode("utf-8", errors="replace"), digest)
+        if directory is not None:
+            entry = _entry_path(Path(directory), digest)
+            _write_entry(entry, structure)
+            prune_cache(Path(directory), get_max_cache_bytes(), keep=entry)
+
+    _memory_cache[memo_key] = (stat.st_mtime_ns, stat.st_size, structure)
+    _memory_cache.move_to_end(memo_key)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return structure
+
+
+def clear_memory_cache() -> None:
+    """Forget structures memoised in this process (the disk cache is kept)."""
+    _memory_cache.clear()
@@ -0,0 +1,328 @@
+"""Solvent-accessible surface coverage of the receptor during the wrapper loop.
+
+The wrapper used to run through its seed list (or ``max_cycles``) however
+much of the surface was already wrapped.  ``SurfaceCoverage`` keeps a
+point map of the receptor's solvent-accessible surface (Shrake-Rupley:
+``points`` test points on a sphere of ``atom_radius + probe`` around every
+heavy atom, kept where no other atom's sphere buries them) and marks a
+point covered once its atom is masked (type ``X``) or an atom of an
+accepted ligand is within ``contact`` Å of it.  Every point stands for the same
+share of surface area, so the covered fraction and the per-residue
+fractions are sums over points.
+
+Uncovered points are grouped into patches (points closer than ``link`` Å
+are connected).  One patch can be the whole remaining surface, so the
+wrapper steers the next cycle's docking box to a ligand-sized target
+instead: the uncovered points within ``radius`` (the ligand's reach, see
+``ligand_reach``) of the densest uncovered spot, skipping spots near
+targets whose pose was rejected.  ``CoverageStop`` ends the loop once ``patience`` cycles in a
+row each added less than ``min_gain`` of the surface (a rejected pose adds
+nothing), or once ``target`` of it is covered.
+
+Distances use the cell list of ``hotspots.nearest_distance`` (vectorised
+with NumPy); the patch and target searches run over a cell hash.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from grid_maps import GridMap, Index
+from hotspots import MASKED_TYPE, _NEIGHBOUR_CELLS, nearest_distance
+from ligand_topology import element_of
+
+PROBE_RADIUS = 1.4     # Å, water
+ATOM_RADIUS = 1.8      # Å, one radius for every heavy atom
+SURFACE_POINTS = 32    # test points per atom
+CONTACT = 3.0          # Å from a ligand atom to an occupied surface point
+PATCH_LINK = 2.5       # Å between neighbouring points of one uncovered patch
+MIN_GAIN = 0.01        # share of the surface a cycle has to add
+PATIENCE = 3           # cycles in a row below MIN_GAIN before stopping
+
+Coord = Tuple[float, float, float]
+
+
+def sphere_points(n: int) -> List[Coord]:
+    """``n`` evenly spread unit vectors (golden-section spiral)."""
+    golden = math.pi * (3.0 - math.sqrt(5.0))
+    points = []
+    for index in range(n):
+        z = 1.0 - (2.0 * index + 1.0) / n
+        radius = math.sqrt(1.0 - z * z)
+        points.append((radius * math.cos(golden * index), radius * math.sin(golden * index), z))
+    return points
+
+
+def heavy_atoms(lines: Sequence[str]) -> Tuple[List[int], List[Coord], List[str]]:
+    """Record numbers, coordinates and residue keys (``A:LYS12``) of the heavy atoms of a PDB(QT)."""
+    records, coords, residues = [], [], []
+    number = 0
+    for line in lines:
+        if not line.startswith(("ATOM", "HETATM")):
+            continue
+        if element_of(line[12:16], line[77:79]) != "H":
+            records.append(number)
+            coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+            residues.append(f"{line[21:22].strip()}:{line[17:20].strip()}{line[22:26].strip()}")
+        number += 1
+    return records, coords, residues
+
+
+def masked_records(lines: Sequence[str]) -> List[int]:
+    """Record numbers of the atoms typed ``X`` (see ``mask_pdbqt.py``)."""
+    atoms = [line for line in lines if line.startswith(("ATOM", "HETATM"))]
+    return [number for number, line in enumerate(atoms) if line[77:79].strip() == MASKED_TYPE]
+
+
+def ligand_reach(coords: Iterable[Sequence[float]], contact: float = CONTACT) -> float:
+    """Radius (Å) of the surface one pose can cover: farthest atom from the centroid plus ``contact``."""
+    points = [tuple(float(value) for value in coord) for coord in coords]
+    if not points:
+        raise ValueError("Ligand has no atom coordinates")
+    centroid = tuple(sum(point[axis] for point in points) / len(points) for axis in range(3))
+    return max(math.dist(point, centroid) for point in points) + contact
+
+
+def in_box(coord: Sequence[float], grid: GridMap) -> bool:
+    """Whether ``coord`` lies in the grid box."""
+    origin = grid.origin
+    return all(origin[axis] <= coord[axis] <= origin[axis] + grid.npts[axis] * grid.spacing for axis in range(3))
+
+
+class Patch:
+    def __init__(self, coords: Sequence[Coord], area: float) -> None:
+        """
+        Args:
+            coords: Uncovered surface points of the patch.
+            area: Surface area they stand for (Å^2).
+        """
+        self.coords = list(coords)
+        self.area = float(area)
+        self.center: Coord = tuple(sum(coord[axis] for coord in self.coords) / len(self.coords)
+                                   for axis in range(3))
+
+    def extent(self, grid: GridMap) -> Tuple[Index, Index]:
+        """Smallest and largest grid index of the patch per axis, clamped to the grid."""
+        origin = grid.origin
+        lower, upper = [], []
+        for axis in range(3):
+            values = [coord[axis] for coord in self.coords]
+            lower.append(min(max(int(math.floor((min(values) - origin[axis]) / grid.spacing)), 0), grid.npts[axis]))
+            upper.append(min(max(int(math.ceil((max(values) - origin[axis]) / grid.spacing)), 0), grid.npts[axis]))
+        return tuple(lower), tuple(upper)
+
+    def inside(self, grid: GridMap) -> bool:
+        """Whether the patch centre lies in the grid box."""
+        return in_box(self.center, grid)
+
+    def __repr__(self) -> str:
+        return (f"Patch(center=({self.center[0]:.1f}, {self.center[1]:.1f}, {self.center[2]:.1f}), "
+                f"area={self.area:.1f})")
+
+
+class SurfaceCoverage:
+    def __init__(self, receptor_lines: Sequence[str], probe: float = PROBE_RADIUS, atom_radius: float = ATOM_RADIUS,
+                 points: int = SURFACE_POINTS, contact: float = CONTACT) -> None:
+        """
+        Args:
+            receptor_lines: Lines of the unmasked receptor PDBQT; masked
+                copies must keep its atom order.
+            probe: Probe radius (Å).
+            atom_radius: Radius of every heavy atom (Å).
+            points: Test points per atom.
+            contact: Distance (Å) within which a ligand atom occupies a surface point.
+        """
+        if probe < 0 or atom_radius <= 0 or points < 1 or contact <= 0:
+            raise ValueError("Surface coverage needs probe >= 0, atom_radius > 0, points >= 1 and contact > 0")
+        self.contact = contact
+        records, atoms, residues = heavy_atoms(receptor_lines)
+        radius = atom_radius + probe
+        candidates, owners = [], []
+        for atom_index, (x, y, z) in enumerate(atoms):
+            for ux, uy, uz in sphere_points(points):
+                candidates.append((x + radius * ux, y + radius * uy, z + radius * uz))
+                owners.append(atom_index)
+        # A point's own atom is exactly ``radius`` away; any other atom closer buries it
+        buried = nearest_distance(candidates, atoms, radius * (1.0 - 1e-6))
+        kept = [index for index, distance in enumerate(buried) if math.isinf(distance)]
+        self.coords: List[Coord] = [candidates[index] for index in kept]
+        self.owner_records = [records[owners[index]] for index in kept]
+        self.residues = [residues[owners[index]] for index in kept]
+        self.point_area = 4.0 * math.pi * radius * radius / points
+        self.covered = [False] * len(self.coords)
+        self.history: List[Dict] = []
+
+    @property
+    def total_area(self) -> float:
+        return len(self.coords) * self.point_area
+
+    @property
+    def covered_area(self) -> float:
+        return sum(self.covered) * self.point_area
+
+    @property
+    def fraction(self) -> float:
+        return sum(self.covered) / len(self.coords) if self.coords else 1.0
+
+    def update(self, ligand_coords: Iterable[Sequence[float]] = (),
+               receptor_lines: Optional[Sequence[str]] = None) -> float:
+        """Mark the points occupied by ``ligand_coords`` or masked in ``receptor_lines``; returns the gain."""
+        before = self.fraction
+        ligand = [tuple(float(value) for value in coord) for coord in ligand_coords]
+        if ligand:
+            for index, distance in enumerate(nearest_distance(self.coords, ligand, self.contact)):
+                if not math.isinf(distance):
+                    self.covered[index] = True
+        if receptor_lines is not None:
+            masked = set(masked_records(receptor_lines))
+            for index, record in enumerate(self.owner_records):
+                if record in masked:
+                    self.covered[index] = True
+        return self.fraction - before
+
+    def residue_coverage(self) -> Dict[str, float]:
+        """Covered share of each surface residue's accessible area."""
+        totals: Dict[str, List[int]] = {}
+        for residue, covered in zip(self.residues, self.covered):
+            counts = totals.setdefault(residue, [0, 0])
+            counts[0] += covered
+            counts[1] += 1
+        return {residue: covered / total for residue, (covered, total) in totals.items()}
+
+    def uncovered_patches(self, link: float = PATCH_LINK) -> List[Patch]:
+        """Connected groups of uncovered points, largest first."""
+        open_points = [index for index, covered in enumerate(self.covered) if not covered]
+        cells: Dict[Tuple[int, int, int], List[int]] = {}
+        for index in open_points:
+            cells.setdefault(self._cell(self.coords[index], link), []).append(index)
+        limit = link * link
+        seen = set()
+        patches = []
+        for start in open_points:
+            if start in seen:
+                continue
+            seen.add(start)
+            members, queue = [], [start]
+            while queue:
+                current = queue.pop()
+                members.append(current)
+                x, y, z = self.coords[current]
+                cx, cy, cz = self._cell(self.coords[current], link)
+                for dx, dy, dz in _NEIGHBOUR_CELLS:
+                    for other in cells.get((cx + dx, cy + dy, cz + dz), ()):
+                        if other not in seen:
+                            ox, oy, oz = self.coords[other]
+                            if (x - ox) ** 2 + (y - oy) ** 2 + (z - oz) ** 2 <= limit:
+                                seen.add(other)
+                                queue.append(other)
+            patches.append(Patch([self.coords[index] for index in sorted(members)], len(members) * self.point_area))
+        patches.sort(key=lambda patch: -patch.area)
+        return patches
+
+    def uncovered_target(self, radius: float, tried: Iterable[Sequence[float]] = (),
+                         grid: Optional[GridMap] = None) -> Optional[Patch]:
+        """Uncovered points within ``radius`` of the densest uncovered spot, or None when no spot is left.
+
+        Args:
+            radius: Target radius (Å), usually ``ligand_reach`` of the ligand.
+            tried: Centres of targets whose pose was rejected; spots within
+                ``radius`` of one are skipped.
+            grid: Only consider spots inside this grid box.
+        """
+        if radius <= 0:
+            raise ValueError("Target radius must be positive")
+        open_points = [index for index, covered in enumerate(self.covered) if not covered]
+        cells: Dict[Tuple[int, int, int], List[int]] = {}
+        spots: Dict[Tuple[int, int, int], int] = {}
+        for index in open_points:
+            cells.setdefault(self._cell(self.coords[index], radius), []).append(index)
+            # One candidate spot per half-radius cell keeps the search linear in the surface size
+            spots.setdefault(self._cell(self.coords[index], radius / 2.0), index)
+        tried = [tuple(center) for center in tried]
+        limit = radius * radius
+        best: List[int] = []
+        for spot in sorted(spots.values()):
+            x, y, z = self.coords[spot]
+            if grid is not None and not in_box((x, y, z), grid):
+                continue
+            if any(math.dist((x, y, z), center) <= radius for center in tried):
+                continue
+            cx, cy, cz = self._cell((x, y, z), radius)
+            members = [other for dx, dy, dz in _NEIGHBOUR_CELLS
+                       for other in cells.get((cx + dx, cy + dy, cz + dz), ())
+                       if (x - self.coords[other][0]) ** 2 + (y - self.coords[other][1]) ** 2
+                       + (z - self.coords[other][2]) ** 2 <= limit]
+            if len(members) > len(best):
+                best = members
+        if not best:
+            return None
+        return Patch([self.coords[index] for index in sorted(best)], len(best) * self.point_area)
+
+    def uncovered_area_near(self, center: Sequence[float], radius: float) -> float:
+        """Uncovered surface area (Å^2) within ``radius`` of ``center``."""
+        return self.point_area * sum(1 for coord, covered in zip(self.coords, self.covered)
+                                     if not covered and math.dist(coord, center) <= radius)
+
+    def record(self, cycle: int, seed, gain: float, accepted: bool) -> Dict:
+        """Append and return the per-cycle report."""
+        residues = self.residue_coverage()
+        entry = {"cycle": cycle, "seed": seed, "accepted": accepted,
+                 "fraction": round(self.fraction, 4), "gain": round(gain, 4),
+                 "covered_area": round(self.covered_area, 1), "total_area": round(self.total_area, 1),
+                 "residues_covered": sum(1 for value in residues.values() if value >= 0.5),
+                 "residues": len(residues)}
+        self.history.append(entry)
+        return entry
+
+    def to_dict(self) -> Dict:
+        return {"fraction": round(self.fraction, 4), "covered_area": round(self.covered_area, 1),
+                "total_area": round(self.total_area, 1), "history": self.history,
+                "residues": {residue: round(value, 3) for residue, value in sorted(self.residue_coverage().items())}}
+
+    @staticmethod
+    def _cell(coord: Sequence[float], size: float) -> Tuple[int, int, int]:
+        return tuple(int(math.floor(value / size)) for value in coord)
+
+
+class CoverageStop:
+    def __init__(self, min_gain: float = MIN_GAIN, patience: int = PATIENCE, target: Optional[float] = None) -> None:
+        """
+        Args:
+            min_gain: Smallest share of the surface a cycle has to add to count.
+            patience: Cycles in a row below ``min_gain`` that end the loop.
+            target: Covered share that ends the loop (None: no target).
+        """
+        if patience < 1:
+            raise ValueError("patience must be at least 1")
+        self.min_gain = min_gain
+        self.patience = patience
+        self.target = target
+        self.stalled = 0
+        self.reason: Optional[str] = None
+
+    def update(self, gain: float, fraction: float) -> bool:
+        """Record one cycle; True once the loop should end (``reason`` says why)."""
+        self.stalled = self.stalled + 1 if gain < self.min_gain else 0
+        if self.target is not None and fraction >= self.target:
+            self.reason = f"surface coverage {fraction:.1%} reached the target {self.target:.1%}"
+        elif self.stalled >= self.patience:
+            self.reason = (f"coverage gain below {self.min_gain:.1%} for {self.stalled} cycles "
+                           f"(surface coverage {fraction:.1%})")
+        return self.reason is not None
+
+
+def coverage_from_config(config: Dict, receptor_lines: Sequence[str]) -> Optional[Tuple[SurfaceCoverage, CoverageStop]]:
+    """``(SurfaceCoverage, CoverageStop)`` from ``wrapper.coverage`` (None unless ``enabled``)."""
+    settings = (config.get("wrapper") or {}).get("coverage") or {}
+    if not settings.get("enabled", False):
+        return None
+    coverage = SurfaceCoverage(receptor_lines, probe=float(settings.get("probe", PROBE_RADIUS)),
+                               atom_radius=float(settings.get("atom_radius", ATOM_RADIUS)),
+                               points=int(settings.get("points", SURFACE_POINTS)),
+                               contact=float(settings.get("contact", CONTACT)))
+    target = settings.get("target")
+    stop = CoverageStop(min_gain=float(settings.get("min_gain", MIN_GAIN)),
+                        patience=int(settings.get("patience", PATIENCE)),
+                        target=float(target) if target is not None else None)
+    return coverage, stop
@@ -0,0 +1,350 @@
+"""Progress telemetry for running tools: parsers, completion estimates and JSON status files.
+
+The progress parsers read the lines a tool writes: a DLG for ``autodock4``
+(GA run, generation and evaluation counts against ``ga_run``,
+``ga_num_generations`` and ``ga_num_evals``), stderr and the ``<deffnm>.log``
+for ``gmx mdrun`` (step against ``nsteps``, ``dt``, final ns/day).  A
+``Telemetry`` keeps timestamped samples of a parser's work counter and
+turns them into a throughput over the last ``RATE_WINDOW`` seconds and an
+estimated completion time::
+
+    tail, telemetry = FileTail(Path("md.log"), skip_existing=False), Telemetry(MdrunProgress())
+    for line in tail.read():
+        telemetry.progress.feed(line)
+    telemetry.sample()
+    write_status(Path("logs/md.status.json"), telemetry.snapshot())
+
+``process_runner`` does this for every tool it starts; ``wns watch`` does it
+for DLGs and mdrun logs of jobs started elsewhere (queue workers, cluster
+jobs on a shared file system).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Seconds between status file refreshes
+STATUS_INTERVAL = 5.0
+# Seconds of samples the throughput is measured over
+RATE_WINDOW = 120.0
+
+LINE_BREAK = re.compile(rb"[\r\n]")
+
+
+def split_lines(data: bytes) -> Tuple[List[str], bytes]:
+    """Complete lines of ``data`` (``\\r`` ends a line too) and the unfinished rest."""
+    parts = LINE_BREAK.split(data)
+    return [part.decode("utf-8", "replace") for part in parts[:-1] if part], parts[-1]
+
+
+class ProgressParser:
+    """Progress of a tool without a known output format (nothing is parsed)."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, Any] = {}
+
+    def feed(self, line: str) -> None:
+        pass
+
+    @property
+    def work(self) -> Optional[Tuple[float, float, str]]:
+        """``(done, total, unit)`` once the total is known."""
+        return None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        work = self.work
+        if work is None or not work[1]:
+            return None
+        return min(1.0, work[0] / work[1])
+
+    def throughput(self, rate: float) -> Dict[str, float]:
+        """Tool-specific throughput figures for ``rate`` work units per second."""
+        return {}
+
+    def describe(self) -> str:
+        return ""
+
+
+class AutoDockProgress(ProgressParser):
+    """GA runs, generations and evaluations from a DLG (``outlev 1``).
+
+    A GA run ends at ``ga_num_generations`` or ``ga_num_evals``, whichever
+    comes first, so the work is counted in generations with each run's
+    progress taken from the limit it is closer to.
+    """
+
+    PATTERNS = [
+        ("setting", re.compile(r"^DPF>\s*(ga_run|ga_num_evals|ga_num_generations)\s+(\d+)")),
+        ("begin", re.compile(r"BEGINNING GENETIC ALGORITHM DOCKING\s+(\d+)\s+of\s+(\d+)")),
+        ("generation", re.compile(r"^Generation:\s*(\d+).*?Num\.evals\.:\s*(\d+)")),
+        ("docked", re.compile(r"^DOCKED: USER\s+Run = (\d+)")),
+    ]
+
+    def feed(self, line: str) -> None:
+        for kind, pattern in self.PATTERNS:
+            match = pattern.search(line)
+            if not match:
+                continue
+            if kind == "setting":
+                self.values[match.group(1)] = int(match.group(2))
+            elif kind == "begin":
+                self.values.update(run=int(match.group(1)), ga_run=int(match.group(2)), generation=0, evals=0)
+            elif kind == "generation":
+                self.values.update(generation=int(match.group(1)), evals=int(match.group(2)))
+            else:
+                self.values["runs_done"] = max(self.values.get("runs_done", 0), int(match.group(1)))
+            return
+
+    @property
+    def work(self) -> Optional[Tuple[float, float, str]]:
+        runs = self.values.get("ga_run")
+        generations = self.values.get("ga_num_generations")
+        if not runs or not generations:
+            return None
+        done = self.values.get("runs_done", 0)
+        within = 0.0
+        if self.values.get("run", 0) > done:
+            shares = [self.values.get(key, 0) / self.values[total]
+                      for key, total in (("evals", "ga_num_evals"), ("generation", "ga_num_generations"))
+                      if self.values.get(total)]
+            within = min(max(shares, default=0.0), 1.0)
+        return (min(done + within, runs) * generations, runs * generations, "generations")
+
+    def describe(self) -> str:
+        if "run" not in self.values:
+            return ""
+        text = f"run {self.values['run']}/{self.values.get('ga_run', '?')}"
+        if self.values.get("generation"):
+            text += f" gen {self.values['generation']}"
+            if self.values.get("ga_num_generations"):
+                text += f"/{self.values['ga_num_generations']}"
+        return text
+
+
+class MdrunProgress(ProgressParser):
+    """Steps, total steps and performance from ``gmx mdrun`` stderr or its ``.log``."""
+
+    PATTERNS = [
+        ("total", re.compile(r"^\s*(\d+) steps,\s+([\d.]+) ps")),
+        ("step", re.compile(r"^step (\d+)")),
+        ("performance", re.compile(r"^Performance:\s+([\d.]+)\s+([\d.]+)")),
+        # md.log: input parameters, then "Step Time" headers over the energy blocks
+        ("nsteps", re.compile(r"^\s+nsteps\s+=\s+(\d+)")),
+        ("dt", re.compile(r"^\s+dt\s+=\s+([\d.eE+-]+)")),
+        ("header", re.compile(r"^\s+Step\s+Time\s*$")),
+    ]
+    LOG_STEP = re.compile(r"^\s+(\d+)\s+([\d.eE+-]+)\s*$")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._after_header = False
+
+    def feed(self, line: str) -> None:
+        if self._after_header:
+            self._after_header = False
+            match = self.LOG_STEP.match(line)
+            if match:
+                self.values["step"] = int(match.group(1))
+                return
+        for kind, pattern in self.PATTERNS:
+            match = pattern.search(line)
+            if not match:
+                continue
+            if kind == "total":
+                self.values.update(nsteps=int(match.group(1)), total_ps=float(match.group(2)))
+            elif kind == "step":
+                self.values["step"] = int(match.group(1))
+            elif kind == "performance":
+                self.values.update(ns_per_day=float(match.group(1)), hour_per_ns=float(match.group(2)))
+            elif kind == "nsteps":
+                self.values["nsteps"] = int(match.group(1))
+            elif kind == "dt":
+                self.values["dt"] = float(match.group(1))
+            else:
+                self._after_header = True
+            return
+
+    @property
+    def work(self) -> Optional[Tuple[float, float, str]]:
+        nsteps = self.values.get("nsteps")
+        if not nsteps:
+            return None
+        return (min(self.values.get("step", 0), nsteps), nsteps, "steps")
+
+    def throughput(self, rate: float) -> Dict[str, float]:
+        dt = self.values.get("dt")
+        if dt is None and self.values.get("nsteps") and "total_ps" in self.values:
+            dt = self.values["total_ps"] / self.values["nsteps"]
+        if dt is None:
+            return {}
+        # steps/s x ps/step -> ns/day
+        return {"ns_per_day": round(rate * dt * 86400 / 1000, 3)}
+
+    def describe(self) -> str:
+        if "nsteps" not in self.values:
+            return ""
+        text = f"step {self.values.get('step', 0)}/{self.values['nsteps']}"
+        if "ns_per_day" in self.values:
+            text += f" {self.values['ns_per_day']:.1f} ns/day"
+        return text
+
+
+def progress_parser(cmd: Sequence[str]) -> ProgressParser:
+    """Parser for the tool ``cmd`` runs (also inside ``wsl bash -c "cd ... && tool ..."``)."""
+    words = [Path(word).name for part in cmd for word in str(part).split()]
+    if "autodock4" in words:
+        return AutoDockProgress()
+    if "mdrun" in words and any(word.startswith("gmx") for word in words):
+        return MdrunProgress()
+    return ProgressParser()
+
+
+def file_parser(path: Path) -> ProgressParser:
+    """Parser for a file a tool writes: a DLG, or else an mdrun log."""
+    return AutoDockProgress() if Path(path).suffix.lower() == ".dlg" else MdrunProgress()
+
+
+def _stamp(path: Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileTail:
+    def __init__(self, path: Path, skip_existing: bool = True) -> None:
+        """
+        Args:
+            path: File a running tool appends to.
+            skip_existing: Ignore the file as it is now (left over from an
+                earlier run) until the tool modifies it; it is then read
+                from the start.
+        """
+        self.path = Path(path)
+        self._stale = _stamp(self.path) if skip_existing else None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._pending = b""
+
+    def read(self) -> List[str]:
+        """Lines completed since the last call."""
+        stamp = _stamp(self.path)
+        if stamp is None or stamp == self._stale:
+            return []
+        self._stale = None
+        inode, size, _ = stamp
+        if inode != self._inode or size < self._offset:
+            # New or truncated (rewritten) file: read it from the start
+            self._inode, self._offset, self._pending = inode, 0, b""
+        if size == self._offset:
+            return []
+        try:
+            with self.path.open("rb") as handle:
+                handle.seek(self._offset)
+                data = handle.read()
+        except OSError:
+            return []
+        self._offset += len(data)
+        lines, self._pending = split_lines(self._pending + data)
+        return lines
+
+    def flush(self) -> List[str]:
+        """``read`` plus the last line if the file does not end with a newline."""
+        lines = self.read()
+        if self._pending:
+            lines.append(self._pending.decode("utf-8", "replace"))
+            self._pending = b""
+        return lines
+
+
+class Telemetry:
+    def __init__(self, progress: ProgressParser, window: float = RATE_WINDOW) -> None:
+        """
+        Args:
+            progress: Parser fed with the tool's output.
+            window: Seconds of samples the throughput is measured over.
+        """
+        self.progress = progress
+        self.window = window
+        self._samples: deque = deque()
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """Record the parser's work counter (call periodically)."""
+        work = self.progress.work
+        if work is None:
+            return
+        now = time.time() if now is None else now
+        if self._samples and work[0] < self._samples[-1][1]:
+            # Restarted from an earlier point: measure from here
+            self._samples.clear()
+        self._samples.append((now, work[0]))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Work units per second over the sample window."""
+        if len(self._samples) < 2:
+            return None
+        (start, done_start), (end, done_end) = self._samples[0], self._samples[-1]
+        if end <= start or done_end <= done_start:
+            return None
+        return (done_end - done_start) / (end - start)
+
+    @property
+    def eta_s(self) -> Optional[float]:
+        """Seconds until the work is done at the current rate."""
+        work, rate = self.progress.work, self.rate
+        if work is None:
+            return None
+        if work[0] >= work[1]:
+            return 0.0
+        return (work[1] - work[0]) / rate if rate else None
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Progress, throughput and completion estimate as a JSON-ready dict."""
+        now = time.time() if now is None else now
+        work, rate, eta_s = self.progress.work, self.rate, self.eta_s
+        record: Dict[str, Any] = {"updated": now, "unit": None, "done": None, "total": None,
+                                  "fraction": self.progress.fraction, "rate_per_s": None,
+                                  "eta_s": None, "eta": None}
+        if work is not None:
+            record.update(done=round(work[0], 3), total=work[1], unit=work[2])
+        if rate is not None:
+            record["rate_per_s"] = round(rate, 6)
+            record.update(self.progress.throughput(rate))
+        if eta_s is not None:
+            record["eta_s"] = round(eta_s, 1)
+            record["eta"] = datetime.fromtimestamp(now + eta_s).astimezone().isoformat(timespec="seconds")
+        record["progress"] = dict(self.progress.values)
+        return record
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """``ETA 1h05m`` / ``ETA 4m10s`` / ``ETA 12s`` (empty when unknown)."""
+    if seconds is None:
+        return ""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"ETA {seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"ETA {seconds // 60}m{seconds % 60:02d}s"
+    return f"ETA {seconds}s"
+
+
+def write_status(path: Path, record: Dict[str, Any]) -> None:
+    """Replace ``path`` with ``record`` atomically, so readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+    tmp.replace(path)
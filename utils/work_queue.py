@@ -0,0 +1,324 @@
+"""Work queue on a shared directory, for workers on several nodes.
+
+No broker and no database: the queue is a directory on the shared (NFS)
+volume.  Each task is one JSON file, and its state is the subdirectory it sits in::
+
+    <queue>/pending/<id>.json    waiting for a worker
+    <queue>/claimed/<id>.json    being worked on; <id>.claim names the worker
+    <queue>/done/<id>.json       finished, with the worker's ``result``
+    <queue>/failed/<id>.json     gave up after ``max_attempts`` tries
+
+Every state change is a single ``rename`` (or ``link`` for results) inside
+the queue directory.  These are atomic on NFS, so when several workers try
+to claim the same task exactly one rename succeeds.  File contents are
+always written to a temporary file first and renamed into place.
+
+While a worker runs a task it touches ``<id>.claim`` every
+``heartbeat_interval`` seconds.  A claim whose heartbeat is older than
+``stale_after`` belongs to a dead worker; ``reclaim_stale`` (called by every
+worker between tasks) puts the task back into ``pending`` or, after
+``max_attempts`` claims, into ``failed``.  Heartbeat ages are measured
+against the file server's clock (the mtime of a freshly touched file), so
+clock skew between nodes does not matter.
+
+    queue = WorkQueue("/shared/run/queue")
+    queue.submit("command", {"cmd": ["autodock4", "-p", "x.dpf"], "cwd": "/shared/run"})
+
+    claim = queue.claim()
+    with claim.heartbeat():
+        result = run(claim.task)
+    queue.complete(claim, result)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+STATES = ("pending", "claimed", "done", "failed")
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> Path:
+    """Write ``data`` to a unique temporary file next to ``path``; returns the temp path."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with tmp.open("w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2)
+        handle.flush()
+        os.fsync(handle.fileno())
+    return tmp
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _unlink(path: Path) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+
+
+class Claim:
+    """A task this worker owns until it completes, fails or loses the claim."""
+
+    def __init__(self, queue: "WorkQueue", task: Dict[str, Any], worker_id: str) -> None:
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.path = queue.root / "claimed" / f"{task['id']}.json"
+        self.claim_path = self.path.with_suffix(".claim")
+        self.lost = False
+
+    @property
+    def id(self) -> str:
+        return self.task["id"]
+
+    def touch(self) -> bool:
+        """Refresh the heartbeat; False once the claim was taken away."""
+        if not self.queue.owns(self):
+            self.lost = True
+            return False
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(self.claim_path)
+        return True
+
+    @contextlib.contextmanager
+    def heartbeat(self) -> Iterator["Claim"]:
+        """Touch the claim from a background thread while the block runs."""
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(self.queue.heartbeat_interval):
+                if not self.touch():
+                    print(f"[QUEUE] Lost claim on {self.id}; its result will be ignored if already done")
+                    return
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{self.id}", daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+
+class WorkQueue:
+    def __init__(self, root: Path, heartbeat_interval: float = 30.0, stale_after: float = 180.0,
+                 max_attempts: int = 3) -> None:
+        """
+        Args:
+            root: Queue directory on the shared volume (created if missing).
+            heartbeat_interval: Seconds between heartbeats of a running task.
+            stale_after: Heartbeat age after which a claim is reclaimed.
+            max_attempts: Claims per task before it is moved to ``failed``.
+        """
+        self.root = Path(root)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.max_attempts = max(1, int(max_attempts))
+        for state in STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, state: str, task_id: str) -> Path:
+        return self.root / state / f"{task_id}.json"
+
+    def _ids(self, state: str) -> List[str]:
+        return sorted(path.stem for path in (self.root / state).glob("*.json"))
+
+    def server_time(self) -> float:
+        """Current time according to the file server (mtime of a touched file)."""
+        clock = self.root / ".clock"
+        clock.touch()  # sets the mtime to "now" on the server
+        return clock.stat().st_mtime
+
+    # ------------------------------------------------------------------
+    # Submitting and inspecting
+    # ------------------------------------------------------------------
+    def state_of(self, task_id: str) -> Optional[str]:
+        for state in ("done", "claimed", "pending", "failed"):
+            if self._path(state, task_id).exists():
+                return state
+        return None
+
+    def submit(self, kind: str, payload: Dict[str, Any], task_id: Optional[str] = None) -> str:
+        """Queue a task; re-submitting a known id is a no-op unless it failed."""
+        task_id = task_id or f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        state = self.state_of(task_id)
+        if state in ("pending", "claimed", "done"):
+            return task_id
+        task = {"id": task_id, "kind": kind, "payload": payload, "attempts": 0,
+                "submitted_at": _now(), "history": []}
+        target = self._path("pending", task_id)
+        os.replace(_write_json(target, task), target)
+        if state == "failed":
+            _unlink(self._path("failed", task_id))
+        return task_id
+
+    def status(self) -> Dict[str, int]:
+        return {state: len(self._ids(state)) for state in STATES}
+
+    def result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """The finished (done or failed) task record, or None while it is still open."""
+        for state in ("done", "failed"):
+            task = _read_json(self._path(state, task_id))
+            if task is not None:
+                task["state"] = state
+                return task
+        return None
+
+    def wait(self, task_ids: Iterable[str], poll: float = 5.0,
+             timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Block until every task is done or failed; returns their records by id."""
+        pending = list(task_ids)
+        finished: Dict[str, Dict[str, Any]] = {}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while pending:
+            self.reclaim_stale()
+            for task_id in list(pending):
+                record = self.result(task_id)
+                if record is not None:
+                    finished[task_id] = record
+                    pending.remove(task_id)
+            if pending:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"{len(pending)} task(s) still open in {self.root}")
+                time.sleep(poll)
+        return finished
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def claim(self, worker_id: Optional[str] = None, kinds: Optional[Iterable[str]] = None) -> Optional[Claim]:
+        """Take the oldest pending task (of ``kinds``), or None if there is none."""
+        worker_id = worker_id or default_worker_id()
+        kinds = set(kinds) if kinds else None
+        for task_id in self._ids("pending"):
+            source = self._path("pending", task_id)
+            if kinds is not None:
+                task = _read_json(source)
+                if task is None or task["kind"] not in kinds:
+                    continue
+            target = self._path("claimed", task_id)
+            try:
+                os.rename(source, target)  # exactly one worker wins
+                # The rename keeps the submission mtime; restart the heartbeat clock first.
+                # A reclaimer may already have taken the file away for looking stale.
+                os.utime(target)
+            except FileNotFoundError:
+                continue
+            task = _read_json(target)
+            if task is None or self._path("done", task_id).exists():
+                # Unreadable, or a late duplicate of a task that already finished
+                _unlink(target)
+                continue
+            task["attempts"] += 1
+            task["history"].append({"worker": worker_id, "claimed_at": _now()})
+            claim_path = target.with_suffix(".claim")
+            os.replace(_write_json(claim_path, {"worker": worker_id, "claimed_at": _now()}), claim_path)
+            os.replace(_write_json(target, task), target)
+            return Claim(self, task, worker_id)
+        return None
+
+    def owns(self, claim: Claim) -> bool:
+        info = _read_json(claim.claim_path)
+        return claim.path.exists() and info is not None and info.get("worker") == claim.worker_id
+
+    def _release(self, claim: Claim) -> None:
+        if self.owns(claim):
+            _unlink(claim.claim_path)
+            _unlink(claim.path)
+
+    def complete(self, claim: Claim, result: Any = None) -> bool:
+        """Store the result; False if another worker already finished the task."""
+        task = dict(claim.task, result=result, worker=claim.worker_id, finished_at=_now())
+        target = self._path("done", claim.id)
+        tmp = _write_json(target, task)
+        try:
+            # link() fails if the target exists: the first result wins
+            os.link(tmp, target)
+            stored = True
+        except FileExistsError:
+            stored = False
+        except (AttributeError, OSError):
+            stored = not target.exists()
+            if stored:
+                os.replace(tmp, target)
+        finally:
+            _unlink(tmp)
+        self._release(claim)
+        return stored
+
+    def fail(self, claim: Claim, error: str) -> str:
+        """Record an error; the task is retried until ``max_attempts``.  Returns its new state."""
+        task = dict(claim.task)
+        task["history"][-1]["error"] = error
+        if not self.owns(claim):
+            return self.state_of(claim.id) or "pending"
+        # Give the claim up before publishing: once the task is back in pending/
+        # a new owner may claim it, and its files must not be released by us
+        aside = claim.path.with_name(f".{claim.id}.{uuid.uuid4().hex}.fail")
+        try:
+            os.rename(claim.path, aside)
+        except FileNotFoundError:
+            return self.state_of(claim.id) or "pending"
+        _unlink(claim.claim_path)
+        _unlink(aside)
+        state = "pending" if task["attempts"] < self.max_attempts else "failed"
+        if state == "failed":
+            task["error"] = error
+        target = self._path(state, claim.id)
+        os.replace(_write_json(target, task), target)
+        return state
+
+    def reclaim_stale(self) -> List[str]:
+        """Return tasks of workers whose heartbeat stopped to ``pending`` (or ``failed``)."""
+        now = self.server_time()
+        reclaimed = []
+        for task_id in self._ids("claimed"):
+            path = self._path("claimed", task_id)
+            claim_path = path.with_suffix(".claim")
+            try:
+                beat = path.stat().st_mtime
+                with contextlib.suppress(FileNotFoundError):
+                    beat = max(beat, claim_path.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+            if now - beat < self.stale_after:
+                continue
+            aside = path.with_name(f".{task_id}.{uuid.uuid4().hex}.reclaim")
+            try:
+                os.rename(path, aside)  # exactly one reclaimer wins
+            except FileNotFoundError:
+                continue
+            task = _read_json(aside)
+            # Drop the old claim before publishing, as fail() does: once the task is
+            # back in pending/ a new owner may write its own .claim, which must survive
+            _unlink(aside)
+            _unlink(claim_path)
+            if task is not None and not self._path("done", task_id).exists():
+                task["history"].append({"reclaimed_at": _now(), "error": "heartbeat timed out"})
+                state = "pending" if task["attempts"] < self.max_attempts else "failed"
+                if state == "failed":
+                    task["error"] = "heartbeat timed out"
+                target = self._path(state, task_id)
+                os.replace(_write_json(target, task), target)
+                reclaimed.append(task_id)
+        return reclaimed